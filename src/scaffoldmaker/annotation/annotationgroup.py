@@ -6,7 +6,7 @@ from opencmiss.zinc.field import Field, FieldGroup
 from opencmiss.zinc.result import RESULT_OK
 from opencmiss.utils.zinc.general import ChangeManager
 from scaffoldmaker.utils.zinc_utils import group_get_highest_dimension, \
-    identifier_ranges_from_string, identifier_ranges_to_string, \
+    identifier_ranges_count, identifier_ranges_from_string, identifier_ranges_to_string, \
     mesh_group_add_identifier_ranges, mesh_group_to_identifier_ranges, \
     nodeset_group_add_identifier_ranges, nodeset_group_to_identifier_ranges
 
@@ -23,6 +23,8 @@ class AnnotationGroup(object):
         '''
         self._name = term[0]
         self._id = term[1]
+        # if True, subelements are added on first request for a lower dimension group, see setAddSubelementsOnDemand()
+        self._addSubelementsOnDemand = False
         fieldmodule = region.getFieldmodule()
         field = fieldmodule.findFieldByName(self._name)
         if field.isValid():
@@ -38,20 +40,25 @@ class AnnotationGroup(object):
         '''
         Encodes object into a dictionary for JSON serialisation.
         Used only for user-defined annotation groups.
+        Groups containing every element or node of their highest dimension domain are marked as
+        wholeDomain so fromDict() can add them all in one operation.
         :return: Dictionary containing object encoding.
         '''
         # get identifier ranges from highest dimension domain in group
         dimension = self.getDimension()
         fieldmodule = self._group.getFieldmodule()
+        wholeDomain = False
         if dimension > 0:
             mesh = fieldmodule.findMeshByDimension(dimension)
             meshGroup = self._group.getFieldElementGroup(mesh).getMeshGroup()
             identifierRanges = mesh_group_to_identifier_ranges(meshGroup)
+            wholeDomain = meshGroup.getSize() == mesh.getSize()
         else:
             nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
             nodesetGroup = self._group.getFieldNodeGroup(nodes).getNodesetGroup()
             if nodesetGroup.isValid():
                 identifierRanges = nodeset_group_to_identifier_ranges(nodesetGroup)
+                wholeDomain = (nodesetGroup.getSize() > 0) and (nodesetGroup.getSize() == nodes.getSize())
             else:
                 identifierRanges = []
         dct = {
@@ -61,13 +68,17 @@ class AnnotationGroup(object):
             'dimension' : dimension,
             'identifierRanges' : identifier_ranges_to_string(identifierRanges)
             }
+        if wholeDomain:
+            dct['wholeDomain'] = True
         return dct
 
     @classmethod
-    def fromDict(cls, dct, region):
+    def fromDict(cls, dct, region, addSubelements=True):
         '''
         Instantiate from dict. See toDict()
         :param region: Zinc region.
+        :param addSubelements: If True (default) add faces, lines and nodes of elements to the group.
+        Pass False if the group is to contain only elements of its highest dimension.
         :return: AnnotationGroup
         '''
         assert dct['_AnnotationGroup']
@@ -76,16 +87,24 @@ class AnnotationGroup(object):
         dimension = dct['dimension']
         identifierRangesString = dct['identifierRanges']
         identifierRanges = identifier_ranges_from_string(identifierRangesString)
+        # only trust wholeDomain if the domain still has the number of identifiers in ranges
+        wholeDomain = dct.get('wholeDomain', False)
         fieldmodule = region.getFieldmodule()
         with ChangeManager(fieldmodule):
             annotationGroup = cls(region, (name, ontId))
-            annotationGroup._group.setSubelementHandlingMode(FieldGroup.SUBELEMENT_HANDLING_MODE_FULL)
             if dimension > 0:
-                meshGroup = annotationGroup.getMeshGroup(fieldmodule.findMeshByDimension(dimension))
-                mesh_group_add_identifier_ranges(meshGroup, identifierRanges)
+                mesh = fieldmodule.findMeshByDimension(dimension)
+                meshGroup = annotationGroup.getMeshGroup(mesh)
+                # add elements without subelements, then add faces and nodes in bulk
+                mesh_group_add_identifier_ranges(meshGroup, identifierRanges,
+                    whole_domain=wholeDomain and (identifier_ranges_count(identifierRanges) == mesh.getSize()))
+                if addSubelements:
+                    annotationGroup.addSubelements()
             else:
-                nodesetGroup = annotationGroup.getNodesetGroup(fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES))
-                nodeset_group_add_identifier_ranges(nodesetGroup, identifierRanges)
+                nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+                nodesetGroup = annotationGroup.getNodesetGroup(nodes)
+                nodeset_group_add_identifier_ranges(nodesetGroup, identifierRanges,
+                    whole_domain=wholeDomain and (identifier_ranges_count(identifierRanges) == nodes.getSize()))
         return annotationGroup
 
     def getName(self):
@@ -139,6 +158,11 @@ class AnnotationGroup(object):
         return ( self._name, self._id )
 
     def getGroup(self):
+        '''
+        :return: The Zinc group field, with subelements added first if set to add them on demand,
+        as it may be used to find faces of the group's elements.
+        '''
+        self._checkAddSubelementsOnDemand(0)
         return self._group
 
     def getDimension(self):
@@ -147,11 +171,31 @@ class AnnotationGroup(object):
         '''
         return group_get_highest_dimension(self._group)
 
+    def setAddSubelementsOnDemand(self, addSubelementsOnDemand):
+        '''
+        Set whether to call addSubelements() on first request for the group field, a lower
+        dimension element group or a node group, so only groups used e.g. by
+        defineFaceAnnotations() get faces.
+        Call after group is complete and faces have been defined.
+        :param addSubelementsOnDemand: True to add subelements on demand, False to not.
+        '''
+        self._addSubelementsOnDemand = addSubelementsOnDemand
+
+    def _checkAddSubelementsOnDemand(self, dimension):
+        '''
+        Add subelements if set to add on demand and dimension is lower than the group's.
+        :param dimension: Dimension of requested mesh, or 0 for nodes.
+        '''
+        if self._addSubelementsOnDemand and (dimension < self.getDimension()):
+            self._addSubelementsOnDemand = False
+            self.addSubelements()
+
     def getFieldElementGroup(self, mesh):
         '''
         :param mesh: The Zinc mesh to manage a sub group of.
         :return: The Zinc element group field for mesh in this AnnotationGroup.
         '''
+        self._checkAddSubelementsOnDemand(mesh.getDimension())
         elementGroup = self._group.getFieldElementGroup(mesh)
         if not elementGroup.isValid():
             elementGroup = self._group.createFieldElementGroup(mesh)
@@ -162,6 +206,7 @@ class AnnotationGroup(object):
         :param nodeset: The Zinc nodeset to manage a sub group of.
         :return: The Zinc node group field for nodeset in this AnnotationGroup.
         '''
+        self._checkAddSubelementsOnDemand(0)
         nodeGroup = self._group.getFieldNodeGroup(nodeset)
         if not nodeGroup.isValid():
             nodeGroup = self._group.createFieldNodeGroup(nodeset)
@@ -179,6 +224,7 @@ class AnnotationGroup(object):
         :param mesh: The Zinc mesh to query a sub group of.
         :return: True if MeshGroup for mesh exists and is not empty, otherwise False.
         '''
+        self._checkAddSubelementsOnDemand(mesh.getDimension())
         elementGroup = self._group.getFieldElementGroup(mesh)
         return elementGroup.isValid() and (elementGroup.getMeshGroup().getSize() > 0)
 
@@ -194,6 +240,7 @@ class AnnotationGroup(object):
         :param nodeset: The Zinc nodeset to query a sub group of.
         :return: True if NodesetGroup for nodeset exists and is not empty, otherwise False.
         '''
+        self._checkAddSubelementsOnDemand(0)
         nodeGroup = self._group.getFieldNodeGroup(nodeset)
         return nodeGroup.isValid() and (nodeGroup.getNodesetGroup().getSize() > 0)
 
@@ -202,6 +249,7 @@ class AnnotationGroup(object):
         Call after group is complete and faces have been defined to add faces and
         nodes for elements in group to related subgroups.
         '''
+        self._addSubelementsOnDemand = False
         self._group.setSubelementHandlingMode(FieldGroup.SUBELEMENT_HANDLING_MODE_FULL)
         fm = self._group.getFieldmodule()
         for dimension in range(1, 4):
@@ -212,6 +260,26 @@ class AnnotationGroup(object):
                 #print('Mesh group:', self._name, ', size', meshGroup.getSize())
                 meshGroup.addElementsConditional(elementGroup)  # use FieldElementGroup as conditional field
 
+    def removeSubelements(self):
+        '''
+        Remove elements of lower dimension than the highest dimension in group, and
+        nodes if group has elements, and stop adding subelements automatically.
+        '''
+        self._addSubelementsOnDemand = False
+        self._group.setSubelementHandlingMode(FieldGroup.SUBELEMENT_HANDLING_MODE_NONE)
+        highestDimension = self.getDimension()
+        if highestDimension < 1:
+            return
+        fm = self._group.getFieldmodule()
+        with ChangeManager(fm):
+            for dimension in range(1, highestDimension):
+                elementGroup = self._group.getFieldElementGroup(fm.findMeshByDimension(dimension))
+                if elementGroup.isValid():
+                    elementGroup.getMeshGroup().removeAllElements()
+            nodeGroup = self._group.getFieldNodeGroup(fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES))
+            if nodeGroup.isValid():
+                nodeGroup.getNodesetGroup().removeAllNodes()
+
 
 def findAnnotationGroupByName(annotationGroups: list, name: str):
     '''
@@ -0,0 +1,192 @@
+"""
+Functions for generating batches of scaffolds in parallel worker processes.
+Each job is a serialised ScaffoldPackage dict as returned by ScaffoldPackage.toDict(),
+generated in its own process with its own Zinc Context.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, TimeoutError, wait
+import json
+import multiprocessing
+import os
+import signal
+import time
+
+
+class BatchJobTimeout(Exception):
+    '''
+    Raised in a worker process when a job exceeds its time limit.
+    '''
+    pass
+
+
+def _raiseBatchJobTimeout(signum, frame):
+    raise BatchJobTimeout()
+
+
+def generateBatchJob(jobIndex, scaffoldPackageDict, applyTransformation=True, timeout=None):
+    '''
+    Generate a single serialised ScaffoldPackage in a new Zinc Context.
+    Called in worker processes by generateBatch(), but can be called directly.
+    :param jobIndex: Index of job in batch, returned in result.
+    :param scaffoldPackageDict: Dict from ScaffoldPackage.toDict(), including scaffoldTypeName.
+    :param applyTransformation: Passed to ScaffoldPackage.generate().
+    :param timeout: Optional time limit in seconds. Only enforced on platforms supporting SIGALRM.
+    :return: dict with keys 'index', 'scaffoldTypeName', 'buffer' (Zinc EX model bytes or None),
+    'annotationGroups' (list of AnnotationGroup dicts), 'time' (wall time in seconds) and
+    'error' (None on success, otherwise error message string).
+    '''
+    # import in worker so parent process need not have imported scaffold types
+    from opencmiss.zinc.context import Context
+    from scaffoldmaker.scaffolds import Scaffolds_decodeJSON, Scaffolds_JSONEncoder
+    startTime = time.perf_counter()
+    result = {
+        'index' : jobIndex,
+        'scaffoldTypeName' : scaffoldPackageDict.get('scaffoldTypeName'),
+        'buffer' : None,
+        'annotationGroups' : [],
+        'time' : 0.0,
+        'error' : None
+        }
+    useAlarm = bool(timeout) and hasattr(signal, 'setitimer')
+    if useAlarm:
+        oldHandler = signal.signal(signal.SIGALRM, _raiseBatchJobTimeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        dct = dict(scaffoldPackageDict)
+        dct['_ScaffoldPackage'] = True
+        # round trip through JSON to decode nested ScaffoldPackage options
+        scaffoldPackage = json.loads(json.dumps(dct, cls=Scaffolds_JSONEncoder), object_hook=Scaffolds_decodeJSON)
+        context = Context('batch' + str(jobIndex))
+        region = context.getDefaultRegion()
+        scaffoldPackage.generate(region, applyTransformation)
+        result['annotationGroups'] = [ annotationGroup.toDict() for annotationGroup in scaffoldPackage.getAnnotationGroups() ]
+        sir = region.createStreaminformationRegion()
+        srm = sir.createStreamresourceMemory()
+        region.write(sir)
+        _, result['buffer'] = srm.getBuffer()
+    except BatchJobTimeout:
+        result['error'] = 'Timed out after ' + str(timeout) + ' seconds'
+    except Exception as e:
+        result['error'] = type(e).__name__ + ': ' + str(e)
+    finally:
+        if useAlarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, oldHandler)
+    result['time'] = time.perf_counter() - startTime
+    return result
+
+
+def _createErrorResult(jobIndex, scaffoldPackageDict, error):
+    '''
+    :return: Job result dict as for generateBatchJob() for job that did not return.
+    '''
+    return {
+        'index' : jobIndex,
+        'scaffoldTypeName' : scaffoldPackageDict.get('scaffoldTypeName'),
+        'buffer' : None,
+        'annotationGroups' : [],
+        'time' : 0.0,
+        'error' : error
+        }
+
+
+def _recordWorkerPid(workerPids):
+    '''
+    Worker process initializer appending its process id to shared list workerPids.
+    '''
+    workerPids.append(os.getpid())
+
+
+def _terminateWorkers(executor, workerPids):
+    '''
+    Terminate worker processes of executor which may be blocked in Zinc calls.
+    :param workerPids: Shared list of worker process ids recorded by _recordWorkerPid().
+    '''
+    executor.shutdown(wait=False, cancel_futures=True)
+    for pid in list(workerPids):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass  # already exited
+
+
+# seconds after job timeout the parent process waits for a result before abandoning a job
+# blocked in a call which does not return to python to be interrupted
+TIMEOUT_MARGIN = 10.0
+
+
+def _runJobs(jobFunction, jobsArgs, createErrorResult, workersCount, timeout, ordered):
+    '''
+    Call jobFunction(jobIndex, *jobArgs, timeout) for each jobArgs in worker processes, yielding results.
+    Jobs raising exceptions in the parent process, e.g. BrokenProcessPool if a worker crashed, or
+    not returning within timeout + TIMEOUT_MARGIN get results from createErrorResult(jobIndex, jobArgs, error).
+    See generateBatch() for other parameters.
+    '''
+    # worker process ids are recorded so workers blocked in calls which do not return can be terminated
+    manager = multiprocessing.Manager()
+    workerPids = manager.list()
+    executor = ProcessPoolExecutor(max_workers=workersCount, initializer=_recordWorkerPid, initargs=(workerPids,))
+    waitTimeout = (timeout + TIMEOUT_MARGIN) if timeout else None
+    blocked = False
+    try:
+        futures = [ executor.submit(jobFunction, jobIndex, *jobArgs, timeout) for jobIndex, jobArgs in enumerate(jobsArgs) ]
+        jobIndexes = { future: jobIndex for jobIndex, future in enumerate(futures) }
+
+        def getResult(future, error=None):
+            jobIndex = jobIndexes[future]
+            if not error:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = type(e).__name__ + ': ' + str(e)
+            return createErrorResult(jobIndex, jobsArgs[jobIndex], error)
+
+        notReturned = 'No result within ' + str(waitTimeout) + ' seconds'
+        if ordered:
+            # earlier jobs have finished, so each job starts within the wait unless all workers are blocked
+            for future in futures:
+                try:
+                    future.exception(timeout=waitTimeout)
+                except TimeoutError:
+                    blocked = True
+                    yield getResult(future, notReturned)
+                    continue
+                yield getResult(future)
+        else:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=waitTimeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # running jobs should finish within the wait, so all remaining jobs are blocked
+                    blocked = True
+                    for future in sorted(pending, key=lambda future: jobIndexes[future]):
+                        yield getResult(future, notReturned)
+                    break
+                for future in done:
+                    yield getResult(future)
+    finally:
+        if blocked:
+            _terminateWorkers(executor, workerPids)
+        executor.shutdown(wait=not blocked, cancel_futures=True)
+        manager.shutdown()
+
+
+def generateBatch(scaffoldPackageDicts, workersCount=None, timeout=None, ordered=True, applyTransformation=True):
+    '''
+    Generate scaffolds for a list of serialised ScaffoldPackages in parallel worker processes.
+    Results are yielded as they become available, so they can be streamed to the client.
+    A job whose worker process crashes, or which does not return within timeout + TIMEOUT_MARGIN
+    e.g. because it is blocked in a Zinc call, gets a result with an error and no buffer.
+    :param scaffoldPackageDicts: List of dicts from ScaffoldPackage.toDict(), including scaffoldTypeName.
+    :param workersCount: Number of worker processes, or None to use the number of CPUs.
+    :param timeout: Optional per-job time limit in seconds. Jobs exceeding it return an error.
+    :param ordered: If True (default) yield results in job order, otherwise yield as completed.
+    :param applyTransformation: Passed to ScaffoldPackage.generate().
+    :return: Generator of job result dicts, see generateBatchJob().
+    '''
+    if not workersCount:
+        workersCount = os.cpu_count() or 1
+    workersCount = min(workersCount, max(1, len(scaffoldPackageDicts)))
+    jobsArgs = [ (scaffoldPackageDict, applyTransformation) for scaffoldPackageDict in scaffoldPackageDicts ]
+    return _runJobs(generateBatchJob, jobsArgs, lambda jobIndex, jobArgs, error: _createErrorResult(jobIndex, jobArgs[0], error),
+        workersCount, timeout, ordered)
@@ -3,8 +3,8 @@ Generates a 1-D tree of bifurcating curves with radius.
 """
 
 from __future__ import division
-from math import cos, radians, sin, sqrt
-from opencmiss.utils.maths.vectorops import add, cross, magnitude, mult, normalize, sub
+from math import cos, radians, sin
+import numpy as np
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreateFieldFiniteElement
 from opencmiss.zinc.element import Element, Elementbasis
 from opencmiss.utils.zinc.general import ChangeManager
@@ -155,14 +155,14 @@ class TreeNode:
 class BifurcationTree:
     '''
     Class for generating tree of 1-D bifurcating curves and converting to Zinc model.
+    Tree nodes are stored breadth first in arrays, with the branches of each generation
+    computed together, so deep trees are not limited by recursion.
     '''
 
     def __init__(self, generationCount, rootLength, rootRadius, forkAngleRadians, forkRadiusRatio, branchArcRadians, branchLengthRatio, branchRadiusRatio):
         '''
         '''
         self._generationCount = generationCount
-        rootDirection = [ 0.0, 0.0, rootLength ]
-        self._rootNode = TreeNode([ 0.0, 0.0, 0.0 ], rootDirection, rootRadius)
         self._forkAngleRadians = forkAngleRadians
         self._cosForkAngle = cos(forkAngleRadians)
         self._sinForkAngle = sin(forkAngleRadians)
@@ -172,51 +172,168 @@ class BifurcationTree:
         self._sinBranchArc = sin(branchArcRadians)
         self._branchLengthRatio = branchLengthRatio
         self._branchRadiusRatio = branchRadiusRatio
-        self._rootNode.addChild(self._createNodeTree(1, rootDirection, rootDirection, rootRadius*branchRadiusRatio, [ 0.0, 1.0, 0.0 ]))
+        self._rootNode = None
+        self._createNodeArrays(rootLength, rootRadius)
 
-    def _createNodeTree(self, generation, x1, d1, r, forkNormal):
-        '''
-        Create node with specified x1, d1, r and recursively add two child nodes until generationCount.
-        :param forkNormal: Unit direction normal to d1 and child branches.
-        :return: Top node of tree.
-        '''
-        node = TreeNode(x1, d1, r)
-        if generation < self._generationCount:
-            branchLength = magnitude(d1)*self._branchLengthRatio
-            main = mult(d1, self._cosForkAngle*self._branchLengthRatio)
-            side = mult(cross(forkNormal, d1), self._sinForkAngle*self._branchLengthRatio)
-            branch1d1 = add(main, side)
-            branch2d1 = sub(main, side)
+    def _createNodeArrays(self, rootLength, rootRadius):
+        '''
+        Create breadth first arrays of tree nodes, the root node at index 0 and the first
+        generation node at index 1, with the 2 children of each node in subsequent generations
+        consecutive in the next generation. Arrays are:
+        parent indexes, -1 for root;
+        x, d1, r: coordinates, primary derivative and radius at node, ending the curve from its parent;
+        parentD1, parentR: derivative and radius at parent node starting the curve to node;
+        parentD1Versions, parentRVersions: versions of parentD1, parentR at parent node, starting at 1;
+        d1VersionsCounts, rVersionsCounts: numbers of d1 and r versions at node.
+        '''
+        rootDirection = [ 0.0, 0.0, rootLength ]
+        parentIndexes = [ np.array([ -1, 0 ]) ]
+        x = [ np.array([ [ 0.0, 0.0, 0.0 ], rootDirection ]) ]
+        d1 = [ np.array([ rootDirection, rootDirection ]) ]
+        r = [ np.array([ rootRadius, rootRadius*self._branchRadiusRatio ]) ]
+        parentD1 = [ np.array([ [ 0.0, 0.0, 0.0 ], rootDirection ]) ]
+        parentR = [ np.array([ 0.0, rootRadius ]) ]
+        parentD1Versions = [ np.array([ 0, 1 ]) ]
+        parentRVersions = [ np.array([ 0, 1 ]) ]
+        forkNormals = np.array([ [ 0.0, 1.0, 0.0 ] ])
+        # start of node indexes in each generation, with root in generation 0
+        self._generationStarts = [ 0, 1, 2 ]
+        for generation in range(1, self._generationCount):
+            gx = x[-1][-len(forkNormals):]
+            gd1 = d1[-1][-len(forkNormals):]
+            gr = r[-1][-len(forkNormals):]
+            gParentIndexes = np.arange(self._generationStarts[generation], self._generationStarts[generation + 1])
+            branchLengths = np.linalg.norm(gd1, axis=1)[:, np.newaxis]*self._branchLengthRatio
+            main = gd1*(self._cosForkAngle*self._branchLengthRatio)
+            side = np.cross(forkNormals, gd1)*(self._sinForkAngle*self._branchLengthRatio)
+            branch1d1 = main + side
+            branch2d1 = main - side
             if self._branchArcRadians > 0.0:
-                arcr = branchLength/self._branchArcRadians
-                arc2 = mult(branch1d1, arcr/branchLength)
-                arc1 = cross(arc2, forkNormal)
-                arcc = sub(x1, arc1)
-                branch1x2 = add(arcc, add(mult(arc1, self._cosBranchArc), mult(arc2, self._sinBranchArc)))
-                branch1d2 = mult(add(mult(arc1, -self._sinBranchArc), mult(arc2, self._cosBranchArc)), branchLength/arcr)
-                arc2 = mult(branch2d1, arcr/branchLength)
-                arc1 = cross(forkNormal, arc2)
-                arcc = sub(x1, arc1)
-                branch2x2 = add(arcc, add(mult(arc1, self._cosBranchArc), mult(arc2, self._sinBranchArc)))
-                branch2d2 = mult(add(mult(arc1, -self._sinBranchArc), mult(arc2, self._cosBranchArc)), branchLength/arcr)
+                arcr = branchLengths/self._branchArcRadians
+                arc2 = branch1d1*(arcr/branchLengths)
+                arc1 = np.cross(arc2, forkNormals)
+                arcc = gx - arc1
+                branch1x2 = arcc + arc1*self._cosBranchArc + arc2*self._sinBranchArc
+                branch1d2 = (arc1*-self._sinBranchArc + arc2*self._cosBranchArc)*(branchLengths/arcr)
+                arc2 = branch2d1*(arcr/branchLengths)
+                arc1 = np.cross(forkNormals, arc2)
+                arcc = gx - arc1
+                branch2x2 = arcc + arc1*self._cosBranchArc + arc2*self._sinBranchArc
+                branch2d2 = (arc1*-self._sinBranchArc + arc2*self._cosBranchArc)*(branchLengths/arcr)
             else:
-                branch1x2 = add(x1, branch1d1)
+                branch1x2 = gx + branch1d1
                 branch1d2 = branch1d1
-                branch2x2 = add(x1, branch2d1)
+                branch2x2 = gx + branch2d1
                 branch2d2 = branch2d1
-            branch1Normal = normalize(cross(forkNormal, branch1d2))
-            branch2Normal = normalize(cross(forkNormal, branch2d2))
-            forkRadius = r*self._forkRadiusRatio
-            node.addChild(self._createNodeTree(generation + 1, branch1x2, branch1d2, forkRadius*self._branchRadiusRatio, branch1Normal), branch1d1, forkRadius)
-            node.addChild(self._createNodeTree(generation + 1, branch2x2, branch2d2, forkRadius*self._branchRadiusRatio, branch2Normal), branch2d1, forkRadius)
-        return node
+            branch1Normals = np.cross(forkNormals, branch1d2)
+            branch2Normals = np.cross(forkNormals, branch2d2)
+            forkRadii = gr*self._forkRadiusRatio
+            # interleave so children of each node are consecutive
+            interleave = lambda a, b: np.stack((a, b), axis=1).reshape((-1,) + a.shape[1:])
+            parentIndexes.append(np.repeat(gParentIndexes, 2))
+            x.append(interleave(branch1x2, branch2x2))
+            d1.append(interleave(branch1d2, branch2d2))
+            r.append(np.repeat(forkRadii*self._branchRadiusRatio, 2))
+            parentD1.append(interleave(branch1d1, branch2d1))
+            parentD1Versions.append(np.tile([ 2, 3 ], len(gParentIndexes)))
+            # zero fork radius uses the parent's primary radius version
+            hasForkRadius = np.repeat(forkRadii != 0.0, 2)
+            parentR.append(np.where(hasForkRadius, np.repeat(forkRadii, 2), np.repeat(gr, 2)))
+            parentRVersions.append(np.where(hasForkRadius, np.tile([ 2, 3 ], len(gParentIndexes)), 1))
+            forkNormals = interleave(branch1Normals, branch2Normals)
+            forkNormals /= np.linalg.norm(forkNormals, axis=1)[:, np.newaxis]
+            self._generationStarts.append(self._generationStarts[-1] + 2*len(gParentIndexes))
+        self._parentIndexes = np.concatenate(parentIndexes)
+        self._x = np.concatenate(x)
+        self._d1 = np.concatenate(d1)
+        self._r = np.concatenate(r)
+        self._parentD1 = np.concatenate(parentD1)
+        self._parentR = np.concatenate(parentR)
+        self._parentD1Versions = np.concatenate(parentD1Versions)
+        self._parentRVersions = np.concatenate(parentRVersions)
+        nodesCount = len(self._parentIndexes)
+        self._d1VersionsCounts = np.ones(nodesCount, dtype=int)
+        self._rVersionsCounts = np.ones(nodesCount, dtype=int)
+        np.maximum.at(self._d1VersionsCounts, self._parentIndexes[1:], self._parentD1Versions[1:])
+        np.maximum.at(self._rVersionsCounts, self._parentIndexes[1:], self._parentRVersions[1:])
+
+    def getNodesCount(self):
+        return len(self._parentIndexes)
+
+    def getGenerationNodeIndexes(self, generation):
+        '''
+        :param generation: Generation from 0 for root to generationCount.
+        :return: range of node indexes in generation.
+        '''
+        return range(self._generationStarts[generation], self._generationStarts[generation + 1])
+
+    def getParentIndexes(self):
+        '''
+        :return: numpy array of parent node index for each node, -1 for root.
+        '''
+        return self._parentIndexes
+
+    def getNodeParameters(self):
+        '''
+        :return: numpy arrays x, d1, r of primary coordinates, derivative and radius at nodes.
+        '''
+        return self._x, self._d1, self._r
+
+    def getCurve(self, nodeIndex):
+        '''
+        :param nodeIndex: Index of node at end of curve, greater than 0.
+        :return: x1, d1, r1, x2, d2, r2 of curve from parent node.
+        '''
+        assert 0 < nodeIndex < len(self._parentIndexes)
+        parentIndex = self._parentIndexes[nodeIndex]
+        return self._x[parentIndex].tolist(), self._parentD1[nodeIndex].tolist(), float(self._parentR[nodeIndex]), \
+            self._x[nodeIndex].tolist(), self._d1[nodeIndex].tolist(), float(self._r[nodeIndex])
 
     def getRootNode(self):
+        '''
+        Get tree as nested TreeNode objects, created on first call.
+        :return: Root TreeNode.
+        '''
+        if not self._rootNode:
+            x = self._x.tolist()
+            d1 = self._d1.tolist()
+            r = self._r.tolist()
+            parentD1 = self._parentD1.tolist()
+            parentR = self._parentR.tolist()
+            treeNodes = [ TreeNode(x[i], d1[i], r[i]) for i in range(len(x)) ]
+            for i in range(1, len(x)):
+                treeNodes[self._parentIndexes[i]].addChild(treeNodes[i],
+                    parentD1[i] if (self._parentD1Versions[i] > 1) else None,
+                    parentR[i] if (self._parentRVersions[i] > 1) else None)
+            self._rootNode = treeNodes[0]
         return self._rootNode
 
+    def _getDepthFirstOrder(self):
+        '''
+        Get position of each node in depth first order, children in order, from sizes of subtrees.
+        :return: numpy array of depth first order for each node, 0 for root.
+        '''
+        nodesCount = len(self._parentIndexes)
+        subtreeSizes = np.ones(nodesCount, dtype=int)
+        for generation in range(len(self._generationStarts) - 2, 0, -1):
+            indexes = self.getGenerationNodeIndexes(generation)
+            np.add.at(subtreeSizes, self._parentIndexes[indexes], subtreeSizes[indexes])
+        order = np.zeros(nodesCount, dtype=int)
+        for generation in range(1, len(self._generationStarts) - 1):
+            indexes = np.array(self.getGenerationNodeIndexes(generation))
+            parentIndexes = self._parentIndexes[indexes]
+            sizes = subtreeSizes[indexes]
+            precedingSizes = np.cumsum(sizes) - sizes
+            # subtract sizes preceding first child of same parent
+            firstChildPositions = np.unique(parentIndexes, return_index=True, return_inverse=True)
+            precedingSizes -= precedingSizes[firstChildPositions[1]][firstChildPositions[2]]
+            order[indexes] = order[parentIndexes] + 1 + precedingSizes
+        return order
+
     def generateZincModel(self, region, nextNodeIdentifier=1, nextElementIdentifier=1):
         '''
         Generate Zinc nodes and elements in region to represent tree.
+        Nodes and elements are numbered in depth first order and created in identifier order.
         :return: Final nextNodeIdentifier, nextElementIdentifier.
         '''
         self._fieldmodule = region.getFieldmodule()
@@ -226,13 +343,49 @@ class BifurcationTree:
         self._linearBasis = self._fieldmodule.createElementbasis(1, Elementbasis.FUNCTION_TYPE_LINEAR_LAGRANGE)
         self._nodetemplates = {}  # indexed by (d1VersionsCount, rVersionsCount)
         self._elementtemplates = {}  # indexed by start (d1Version, rVersion)
+        nodesCount = len(self._parentIndexes)
+        depthFirstOrder = self._getDepthFirstOrder()
+        nodeIndexes = np.argsort(depthFirstOrder).tolist()
+        nodeIdentifiers = (depthFirstOrder + nextNodeIdentifier).tolist()
+        # all versions of d1 and r at each node: primary then starts of curves to children
+        d1Versions = np.zeros((nodesCount, 3, 3))
+        d1Versions[:, 0] = self._d1
+        d1Versions[self._parentIndexes[1:], self._parentD1Versions[1:] - 1] = self._parentD1[1:]
+        rVersions = np.zeros((nodesCount, 3))
+        rVersions[:, 0] = self._r
+        rVersions[self._parentIndexes[1:], self._parentRVersions[1:] - 1] = self._parentR[1:]
+        x = self._x.tolist()
+        d1Versions = d1Versions.tolist()
+        rVersions = rVersions.tolist()
+        d1VersionsCounts = self._d1VersionsCounts.tolist()
+        rVersionsCounts = self._rVersionsCounts.tolist()
+        parentIndexes = self._parentIndexes.tolist()
+        parentD1Versions = self._parentD1Versions.tolist()
+        parentRVersions = self._parentRVersions.tolist()
         with ChangeManager(self._fieldmodule):
             self._coordinates = findOrCreateFieldCoordinates(self._fieldmodule)
             self._radius = findOrCreateFieldFiniteElement(self._fieldmodule, "radius", components_count=1, managed=True)
             self._fieldcache = self._fieldmodule.createFieldcache()
-            parentNode = None
-            nextNodeIdentifier, nextElementIdentifier = self._generateZincModelTree(self._rootNode, parentNode, nextNodeIdentifier, nextElementIdentifier)
-        return nextNodeIdentifier, nextElementIdentifier
+            for i in nodeIndexes:
+                d1VersionsCount = d1VersionsCounts[i]
+                rVersionsCount = rVersionsCounts[i]
+                nodetemplate = self._getZincNodetemplate(d1VersionsCount, rVersionsCount)
+                node = self._nodes.createNode(nodeIdentifiers[i], nodetemplate)
+                self._fieldcache.setNode(node)
+                self._coordinates.setNodeParameters(self._fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, x[i])
+                for v in range(d1VersionsCount):
+                    self._coordinates.setNodeParameters(self._fieldcache, -1, Node.VALUE_LABEL_D_DS1, v + 1, d1Versions[i][v])
+                for v in range(rVersionsCount):
+                    self._radius.setNodeParameters(self._fieldcache, -1, Node.VALUE_LABEL_VALUE, v + 1, rVersions[i][v])
+            for i in nodeIndexes[1:]:
+                elementtemplate = self._getZincElementtemplate(parentD1Versions[i], parentRVersions[i])
+                element = self._mesh1d.createElement(nextElementIdentifier, elementtemplate)
+                nextElementIdentifier += 1
+                nids = [ nodeIdentifiers[parentIndexes[i]], nodeIdentifiers[i] ]
+                # must set nodes for both efts
+                element.setNodesByIdentifier(element.getElementfieldtemplate(self._coordinates, -1), nids)
+                element.setNodesByIdentifier(element.getElementfieldtemplate(self._radius, -1), nids)
+        return nextNodeIdentifier + nodesCount, nextElementIdentifier
 
     def _getZincNodetemplate(self, d1VersionsCount, rVersionsCount):
         '''
@@ -270,35 +423,3 @@ class BifurcationTree:
             elementtemplate.defineField(self._radius, -1, eftRadius)
             self._elementtemplates[templateId] = elementtemplate
         return elementtemplate
-
-    def _generateZincModelTree(self, treeNode, parentNode, nextNodeIdentifier, nextElementIdentifier):
-        '''
-        :return: Final nextNodeIdentifier, nextElementIdentifier.
-        '''
-        d1VersionsCount = len(treeNode._d1)
-        rVersionsCount = len(treeNode._r)
-        nodetemplate = self._getZincNodetemplate(d1VersionsCount, rVersionsCount)
-        node = self._nodes.createNode(nextNodeIdentifier, nodetemplate)
-        nextNodeIdentifier += 1
-        self._fieldcache.setNode(node)
-        self._coordinates.setNodeParameters(self._fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, treeNode._x)
-        for i in range(d1VersionsCount):
-            self._coordinates.setNodeParameters(self._fieldcache, -1, Node.VALUE_LABEL_D_DS1, i + 1, treeNode._d1[i])
-        for i in range(rVersionsCount):
-            self._radius.setNodeParameters(self._fieldcache, -1, Node.VALUE_LABEL_VALUE, i + 1, treeNode._r[i])
-
-        if parentNode:
-            elementtemplate = self._getZincElementtemplate(treeNode._parent_d1_index + 1, treeNode._parent_r_index + 1)
-            element = self._mesh1d.createElement(nextElementIdentifier, elementtemplate)
-            nextElementIdentifier += 1
-            eftCoordinates = element.getElementfieldtemplate(self._coordinates, -1)
-            eftRadius = element.getElementfieldtemplate(self._radius, -1)
-            # must set node for both efts
-            for eft in ( eftCoordinates, eftRadius ):
-                element.setNode(eft, 1, parentNode)
-                element.setNode(eft, 2, node)
-
-        for childTreeNode in treeNode._children:
-            nextNodeIdentifier, nextElementIdentifier = self._generateZincModelTree(childTreeNode, node, nextNodeIdentifier, nextElementIdentifier)
-
-        return nextNodeIdentifier, nextElementIdentifier
@@ -4,14 +4,17 @@ Generates a 1-D path mesh.
 
 from __future__ import division
 import math
+import numpy
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreateFieldGroup
 from opencmiss.utils.zinc.general import ChangeManager
 from opencmiss.zinc.element import Element, Elementbasis
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.node import Node
 from scaffoldmaker.meshtypes.scaffold_base import Scaffold_base
+from scaffoldmaker.utils.generationcache import subScaffoldCache
 from scaffoldmaker.utils.interpolation import DerivativeScalingMode, smoothCubicHermiteDerivativesLine, smoothCubicHermiteCrossDerivativesLine
 from scaffoldmaker.utils import vector
+from scaffoldmaker.utils.zinc_utils import get_nodeset_field_parameters, set_nodeset_field_parameters
 from opencmiss.zinc.result import RESULT_OK
 
 
@@ -225,10 +228,6 @@ def extractPathParametersFromRegion(region, valueLabels, groupName=None):
     coordinates = fieldmodule.findFieldByName('coordinates').castFiniteElement()
     componentsCount = coordinates.getNumberOfComponents()
     assert componentsCount in [ 1, 2, 3 ], 'extractPathParametersFromRegion.  Invalid coordinates number of components'
-    cache = fieldmodule.createFieldcache()
-
-    valueLabelsCount = len(valueLabels)
-    returnValues = [[] for i in range(valueLabelsCount)]
     nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
     if groupName:
         group = fieldmodule.findFieldByName(groupName).castGroup()
@@ -237,18 +236,25 @@ def extractPathParametersFromRegion(region, valueLabels, groupName=None):
             nodes = nodeGroup.getNodesetGroup()
         else:
             print('extractPathParametersFromRegion: missing group "' + groupName + '"')
-    nodeIter = nodes.createNodeiterator()
-    node = nodeIter.next()
-    while node.isValid():
-        cache.setNode(node)
-        for i in range(valueLabelsCount):
-            result, values = coordinates.getNodeParameters(cache, -1, valueLabels[i], 1, componentsCount)
-            for c in range(componentsCount, 3):
-                values.append(0.0)
-            returnValues[i].append(values)
-        node = nodeIter.next()
+    identifiers, parameters, present = get_nodeset_field_parameters(nodes, coordinates, valueLabels)
+    # first version of each value label, padded with zeroes to 3 components
+    values = numpy.zeros((len(valueLabels), len(identifiers), 3))
+    values[:, :, :componentsCount] = parameters[:, :, 0, :].transpose((1, 0, 2))
+    return values.tolist()
+
 
-    return returnValues
+def extractPathParametersFromScaffoldPackage(region, scaffoldPackage, valueLabels, groupName=None):
+    '''
+    Returns parameters of all nodes in path generated from scaffoldPackage, as for
+    extractPathParametersFromRegion(). Results are memoized in subScaffoldCache, so the
+    path is only generated, in a temporary child region of region, on first use.
+    :param region: Parent region for temporary region.
+    :param scaffoldPackage: ScaffoldPackage for path, e.g. central path option.
+    :param valueLabels: List of parameters required as list of node value labels.
+    :param groupName: Optional name of Zinc group to get parameters from.
+    :return: List of parameters for each value label (all padded with zeroes to 3 components).
+    '''
+    return subScaffoldCache.getGeneratedResult(region, scaffoldPackage, extractPathParametersFromRegion, valueLabels, groupName)
 
 
 def setPathParameters(region, nodeValueLabels, nodeValues, editGroupName=None):
@@ -262,7 +268,6 @@ def setPathParameters(region, nodeValueLabels, nodeValues, editGroupName=None):
     coordinates = fieldmodule.findFieldByName('coordinates').castFiniteElement()
     componentsCount = coordinates.getNumberOfComponents()
     # following requires at least one value label and node, assumes consistent values and components counts
-    nodeValueLabelsCount = len(nodeValueLabels)
     nodesCount = len(nodeValues[0])
     nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
     assert nodesCount == nodes.getSize()
@@ -273,15 +278,11 @@ def setPathParameters(region, nodeValueLabels, nodeValues, editGroupName=None):
             if not editNodeGroup.isValid():
                 editNodeGroup = editGroup.createFieldNodeGroup(nodes)
             editNodesetGroup = editNodeGroup.getNodesetGroup()
-        cache = fieldmodule.createFieldcache()
-        nodeIter = nodes.createNodeiterator()
-        node = nodeIter.next()
-        n = 0
-        while node.isValid():
-            cache.setNode(node)
-            for v in range(nodeValueLabelsCount):
-                coordinates.setNodeParameters(cache, -1, nodeValueLabels[v], 1, nodeValues[v][n])
-            if editGroupName:
-                editNodesetGroup.addNode(node)
-            node = nodeIter.next()
-            n += 1
+        # first version of each value label, for nodes in identifier order
+        parameters = numpy.array([ [ values[:componentsCount] for values in valuesList ] for valuesList in nodeValues ], dtype=float)
+        set_nodeset_field_parameters(nodes, coordinates, nodeValueLabels, None, parameters.transpose((1, 0, 2))[:, :, numpy.newaxis, :])
+        if editGroupName:
+            # all nodes are modified, so add them in one call
+            trueField = fieldmodule.createFieldConstant(1.0)
+            editNodesetGroup.addNodesConditional(trueField)
+            del trueField
@@ -118,10 +118,8 @@ class MeshType_2d_tubebifurcationtree1(Scaffold_base):
         nodetemplate.setValueNumberOfVersions(coordinates, -1, Node.VALUE_LABEL_D_DS1, 1)
         nodetemplate.setValueNumberOfVersions(coordinates, -1, Node.VALUE_LABEL_D_DS2, 1)
 
-        rootNode = bifurcationTree.getRootNode()
-        child1 = rootNode.getChild(0)
-
-        x1, xd1, r1, x2, xd2, r2 = child1.getChildCurve(0)
+        # first child of first generation node, in breadth first order
+        x1, xd1, r1, x2, xd2, r2 = bifurcationTree.getCurve(2)
         rd1 = rd2 = (r2 - r1)
 
         curveLength = getCubicHermiteArcLength(x1, xd1, x2, xd2)
@@ -842,13 +842,7 @@ class MeshType_3d_bladder1(Scaffold_base):
         refineElementsCountAround = options['Refine number of elements around']
         refineElementsCountUp = options['Refine number of elements up']
         refineElementsCountThroughWall = options['Refine number of elements through wall']
-        element = meshrefinement._sourceElementiterator.next()
-        while element.isValid():
-            numberInXi1 = refineElementsCountAround
-            numberInXi2 = refineElementsCountUp
-            numberInXi3 = refineElementsCountThroughWall
-            meshrefinement.refineElementCubeStandard3d(element, numberInXi1, numberInXi2, numberInXi3)
-            element = meshrefinement._sourceElementiterator.next()
+        meshrefinement.refineAllElementsCubeStandard3d(refineElementsCountAround, refineElementsCountUp, refineElementsCountThroughWall)
 
     @classmethod
     def defineFaceAnnotations(cls, region, options, annotationGroups):
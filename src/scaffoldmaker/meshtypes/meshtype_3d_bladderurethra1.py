@@ -8,7 +8,7 @@ import copy
 import math
 from scaffoldmaker.annotation.annotationgroup import AnnotationGroup, findOrCreateAnnotationGroupForTerm, getAnnotationGroupForTerm
 from scaffoldmaker.annotation.bladder_terms import get_bladder_term
-from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromRegion
+from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromScaffoldPackage
 from scaffoldmaker.meshtypes.meshtype_3d_ostium1 import MeshType_3d_ostium1, generateOstiumMesh
 from scaffoldmaker.meshtypes.scaffold_base import Scaffold_base
 from scaffoldmaker.scaffoldpackage import ScaffoldPackage
@@ -464,21 +464,15 @@ class MeshType_3d_bladderurethra1(Scaffold_base):
 
         # Central path
         # Bladder part
-        tmpRegion = region.createRegion()
-        centralPath.generate(tmpRegion)
-        cx_bladder, cd1_bladder, cd2_bladder, cd12_bladder = extractPathParametersFromRegion(tmpRegion,
+        cx_bladder, cd1_bladder, cd2_bladder, cd12_bladder = extractPathParametersFromScaffoldPackage(region, centralPath,
             [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2], groupName='urinary bladder')
         # for i in range(len(cx_bladder)):
         #     print(i, '[', cx_bladder[i], ',', cd1_bladder[i], ',', cd2_bladder[i], ',', cd12_bladder[i], '],')
-        del tmpRegion
         # Urethra part
-        tmpRegion = region.createRegion()
-        centralPath.generate(tmpRegion)
-        cx_urethra, cd1_urethra, cd2_urethra, cd12_urethra = extractPathParametersFromRegion(tmpRegion,
+        cx_urethra, cd1_urethra, cd2_urethra, cd12_urethra = extractPathParametersFromScaffoldPackage(region, centralPath,
             [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2], groupName='urethra')
         # for i in range(len(cx_urethra)):
         #     print(i, '[', cx_urethra[i], ',', cd1_urethra[i], ',', cd2_urethra[i], ',', cd12_urethra[i], '],')
-        del tmpRegion
 
         # Find arcLength
         # Bladder part
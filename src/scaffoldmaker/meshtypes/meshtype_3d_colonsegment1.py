@@ -7,6 +7,7 @@ and thickness along.
 
 import copy
 import math
+import numpy as np
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreateFieldTextureCoordinates
 from opencmiss.zinc.element import Element
 from opencmiss.zinc.field import Field
@@ -515,8 +516,6 @@ def getColonSegmentInnerPoints(region, elementsCountAroundTC,
 
     d2HalfSet = []
     d2Raw = []
-    xInnerRaw = []
-    dx_ds2InnerRaw = []
     xFinal = []
     d1Final = []
     d2Final = []
@@ -684,18 +683,14 @@ def getColonSegmentInnerPoints(region, elementsCountAroundTC,
             xForSampling.append(xFace)
             d1ForSampling.append(d1Face)
 
-        # Re-sample to have points spread out evenly
-        for n1 in range(elementsCountAroundHalfHaustrum + 1):
-            xForSamplingAlong = []
-            d1ForSamplingAlong = []
-            for n2 in range(elementsCountAlongSegment + 1):
-                xForSamplingAlong.append(xForSampling[n2][n1])
-                d1ForSamplingAlong.append(d1ForSampling[n2][n1])
-            xResampled, d1Resampled, se, sxi, _ = interp.sampleCubicHermiteCurves(xForSamplingAlong, d1ForSamplingAlong,
-                                                                                  elementsCountAlongSegment,
-                                                                                  arcLengthDerivatives = True)
-            xInnerRaw.append(xResampled)
-            dx_ds2InnerRaw.append(d1Resampled)
+        # Re-sample to have points spread out evenly, all columns along together
+        xForSamplingAlong = np.swapaxes(np.array(xForSampling), 0, 1)
+        d1ForSamplingAlong = np.swapaxes(np.array(d1ForSampling), 0, 1)
+        xResampled, d1Resampled = interp.sampleCubicHermiteCurvesArray(xForSamplingAlong, d1ForSamplingAlong,
+                                                                       elementsCountAlongSegment,
+                                                                       arcLengthDerivatives = True)[0:2]
+        xInnerRaw = xResampled.tolist()
+        dx_ds2InnerRaw = d1Resampled.tolist()
 
         # Re-arrange sample order & calculate dx_ds1 and dx_ds3 from dx_ds2
         for n2 in range(elementsCountAlongSegment + 1):
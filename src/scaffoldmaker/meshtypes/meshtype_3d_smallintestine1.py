@@ -7,7 +7,7 @@ wall, with variable radius and thickness along.
 import copy
 from scaffoldmaker.annotation.annotationgroup import AnnotationGroup
 from scaffoldmaker.annotation.smallintestine_terms import get_smallintestine_term
-from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromRegion
+from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromScaffoldPackage
 from scaffoldmaker.meshtypes.scaffold_base import Scaffold_base
 from scaffoldmaker.scaffoldpackage import ScaffoldPackage
 from scaffoldmaker.utils import interpolation as interp
@@ -793,16 +793,12 @@ class MeshType_3d_smallintestine1(Scaffold_base):
         firstElementIdentifier = 1
 
         # Central path
-        tmpRegion = region.createRegion()
-        centralPath.generate(tmpRegion)
-        cx, cd1, cd2, cd12 = extractPathParametersFromRegion(tmpRegion,
-                                                             [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1,
-                                                              Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2])
+        cx, cd1, cd2, cd12 = extractPathParametersFromScaffoldPackage(region, centralPath,
+                                                                      [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1,
+                                                                       Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2])
         # for i in range(len(cx)):
         #     print(i+1, '[', cx[i], ',', cd1[i], ',', cd2[i],',', cd12[i], '],')
 
-        del tmpRegion
-
         # find arclength of colon
         length = 0.0
         elementsCountIn = len(cx) - 1
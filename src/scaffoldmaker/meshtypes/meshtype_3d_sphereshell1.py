@@ -318,13 +318,12 @@ class MeshType_3d_sphereshell1(Scaffold_base):
             if excludeBottomRows == 0:
                 # create bottom apex elements, editing eft scale factor identifiers around apex
                 # scale factor identifiers follow convention of offsetting by 100 for each 'version'
-                elementtemplate1 = mesh.createElementtemplate()
-                elementtemplate1.setElementShapeType(Element.SHAPE_TYPE_CUBE)
+                # templates are shared with the same sector on other layers through the wall
                 for e1 in range(elementsCountAround):
                     va = e1
                     vb = (e1 + 1)%elementsCountAround
-                    eft1 = eftfactory.createEftShellPoleBottom(va*100, vb*100)
-                    elementtemplate1.defineField(coordinates, -1, eft1)
+                    elementtemplate1, eft1 = eftfactory.getSharedElementtemplate(coordinates,
+                        eftfactory.getSharedEft(eftfactory.createEftShellPoleBottom, va*100, vb*100))
                     element = mesh.createElement(elementIdentifier, elementtemplate1)
                     bni1 = no + 1
                     bni2 = no + e1 + 2
@@ -364,13 +363,12 @@ class MeshType_3d_sphereshell1(Scaffold_base):
             if excludeTopRows == 0:
                 # create top apex elements, editing eft scale factor identifiers around apex
                 # scale factor identifiers follow convention of offsetting by 100 for each 'version'
-                elementtemplate1 = mesh.createElementtemplate()
-                elementtemplate1.setElementShapeType(Element.SHAPE_TYPE_CUBE)
+                # templates are shared with the same sector on other layers through the wall
                 for e1 in range(elementsCountAround):
                     va = e1
                     vb = (e1 + 1)%elementsCountAround
-                    eft1 = eftfactory.createEftShellPoleTop(va*100, vb*100)
-                    elementtemplate1.defineField(coordinates, -1, eft1)
+                    elementtemplate1, eft1 = eftfactory.getSharedElementtemplate(coordinates,
+                        eftfactory.getSharedEft(eftfactory.createEftShellPoleTop, va*100, vb*100))
                     element = mesh.createElement(elementIdentifier, elementtemplate1)
                     bni3 = no + now
                     bni1 = bni3 - elementsCountAround + e1
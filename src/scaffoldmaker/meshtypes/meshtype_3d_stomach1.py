@@ -15,7 +15,7 @@ from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreat
 from opencmiss.zinc.element import Element
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.node import Node
-from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromRegion
+from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromScaffoldPackage
 from scaffoldmaker.meshtypes.meshtype_3d_ostium1 import MeshType_3d_ostium1, generateOstiumMesh
 from scaffoldmaker.meshtypes.scaffold_base import Scaffold_base
 from scaffoldmaker.scaffoldpackage import ScaffoldPackage
@@ -423,13 +423,12 @@ class MeshType_3d_stomach1(Scaffold_base):
         arcLengthOfGroupsAlong = []
         stomachTermsAlong = [None, 'fundus of stomach', 'body of stomach', 'pyloric antrum', 'pylorus', 'duodenum']
         for i in range(len(stomachTermsAlong)):
-            tmpRegion = region.createRegion()
-            centralPath.generate(tmpRegion)
             cxGroup, cd1Group, cd2Group, cd3Group, cd12Group, cd13Group = \
-                extractPathParametersFromRegion(tmpRegion, [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1,
-                                                            Node.VALUE_LABEL_D_DS2,  Node.VALUE_LABEL_D_DS3,
-                                                            Node.VALUE_LABEL_D2_DS1DS2, Node.VALUE_LABEL_D2_DS1DS3],
-                                                groupName=stomachTermsAlong[i])
+                extractPathParametersFromScaffoldPackage(region, centralPath,
+                                                         [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1,
+                                                          Node.VALUE_LABEL_D_DS2,  Node.VALUE_LABEL_D_DS3,
+                                                          Node.VALUE_LABEL_D2_DS1DS2, Node.VALUE_LABEL_D2_DS1DS3],
+                                                         groupName=stomachTermsAlong[i])
 
             arcLength = 0.0
             for e in range(len(cxGroup) - 1):
@@ -444,7 +443,6 @@ class MeshType_3d_stomach1(Scaffold_base):
                 cd3 = cd3Group
                 cd12 = cd12Group
                 cd13 = cd13Group
-            del tmpRegion
 
         sx, sd1, se, sxi, ssf = interp.sampleCubicHermiteCurves(cx, cd1, elementsCountAlongTrackSurface)
         sd2, sd12 = interp.interpolateSampleCubicHermite(cd2, cd12, se, sxi, ssf)
@@ -1932,7 +1930,7 @@ class MeshType_3d_stomach1(Scaffold_base):
                                                        bni11 + elementsCountAround1,
                                                        bni21 + elementsCountAround2,
                                                        bni22 + elementsCountAround2]
-                                    eft1 = eftfactory.createEftWedgeCollapseXi1Quadrant([1, 5])
+                                    eft1 = eftfactory.getSharedEft(eftfactory.createEftWedgeCollapseXi1Quadrant, [1, 5])
                                 elementtemplateX.defineField(coordinates, -1, eft1)
                                 elementtemplate1 = elementtemplateX
 
@@ -1956,7 +1954,7 @@ class MeshType_3d_stomach1(Scaffold_base):
                                                        bni12 + elementsCountAround1,
                                                        bni21 + elementsCountAround2,
                                                        bni22 + elementsCountAround2]
-                                    eft1 = eftfactory.createEftWedgeCollapseXi1Quadrant([2, 6])
+                                    eft1 = eftfactory.getSharedEft(eftfactory.createEftWedgeCollapseXi1Quadrant, [2, 6])
                                 elif e1 == elementsCountAround1 + 1:  # Remap derivatives of element adjacent to GC
                                     scaleFactors = [-1.0]
                                     nodeIdentifiers = [bni11, bni12, bni21, bni22,
@@ -2032,7 +2030,7 @@ class MeshType_3d_stomach1(Scaffold_base):
                                                    bni11 + elementsCountAround1, bni12 + elementsCountAround1,
                                                    bni21 + elementsCountAround2]
                                 scaleFactors = [-1.0]
-                                eft1 = eftfactory.createEftWedgeCollapseXi2Quadrant([4, 8])
+                                eft1 = eftfactory.getSharedEft(eftfactory.createEftWedgeCollapseXi2Quadrant, [4, 8])
                                 elementtemplateX.defineField(coordinates, -1, eft1)
                                 elementtemplate1 = elementtemplateX
 
@@ -2041,7 +2039,7 @@ class MeshType_3d_stomach1(Scaffold_base):
                                 nodeIdentifiers = [bni11, bni12, bni21,
                                                    bni11 + elementsCountAround1, bni12 + elementsCountAround1,
                                                    bni21 + elementsCountAround2]
-                                eft1 = eftfactory.createEftWedgeCollapseXi2Quadrant([3, 7])
+                                eft1 = eftfactory.getSharedEft(eftfactory.createEftWedgeCollapseXi2Quadrant, [3, 7])
                                 elementtemplateX.defineField(coordinates, -1, eft1)
                                 elementtemplate1 = elementtemplateX
 
@@ -6,14 +6,142 @@ Provenance information at http://models.cellml.org/workspace/516
 from __future__ import division
 import numpy as np
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreateFieldFibres
-from opencmiss.zinc.context import Context
 from opencmiss.zinc.element import Element
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.node import Node
 from scaffoldmaker.meshtypes.scaffold_base import Scaffold_base
 from scaffoldmaker.utils.eftfactory_tricubichermite import eftfactory_tricubichermite
+from scaffoldmaker.utils.zinc_utils import set_nodeset_field_parameters
 from scipy.interpolate import splprep, splev
 
+# node value labels in order of parameters for each coordinates component
+_hermiteValueLabels = [ 'value', 'd/ds1', 'd/ds2', 'd2/ds1ds2', 'd/ds3', 'd2/ds1ds3', 'd2/ds2ds3', 'd3/ds1ds2ds3' ]
+
+# arrays of host mesh parameters read from Stomach.hostMesh on first use, shared by all instances.
+# Reading the EX string takes about 30 ms once per process, so it remains the single source of the
+# host mesh rather than also shipping a binary copy of its parameters which could get out of step.
+_hostMeshArrays = None
+
+
+def _readHostMeshArrays(text):
+    '''
+    Read stomach host mesh EX text into numpy arrays of element parameters for vectorised evaluation.
+    Only supports the fields of Stomach.hostMesh: tricubic Hermite coordinates with all 8 node
+    values per component and trilinear Lagrange fibres with up to 2 versions, both with unit scale factors.
+    :param text: EX format string.
+    :return: elementCoordinates[elementsCount, 8 local nodes, 3 components, 8 values],
+    elementFibres[elementsCount, 8 local nodes, 3 components], in element identifier order from 1.
+    '''
+    nodeParameters = {}
+    elementNodes = {}
+    componentValuesCounts = []
+    # map element identifier -> fibre version for component, local node
+    elementFibreVersions = {}
+    fibreVersions = None
+    readingElements = False
+    componentIndex = -1
+    localNodeIndex = -1
+    lines = text.splitlines()
+    lineCount = len(lines)
+    i = 0
+    while i < lineCount:
+        line = lines[i]
+        i += 1
+        if line.startswith('Shape. Dimension=3'):
+            readingElements = True
+        elif line.startswith('#Fields='):
+            componentIndex = -1
+            componentValuesCounts = []
+            if readingElements:
+                fibreVersions = [ [ 1 ]*8 for c in range(3) ]
+        elif readingElements:
+            if line.startswith('Element: '):
+                identifier = int(line[9:])
+                elementFibreVersions[identifier] = fibreVersions
+                while not lines[i].startswith(' Nodes:'):
+                    i += 1
+                elementNodes[identifier] = [ int(s) for s in lines[i + 1].split() ]
+                i += 3
+                while (i < lineCount) and lines[i].startswith('  '):
+                    if any((float(s) != 1.0) for s in lines[i].split()):
+                        raise ValueError('Stomach host mesh:  Only unit scale factors are supported')
+                    i += 1
+            elif line.startswith(' ') and (' standard node based.' in line):
+                componentIndex += 1
+            elif line.startswith('  ') and ('. #Values=' in line):
+                localNodeIndex = int(line.split('.')[0]) - 1
+            elif line.startswith('   Value labels: '):
+                labels = line.split()[2:]
+                if componentIndex < 3:
+                    if labels != _hermiteValueLabels:
+                        raise ValueError('Stomach host mesh:  Unsupported coordinates value labels ' + line)
+                else:
+                    fibreVersions[componentIndex - 3][localNodeIndex] = 2 if (labels == [ 'value(2)' ]) else 1
+        elif line.startswith(' ') and ('. #Values=' in line):
+            componentValuesCounts.append(int(line.split('#Values=')[1].split()[0]))
+        elif line.startswith('Node: '):
+            identifier = int(line[6:])
+            values = []
+            while (i < lineCount) and lines[i].startswith(' '):
+                values += [ float(s) for s in lines[i].split() ]
+                i += 1
+            coordinates = []
+            fibres = []
+            v = 0
+            for c, valuesCount in enumerate(componentValuesCounts):
+                componentValues = values[v:v + valuesCount]
+                v += valuesCount
+                if c < 3:
+                    coordinates.append(componentValues)
+                else:
+                    # fibre versions: version 2 defaults to version 1 if not present
+                    fibres.append([ componentValues[0], componentValues[-1] ])
+            nodeParameters[identifier] = (coordinates, fibres)
+    elementsCount = len(elementNodes)
+    elementCoordinates = np.zeros((elementsCount, 8, 3, 8))
+    elementFibres = np.zeros((elementsCount, 8, 3))
+    for e in range(elementsCount):
+        fibreVersions = elementFibreVersions[e + 1]
+        for n, nodeIdentifier in enumerate(elementNodes[e + 1]):
+            coordinates, fibres = nodeParameters[nodeIdentifier]
+            elementCoordinates[e, n] = coordinates
+            for c in range(3):
+                elementFibres[e, n, c] = fibres[c][fibreVersions[c][n] - 1]
+    return elementCoordinates, elementFibres
+
+
+def _getCubicHermiteBasisArray(xi):
+    '''
+    :param xi: Array of element xi values.
+    :return: Array xi.shape + (2 nodes, 2 value, derivative) of cubic Hermite basis functions.
+    '''
+    xi2 = xi*xi
+    xi3 = xi2*xi
+    return np.stack([
+        np.stack([ 1.0 - 3.0*xi2 + 2.0*xi3, xi - 2.0*xi2 + xi3 ], axis=-1),
+        np.stack([ 3.0*xi2 - 2.0*xi3, xi3 - xi2 ], axis=-1) ], axis=-2)
+
+
+def _evaluateHostMeshArrays(elementCoordinates, elementFibres, elementIndexes, xi):
+    '''
+    Evaluate host mesh coordinates and fibres at many element locations in one pass.
+    :param elementCoordinates, elementFibres: Arrays from _readHostMeshArrays().
+    :param elementIndexes: Integer array (pointsCount) of zero-based element indexes.
+    :param xi: Array (pointsCount, 3) of host element xi.
+    :return: coordinates, fibres arrays (pointsCount, 3).
+    '''
+    basis = _getCubicHermiteBasisArray(xi)
+    # reshape local nodes to (n3, n2, n1) and values to (d3, d2, d1)
+    coordinates = np.einsum('pkjicfed,pid,pje,pkf->pc',
+        elementCoordinates[elementIndexes].reshape((-1, 2, 2, 2, 3, 2, 2, 2)),
+        basis[:, 0], basis[:, 1], basis[:, 2], optimize=True)
+    linear = np.stack([ 1.0 - xi, xi ], axis=-1)
+    fibres = np.einsum('pkjic,pi,pj,pk->pc',
+        elementFibres[elementIndexes].reshape((-1, 2, 2, 2, 3)),
+        linear[:, 0], linear[:, 1], linear[:, 2], optimize=True)
+    return coordinates, fibres
+
+
 class Stomach:
     '''
     Loads stomach mesh generated by Dr. Kumar Mithraratne (p.mithraratne@auckland.ac.nz)
@@ -9233,28 +9361,21 @@ Element: 264
 
     def __init__(self,):
         '''
-        Ex2 file containing node, element and field information
+        Host mesh parameters are read from EX string on first use and shared by all instances.
         '''
         
         self.circumferentialElements = 8
         self.axialElements = 11
         self.wallElements = 3        
-        self.ctx = Context('HostMesh')
-        region = self.ctx.getDefaultRegion()
-        sir  = region.createStreaminformationRegion()
-        sir.createStreamresourceMemoryBuffer(str(self.hostMesh)) 
-        region.read(sir)
-        self.region = region
-        fieldModule = self.region.getFieldmodule()
-        #Get the elements
-        mesh = fieldModule.findMeshByDimension(3)
-        ei   = mesh.createElementiterator()
-        elemDict = dict()
-        elem = ei.next()
-        while elem.isValid():
-            elemDict[int(elem.getIdentifier())] = elem
-            elem = ei.next()
-        self.elements = elemDict
+
+    def getHostMeshArrays(self):
+        '''
+        :return: elementCoordinates, elementFibres arrays from _readHostMeshArrays(), read once per process.
+        '''
+        global _hostMeshArrays
+        if _hostMeshArrays is None:
+            _hostMeshArrays = _readHostMeshArrays(self.hostMesh)
+        return _hostMeshArrays
     
     def generateTube(self,region,circumferentialElements,axialElements,wallElements,wallThickness=1):
         fieldModule = region.getFieldmodule()
@@ -9349,68 +9470,47 @@ Element: 264
         Calculate the length of each circumferential cross-section, determine the mean segment length
         for even distribution of element segments and determine the appropriate coordinate values 
         for the nodes
-        nvals - dictionary of nodeNumber (starts at 1) and fieldvalues
+        nvals - dictionary of fieldName and array of values at nodes in node number order
         fieldName - coordinate field's name 
         '''
         npts = 200
-        ilengths = np.zeros(npts-1)
-        def arcLength(x, y, z):
-            arc = np.sqrt((x[1] - x[0])**2 + (y[1] - y[0])**2 + (z[1] - z[0])**2)
-            ilengths[0] = arc
-            for k in range(2, npts):
-                ilengths[k-1] = np.sqrt((x[k] - x[k-1])**2 + (y[k] - y[k-1])**2 + (z[k] - z[k-1])**2)
-                arc = arc + ilengths[k-1]
-            return arc,ilengths                
-        
-        numLengthNodes = axialElements + 1
         numCircumferentialNodes = circumferentialElements
-        coordinates = np.zeros((numCircumferentialNodes,3))
-        for b in range(wallElements+1):
-            woff = b*(numLengthNodes*numCircumferentialNodes)
-            for a in range(numLengthNodes):
-                axoff = a*numCircumferentialNodes + woff
-                #Find the coordinates of a cross-section nodes number go from start-start+numCircumferentialNodes
-                for nd in range(numCircumferentialNodes):
-                    nid = nd + axoff
-                    coordinates[nd] = nvals[nid + 1][fieldName]
-                #Create a interpolator
-                tck, u = splprep(coordinates.T, u=None, s=0.0, per=1)
-                #Sample it finely to determine spine and its length
-                u_new = np.linspace(u.min(), u.max(), npts)
-                xs, ys, zs = splev(u_new, tck, der=0)
-                cLengths,ilengths = arcLength(xs,ys,zs)
-                #Find mean segment length
-                segmentLength = cLengths/circumferentialElements
-                #Find equi distant segments based on length 
-                uvalues = [0]  
-                cSegLength = ilengths[0]
-                for st in range(1,npts-1):
-                    cSegLength += ilengths[st]
-                    if cSegLength >= segmentLength:
-                        cSegLength = 0.0
-                        uvalues.append(st)
-                uvalues.append(uvalues[0])
-                #Parameter u goes from 0-1, so normalize
-                uvalues = np.array(uvalues)/(npts-1)
-                #Determine the new coordinate values and update
-                xs, ys, zs = splev(uvalues, tck, der=0)
-                for nd in range(numCircumferentialNodes):
-                    nid = nd + axoff
-                    nvals[nid + 1][fieldName] = [xs[nd],ys[nd],zs[nd]]
-            
+        rings = nvals[fieldName].reshape((-1, numCircumferentialNodes, 3))
+        for coordinates in rings:
+            #Create a interpolator
+            tck, u = splprep(coordinates.T, u=None, s=0.0, per=1)
+            #Sample it finely to determine spine and its length
+            u_new = np.linspace(u.min(), u.max(), npts)
+            xs = np.array(splev(u_new, tck, der=0))
+            ilengths = np.linalg.norm(xs[:, 1:] - xs[:, :-1], axis=0)
+            cumulativeLengths = np.cumsum(ilengths)
+            #Find mean segment length
+            segmentLength = cumulativeLengths[-1]/circumferentialElements
+            #Find equi distant segments based on length, restarting the sum at each segment end
+            uvalues = [0]
+            startLength = 0.0
+            st = 1
+            while True:
+                st = max(st, int(np.searchsorted(cumulativeLengths, startLength + segmentLength)))
+                if st >= npts - 1:
+                    break
+                uvalues.append(st)
+                startLength = cumulativeLengths[st]
+                st += 1
+            uvalues.append(uvalues[0])
+            #Parameter u goes from 0-1, so normalize
+            uvalues = np.array(uvalues[:numCircumferentialNodes])/(npts-1)
+            #Determine the new coordinate values and update
+            coordinates[:] = np.array(splev(uvalues, tck, der=0)).T
         return nvals     
     
     def getInitialValues(self,fieldNames,circumferentialElements,axialElements,wallElements,refineAtLength,refineAtTheta):
         '''
         Determine initial values of fields in fieldNames from source mesh
         based on material coordinates of target mesh nodes
-        fieldNames is a dictionary with fieldName,numberOfComponents {'coordinates':3,'label',:1}
+        fieldNames is a dictionary with fieldName,numberOfComponents, only 'coordinates':3 and 'fibres':3 are supported
+        :return: dictionary of fieldName and array (nodesCount, numberOfComponents) of values in node number order
         '''
-        numberOfCircumfrentialNodes = circumferentialElements
-        numberOfLengthNodes = axialElements + 1
-        # create node element map
-        ev = 0
-        nodes = dict()
         linterval = axialElements-len(refineAtLength)
         if linterval > 8:
             lengthElementLocations = np.linspace(0.0, 0.99999, linterval+1)
@@ -9438,69 +9538,24 @@ Element: 264
             ctr +=1            
             
         wallElementLocations   = np.linspace(0.0, 0.99999, wallElements+1)
-        #Compute the material coordinates of nodes
-        for wallElementIdx in range(1,wallElements+1):
-            for lengthElementIdx in range(1,axialElements+1):
-                for circumfrentialElementIdx in range(1,circumferentialElements+1):
-                    #Element coord with respect to elements along each dim
-                    
-                    localNode1 = circumfrentialElementIdx + (lengthElementIdx - 1)*circumferentialElements + \
-                        (wallElementIdx-1)*numberOfCircumfrentialNodes*numberOfLengthNodes
-                    if circumfrentialElementIdx == circumferentialElements:
-                        localNode2 = 1 + (lengthElementIdx-1)*numberOfCircumfrentialNodes + \
-                            (wallElementIdx-1)*numberOfCircumfrentialNodes*numberOfLengthNodes                          
-                    else: 
-                        localNode2 = localNode1 + 1
-                        
-                    localNode3 = localNode1 + numberOfCircumfrentialNodes
-                    localNode4 = localNode2 + numberOfCircumfrentialNodes
-                    localNode5 = localNode1 + numberOfCircumfrentialNodes*numberOfLengthNodes
-                    localNode6 = localNode2 + numberOfCircumfrentialNodes*numberOfLengthNodes
-                    localNode7 = localNode3 + numberOfCircumfrentialNodes*numberOfLengthNodes
-                    localNode8 = localNode4 + numberOfCircumfrentialNodes*numberOfLengthNodes
-
-                    l1xi = [circumferentialElementLocations[circumfrentialElementIdx-1],lengthElementLocations[lengthElementIdx-1],wallElementLocations[wallElementIdx-1]]
-                    l2xi = [circumferentialElementLocations[circumfrentialElementIdx],lengthElementLocations[lengthElementIdx-1],wallElementLocations[wallElementIdx-1]]
-                    l3xi = [circumferentialElementLocations[circumfrentialElementIdx-1],lengthElementLocations[lengthElementIdx],wallElementLocations[wallElementIdx-1]]
-                    l4xi = [circumferentialElementLocations[circumfrentialElementIdx],lengthElementLocations[lengthElementIdx],wallElementLocations[wallElementIdx-1]]
-                    l5xi = [circumferentialElementLocations[circumfrentialElementIdx-1],lengthElementLocations[lengthElementIdx-1],wallElementLocations[wallElementIdx]]
-                    l6xi = [circumferentialElementLocations[circumfrentialElementIdx],lengthElementLocations[lengthElementIdx-1],wallElementLocations[wallElementIdx]]
-                    l7xi = [circumferentialElementLocations[circumfrentialElementIdx-1],lengthElementLocations[lengthElementIdx],wallElementLocations[wallElementIdx]]
-                    l8xi = [circumferentialElementLocations[circumfrentialElementIdx],lengthElementLocations[lengthElementIdx],wallElementLocations[wallElementIdx]]
-                    
-                    ev +=1
-                    nds = [localNode1,localNode2,localNode3,localNode4,localNode5,localNode6,localNode7,localNode8]
-                    xis = [l1xi,l2xi,l3xi,l4xi,l5xi,l6xi,l7xi,l8xi]
-                    for i,nd in enumerate(nds):
-                        if not nd in nodes:
-                            nodes[nd] = xis[i]
+        #Compute the material coordinates of nodes in node number order: around, along, through wall
+        wallLocations, lengthLocations, circumferentialLocations = np.meshgrid(
+            wallElementLocations, lengthElementLocations[:axialElements + 1],
+            circumferentialElementLocations[:circumferentialElements], indexing='ij')
+        materialCoordinates = np.stack([ circumferentialLocations.ravel(), lengthLocations.ravel(), wallLocations.ravel() ], axis=1)
 
-        
-        fieldModule = self.region.getFieldmodule()
-        #Coordinates is a cubic hermite Field 
-        fieldHandles = dict()
-        for field in fieldNames.keys():       
-            hField = fieldModule.findFieldByName(field)
-            fieldHandles[field]=hField
-
-        fieldCache = fieldModule.createFieldcache()        
-        for nd,val in nodes.items():
-            xpos = int(val[0]*self.circumferentialElements)
-            xi1  = val[0]*self.circumferentialElements - xpos    
-            ypos = int(val[1]*self.axialElements)
-            xi2  = val[1]*self.axialElements - ypos
-            zpos = int(val[2]*self.wallElements)
-            xi3  = val[2]*self.wallElements - zpos
-            eid = xpos + ypos*self.circumferentialElements + zpos*(self.circumferentialElements*self.axialElements) + 1
-            fv = dict()
-            #xi1 and xi2 are inverted in kumar's mesh
-            
-            for fn,hfl in fieldHandles.items():
-                fieldCache.setMeshLocation(self.elements[eid],[xi2,xi1,xi3])
-                _,v = hfl.evaluateReal(fieldCache,fieldNames[fn])                
-                fv[fn] = v  
-            nodes[nd] = fv
-        return nodes    
+        #Find host element and xi of all nodes and evaluate in one pass
+        hostElementsCounts = np.array([ self.circumferentialElements, self.axialElements, self.wallElements ])
+        scaledCoordinates = materialCoordinates*hostElementsCounts
+        hostPositions = np.floor(scaledCoordinates).astype(int)
+        xi = scaledCoordinates - hostPositions
+        elementIndexes = hostPositions[:, 0] + hostPositions[:, 1]*self.circumferentialElements + \
+            hostPositions[:, 2]*(self.circumferentialElements*self.axialElements)
+        elementCoordinates, elementFibres = self.getHostMeshArrays()
+        #xi1 and xi2 are inverted in kumar's mesh
+        coordinates, fibres = _evaluateHostMeshArrays(elementCoordinates, elementFibres, elementIndexes, xi[:, [ 1, 0, 2 ]])
+        values = { 'coordinates' : coordinates, 'fibres' : fibres }
+        return { fieldName : values[fieldName] for fieldName in fieldNames.keys() }
     
     def generateMesh(self,region,circumferentialElements,axialElements,wallElements,normalizeCircumferentialSegmentLengths,refineAtLength={},refineAtTheta={}):
         '''
@@ -9526,19 +9581,18 @@ Element: 264
             nvals = self.normalizeByCircumferentialLengths(nvals, 'coordinates', totalCircumferentialElements, totalAxialElements, wallElements) 
    
         fieldModule = region.getFieldmodule()
-        fieldCache = fieldModule.createFieldcache()  
         coordinatesField = fieldModule.findFieldByName('coordinates').castFiniteElement()
         fibresField = fieldModule.findFieldByName('fibres').castFiniteElement()
+        nodeset = fieldModule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        nodeIdentifiers = range(1, len(nodes) + 1)
         fieldModule.beginChange()
-        for nd,node in nodes.items():
-            fieldCache.setNode(node)
-            coordinatesField.setNodeParameters(fieldCache, -1, Node.VALUE_LABEL_VALUE, 1, nvals[nd]['coordinates'])
-            fibresField.setNodeParameters(fieldCache, -1, Node.VALUE_LABEL_VALUE, 1, nvals[nd]['fibres'])            
+        for field, values in ((coordinatesField, nvals['coordinates']), (fibresField, nvals['fibres'])):
+            set_nodeset_field_parameters(nodeset, field, [ Node.VALUE_LABEL_VALUE ], nodeIdentifiers, values[:, np.newaxis, np.newaxis, :])
         smoothing = fieldModule.createFieldsmoothing()
         coordinatesField.smooth(smoothing)
         fibresField.smooth(smoothing)
         fieldModule.endChange()
-            
+
 
 class MeshType_3d_stomachhuman1(Scaffold_base):
     '''
@@ -246,31 +246,11 @@ Generates body coordinates using a solid cylinder of all cube elements,
                             elementsCountAcrossTransition, shellProportion,
                             [0.0, 0.0, 0.0], cylinderCentralPath.alongAxis[0], cylinderCentralPath.majorAxis[0],
                             cylinderCentralPath.minorRadii[0])
-        cylinder1 = CylinderMesh(fieldmodule, coordinates, elementsCountAlong, base,
-                                 cylinderShape=cylinderShape,
-                                 cylinderCentralPath=cylinderCentralPath, useCrossDerivatives=False)
-
-        # body coordinates
+        # body coordinates are defined with the same parameters as coordinates in the same pass
         bodyCoordinates = findOrCreateFieldCoordinates(fieldmodule, name="body coordinates")
-        tmp_region = region.createRegion()
-        tmp_fieldmodule = tmp_region.getFieldmodule()
-        tmp_body_coordinates = findOrCreateFieldCoordinates(tmp_fieldmodule, name="body coordinates")
-        tmp_cylinder = CylinderMesh(tmp_fieldmodule, tmp_body_coordinates, elementsCountAlong, base,
+        cylinder1 = CylinderMesh(fieldmodule, [coordinates, bodyCoordinates], elementsCountAlong, base,
                                  cylinderShape=cylinderShape,
                                  cylinderCentralPath=cylinderCentralPath, useCrossDerivatives=False)
-        sir = tmp_region.createStreaminformationRegion()
-        srm = sir.createStreamresourceMemory()
-        tmp_region.write(sir)
-        result, buffer = srm.getBuffer()
-        sir = region.createStreaminformationRegion()
-        srm = sir.createStreamresourceMemoryBuffer(buffer)
-        region.read(sir)
-
-        del srm
-        del sir
-        del tmp_body_coordinates
-        del tmp_fieldmodule
-        del tmp_region
 
         # Groups of different parts of the body
         is_body = fieldmodule.createFieldConstant(1)
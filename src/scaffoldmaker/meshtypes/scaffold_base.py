@@ -3,13 +3,30 @@ Scaffold abstract base class.
 Describes methods each scaffold must or may override.
 """
 import copy
+from enum import Enum
 from opencmiss.utils.zinc.general import ChangeManager
 from opencmiss.zinc.field import Field
 from scaffoldmaker.utils.meshrefinement import MeshRefinement
 from scaffoldmaker.utils.derivativemoothing import DerivativeSmoothing
 from scaffoldmaker.utils.interpolation import DerivativeScalingMode
+from scaffoldmaker.utils.profiling import addProfileCount, isProfiling, profileSpan
 from scaffoldmaker.utils.zinc_utils import extract_node_field_parameters, print_node_field_parameters
 
+class FaceGenerationMode(Enum):
+    '''
+    Controls which faces and lines are defined when generating a mesh.
+    Zinc can only find exterior faces once all faces are defined, so EXTERIOR defines all faces
+    then destroys interior ones: it takes slightly longer than ALL, but saves memory and size
+    of the model and its output. Only NONE saves generation time.
+    '''
+    NONE = 1      # no faces or lines are defined
+    EXTERIOR = 2  # only faces and lines on the exterior or in annotation groups of dimension 2 or less are kept
+    ALL = 3       # all faces and lines are defined (default)
+
+class GroupGenerationMode(Enum):
+    HIGHEST_DIMENSION = 1  # annotation groups only contain elements of their highest dimension
+    FULL = 2               # annotation groups also contain faces, lines and nodes of their elements (default)
+
 class Scaffold_base:
     '''
     Base class for scaffolds / mesh generator scripts.
@@ -126,34 +143,89 @@ class Scaffold_base:
         pass
 
     @classmethod
-    def generateMesh(cls, region, options):
+    def generateMesh(cls, region, options, faceMode=FaceGenerationMode.ALL, groupMode=GroupGenerationMode.FULL):
         """
         Generate base or refined mesh.
         Some classes may override to a simpler version just generating the base mesh.
         :param region: Zinc region to create mesh in. Must be empty.
         :param options: Dict containing options. See getDefaultOptions().
+        :param faceMode: FaceGenerationMode controlling which faces and lines are defined.
+        Face annotation groups are only defined if faceMode is not NONE.
+        :param groupMode: GroupGenerationMode controlling whether annotation groups contain
+        subelements and nodes of their highest dimension elements.
         :return: list of AnnotationGroup for mesh.
         """
         fieldmodule = region.getFieldmodule()
-        with ChangeManager(fieldmodule):
+        with profileSpan(cls.getName() + ' generateMesh'), ChangeManager(fieldmodule):
             if options.get('Refine'):
                 baseRegion = region.createRegion()
-                annotationGroups = cls.generateBaseMesh(baseRegion, options)
-                meshrefinement = MeshRefinement(baseRegion, region, annotationGroups)
-                cls.refineMesh(meshrefinement, options)
-                annotationGroups = meshrefinement.getAnnotationGroups()
+                with profileSpan('generateBaseMesh'):
+                    annotationGroups = cls.generateBaseMesh(baseRegion, options)
+                with profileSpan('refineMesh'):
+                    meshrefinement = MeshRefinement(baseRegion, region, annotationGroups)
+                    cls.refineMesh(meshrefinement, options)
+                    annotationGroups = meshrefinement.getAnnotationGroups()
             else:
-                annotationGroups = cls.generateBaseMesh(region, options)
-            fieldmodule.defineAllFaces()
+                with profileSpan('generateBaseMesh'):
+                    annotationGroups = cls.generateBaseMesh(region, options)
+            if faceMode != FaceGenerationMode.NONE:
+                with profileSpan('defineAllFaces'):
+                    fieldmodule.defineAllFaces()
             oldAnnotationGroups = copy.copy(annotationGroups)
-            for annotationGroup in annotationGroups:
-                annotationGroup.addSubelements()
-            cls.defineFaceAnnotations(region, options, annotationGroups)
-            for annotationGroup in annotationGroups:
-                if annotationGroup not in oldAnnotationGroups:
-                    annotationGroup.addSubelements()
+            if groupMode == GroupGenerationMode.FULL:
+                with profileSpan('addSubelements'):
+                    for annotationGroup in annotationGroups:
+                        annotationGroup.addSubelements()
+            elif faceMode != FaceGenerationMode.NONE:
+                # only add faces, lines and nodes to groups defineFaceAnnotations uses; removed below
+                for annotationGroup in annotationGroups:
+                    annotationGroup.setAddSubelementsOnDemand(True)
+            if faceMode != FaceGenerationMode.NONE:
+                with profileSpan('defineFaceAnnotations'):
+                    cls.defineFaceAnnotations(region, options, annotationGroups)
+                    for annotationGroup in annotationGroups:
+                        if annotationGroup not in oldAnnotationGroups:
+                            if groupMode == GroupGenerationMode.FULL:
+                                annotationGroup.addSubelements()
+                            else:
+                                annotationGroup.setAddSubelementsOnDemand(True)
+            if faceMode == FaceGenerationMode.EXTERIOR:
+                with profileSpan('removeInteriorFaces'):
+                    cls._removeInteriorFaces(fieldmodule, annotationGroups)
+            if (faceMode != FaceGenerationMode.NONE) and (groupMode == GroupGenerationMode.HIGHEST_DIMENSION):
+                with profileSpan('removeSubelements'):
+                    for annotationGroup in annotationGroups:
+                        annotationGroup.removeSubelements()
+            if isProfiling():
+                addProfileCount('nodes', fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES).getSize())
+                for dimension in range(3, 0, -1):
+                    addProfileCount('elements ' + str(dimension) + 'D', fieldmodule.findMeshByDimension(dimension).getSize())
+                addProfileCount('annotation groups', len(annotationGroups))
         return annotationGroups
 
+    @classmethod
+    def _removeInteriorFaces(cls, fieldmodule, annotationGroups):
+        """
+        Destroy faces and lines of a 3D mesh which are not on its exterior
+        nor in annotation groups of dimension 2 or less, nor lines of kept faces.
+        Call after subelements have been added to annotation groups.
+        :param fieldmodule: Zinc fieldmodule of the model.
+        :param annotationGroups: List of AnnotationGroup for the model.
+        """
+        mesh3d = fieldmodule.findMeshByDimension(3)
+        if mesh3d.getSize() == 0:
+            return
+        isExterior = fieldmodule.createFieldIsExterior()
+        for dimension in (2, 1):
+            mesh = fieldmodule.findMeshByDimension(dimension)
+            keep = isExterior
+            for annotationGroup in annotationGroups:
+                if (0 < annotationGroup.getDimension() <= 2) and annotationGroup.hasMeshGroup(mesh):
+                    keep = fieldmodule.createFieldOr(keep, annotationGroup.getFieldElementGroup(mesh))
+            mesh.destroyElementsConditional(fieldmodule.createFieldNot(keep))
+            del keep
+        del isExterior
+
     @classmethod
     def printNodeFieldParameters(cls, region, options, functionOptions, editGroupName):
         '''
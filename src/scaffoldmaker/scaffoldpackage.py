@@ -5,34 +5,68 @@ Supports serialisation to/from JSON. Can be used as a scaffold option.
 
 import copy
 import math
+import numpy as np
 from opencmiss.utils.zinc.field import createFieldEulerAnglesRotationMatrix
 from opencmiss.utils.zinc.general import ChangeManager
 from opencmiss.utils.maths.vectorops import euler_to_rotation_matrix
+from opencmiss.zinc.field import Field, FieldGroup
+from opencmiss.zinc.node import Node
 from scaffoldmaker.annotation.annotationgroup import AnnotationGroup, findAnnotationGroupByName
-from scaffoldmaker.meshtypes.scaffold_base import Scaffold_base
+from scaffoldmaker.meshtypes.scaffold_base import FaceGenerationMode, GroupGenerationMode, Scaffold_base
+from scaffoldmaker.utils.profiling import addProfileCount, profileSpan
+from scaffoldmaker.utils.zinc_utils import get_nodeset_field_parameters, set_nodeset_field_parameters
+
+
+# map (scaffoldType, parameterSetName) -> default options, from first call to scaffoldType.getDefaultOptions()
+_defaultScaffoldSettingsCache = {}
+
+
+def getDefaultScaffoldSettings(scaffoldType, parameterSetName='Default'):
+    '''
+    Get default options for scaffold type and parameter set, only calling its getDefaultOptions()
+    on first use since some build nested ScaffoldPackages and Zinc models for every call.
+    :param scaffoldType: A scaffold type derived from Scaffold_base.
+    :param parameterSetName: Name of parameter set to get defaults for.
+    :return: Deep copy of cached default options, which may be modified.
+    '''
+    key = (scaffoldType, parameterSetName)
+    defaultOptions = _defaultScaffoldSettingsCache.get(key)
+    if defaultOptions is None:
+        defaultOptions = _defaultScaffoldSettingsCache[key] = scaffoldType.getDefaultOptions(parameterSetName)
+    return copy.deepcopy(defaultOptions)
+
 
 class ScaffoldPackage:
     '''
     Class packaging a scaffold type, options and modifications.
     '''
 
+    # all coordinates node value labels, stored for updateTransformation()
+    _coordinatesValueLabels = [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2,
+        Node.VALUE_LABEL_D_DS3, Node.VALUE_LABEL_D2_DS1DS3, Node.VALUE_LABEL_D2_DS2DS3, Node.VALUE_LABEL_D3_DS1DS2DS3 ]
+
     def __init__(self, scaffoldType, dct={}, defaultParameterSetName='Default'):
         '''
         :param scaffoldType: A scaffold type derived from Scaffold_base.
         :param dct: Dictionary containing other scaffold settings. Key names and meanings:
             scaffoldSettings: The options dict for the scaffold, or None to generate defaults.
             meshEdits: A Zinc model file as a string e.g. containing edited node parameters, or None.
-        :param defaultParameterSetName: Parameter set name from scaffoldType to get defaults from.
+        :param defaultParameterSetName: Parameter set name from scaffoldType to get defaults from,
+        or None if scaffoldSettings in dct are complete and owned by this object, so are used
+        without merging with defaults.
         '''
         #print('ScaffoldPackage.__init__',dct)
         assert issubclass(scaffoldType, Scaffold_base), 'ScaffoldPackage:  Invalid scaffold type'
         self._scaffoldType = scaffoldType
-        # merge with defaults to ensure new options for scaffold type are present
-        self._scaffoldSettings = scaffoldType.getDefaultOptions(defaultParameterSetName)
         scaffoldSettings = dct.get('scaffoldSettings')
-        if scaffoldSettings:
-            # remove obsolete options? If so, deepcopy first?
-            self._scaffoldSettings.update(scaffoldSettings)
+        if defaultParameterSetName is None:
+            self._scaffoldSettings = scaffoldSettings
+        else:
+            # merge with defaults to ensure new options for scaffold type are present
+            self._scaffoldSettings = getDefaultScaffoldSettings(scaffoldType, defaultParameterSetName)
+            if scaffoldSettings:
+                # remove obsolete options? If so, deepcopy first?
+                self._scaffoldSettings.update(scaffoldSettings)
         # note rotation is stored in degrees
         rotation =  dct.get('rotation')
         self._rotation = copy.deepcopy(rotation) if rotation else [ 0.0, 0.0, 0.0 ]
@@ -57,6 +91,8 @@ class ScaffoldPackage:
         self._userAnnotationGroups = []
         # region is set in generate(); can only instantiate user AnnotationGroups then
         self._region = None
+        # optional untransformed coordinates node parameters stored by generate() for updateTransformation()
+        self._untransformed = None
 
     def __eq__(self, other):
         '''
@@ -75,8 +111,11 @@ class ScaffoldPackage:
     def __deepcopy__(self, memo):
         '''
         Deep copies object in deserialised, pre-generated form.
+        Settings are copied directly without re-merging default options or serialising.
         '''
-        return ScaffoldPackage(self._scaffoldType, self.toDict())
+        dct = self.toDict()
+        dct['scaffoldSettings'] = copy.deepcopy(self._scaffoldSettings, memo)
+        return ScaffoldPackage(self._scaffoldType, dct, defaultParameterSetName=None)
 
     def toDict(self):
         '''
@@ -221,25 +260,138 @@ class ScaffoldPackage:
             del coordinates
         return doApply
 
-    def generate(self, region, applyTransformation=True):
+    def _getUntransformedSettings(self):
+        '''
+        :return: Copy of settings determining untransformed coordinates, for comparison.
+        '''
+        return (self._scaffoldType, copy.deepcopy(self._scaffoldSettings), copy.deepcopy(self._meshEdits))
+
+    def _storeUntransformed(self):
+        '''
+        Store untransformed coordinates node parameters of all value labels and versions, with the
+        settings used to generate them, so updateTransformation() can re-apply the transformation.
+        '''
+        self._untransformed = None
+        fieldmodule = self._region.getFieldmodule()
+        coordinates = fieldmodule.findFieldByName('coordinates').castFiniteElement()
+        if not (coordinates.isValid() and (coordinates.getNumberOfComponents() == 3)):
+            return
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        identifiers, parameters, present = get_nodeset_field_parameters(nodes, coordinates, self._coordinatesValueLabels)
+        self._untransformed = (self._getUntransformedSettings(), identifiers, parameters, present)
+
+    def updateTransformation(self):
+        '''
+        Re-apply the current scale, rotation and translation to the generated region from the
+        stored untransformed node parameters, avoiding regeneration when only the transformation
+        has changed. Requires prior call to generate() with storeUntransformed=True.
+        :return: True if coordinates were updated, False if not possible: call generate() instead.
+        '''
+        if not (self._untransformed and self._region):
+            return False
+        settings, identifiers, parameters, present = self._untransformed
+        if settings != self._getUntransformedSettings():
+            return False
+        fieldmodule = self._region.getFieldmodule()
+        coordinates = fieldmodule.findFieldByName('coordinates').castFiniteElement()
+        if not coordinates.isValid():
+            return False
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        if nodes.getSize() != len(identifiers):
+            return False
+        findNodeByIdentifier = nodes.findNodeByIdentifier
+        for identifier in identifiers.tolist():
+            if not findNodeByIdentifier(identifier).isValid():
+                return False
+        transformationMatrix = self.getTransformationMatrix()
+        if transformationMatrix:
+            matrix = np.array(transformationMatrix)
+            # derivatives are only scaled and rotated; values, the first value label, are also translated
+            newParameters = parameters @ matrix[:3, :3].T
+            newParameters[:, 0] += matrix[:3, 3]
+        else:
+            newParameters = parameters
+        failedCount = set_nodeset_field_parameters(nodes, coordinates, self._coordinatesValueLabels, identifiers, newParameters, present)
+        return failedCount == 0
+
+    def generate(self, region, applyTransformation=True, generationCache=None, storeUntransformed=False,
+            faceMode=FaceGenerationMode.ALL, groupMode=GroupGenerationMode.FULL):
         '''
         Generate the finite element scaffold and define annotation groups.
         :param applyTransformation: If True (default) apply scale, rotation and translation to
         node coordinates. Specify False if client will transform, e.g. with graphics transformations.
+        :param generationCache: Optional GenerationCache. If the same settings have been generated
+        before the model is read from the cache, otherwise the generated model is added to it.
+        :param storeUntransformed: If True, store untransformed node parameters so later changes
+        to only the transformation can be applied quickly with updateTransformation(). With a
+        generationCache, the untransformed model is cached and transformed after reading.
+        :param faceMode: FaceGenerationMode passed to scaffold generateMesh(). Use NONE to skip
+        defining faces and lines, e.g. for fitting or volume-only export, or EXTERIOR to not keep
+        interior faces and lines, reducing memory and output size but not generation time.
+        :param groupMode: GroupGenerationMode passed to scaffold generateMesh(). With HIGHEST_DIMENSION
+        annotation groups do not contain subelements and nodes of their elements.
         '''
         self._region = region
-        with ChangeManager(region.getFieldmodule()):
-            self._autoAnnotationGroups = self._scaffoldType.generateMesh(region, self._scaffoldSettings)
+        self._untransformed = None
+        fieldmodule = region.getFieldmodule()
+        with profileSpan('ScaffoldPackage.generate ' + self._scaffoldType.getName()), ChangeManager(fieldmodule):
+            subelementHandlingMode = FieldGroup.SUBELEMENT_HANDLING_MODE_FULL if (groupMode == GroupGenerationMode.FULL) \
+                else FieldGroup.SUBELEMENT_HANDLING_MODE_NONE
+            if generationCache:
+                # when storing untransformed parameters, cache the untransformed model and transform after
+                cacheTransformed = applyTransformation and not storeUntransformed
+                key = generationCache.getKey(self, cacheTransformed, faceMode=faceMode, groupMode=groupMode)
+                buffer, autoAnnotationGroupTerms = generationCache.get(key)
+                if buffer:
+                    addProfileCount('generation cache hits')
+                    sir = region.createStreaminformationRegion()
+                    srm = sir.createStreamresourceMemoryBuffer(buffer)
+                    region.read(sir)
+                    self._autoAnnotationGroups = []
+                    for term in autoAnnotationGroupTerms:
+                        annotationGroup = AnnotationGroup(region, term)
+                        annotationGroup.getGroup().setSubelementHandlingMode(subelementHandlingMode)
+                        self._autoAnnotationGroups.append(annotationGroup)
+                    self._userAnnotationGroups = [ AnnotationGroup(region, (dct['name'], dct['ontId'])) for dct in self._userAnnotationGroupsDict ]
+                    for annotationGroup in self._userAnnotationGroups:
+                        annotationGroup.getGroup().setSubelementHandlingMode(subelementHandlingMode)
+                    if storeUntransformed:
+                        self._storeUntransformed()
+                        if applyTransformation:
+                            with profileSpan('applyTransformation'):
+                                self.applyTransformation()
+                    return
+            self._autoAnnotationGroups = self._scaffoldType.generateMesh(region, self._scaffoldSettings, faceMode=faceMode, groupMode=groupMode)
             if self._meshEdits:
                 # apply mesh edits, a Zinc-readable model file containing node edits
                 # Note: these are untransformed coordinates
-                sir = region.createStreaminformationRegion()
-                srm = sir.createStreamresourceMemoryBuffer(self._meshEdits)
-                region.read(sir)
+                with profileSpan('meshEdits'):
+                    sir = region.createStreaminformationRegion()
+                    srm = sir.createStreamresourceMemoryBuffer(self._meshEdits)
+                    region.read(sir)
             # define user AnnotationGroups from serialised Dict
-            self._userAnnotationGroups = [ AnnotationGroup.fromDict(dct, self._region) for dct in self._userAnnotationGroupsDict ]
+            addSubelements = groupMode == GroupGenerationMode.FULL
+            self._userAnnotationGroups = [ AnnotationGroup.fromDict(dct, self._region, addSubelements) for dct in self._userAnnotationGroupsDict ]
+            if storeUntransformed:
+                self._storeUntransformed()
+            if generationCache and not cacheTransformed:
+                self._putGenerationCache(generationCache, key)
             if applyTransformation:
-                self.applyTransformation()
+                with profileSpan('applyTransformation'):
+                    self.applyTransformation()
+            if generationCache and cacheTransformed:
+                self._putGenerationCache(generationCache, key)
+
+    def _putGenerationCache(self, generationCache, key):
+        '''
+        Add model in region and automatic annotation group terms to generation cache.
+        '''
+        with profileSpan('generationCache.put'):
+            sir = self._region.createStreaminformationRegion()
+            srm = sir.createStreamresourceMemory()
+            self._region.write(sir)
+            result, buffer = srm.getBuffer()
+            generationCache.put(key, buffer, [ annotationGroup.getTerm() for annotationGroup in self._autoAnnotationGroups ])
 
     def getAnnotationGroups(self):
         '''
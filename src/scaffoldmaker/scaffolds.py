@@ -1,104 +1,84 @@
 """
 Class for listing and accessing all mesh type scripts supported by scaffoldmaker.
+Scaffold type modules are imported on first access so only the types used are loaded.
 """
 
+import importlib
 import json
-from scaffoldmaker.meshtypes.meshtype_1d_bifurcationtree1 import MeshType_1d_bifurcationtree1
-from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1
-from scaffoldmaker.meshtypes.meshtype_2d_plate1 import MeshType_2d_plate1
-from scaffoldmaker.meshtypes.meshtype_2d_platehole1 import MeshType_2d_platehole1
-from scaffoldmaker.meshtypes.meshtype_2d_sphere1 import MeshType_2d_sphere1
-from scaffoldmaker.meshtypes.meshtype_2d_tube1 import MeshType_2d_tube1
-from scaffoldmaker.meshtypes.meshtype_2d_tubebifurcation1 import MeshType_2d_tubebifurcation1
-from scaffoldmaker.meshtypes.meshtype_2d_tubebifurcationtree1 import MeshType_2d_tubebifurcationtree1
-from scaffoldmaker.meshtypes.meshtype_3d_bladder1 import MeshType_3d_bladder1
-from scaffoldmaker.meshtypes.meshtype_3d_bladderurethra1 import MeshType_3d_bladderurethra1
-from scaffoldmaker.meshtypes.meshtype_3d_box1 import MeshType_3d_box1
-from scaffoldmaker.meshtypes.meshtype_3d_boxhole1 import MeshType_3d_boxhole1
-from scaffoldmaker.meshtypes.meshtype_3d_brainstem import MeshType_3d_brainstem1
-from scaffoldmaker.meshtypes.meshtype_3d_cecum1 import MeshType_3d_cecum1
-from scaffoldmaker.meshtypes.meshtype_3d_colon1 import MeshType_3d_colon1
-from scaffoldmaker.meshtypes.meshtype_3d_colonsegment1 import MeshType_3d_colonsegment1
-from scaffoldmaker.meshtypes.meshtype_3d_heart1 import MeshType_3d_heart1
-from scaffoldmaker.meshtypes.meshtype_3d_heart2 import MeshType_3d_heart2
-from scaffoldmaker.meshtypes.meshtype_3d_heartarterialroot1 import MeshType_3d_heartarterialroot1
-from scaffoldmaker.meshtypes.meshtype_3d_heartarterialvalve1 import MeshType_3d_heartarterialvalve1
-from scaffoldmaker.meshtypes.meshtype_3d_heartatria1 import MeshType_3d_heartatria1
-from scaffoldmaker.meshtypes.meshtype_3d_heartatria2 import MeshType_3d_heartatria2
-from scaffoldmaker.meshtypes.meshtype_3d_heartventricles1 import MeshType_3d_heartventricles1
-from scaffoldmaker.meshtypes.meshtype_3d_heartventricles2 import MeshType_3d_heartventricles2
-from scaffoldmaker.meshtypes.meshtype_3d_heartventricles3 import MeshType_3d_heartventricles3
-from scaffoldmaker.meshtypes.meshtype_3d_heartventriclesbase1 import MeshType_3d_heartventriclesbase1
-from scaffoldmaker.meshtypes.meshtype_3d_heartventriclesbase2 import MeshType_3d_heartventriclesbase2
-from scaffoldmaker.meshtypes.meshtype_3d_lens1 import MeshType_3d_lens1
-from scaffoldmaker.meshtypes.meshtype_3d_lung1 import MeshType_3d_lung1
-from scaffoldmaker.meshtypes.meshtype_3d_ostium1 import MeshType_3d_ostium1
-from scaffoldmaker.meshtypes.meshtype_3d_smallintestine1 import MeshType_3d_smallintestine1
-from scaffoldmaker.meshtypes.meshtype_3d_solidsphere1 import MeshType_3d_solidsphere1
-from scaffoldmaker.meshtypes.meshtype_3d_solidcylinder1 import MeshType_3d_solidcylinder1
-from scaffoldmaker.meshtypes.meshtype_3d_sphereshell1 import MeshType_3d_sphereshell1
-from scaffoldmaker.meshtypes.meshtype_3d_sphereshellseptum1 import MeshType_3d_sphereshellseptum1
-from scaffoldmaker.meshtypes.meshtype_3d_stellate1 import MeshType_3d_stellate1
-from scaffoldmaker.meshtypes.meshtype_3d_stomach1 import MeshType_3d_stomach1
-from scaffoldmaker.meshtypes.meshtype_3d_stomachhuman1 import MeshType_3d_stomachhuman1
-from scaffoldmaker.meshtypes.meshtype_3d_tube1 import MeshType_3d_tube1
-from scaffoldmaker.meshtypes.meshtype_3d_tubeseptum1 import MeshType_3d_tubeseptum1
-from scaffoldmaker.meshtypes.meshtype_3d_wholebody1 import MeshType_3d_wholebody1
 from scaffoldmaker.scaffoldpackage import ScaffoldPackage
+from scaffoldmaker.utils.binaryserialisation import decodeBinary, encodeBinary
 
 
-class Scaffolds(object):
+# scaffold type name -> (module name in scaffoldmaker.meshtypes, class name), in listed order
+_scaffoldTypeModules = {
+    '1D Bifurcation Tree 1': ('meshtype_1d_bifurcationtree1', 'MeshType_1d_bifurcationtree1'),
+    '1D Path 1': ('meshtype_1d_path1', 'MeshType_1d_path1'),
+    '2D Plate 1': ('meshtype_2d_plate1', 'MeshType_2d_plate1'),
+    '2D Plate Hole 1': ('meshtype_2d_platehole1', 'MeshType_2d_platehole1'),
+    '2D Sphere 1': ('meshtype_2d_sphere1', 'MeshType_2d_sphere1'),
+    '2D Tube 1': ('meshtype_2d_tube1', 'MeshType_2d_tube1'),
+    '2D Tube Bifurcation 1': ('meshtype_2d_tubebifurcation1', 'MeshType_2d_tubebifurcation1'),
+    #'2D Tube Bifurcation Tree 1': ('meshtype_2d_tubebifurcationtree1', 'MeshType_2d_tubebifurcationtree1'),
+    '3D Bladder 1': ('meshtype_3d_bladder1', 'MeshType_3d_bladder1'),
+    '3D Bladder with Urethra 1': ('meshtype_3d_bladderurethra1', 'MeshType_3d_bladderurethra1'),
+    '3D Box 1': ('meshtype_3d_box1', 'MeshType_3d_box1'),
+    '3D Box Hole 1': ('meshtype_3d_boxhole1', 'MeshType_3d_boxhole1'),
+    '3D Brainstem 1': ('meshtype_3d_brainstem', 'MeshType_3d_brainstem1'),
+    '3D Cecum 1': ('meshtype_3d_cecum1', 'MeshType_3d_cecum1'),
+    '3D Colon 1': ('meshtype_3d_colon1', 'MeshType_3d_colon1'),
+    '3D Colon Segment 1': ('meshtype_3d_colonsegment1', 'MeshType_3d_colonsegment1'),
+    '3D Heart 1': ('meshtype_3d_heart1', 'MeshType_3d_heart1'),
+    '3D Heart 2': ('meshtype_3d_heart2', 'MeshType_3d_heart2'),
+    '3D Heart Arterial Root 1': ('meshtype_3d_heartarterialroot1', 'MeshType_3d_heartarterialroot1'),
+    '3D Heart Arterial Valve 1': ('meshtype_3d_heartarterialvalve1', 'MeshType_3d_heartarterialvalve1'),
+    '3D Heart Atria 1': ('meshtype_3d_heartatria1', 'MeshType_3d_heartatria1'),
+    '3D Heart Atria 2': ('meshtype_3d_heartatria2', 'MeshType_3d_heartatria2'),
+    '3D Heart Ventricles 1': ('meshtype_3d_heartventricles1', 'MeshType_3d_heartventricles1'),
+    '3D Heart Ventricles 2': ('meshtype_3d_heartventricles2', 'MeshType_3d_heartventricles2'),
+    '3D Heart Ventricles 3': ('meshtype_3d_heartventricles3', 'MeshType_3d_heartventricles3'),
+    '3D Heart Ventricles with Base 1': ('meshtype_3d_heartventriclesbase1', 'MeshType_3d_heartventriclesbase1'),
+    '3D Heart Ventricles with Base 2': ('meshtype_3d_heartventriclesbase2', 'MeshType_3d_heartventriclesbase2'),
+    '3D Lens 1': ('meshtype_3d_lens1', 'MeshType_3d_lens1'),
+    '3D Lung 1': ('meshtype_3d_lung1', 'MeshType_3d_lung1'),
+    '3D Ostium 1': ('meshtype_3d_ostium1', 'MeshType_3d_ostium1'),
+    '3D Small Intestine 1': ('meshtype_3d_smallintestine1', 'MeshType_3d_smallintestine1'),
+    '3D Solid Sphere 1': ('meshtype_3d_solidsphere1', 'MeshType_3d_solidsphere1'),
+    '3D Solid Cylinder 1': ('meshtype_3d_solidcylinder1', 'MeshType_3d_solidcylinder1'),
+    '3D Sphere Shell 1': ('meshtype_3d_sphereshell1', 'MeshType_3d_sphereshell1'),
+    '3D Sphere Shell Septum 1': ('meshtype_3d_sphereshellseptum1', 'MeshType_3d_sphereshellseptum1'),
+    '3D Stellate 1': ('meshtype_3d_stellate1', 'MeshType_3d_stellate1'),
+    '3D Stomach 1': ('meshtype_3d_stomach1', 'MeshType_3d_stomach1'),
+    '3D Stomach Human 1': ('meshtype_3d_stomachhuman1', 'MeshType_3d_stomachhuman1'),
+    '3D Tube 1': ('meshtype_3d_tube1', 'MeshType_3d_tube1'),
+    '3D Tube Septum 1': ('meshtype_3d_tubeseptum1', 'MeshType_3d_tubeseptum1'),
+    '3D Whole Body 1': ('meshtype_3d_wholebody1', 'MeshType_3d_wholebody1')
+    }
+
+# scaffold type name -> scaffold type class, for types imported so far
+_scaffoldTypesByName = {}
+
+
+def _getScaffoldType(name):
+    '''
+    Get scaffold type by name, importing its module on first access.
+    :param name: Scaffold type name as returned by its getName().
+    :return: Scaffold type class, or None if name not found.
+    '''
+    scaffoldType = _scaffoldTypesByName.get(name)
+    if scaffoldType is None:
+        moduleClassName = _scaffoldTypeModules.get(name)
+        if moduleClassName is None:
+            return None
+        module = importlib.import_module('scaffoldmaker.meshtypes.' + moduleClassName[0])
+        scaffoldType = getattr(module, moduleClassName[1])
+        _scaffoldTypesByName[name] = scaffoldType
+    return scaffoldType
 
-    def __init__(self):
-        self._allScaffoldTypes = [
-            MeshType_1d_bifurcationtree1,
-            MeshType_1d_path1,
-            MeshType_2d_plate1,
-            MeshType_2d_platehole1,
-            MeshType_2d_sphere1,
-            MeshType_2d_tube1,
-            MeshType_2d_tubebifurcation1,
-            #MeshType_2d_tubebifurcationtree1,
-            MeshType_3d_bladder1,
-            MeshType_3d_bladderurethra1,
-            MeshType_3d_box1,
-            MeshType_3d_boxhole1,
-            MeshType_3d_brainstem1,
-            MeshType_3d_cecum1,
-            MeshType_3d_colon1,
-            MeshType_3d_colonsegment1,
-            MeshType_3d_heart1,
-            MeshType_3d_heart2,
-            MeshType_3d_heartarterialroot1,
-            MeshType_3d_heartarterialvalve1,
-            MeshType_3d_heartatria1,
-            MeshType_3d_heartatria2,
-            MeshType_3d_heartventricles1,
-            MeshType_3d_heartventricles2,
-            MeshType_3d_heartventricles3,
-            MeshType_3d_heartventriclesbase1,
-            MeshType_3d_heartventriclesbase2,
-            MeshType_3d_lens1,
-            MeshType_3d_lung1,
-            MeshType_3d_ostium1,
-            MeshType_3d_smallintestine1,
-            MeshType_3d_solidsphere1,
-            MeshType_3d_solidcylinder1,
-            MeshType_3d_sphereshell1,
-            MeshType_3d_sphereshellseptum1,
-            MeshType_3d_stellate1,
-            MeshType_3d_stomach1,
-            MeshType_3d_stomachhuman1,
-            MeshType_3d_tube1,
-            MeshType_3d_tubeseptum1,
-            MeshType_3d_wholebody1
-            ]
+
+class Scaffolds(object):
 
     def findScaffoldTypeByName(self, name):
-        for scaffoldType in self._allScaffoldTypes:
-            if scaffoldType.getName() == name:
-                return scaffoldType
-        return None
+        return _getScaffoldType(name)
 
     def getDefaultMeshType(self):
         '''
@@ -107,7 +87,7 @@ class Scaffolds(object):
         return self.getDefaultScaffoldType()
 
     def getDefaultScaffoldType(self):
-        return MeshType_3d_box1
+        return _getScaffoldType('3D Box 1')
 
     def getMeshTypes(self):
         '''
@@ -115,8 +95,17 @@ class Scaffolds(object):
         '''
         return self.getScaffoldTypes()
 
+    def getScaffoldTypeNames(self):
+        '''
+        :return: List of names of all scaffold types, without importing them.
+        '''
+        return list(_scaffoldTypeModules)
+
     def getScaffoldTypes(self):
-        return self._allScaffoldTypes
+        '''
+        :return: List of all scaffold types. Imports all scaffold type modules.
+        '''
+        return [ _getScaffoldType(name) for name in _scaffoldTypeModules ]
 
 
 class Scaffolds_JSONEncoder(json.JSONEncoder):
@@ -141,7 +130,33 @@ def Scaffolds_decodeJSON(dct):
     Constructs scaffold objects from their JSON object encoding.
     '''
     if ('_ScaffoldPackage' in dct):
-        scaffoldType = Scaffolds().findScaffoldTypeByName(dct['scaffoldTypeName'])
+        scaffoldType = _getScaffoldType(dct['scaffoldTypeName'])
         #print('Scaffolds_decodeJSON scaffoldType',scaffoldType.getName(), dct)
         return ScaffoldPackage(scaffoldType, dct)
     return dct
+
+
+def _Scaffolds_encodeBinaryDefault(obj):
+    if isinstance(obj, ScaffoldPackage):
+        dct = obj.toDict()
+        dct['_ScaffoldPackage'] = True
+        return dct
+    raise TypeError('Scaffolds_encodeBinary:  Object of type ' + type(obj).__name__ + ' is not serialisable')
+
+
+def Scaffolds_encodeBinary(obj, compress=True):
+    '''
+    Encode scaffold objects in compact binary form, with meshEdits stored as bytes.
+    Convert to and from JSON with binaryToJSON() and jsonToBinary() in utils.binaryserialisation.
+    :param obj: ScaffoldPackage or JSON-like value containing them.
+    :param compress: Set to True to zlib compress the encoded body.
+    :return: bytes
+    '''
+    return encodeBinary(obj, default=_Scaffolds_encodeBinaryDefault, compress=compress)
+
+
+def Scaffolds_decodeBinary(data):
+    '''
+    Construct scaffold objects from bytes returned by Scaffolds_encodeBinary().
+    '''
+    return decodeBinary(data, objectHook=Scaffolds_decodeJSON)
@@ -0,0 +1,198 @@
+'''
+Compact, versioned binary serialisation of JSON-like values used to store scaffold
+settings: None, bool, int, float, str, bytes, list and dict. Lists of floats are
+packed as float64 arrays and bytes such as Zinc meshEdits are stored unencoded.
+The body may be zlib compressed. Values convert losslessly to and from JSON text,
+with bytes converted to utf-8 strings as for Scaffolds_JSONEncoder.
+'''
+
+import json
+import struct
+import zlib
+
+_MAGIC = b'SMB'
+_VERSION = 1
+_FLAG_COMPRESSED = 1
+
+_int64 = struct.Struct('<q')
+_uint32 = struct.Struct('<I')
+_float64 = struct.Struct('<d')
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+def _encodeValue(value, out, default):
+    '''
+    Append encoding of value to bytearray out.
+    :param default: Optional function converting other objects to encodable values.
+    '''
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, int):
+        if _INT64_MIN <= value <= _INT64_MAX:
+            out += b'i'
+            out += _int64.pack(value)
+        else:
+            text = str(value).encode('ascii')
+            out += b'I'
+            out += _uint32.pack(len(text))
+            out += text
+    elif isinstance(value, float):
+        out += b'd'
+        out += _float64.pack(value)
+    elif isinstance(value, str):
+        text = value.encode('utf-8')
+        out += b's'
+        out += _uint32.pack(len(text))
+        out += text
+    elif isinstance(value, (bytes, bytearray)):
+        out += b'b'
+        out += _uint32.pack(len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        if value and all((type(item) is float) for item in value):
+            out += b'D'
+            out += _uint32.pack(len(value))
+            out += struct.pack('<%dd' % len(value), *value)
+        else:
+            out += b'l'
+            out += _uint32.pack(len(value))
+            for item in value:
+                _encodeValue(item, out, default)
+    elif isinstance(value, dict):
+        out += b'm'
+        out += _uint32.pack(len(value))
+        for key, item in value.items():
+            _encodeValue(key, out, default)
+            _encodeValue(item, out, default)
+    elif default:
+        _encodeValue(default(value), out, default)
+    else:
+        raise TypeError('encodeBinary:  Object of type ' + type(value).__name__ + ' is not serialisable')
+
+
+class _Decoder:
+    '''
+    Decodes values from binary body, calling optional objectHook on each decoded dict.
+    '''
+
+    def __init__(self, data, objectHook):
+        self._data = data
+        self._offset = 0
+        self._objectHook = objectHook
+
+    def _read(self, size):
+        offset = self._offset
+        self._offset += size
+        if self._offset > len(self._data):
+            raise ValueError('decodeBinary:  Truncated data')
+        return self._data[offset:self._offset]
+
+    def _readCount(self):
+        return _uint32.unpack(self._read(4))[0]
+
+    def decodeValue(self):
+        tag = self._read(1)
+        if tag == b'N':
+            return None
+        if tag == b'T':
+            return True
+        if tag == b'F':
+            return False
+        if tag == b'i':
+            return _int64.unpack(self._read(8))[0]
+        if tag == b'I':
+            return int(self._read(self._readCount()).decode('ascii'))
+        if tag == b'd':
+            return _float64.unpack(self._read(8))[0]
+        if tag == b's':
+            return self._read(self._readCount()).decode('utf-8')
+        if tag == b'b':
+            return self._read(self._readCount())
+        if tag == b'D':
+            count = self._readCount()
+            return list(struct.unpack('<%dd' % count, self._read(8*count)))
+        if tag == b'l':
+            return [ self.decodeValue() for i in range(self._readCount()) ]
+        if tag == b'm':
+            dct = {}
+            for i in range(self._readCount()):
+                key = self.decodeValue()
+                dct[key] = self.decodeValue()
+            return self._objectHook(dct) if self._objectHook else dct
+        raise ValueError('decodeBinary:  Invalid tag ' + repr(tag))
+
+    def isAtEnd(self):
+        return self._offset == len(self._data)
+
+
+def encodeBinary(value, default=None, compress=True):
+    '''
+    Encode value in compact binary form.
+    :param value: JSON-like value to encode, which may also contain bytes.
+    :param default: Optional function converting other objects to encodable values,
+    as for the default method of json.JSONEncoder.
+    :param compress: Set to True to zlib compress the encoded body.
+    :return: bytes
+    '''
+    body = bytearray()
+    _encodeValue(value, body, default)
+    flags = 0
+    if compress:
+        body = zlib.compress(body)
+        flags |= _FLAG_COMPRESSED
+    return _MAGIC + bytes([ _VERSION, flags ]) + body
+
+
+def decodeBinary(data, objectHook=None):
+    '''
+    Decode value from bytes returned by encodeBinary().
+    :param data: bytes to decode.
+    :param objectHook: Optional function called with each decoded dict returning the
+    object to use in its place, as for json.loads object_hook.
+    :return: Decoded value.
+    '''
+    if data[:len(_MAGIC)] != _MAGIC:
+        raise ValueError('decodeBinary:  Not scaffoldmaker binary data')
+    version = data[len(_MAGIC)]
+    if version > _VERSION:
+        raise ValueError('decodeBinary:  Unsupported version ' + str(version))
+    flags = data[len(_MAGIC) + 1]
+    body = data[len(_MAGIC) + 2:]
+    if flags & _FLAG_COMPRESSED:
+        body = zlib.decompress(body)
+    decoder = _Decoder(bytes(body), objectHook)
+    value = decoder.decodeValue()
+    if not decoder.isAtEnd():
+        raise ValueError('decodeBinary:  Unexpected data after value')
+    return value
+
+
+def jsonToBinary(jsonString, compress=True):
+    '''
+    Convert JSON text e.g. from json.dumps(scaffoldPackage, cls=Scaffolds_JSONEncoder) to binary.
+    :param jsonString: JSON text as str or bytes.
+    :param compress: Set to True to zlib compress the encoded body.
+    :return: bytes
+    '''
+    return encodeBinary(json.loads(jsonString), compress=compress)
+
+
+def _bytesToStr(obj):
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8')
+    raise TypeError('binaryToJSON:  Object of type ' + type(obj).__name__ + ' is not serialisable')
+
+
+def binaryToJSON(data, **kwargs):
+    '''
+    Convert binary data to JSON text, with bytes as utf-8 strings.
+    :param data: bytes returned by encodeBinary() or jsonToBinary().
+    :param kwargs: Other arguments passed to json.dumps e.g. indent.
+    :return: JSON text str.
+    '''
+    return json.dumps(decodeBinary(data), default=_bytesToStr, **kwargs)
@@ -14,7 +14,7 @@ from scaffoldmaker.utils.interpolation import sampleCubicHermiteCurves, interpol
     smoothCubicHermiteDerivativesLine, interpolateSampleLinear
 from opencmiss.zinc.node import Node
 from scaffoldmaker.utils.mirror import Mirror
-from scaffoldmaker.meshtypes.meshtype_1d_path1 import extractPathParametersFromRegion
+from scaffoldmaker.meshtypes.meshtype_1d_path1 import extractPathParametersFromScaffoldPackage
 
 
 class CylinderShape(Enum):
@@ -104,15 +104,12 @@ class CylinderCentralPath:
         :param centralPath: Central path subscaffold comes from meshtype_1d_path1 and used to calculate ellipse radii.
         :param elementsCount: Number of elements needs to be sampled along the central path.
         """
-        tmpRegion = region.createRegion()
-        centralPath.generate(tmpRegion)
-        cx, cd1, cd2, cd3, cd12, cd13 = extractPathParametersFromRegion(tmpRegion,
-                                                                        [Node.VALUE_LABEL_VALUE,
-                                                                         Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2,
-                                                                         Node.VALUE_LABEL_D_DS3,
-                                                                         Node.VALUE_LABEL_D2_DS1DS2,
-                                                                         Node.VALUE_LABEL_D2_DS1DS3])
-        del tmpRegion
+        cx, cd1, cd2, cd3, cd12, cd13 = extractPathParametersFromScaffoldPackage(region, centralPath,
+                                                                                 [Node.VALUE_LABEL_VALUE,
+                                                                                  Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2,
+                                                                                  Node.VALUE_LABEL_D_DS3,
+                                                                                  Node.VALUE_LABEL_D2_DS1DS2,
+                                                                                  Node.VALUE_LABEL_D2_DS1DS3])
         # for i in range(len(cx)):
         #     print(i, '[', cx[i], ',', cd1[i], ',', cd2[i], ',', cd12[i], ',', cd3[i], ',', cd13[i], '],')
 
@@ -135,14 +132,17 @@ class CylinderMesh:
 
     def __init__(self, fieldModule, coordinates, elementsCountAlong, base=None, end=None,
                  cylinderShape=CylinderShape.CYLINDER_SHAPE_FULL,
-                 tapered=None, cylinderCentralPath=None, useCrossDerivatives=False):
+                 tapered=None, cylinderCentralPath=None, useCrossDerivatives=False, fieldTransforms=None):
         """
         :param fieldModule: Zinc fieldModule to create elements in.
-        :param coordinates: Coordinate field to define.
+        :param coordinates: Coordinate field to define, or list of coordinate fields to define on the
+        same nodes and elements in one pass.
         :param base: Cylinder base ellipse. It is an instance of class CylinderEnds.
         :param end: Cylinder end ellipse. It is an instance of class CylinderEnds.
         :param elementsCountAlong: Number of elements along the cylinder axis.
         :param cylinderShape: A value from enum CylinderMode specifying.
+        :param fieldTransforms: Optional list of transforms for each field in coordinates. See
+        ShieldMesh.generateNodes().
         """
 
         self._centres = None
@@ -176,6 +176,7 @@ class CylinderMesh:
             self._cylinderType = CylinderType.CYLINDER_TAPERED
             self._tapered = tapered
         self._useCrossDerivatives = useCrossDerivatives
+        self._fieldTransforms = fieldTransforms
         self._cylinderCentralPath = cylinderCentralPath
         if cylinderCentralPath:
             self.calculateEllipseParams(cylinderCentralPath=self._cylinderCentralPath)
@@ -196,7 +197,7 @@ class CylinderMesh:
         Create an extruded shape (ellipse/circle) mesh. Currently limited to ellipse or circle base with the alongAxis
         perpendicular to the base.
         :param fieldModule: Zinc fieldModule to create elements in.
-        :param coordinates: Coordinate field to define.
+        :param coordinates: Coordinate field or list of coordinate fields to define.
         :return: Final values of nextNodeIdentifier, nextElementIdentifier.
         """
         assert (self._elementsCountAlong > 0), 'createCylinderMesh3d:  Invalid number of along elements'
@@ -373,11 +374,12 @@ class CylinderMesh:
         Create cylinder nodes from coordinates.
         :param nodes: nodes from coordinates.
         :param fieldModule: Zinc fieldmodule to create nodes in. Uses DOMAIN_TYPE_NODES.
-        :param coordinates: Coordinate field to define.
+        :param coordinates: Coordinate field or list of coordinate fields to define.
         """
         nodeIdentifier = max(1, getMaximumNodeIdentifier(nodes) + 1)
         self._startNodeIdentifier = nodeIdentifier
-        nodeIdentifier = self._shield.generateNodes(fieldModule, coordinates, nodeIdentifier)
+        nodeIdentifier = self._shield.generateNodes(fieldModule, coordinates, nodeIdentifier,
+                                                   fieldTransforms=self._fieldTransforms)
         self._endNodeIdentifier = nodeIdentifier
 
     def generateElements(self, mesh, fieldModule, coordinates):
@@ -385,7 +387,7 @@ class CylinderMesh:
         Create cylinder elements from nodes.
         :param mesh:
         :param fieldModule: Zinc fieldmodule to create nodes in. Uses DOMAIN_TYPE_NODES.
-        :param coordinates: Coordinate field to define.
+        :param coordinates: Coordinate field or list of coordinate fields to define.
         """
         elementIdentifier = max(1, getMaximumElementIdentifier(mesh) + 1)
         self._startElementIdentifier = elementIdentifier
@@ -2,16 +2,15 @@
 Class for globally smoothing field derivatives.
 '''
 from __future__ import division
-import math
-from opencmiss.utils.maths.vectorops import add, magnitude
+import numpy as np
 from opencmiss.utils.zinc.field import findOrCreateFieldGroup
 from opencmiss.utils.zinc.general import ChangeManager
 from opencmiss.zinc.element import Element, Elementbasis
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.node import Node
 from opencmiss.zinc.result import RESULT_OK as ZINC_OK
-from scaffoldmaker.utils.interpolation import DerivativeScalingMode, getCubicHermiteArcLength, interpolateHermiteLagrangeDerivative, interpolateLagrangeHermiteDerivative
-from scaffoldmaker.utils.vector import setMagnitude
+from scaffoldmaker.utils.interpolation import DerivativeScalingMode, getCubicHermiteArcLengthArray
+from scaffoldmaker.utils.profiling import addProfileCount, profileSpan
 
 
 class EdgeCurve:
@@ -21,64 +20,13 @@ class EdgeCurve:
 
     def __init__(self, expressions):
         self._expressions = expressions
-        self._arcLength = None
-        self._lastArcLength = 0.0
-        self._parameters = None
-
-    def evaluateArcLength(self, nodes, field, fieldcache):
-        componentsCount = field.getNumberOfComponents()
-        self._parameters = []
-        for expression in self._expressions:
-            sumx = None
-            for term in expression:
-                nodeIdentifier, nodeValueLabel, nodeVersion, scaleFactor = term
-                fieldcache.setNode(nodes.findNodeByIdentifier(nodeIdentifier))
-                result, x = field.getNodeParameters(fieldcache, -1, nodeValueLabel, nodeVersion, componentsCount)
-                if scaleFactor:
-                    x = [ v*scaleFactor for v in x ]
-                if sumx:
-                    sumx = [ (sumx[c] + x[c]) for c in range(componentsCount) ]
-                else:
-                    sumx = x
-            self._parameters.append(sumx)
-        self._arcLength = getCubicHermiteArcLength(*self._parameters)
-        return self._arcLength
-
-    def getArcLength(self):
-        '''
-        Caller must have called evaluateArcLength!
-        '''
-        return self._arcLength
-
-    def getLastArcLength(self):
-        return self._lastArcLength
-
-    def updateLastArcLength(self):
-        self._lastArcLength = self._arcLength
-
-    def getDelta(self):
-        '''
-        Caller must have called evaluateArcLength!
-        '''
-        x1 = self._parameters[0]
-        x2 = self._parameters[2]
-        componentsCount = len(x1)
-        return [ (x2[c] - x1[c]) for c in range(componentsCount) ]
 
     def getExpression(self, expressionIndex):
         '''
-        Caller must have called evaluateArcLength!
-        :param parameterIndex: 0 = start x, 1 = start d, 2 = end x, 3 = end d
+        :param expressionIndex: 0 = start x, 1 = start d, 2 = end x, 3 = end d
         '''
         return self._expressions[expressionIndex]
 
-    def getParameter(self, parameterIndex):
-        '''
-        Caller must have called evaluateArcLength!
-        :param parameterIndex: 0 = start x, 1 = start d, 2 = end x, 3 = end d
-        '''
-        return self._parameters[parameterIndex]
-
 class DerivativeSmoothing:
     '''
     Class for globally smoothing field derivatives.
@@ -128,6 +76,8 @@ class DerivativeSmoothing:
         self._edgesMap = {}
         # map global nodeid, derivative, version to list of EdgeCurve
         self._derivativeMap = {}
+        # arrays compiled from edge and derivative maps on first smooth
+        self._edgesCount = None
         if selectionGroupName:
             self._selectionGroup = self._fieldmodule.findFieldByName(selectionGroupName).castGroup()
             if not self._selectionGroup.isValid():
@@ -285,105 +235,194 @@ class DerivativeSmoothing:
                 else:
                     self._derivativeMap[derivativeKey] = [ derivativeEdge ]
 
+    def _buildArrays(self):
+        '''
+        Compile edge expressions and derivative maps into index arrays for vectorised smoothing.
+        Boundary derivatives are split into 2 stages so where both ends of an edge are
+        on the boundary, the later one in the derivative map uses the updated earlier one.
+        '''
+        # map (node identifier, value label, version) -> index into parameter array
+        self._slotMap = {}
+        self._slotKeys = []
+        def getSlotIndex(key):
+            slotIndex = self._slotMap.get(key)
+            if slotIndex is None:
+                slotIndex = self._slotMap[key] = len(self._slotKeys)
+                self._slotKeys.append(key)
+            return slotIndex
+        edgeIndexes = {}
+        termRows = []
+        termSlots = []
+        termScaleFactors = []
+        for edgeIndex, edge in enumerate(self._edgesMap.values()):
+            edgeIndexes[id(edge)] = edgeIndex
+            for expressionIndex in range(4):
+                for nodeIdentifier, nodeValueLabel, nodeVersion, scaleFactor in edge.getExpression(expressionIndex):
+                    termRows.append(edgeIndex*4 + expressionIndex)
+                    termSlots.append(getSlotIndex((nodeIdentifier, nodeValueLabel, nodeVersion)))
+                    termScaleFactors.append(scaleFactor if scaleFactor else 1.0)
+        self._edgesCount = len(edgeIndexes)
+        self._termRows = np.array(termRows, dtype=np.int64)
+        self._termSlots = np.array(termSlots, dtype=np.int64)
+        self._termScaleFactors = np.array(termScaleFactors)
+        derivativeOrder = { derivativeKey: order for order, derivativeKey in enumerate(self._derivativeMap) }
+        interiorSlots = []
+        interior = []  # list of (interior derivative index, edge index, expression index, total scale factor)
+        boundary = [ [], [] ]  # per stage list of (slot, edge index, expression index, total scale factor, both ends on boundary)
+        for derivativeKey, derivativeEdges in self._derivativeMap.items():
+            slotIndex = getSlotIndex(derivativeKey)
+            if len(derivativeEdges) > 1:
+                for edge, expressionIndex, totalScaleFactor in derivativeEdges:
+                    interior.append((len(interiorSlots), edgeIndexes[id(edge)], expressionIndex, totalScaleFactor))
+                interiorSlots.append(slotIndex)
+            else:
+                edge, expressionIndex, totalScaleFactor = derivativeEdges[0]
+                otherExpression = edge.getExpression(3 if (expressionIndex == 1) else 1)
+                bothEndsOnBoundary = False
+                stage = 0
+                if len(otherExpression) == 1:
+                    otherDerivativeKey = tuple(otherExpression[0][:3])
+                    otherDerivativeEdges = self._derivativeMap.get(otherDerivativeKey)
+                    bothEndsOnBoundary = (otherDerivativeEdges is not None) and (len(otherDerivativeEdges) == 1)
+                    if bothEndsOnBoundary and (derivativeOrder[otherDerivativeKey] < derivativeOrder[derivativeKey]):
+                        stage = 1
+                boundary[stage].append((slotIndex, edgeIndexes[id(edge)], expressionIndex, totalScaleFactor, bothEndsOnBoundary))
+        self._interiorSlots = np.array(interiorSlots, dtype=np.int64)
+        self._interior = tuple(np.array(values, dtype=dtype) for values, dtype in
+            zip(zip(*interior), (np.int64, np.int64, np.int64, float))) if interior else None
+        self._boundaryStages = []
+        for stageBoundary in boundary:
+            if stageBoundary:
+                self._boundaryStages.append(tuple(np.array(values, dtype=dtype) for values, dtype in
+                    zip(zip(*stageBoundary), (np.int64, np.int64, np.int64, float, bool))))
+
+    def _extractParameters(self, fieldcache):
+        '''
+        :return: Array of field parameters for all slots in expressions, shape (slotsCount, componentsCount).
+        '''
+        componentsCount = self._field.getNumberOfComponents()
+        parameters = np.zeros((len(self._slotKeys), componentsCount))
+        lastNodeIdentifier = None
+        for slotIndex in sorted(range(len(self._slotKeys)), key=lambda i: self._slotKeys[i][0]):
+            nodeIdentifier, nodeValueLabel, nodeVersion = self._slotKeys[slotIndex]
+            if nodeIdentifier != lastNodeIdentifier:
+                fieldcache.setNode(self._nodes.findNodeByIdentifier(nodeIdentifier))
+                lastNodeIdentifier = nodeIdentifier
+            result, x = self._field.getNodeParameters(fieldcache, -1, nodeValueLabel, nodeVersion, componentsCount)
+            parameters[slotIndex] = x
+        return parameters
+
+    def _evaluateEdges(self, parameters):
+        '''
+        :param parameters: Array of parameters from _extractParameters(), with updates.
+        :return: edgeParameters array of x1, d1, x2, d2 for all edges shape (edgesCount, 4, componentsCount),
+        arcLengths array shape (edgesCount,).
+        '''
+        edgeParameters = np.zeros((self._edgesCount*4, parameters.shape[1]))
+        np.add.at(edgeParameters, self._termRows, parameters[self._termSlots]*self._termScaleFactors[:, np.newaxis])
+        edgeParameters = edgeParameters.reshape((self._edgesCount, 4, parameters.shape[1]))
+        arcLengths = getCubicHermiteArcLengthArray(edgeParameters[:, 0], edgeParameters[:, 1], edgeParameters[:, 2], edgeParameters[:, 3])
+        return edgeParameters, arcLengths
+
+    def _warnNonPositiveMagnitudes(self, slots, mags):
+        for slotIndex, mag in zip(slots[mags <= 0.0].tolist(), mags[mags <= 0.0].tolist()):
+            nodeIdentifier, nodeValueLabel, nodeVersion = self._slotKeys[slotIndex]
+            print('Derivative smoothing: Node', nodeIdentifier, 'label', nodeValueLabel, 'version', nodeVersion, 'has negative magnitude', mag)
+
+    def _setMagnitudes(self, slots, x, mags):
+        '''
+        :return: Derivatives x scaled to magnitudes mags. Zero derivatives have no direction
+        so are left zero, with a warning.
+        '''
+        norms = np.linalg.norm(x, axis=1)
+        isZero = norms == 0.0
+        for slotIndex in slots[isZero].tolist():
+            nodeIdentifier, nodeValueLabel, nodeVersion = self._slotKeys[slotIndex]
+            print('Derivative smoothing: Node', nodeIdentifier, 'label', nodeValueLabel, 'version', nodeVersion, 'has zero derivative')
+        return x*np.divide(mags, norms, out=np.zeros_like(norms), where=~isZero)[:, np.newaxis]
+
     def smooth(self, updateDirections=False, maxIterations=10, arcLengthTolerance=1.0E-6):
         '''
+        Smooth derivatives by iterating over all edges together with arrays of parameters
+        extracted once from the field, and writing back changed derivatives at the end.
         :param maxIterations: Maximum iterations before stopping if not converging.
         :param arcLengthTolerance: Ratio of difference in arc length from last iteration
         divided by current arc length under which convergence is achieved. Required to
         be met by every element edge.
+        :return: List of maximum ratio of arc length change to arc length over all edges
+        for each iteration, the first being 1.0 as compared with zero initial length.
         '''
         if not self._derivativeMap:
-            return  # no nodes being smoothed
-        componentsCount = self._field.getNumberOfComponents()
-        with ChangeManager(self._fieldmodule):
+            return []  # no nodes being smoothed
+        convergenceHistory = []
+        with profileSpan('DerivativeSmoothing.smooth'), ChangeManager(self._fieldmodule):
+            addProfileCount('edges', len(self._edgesMap))
+            addProfileCount('derivatives', len(self._derivativeMap))
+            if self._edgesCount is None:
+                self._buildArrays()
             fieldcache = self._fieldmodule.createFieldcache()
+            parameters = self._extractParameters(fieldcache)
+            lastArcLengths = np.zeros(self._edgesCount)
             for iter in range(maxIterations + 1):
-                converged = True
-                for edge in self._edgesMap.values():
-                    lastArcLength = edge.getLastArcLength()
-                    arcLength = edge.evaluateArcLength(self._nodes, self._field, fieldcache)
-                    edge.updateLastArcLength()
-                    if (math.fabs(arcLength - lastArcLength)/arcLength) > arcLengthTolerance:
-                        converged = False
-                if converged:
+                edgeParameters, arcLengths = self._evaluateEdges(parameters)
+                # change relative to arc length, or absolute for zero length edges
+                maxArcLengthChange = float(np.max(np.fabs(arcLengths - lastArcLengths)/np.where(arcLengths > 0.0, arcLengths, 1.0)))
+                convergenceHistory.append(maxArcLengthChange)
+                lastArcLengths = arcLengths
+                if maxArcLengthChange <= arcLengthTolerance:
                     print('Derivative smoothing: Converged after', iter, 'iterations.')
                     break
                 elif (iter == maxIterations):
                     print('Derivative smoothing: Stopping after', maxIterations, 'iterations without converging.')
                     break
-                for derivativeKey, derivativeEdges in self._derivativeMap.items():
-                    edgeCount = len(derivativeEdges)
-                    if edgeCount > 1:
-                        nodeIdentifier, nodeValueLabel, nodeVersion = derivativeKey
-                        fieldcache.setNode(self._nodes.findNodeByIdentifier(nodeIdentifier))
-                        if updateDirections:
-                            x = [ 0.0 for _ in range(componentsCount) ]
-                        else:
-                            result, x = self._field.getNodeParameters(fieldcache, -1, nodeValueLabel, nodeVersion, componentsCount)
-                        mag = 0.0
-                        for derivativeEdge in derivativeEdges:
-                            edge, expressionIndex, totalScaleFactor = derivativeEdge
-                            arcLength = edge.getArcLength()
-                            if updateDirections:
-                                delta = edge.getDelta()
-                                if totalScaleFactor < 0.0:
-                                    delta = [ -d for d in delta ]
-                                for c in range(componentsCount):
-                                    x[c] += delta[c] / arcLength
-                            if self._scalingMode == DerivativeScalingMode.ARITHMETIC_MEAN:
-                                mag += arcLength/math.fabs(totalScaleFactor)
-                            else: # self._scalingMode == DerivativeScalingMode.HARMONIC_MEAN
-                                mag += math.fabs(totalScaleFactor)/arcLength
-                        if self._scalingMode == DerivativeScalingMode.ARITHMETIC_MEAN:
-                            mag /= edgeCount
-                        else: # self._scalingMode == DerivativeScalingMode.HARMONIC_MEAN
-                            mag = edgeCount/mag
-                        if (mag <= 0.0):
-                            print('Node', nodeIdentifier, 'label', label, 'version', version, 'has negative mag', mag)
-                        x = setMagnitude(x, mag)
-                        result = self._field.setNodeParameters(fieldcache, -1, nodeValueLabel, nodeVersion, x)
-                for derivativeKey, derivativeEdges in self._derivativeMap.items():
-                    edgeCount = len(derivativeEdges)
-                    if edgeCount == 1:
-                        # boundary smoothing over single edge
-                        nodeIdentifier, nodeValueLabel, nodeVersion = derivativeKey
-                        edge, expressionIndex, totalScaleFactor = derivativeEdges[0]
-                        # re-evaluate arc length so parameters are up-to-date for other end
-                        arcLength = edge.evaluateArcLength(self._nodes, self._field, fieldcache)
-                        fieldcache.setNode(self._nodes.findNodeByIdentifier(nodeIdentifier))  # since changed by evaluateArcLength
-                        otherExpressionIndex = 3 if (expressionIndex == 1) else 1
-                        otherd = edge.getParameter(otherExpressionIndex)
-                        if updateDirections:
-                            thisx = edge.getParameter(expressionIndex - 1)
-                            otherx = edge.getParameter(otherExpressionIndex - 1)
-                            bothEndsOnBoundary = False
-                            otherExpression = edge.getExpression(otherExpressionIndex)
-                            if len(otherExpression) == 1:
-                                otherNodeIdentifier, otherValueLabel, otherNodeVersion, otherTotalScaleFactor = otherExpression[0]
-                                otherDerivativeKey = (otherNodeIdentifier, otherValueLabel, otherNodeVersion)
-                                otherDerivativeEdges = self._derivativeMap.get(otherDerivativeKey)
-                                bothEndsOnBoundary = (otherDerivativeEdges is not None) and (len(otherDerivativeEdges) == 1)
-                            if bothEndsOnBoundary:
-                                if expressionIndex == 1:
-                                    x = [ (otherx[c] - thisx[c]) for c in range(componentsCount) ]
-                                else:
-                                    x = [ (thisx[c] - otherx[c]) for c in range(componentsCount) ]
-                            else:
-                                if expressionIndex == 1:
-                                    x = interpolateLagrangeHermiteDerivative(thisx, otherx, otherd, 0.0)
-                                else:
-                                    x = interpolateHermiteLagrangeDerivative(otherx, otherd, thisx, 1.0)
-                            x = [ d/totalScaleFactor for d in x ]
-                        else:
-                            result, x = self._field.getNodeParameters(fieldcache, -1, nodeValueLabel, nodeVersion, componentsCount)
-                        othermag = magnitude(otherd)
-                        mag = (2.0*arcLength - othermag)/math.fabs(totalScaleFactor)
-                        if (mag <= 0.0):
-                            print('Derivative smoothing: Node', nodeIdentifier, 'label', nodeValueLabel, 'version', nodeVersion, 'has negative magnitude', mag)
-                        x = setMagnitude(x, mag)
-                        result = self._field.setNodeParameters(fieldcache, -1, nodeValueLabel, nodeVersion, x)
-            # record modified nodes while ChangeManager is in effect
-            if self._editNodesetGroup:
-                for derivativeKey in self._derivativeMap:
-                    self._editNodesetGroup.addNode((self._nodes.findNodeByIdentifier(derivativeKey[0])))
+                if self._interior:
+                    # derivatives on multiple edges take the mean of arc lengths from the start of the iteration
+                    derivativeIndexes, edgeIndexes, expressionIndexes, totalScaleFactors = self._interior
+                    interiorArcLengths = arcLengths[edgeIndexes]
+                    if updateDirections:
+                        delta = edgeParameters[edgeIndexes, 2] - edgeParameters[edgeIndexes, 0]
+                        delta *= (np.where(totalScaleFactors < 0.0, -1.0, 1.0)/np.where(interiorArcLengths > 0.0, interiorArcLengths, 1.0))[:, np.newaxis]
+                        x = np.zeros((len(self._interiorSlots), parameters.shape[1]))
+                        np.add.at(x, derivativeIndexes, delta)
+                    else:
+                        x = parameters[self._interiorSlots]
+                    edgeCounts = np.bincount(derivativeIndexes)
+                    if self._scalingMode == DerivativeScalingMode.ARITHMETIC_MEAN:
+                        mags = np.bincount(derivativeIndexes, interiorArcLengths/np.fabs(totalScaleFactors))/edgeCounts
+                    else: # self._scalingMode == DerivativeScalingMode.HARMONIC_MEAN
+                        mags = edgeCounts/np.bincount(derivativeIndexes, np.fabs(totalScaleFactors)/interiorArcLengths)
+                    self._warnNonPositiveMagnitudes(self._interiorSlots, mags)
+                    parameters[self._interiorSlots] = self._setMagnitudes(self._interiorSlots, x, mags)
+                for slots, edgeIndexes, expressionIndexes, totalScaleFactors, bothEndsOnBoundary in self._boundaryStages:
+                    # boundary smoothing over single edge, re-evaluated so parameters are up-to-date for other end
+                    edgeParameters, arcLengths = self._evaluateEdges(parameters)
+                    otherExpressionIndexes = 4 - expressionIndexes
+                    otherd = edgeParameters[edgeIndexes, otherExpressionIndexes]
+                    if updateDirections:
+                        thisx = edgeParameters[edgeIndexes, expressionIndexes - 1]
+                        otherx = edgeParameters[edgeIndexes, otherExpressionIndexes - 1]
+                        sign = np.where(expressionIndexes == 1, 1.0, -1.0)[:, np.newaxis]
+                        # linear if both ends on boundary, otherwise Lagrange-Hermite derivative at this end
+                        x = np.where(bothEndsOnBoundary[:, np.newaxis], sign*(otherx - thisx), sign*2.0*(otherx - thisx) - otherd)
+                        x /= totalScaleFactors[:, np.newaxis]
+                    else:
+                        x = parameters[slots]
+                    mags = (2.0*arcLengths[edgeIndexes] - np.linalg.norm(otherd, axis=1))/np.fabs(totalScaleFactors)
+                    self._warnNonPositiveMagnitudes(slots, mags)
+                    parameters[slots] = self._setMagnitudes(slots, x, mags)
+            addProfileCount('iterations', iter)
+            # write back changed derivatives once
+            lastNodeIdentifier = None
+            for derivativeKey in sorted(self._derivativeMap):
+                nodeIdentifier, nodeValueLabel, nodeVersion = derivativeKey
+                if nodeIdentifier != lastNodeIdentifier:
+                    node = self._nodes.findNodeByIdentifier(nodeIdentifier)
+                    fieldcache.setNode(node)
+                    # record modified nodes while ChangeManager is in effect
+                    if self._editNodesetGroup:
+                        self._editNodesetGroup.addNode(node)
+                    lastNodeIdentifier = nodeIdentifier
+                self._field.setNodeParameters(fieldcache, -1, nodeValueLabel, nodeVersion,
+                    parameters[self._slotMap[derivativeKey]].tolist())
             del fieldcache
+        return convergenceHistory
@@ -1,7 +1,7 @@
 '''
 Utility functions for element field templates shared by mesh generators.
 '''
-from opencmiss.zinc.element import Elementfieldtemplate
+from opencmiss.zinc.element import Element, Elementfieldtemplate
 
 def getEftTermScaling(eft, functionIndex, termIndex):
     '''
@@ -148,3 +148,114 @@ def setEftScaleFactorIds(eft, globalScaleFactorIds, nodeScaleFactorIds):
         eft.setScaleFactorType(s, Elementfieldtemplate.SCALE_FACTOR_TYPE_NODE_GENERAL)
         eft.setScaleFactorIdentifier(s, id)
         s += 1
+
+def getEftSignature(eft):
+    '''
+    Get a canonical structural description of an element field template, equal for templates
+    giving identical interpolation whether created by the same or different calls.
+    :param eft: Element field template to describe.
+    :return: Hashable tuple of basis, local node and scale factor counts, scale factor types and
+    identifiers, and for each function the node, value label, version and scaling of each term.
+    '''
+    elementbasis = eft.getElementbasis()
+    basisFunctionTypes = tuple(elementbasis.getFunctionType(d) for d in range(1, elementbasis.getDimension() + 1))
+    parameterMappingMode = eft.getParameterMappingMode()
+    if parameterMappingMode != Elementfieldtemplate.PARAMETER_MAPPING_MODE_NODE:
+        # only node-based templates are compared by structure
+        return (basisFunctionTypes, parameterMappingMode, id(eft))
+    scaleFactorsCount = eft.getNumberOfLocalScaleFactors()
+    scaleFactors = tuple((eft.getScaleFactorType(s), eft.getScaleFactorIdentifier(s)) for s in range(1, scaleFactorsCount + 1))
+    functions = []
+    for f in range(1, eft.getNumberOfFunctions() + 1):
+        functions.append(tuple((eft.getTermLocalNodeIndex(f, t), eft.getTermNodeValueLabel(f, t), eft.getTermNodeVersion(f, t),
+            tuple(getEftTermScaling(eft, f, t)) if scaleFactorsCount else ()) for t in range(1, eft.getFunctionNumberOfTerms(f) + 1)))
+    return (basisFunctionTypes, eft.getNumberOfLocalNodes(), scaleFactors, tuple(functions))
+
+class EftCache:
+    '''
+    Interns element field templates and element templates for one mesh so identical templates
+    are shared instead of being created again for each element.
+    Shared templates must not be modified by callers.
+    '''
+
+    def __init__(self, mesh):
+        '''
+        :param mesh: Zinc mesh templates are for.
+        '''
+        self._mesh = mesh
+        # map (create method name, arguments) -> interned eft
+        self._createdEfts = {}
+        # map eft signature -> interned eft
+        self._efts = {}
+        # map (field name, eft signature, shape type) -> element template
+        self._elementtemplates = {}
+        self._hitCount = 0
+        self._missCount = 0
+
+    def getEft(self, createEftMethod, *args):
+        '''
+        Get element field template returned by createEftMethod(*args), shared with any earlier call
+        with equal arguments or any structurally identical interned template.
+        :param createEftMethod: Bound eftfactory create method e.g. eftfactory.createEftShellPoleBottom.
+        :param args: Arguments to createEftMethod. Lists are compared by value.
+        :return: Shared element field template.
+        '''
+        key = (createEftMethod.__name__, tuple((tuple(arg) if isinstance(arg, list) else arg) for arg in args))
+        eft = self._createdEfts.get(key)
+        if eft is not None:
+            self._hitCount += 1
+            return eft
+        eft = self.internEft(createEftMethod(*args))
+        self._createdEfts[key] = eft
+        return eft
+
+    def internEft(self, eft):
+        '''
+        Get interned element field template structurally identical to eft, or intern eft.
+        Use after editing a template e.g. with remapEftNodeValueLabel; eft must not be modified further.
+        :param eft: Element field template to intern.
+        :return: Shared element field template, which may be eft.
+        '''
+        return self._internEft(eft)[0]
+
+    def _internEft(self, eft):
+        '''
+        :return: Interned eft, its signature.
+        '''
+        signature = getEftSignature(eft)
+        internedEft = self._efts.get(signature)
+        if internedEft is not None:
+            self._hitCount += 1
+            return internedEft, signature
+        self._missCount += 1
+        self._efts[signature] = eft
+        return eft, signature
+
+    def getElementtemplate(self, field, eft, shapeType=Element.SHAPE_TYPE_CUBE):
+        '''
+        Get shared element template defining only field with eft, interning eft.
+        :param field: Zinc field to define on element template.
+        :param eft: Element field template for field, used if no identical template is interned.
+        :param shapeType: Element shape type, default cube.
+        :return: Element template, interned element field template to set nodes and scale factors with.
+        '''
+        eft, signature = self._internEft(eft)
+        key = (field.getName(), signature, shapeType)
+        elementtemplate = self._elementtemplates.get(key)
+        if elementtemplate is None:
+            elementtemplate = self._mesh.createElementtemplate()
+            elementtemplate.setElementShapeType(shapeType)
+            elementtemplate.defineField(field, -1, eft)
+            self._elementtemplates[key] = elementtemplate
+        return elementtemplate, eft
+
+    def getStatistics(self):
+        '''
+        :return: dict of hits, misses, distinct element field templates and element templates.
+        '''
+        return {
+            'hits' : self._hitCount,
+            'misses' : self._missCount,
+            'efts' : len(self._efts),
+            'elementtemplates' : len(self._elementtemplates)
+            }
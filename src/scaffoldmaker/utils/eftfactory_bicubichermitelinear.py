@@ -1,7 +1,8 @@
 '''
 Definitions of standard element field templates using bicubic Hermite x linear Lagrange basis.
 '''
-from scaffoldmaker.utils.eft_utils import remapEftLocalNodes, remapEftNodeValueLabel, setEftScaleFactorIds
+from scaffoldmaker.utils.eft_utils import EftCache, remapEftLocalNodes, remapEftNodeValueLabel, setEftScaleFactorIds
+from scaffoldmaker.utils.profiling import addProfileCount
 from opencmiss.zinc.element import Elementbasis, Elementfieldtemplate
 from opencmiss.zinc.node import Node
 from opencmiss.zinc.status import OK as ZINC_OK
@@ -33,9 +34,42 @@ class eftfactory_bicubichermitelinear:
                      else Node.VALUE_LABEL_D2_DS1DS3 if (d_ds2 == Node.VALUE_LABEL_D_DS3) \
                      else Node.VALUE_LABEL_D2_DS1DS2
         self._fieldmodule = mesh.getFieldmodule()
+        self._eftCache = EftCache(mesh)
         self._basis = self._fieldmodule.createElementbasis(3, Elementbasis.FUNCTION_TYPE_CUBIC_HERMITE)
         self._basis.setFunctionType(linearAxis, Elementbasis.FUNCTION_TYPE_LINEAR_LAGRANGE)
 
+    def _createElementfieldtemplate(self):
+        '''
+        Create element field template with the factory basis, counting it when profiling.
+        '''
+        addProfileCount('element field templates')
+        return self._mesh.createElementfieldtemplate(self._basis)
+
+    def getSharedEft(self, createEftMethod, *args):
+        '''
+        Get element field template from a create method of this factory, shared with earlier calls
+        with the same arguments instead of creating a new template. Must not be modified.
+        :param createEftMethod: Bound create method of this factory e.g. self.createEftShellPoleBottom.
+        :param args: Arguments to createEftMethod.
+        :return: Shared element field template.
+        '''
+        return self._eftCache.getEft(createEftMethod, *args)
+
+    def internEft(self, eft):
+        '''
+        Get shared element field template identical to eft, interning eft if new.
+        Use after editing a template e.g. with remapEftNodeValueLabel; eft must not be modified after.
+        :return: Shared element field template.
+        '''
+        return self._eftCache.internEft(eft)
+
+    def getSharedElementtemplate(self, field, eft):
+        '''
+        Get shared cube element template defining only field with eft, interning eft.
+        :return: Element template, shared element field template to set nodes and scale factors with.
+        '''
+        return self._eftCache.getElementtemplate(field, eft)
+
     def _remapDefaultNodeDerivatives(self, eft):
         '''
         Remap the Hermite node derivatives to those chosen in __init__.
@@ -58,7 +92,7 @@ class eftfactory_bicubichermitelinear:
         '''
         if not self._useCrossDerivatives:
             return self.createEftNoCrossDerivatives()
-        eft = self._mesh.createElementfieldtemplate(self._basis)
+        eft = self._createElementfieldtemplate()
         self._remapDefaultNodeDerivatives(eft)
         assert eft.validate(), 'eftfactory_bicubichermitelinear.createEftBasic:  Failed to validate eft'
         return eft
@@ -69,7 +103,7 @@ class eftfactory_bicubichermitelinear:
         node derivatives ds1 & ds2, without cross derivatives.
         :return: Element field template
         '''
-        eft = self._mesh.createElementfieldtemplate(self._basis)
+        eft = self._createElementfieldtemplate()
         for n in range(8):
             eft.setFunctionNumberOfTerms(n*4 + 4, 0)
         self._remapDefaultNodeDerivatives(eft)
@@ -91,7 +125,7 @@ class eftfactory_bicubichermitelinear:
         :return: Element field template
         '''
         # start with full bicubic hermite linear to remap D2_DS1DS2 at pole
-        eft = self._mesh.createElementfieldtemplate(self._basis)
+        eft = self._createElementfieldtemplate()
         if not self._useCrossDerivatives:
             for n in [ 2, 3, 6, 7 ]:
                 eft.setFunctionNumberOfTerms(n*4 + 4, 0)
@@ -139,7 +173,7 @@ class eftfactory_bicubichermitelinear:
         :return: Element field template
         '''
         # start with full bicubic hermite linear to remap D2_DS1DS2 at pole
-        eft = self._mesh.createElementfieldtemplate(self._basis)
+        eft = self._createElementfieldtemplate()
         if not self._useCrossDerivatives:
             for n in [ 0, 1, 4, 5 ]:
                 eft.setFunctionNumberOfTerms(n*4 + 4, 0)
@@ -402,7 +436,7 @@ class eftfactory_bicubichermitelinear:
         :return: Element field template
         '''
         # start with full bicubic hermite linear
-        eft = self._mesh.createElementfieldtemplate(self._basis)
+        eft = self._createElementfieldtemplate()
 
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n * 4 + 4, 0)
@@ -458,7 +492,7 @@ class eftfactory_bicubichermitelinear:
         :return: Element field template
         '''
         # start with full bicubic hermite linear
-        eft = self._mesh.createElementfieldtemplate(self._basis)
+        eft = self._createElementfieldtemplate()
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n * 4 + 4, 0)
 
@@ -512,7 +546,7 @@ class eftfactory_bicubichermitelinear:
         :return: Element field template
         '''
         # start with full bicubic hermite linear
-        eft = self._mesh.createElementfieldtemplate(self._basis)
+        eft = self._createElementfieldtemplate()
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n * 4 + 4, 0)
 
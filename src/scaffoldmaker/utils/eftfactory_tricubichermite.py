@@ -8,8 +8,9 @@ from opencmiss.zinc.element import Element, Elementbasis, Elementfieldtemplate
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.node import Node
 from opencmiss.zinc.status import OK as ZINC_OK
-from scaffoldmaker.utils.eft_utils import mapEftFunction1Node1Term, remapEftLocalNodes, remapEftNodeValueLabel, scaleEftNodeValueLabels, setEftScaleFactorIds
+from scaffoldmaker.utils.eft_utils import EftCache, mapEftFunction1Node1Term, remapEftLocalNodes, remapEftNodeValueLabel, scaleEftNodeValueLabels, setEftScaleFactorIds
 from scaffoldmaker.utils import interpolation as interp
+from scaffoldmaker.utils.profiling import addProfileCount
 from scaffoldmaker.utils import vector
 
 
@@ -27,8 +28,41 @@ class eftfactory_tricubichermite:
         self._mesh = mesh
         self._useCrossDerivatives = useCrossDerivatives
         self._fieldmodule = mesh.getFieldmodule()
+        self._eftCache = EftCache(mesh)
         self._tricubicHermiteBasis = self._fieldmodule.createElementbasis(3, Elementbasis.FUNCTION_TYPE_CUBIC_HERMITE)
 
+    def _createElementfieldtemplate(self):
+        '''
+        Create element field template with the factory basis, counting it when profiling.
+        '''
+        addProfileCount('element field templates')
+        return self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+
+    def getSharedEft(self, createEftMethod, *args):
+        '''
+        Get element field template from a create method of this factory, shared with earlier calls
+        with the same arguments instead of creating a new template. Must not be modified.
+        :param createEftMethod: Bound create method of this factory e.g. self.createEftShellPoleBottom.
+        :param args: Arguments to createEftMethod.
+        :return: Shared element field template.
+        '''
+        return self._eftCache.getEft(createEftMethod, *args)
+
+    def internEft(self, eft):
+        '''
+        Get shared element field template identical to eft, interning eft if new.
+        Use after editing a template e.g. with remapEftNodeValueLabel; eft must not be modified after.
+        :return: Shared element field template.
+        '''
+        return self._eftCache.internEft(eft)
+
+    def getSharedElementtemplate(self, field, eft):
+        '''
+        Get shared cube element template defining only field with eft, interning eft.
+        :return: Element template, shared element field template to set nodes and scale factors with.
+        '''
+        return self._eftCache.getElementtemplate(field, eft)
+
     def createEftBasic(self):
         '''
         Create the basic tricubic hermite element field template with 1:1 mappings to
@@ -37,7 +71,7 @@ class eftfactory_tricubichermite:
         '''
         if not self._useCrossDerivatives:
             return self.createEftNoCrossDerivatives()
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         assert eft.validate(), 'eftfactory_tricubichermite.createEftBasic:  Failed to validate eft'
         return eft
 
@@ -47,7 +81,7 @@ class eftfactory_tricubichermite:
         node derivatives, without cross derivatives.
         :return: Element field template
         '''
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         for n in range(8):
             eft.setFunctionNumberOfTerms(n*8 + 4, 0)
             eft.setFunctionNumberOfTerms(n*8 + 6, 0)
@@ -116,7 +150,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic to remap D2_DS1DS2 at pole
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         if not self._useCrossDerivatives:
             for n in [ 2, 3, 6, 7 ]:
                 eft.setFunctionNumberOfTerms(n*8 + 4, 0)
@@ -175,7 +209,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic to remap D2_DS1DS2 at pole
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         if not self._useCrossDerivatives:
             for n in [ 0, 1, 4, 5 ]:
                 eft.setFunctionNumberOfTerms(n*8 + 4, 0)
@@ -234,7 +268,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         if not self._useCrossDerivatives:
             for n in [ 4, 5, 6, 7 ]:
                 eft.setFunctionNumberOfTerms(n*8 + 4, 0)
@@ -297,7 +331,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n*8 + 4, 0)
             if n > 3:
@@ -376,7 +410,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         for n in [ 0, 1, 4, 5 ]:
             eft.setFunctionNumberOfTerms(n*8 + 4, 0)
             if n > 1:
@@ -452,7 +486,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
 
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n * 8 + 4, 0)
@@ -528,7 +562,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n * 8 + 4, 0)
             eft.setFunctionNumberOfTerms(n * 8 + 6, 0)
@@ -606,7 +640,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n*8 + 4, 0)
             eft.setFunctionNumberOfTerms(n*8 + 6, 0)
@@ -670,7 +704,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         for n in [ 0, 1, 4, 5 ]:
             eft.setFunctionNumberOfTerms(n*8 + 4, 0)
             eft.setFunctionNumberOfTerms(n*8 + 6, 0)
@@ -731,7 +765,7 @@ class eftfactory_tricubichermite:
         :return: Element field template
         '''
         # start with full tricubic
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         for n in [ 2, 3, 6, 7 ]:
             eft.setFunctionNumberOfTerms(n * 8 + 4, 0)
             eft.setFunctionNumberOfTerms(n * 8 + 6, 0)
@@ -1129,7 +1163,7 @@ class eftfactory_tricubichermite:
         Cross derivatives are not used on the general mapped nodes.
         :return: Element field template
         '''
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         # general linear map at 4 nodes for one derivative
         eft.setNumberOfLocalScaleFactors(8)
         for s in range(8):
@@ -1164,7 +1198,7 @@ class eftfactory_tricubichermite:
         Cross derivatives are not used on the general mapped nodes.
         :return: Element field template
         '''
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         # negate dxi1 plus general linear map at 4 nodes for one derivative
         eft.setNumberOfLocalScaleFactors(10)
         # GRC: allow scale factor identifier for global -1.0 to be prescribed
@@ -1216,7 +1250,7 @@ class eftfactory_tricubichermite:
         Cross derivatives are not used on the general mapped nodes.
         :return: Element field template
         '''
-        eft = self._mesh.createElementfieldtemplate(self._tricubicHermiteBasis)
+        eft = self._createElementfieldtemplate()
         # negate dxi1 plus general linear map at 4 nodes for one derivative
         eft.setNumberOfLocalScaleFactors(10)
         # GRC: allow scale factor identifier for global -1.0 to be prescribed
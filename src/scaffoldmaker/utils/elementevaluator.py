@@ -0,0 +1,312 @@
+'''
+Class for evaluating finite element fields over many element xi locations with numpy basis
+matrices, without binding a field cache to each location.
+'''
+from __future__ import division
+import numpy as np
+from opencmiss.utils.zinc.general import ChangeManager
+from opencmiss.zinc.element import Element, Elementbasis, Elementfieldtemplate
+from opencmiss.zinc.result import RESULT_OK
+from scaffoldmaker.utils.eft_utils import getEftSignature
+
+
+# map function type -> monomial coefficients of 1-D basis functions indexed by
+# (basis node, function of node, power of xi from 0 to 3)
+_basisMonomialCoefficients = {
+    Elementbasis.FUNCTION_TYPE_LINEAR_LAGRANGE: np.array([
+        [ [ 1.0, -1.0, 0.0, 0.0 ] ],
+        [ [ 0.0, 1.0, 0.0, 0.0 ] ] ]),
+    Elementbasis.FUNCTION_TYPE_QUADRATIC_LAGRANGE: np.array([
+        [ [ 1.0, -3.0, 2.0, 0.0 ] ],
+        [ [ 0.0, 4.0, -4.0, 0.0 ] ],
+        [ [ 0.0, -1.0, 2.0, 0.0 ] ] ]),
+    Elementbasis.FUNCTION_TYPE_CUBIC_LAGRANGE: np.array([
+        [ [ 1.0, -5.5, 9.0, -4.5 ] ],
+        [ [ 0.0, 9.0, -22.5, 13.5 ] ],
+        [ [ 0.0, -4.5, 18.0, -13.5 ] ],
+        [ [ 0.0, 1.0, -4.5, 4.5 ] ] ]),
+    Elementbasis.FUNCTION_TYPE_CUBIC_HERMITE: np.array([
+        [ [ 1.0, 0.0, -3.0, 2.0 ], [ 0.0, 1.0, -2.0, 1.0 ] ],
+        [ [ 0.0, 0.0, 3.0, -2.0 ], [ 0.0, 0.0, -1.0, 1.0 ] ] ])
+    }
+
+_shapeTypes = [ None, Element.SHAPE_TYPE_LINE, Element.SHAPE_TYPE_SQUARE, Element.SHAPE_TYPE_CUBE ]
+
+# number of most recently used element field templates ElementEvaluator compares each element's with
+_recentEftsCount = 4
+
+
+def getBasisValues1d(functionType, xi, derivative=0):
+    '''
+    Evaluate 1-D basis functions or their derivatives.
+    :param functionType: Elementbasis function type; linear, quadratic or cubic Lagrange, or cubic Hermite.
+    :param xi: Array-like of xi values.
+    :param derivative: Order of derivative with respect to xi, 0 for values.
+    :return: numpy array (pointsCount, basis nodes count, functions per node count).
+    '''
+    coefficients = _basisMonomialCoefficients[functionType]
+    for d in range(derivative):
+        coefficients = coefficients[:, :, 1:]*np.arange(1, coefficients.shape[2])
+    xi = np.asarray(xi, dtype=float)
+    # Horner's rule over the remaining powers
+    values = np.broadcast_to(coefficients[:, :, -1], xi.shape + coefficients.shape[0:2])
+    for p in range(coefficients.shape[2] - 2, -1, -1):
+        values = values*xi[:, np.newaxis, np.newaxis] + coefficients[:, :, p]
+    return values
+
+
+def getBasisMatrix(functionTypes, xi, derivatives=None):
+    '''
+    Get matrix of tensor product basis function values, or their xi derivatives, at xi points.
+    :param functionTypes: Sequence of Elementbasis function types for each xi direction.
+    :param xi: Array-like (pointsCount, dimension) of element xi.
+    :param derivatives: Optional sequence of derivative order with respect to each xi,
+    e.g. (1, 0, 0) for first derivative with respect to xi1. Default is values.
+    :return: numpy array (pointsCount, functionsCount) with functions in Zinc order: for each basis
+    node with xi1 varying fastest, for each function of the node with xi1 varying fastest.
+    '''
+    xi = np.asarray(xi, dtype=float).reshape(-1, len(functionTypes))
+    basisMatrix = None
+    for i, functionType in enumerate(functionTypes):
+        values = getBasisValues1d(functionType, xi[:, i], derivatives[i] if derivatives else 0)
+        if basisMatrix is None:
+            basisMatrix = values
+        else:
+            pointsCount, nodesCount, functionsCount = basisMatrix.shape
+            basisMatrix = np.einsum('paf,pbg->pbagf', basisMatrix, values).reshape(
+                pointsCount, values.shape[1]*nodesCount, values.shape[2]*functionsCount)
+    return basisMatrix.reshape(basisMatrix.shape[0], -1)
+
+
+def getLatticeXi(numberInXi):
+    '''
+    :param numberInXi: Sequence of number of intervals in each xi direction.
+    :return: numpy array (pointsCount, dimension) of xi at the regular lattice, with xi1 varying fastest.
+    '''
+    grids = np.meshgrid(*[ (np.arange(number + 1)/number) for number in reversed(numberInXi) ], indexing='ij')
+    return np.stack([ grid.ravel() for grid in reversed(grids) ], axis=1)
+
+
+class ElementEvaluator:
+    '''
+    Evaluates a finite element field at many locations in elements of a mesh by applying numpy
+    basis matrices to element parameters, avoiding a field cache round trip per location.
+    Element parameters multiplying each basis function are extracted once per element from
+    the term layout of its element field template, including scale factors and multi-term maps
+    from eft_utils.remapEftNodeValueLabel(), and cached until clearCache() is called. Term
+    layouts are cached per template signature, and recently used templates are matched first,
+    so per element usually only its nodes and scale factors are queried.
+    Supports node-based templates on line, square and cube shaped elements with Lagrange
+    and cubic Hermite bases; other elements are evaluated with Zinc.
+    '''
+
+    def __init__(self, field, mesh):
+        '''
+        :param field: Zinc finite element field to evaluate.
+        :param mesh: Zinc mesh containing elements to evaluate field on.
+        '''
+        self._field = field.castFiniteElement()
+        self._mesh = mesh
+        self._dimension = mesh.getDimension()
+        self._componentsCount = field.getNumberOfComponents()
+        self._fieldmodule = field.getFieldmodule()
+        self._fieldcache = self._fieldmodule.createFieldcache()
+        # map (node identifier, value label, version) -> list of component parameters
+        self._nodeParameters = {}
+        # map element identifier -> (functionTypes, parameters) or (None, None) if not supported
+        self._elementParameters = {}
+        # map eft signature -> term layout, see _getEftTermLayout(), or None if not supported
+        self._eftTermLayouts = {}
+        # list of (eft, term layout) most recently used first, matched before getting signature
+        self._recentEftTermLayouts = []
+        # map derivatives -> Zinc field giving derivatives of field with respect to xi
+        self._derivativeFields = {}
+
+    def clearCache(self):
+        '''
+        Clear cached node and element parameters. Call after the field or mesh has changed.
+        '''
+        self._nodeParameters = {}
+        self._elementParameters = {}
+
+    def getElementParameters(self, element):
+        '''
+        Interpret the element field template for the field on element to get the element
+        parameters multiplying each basis function. Cached by element identifier.
+        :return: functionTypes tuple, parameters (numpy array functionsCount x componentsCount),
+        or None, None if the element or its element field template is not supported.
+        '''
+        elementIdentifier = element.getIdentifier()
+        elementParameters = self._elementParameters.get(elementIdentifier)
+        if elementParameters is None:
+            elementParameters = self._extractElementParameters(element)
+            self._elementParameters[elementIdentifier] = elementParameters
+        return elementParameters
+
+    def _getEftTermLayout(self, eft):
+        '''
+        Get the layout of the terms of all functions of a node-based element field template,
+        cached by its signature from eft_utils.getEftSignature(). Templates equal to one of the
+        last few used, i.e. the same Zinc object, reuse its layout without reading the terms.
+        :return: functionTypes tuple, functions count, local nodes count, and for each term numpy
+        arrays of function index, local node index from 0, list of (value label, version), and
+        scale factor indexes padded with 0 for unscaled, or None if template is not supported.
+        '''
+        for index, (recentEft, layout) in enumerate(self._recentEftTermLayouts):
+            if recentEft == eft:
+                if index > 0:
+                    self._recentEftTermLayouts.insert(0, self._recentEftTermLayouts.pop(index))
+                return layout
+        signature = getEftSignature(eft)
+        if signature in self._eftTermLayouts:
+            layout = self._eftTermLayouts[signature]
+            self._addRecentEftTermLayout(eft, layout)
+            return layout
+        functionTypes, localNodesCount, scaleFactors, functions = signature
+        basisFunctionsCount = 1
+        for functionType in functionTypes:
+            coefficients = _basisMonomialCoefficients.get(functionType)
+            if coefficients is None:
+                basisFunctionsCount = 0
+                break
+            basisFunctionsCount *= coefficients.shape[0]*coefficients.shape[1]
+        if basisFunctionsCount != len(functions):
+            layout = None
+        else:
+            terms = [ (fn, term) for fn, functionTerms in enumerate(functions) for term in functionTerms ]
+            maxScaleFactorIndexesCount = max([ len(term[3]) for fn, term in terms ] + [ 0 ])
+            termScaleFactorIndexes = np.zeros((len(terms), maxScaleFactorIndexesCount), dtype=np.int64)
+            for t, (fn, term) in enumerate(terms):
+                termScaleFactorIndexes[t, :len(term[3])] = term[3]
+            layout = (functionTypes, basisFunctionsCount, localNodesCount,
+                np.array([ fn for fn, term in terms ], dtype=np.int64),
+                np.array([ term[0] - 1 for fn, term in terms ], dtype=np.int64),
+                [ (term[1], term[2]) for fn, term in terms ],
+                termScaleFactorIndexes)
+        self._eftTermLayouts[signature] = layout
+        self._addRecentEftTermLayout(eft, layout)
+        return layout
+
+    def _addRecentEftTermLayout(self, eft, layout):
+        '''
+        Record eft as most recently used with its term layout, forgetting the least recently used.
+        '''
+        self._recentEftTermLayouts.insert(0, (eft, layout))
+        del self._recentEftTermLayouts[_recentEftsCount:]
+
+    def _extractElementParameters(self, element):
+        '''
+        Extract element parameters without caching. See getElementParameters().
+        '''
+        if element.getShapeType() != _shapeTypes[self._dimension]:
+            return None, None
+        eft = element.getElementfieldtemplate(self._field, -1)
+        if (not eft.isValid()) or (eft.getParameterMappingMode() != Elementfieldtemplate.PARAMETER_MAPPING_MODE_NODE):
+            return None, None
+        layout = self._getEftTermLayout(eft)
+        if layout is None:
+            return None, None
+        functionTypes, functionsCount, localNodesCount, termFunctions, termLocalNodes, termValueKeys, termScaleFactorIndexes = layout
+        scaleFactors = [ 1.0 ]  # index 0 is for unscaled
+        scaleFactorsCount = eft.getNumberOfLocalScaleFactors()
+        if scaleFactorsCount > 0:
+            # handle zinc returning single value as a scalar, change to list for consistency
+            result, elementScaleFactors = element.getScaleFactors(eft, scaleFactorsCount)
+            if result != RESULT_OK:
+                return None, None
+            scaleFactors += elementScaleFactors if isinstance(elementScaleFactors, list) else [ elementScaleFactors ]
+        nodes = [ element.getNode(eft, n) for n in range(1, localNodesCount + 1) ]
+        nodeIdentifiers = [ node.getIdentifier() for node in nodes ]
+        termParameters = np.zeros((len(termValueKeys), self._componentsCount))
+        for t, (localNode, (valueLabel, version)) in enumerate(zip(termLocalNodes.tolist(), termValueKeys)):
+            key = (nodeIdentifiers[localNode], valueLabel, version)
+            x = self._nodeParameters.get(key)
+            if x is None:
+                self._fieldcache.setNode(nodes[localNode])
+                result, x = self._field.getNodeParameters(self._fieldcache, -1, valueLabel, version, self._componentsCount)
+                if result != RESULT_OK:
+                    return None, None
+                if not isinstance(x, list):
+                    x = [x]
+                self._nodeParameters[key] = x
+            termParameters[t] = x
+        termScaleFactors = np.prod(np.array(scaleFactors)[termScaleFactorIndexes], axis=1)
+        parameters = np.zeros((functionsCount, self._componentsCount))
+        np.add.at(parameters, termFunctions, termParameters*termScaleFactors[:, np.newaxis])
+        return functionTypes, parameters
+
+    def _getDerivativeField(self, derivatives):
+        '''
+        :return: Zinc field evaluating derivatives of field with respect to xi, created on first use.
+        '''
+        derivativeField = self._derivativeFields.get(derivatives)
+        if derivativeField is None:
+            derivativeField = self._field
+            with ChangeManager(self._fieldmodule):
+                for i in range(self._dimension):
+                    for d in range(derivatives[i]):
+                        derivativeField = self._fieldmodule.createFieldDerivative(derivativeField, i + 1)
+            self._derivativeFields[derivatives] = derivativeField
+        return derivativeField
+
+    def _evaluateWithZinc(self, element, xi, derivatives):
+        '''
+        Fallback evaluation at each xi for elements not supported by basis matrices.
+        '''
+        field = self._getDerivativeField(tuple(derivatives)) if (derivatives and any(derivatives)) else self._field
+        values = np.zeros((xi.shape[0], self._componentsCount))
+        for p in range(xi.shape[0]):
+            self._fieldcache.setMeshLocation(element, xi[p].tolist())
+            result, x = field.evaluateReal(self._fieldcache, self._componentsCount)
+            if result != RESULT_OK:
+                print('ElementEvaluator.evaluate:  Failed to evaluate field in element', element.getIdentifier())
+            values[p] = x
+        return values
+
+    def evaluate(self, element, xi, derivatives=None):
+        '''
+        Evaluate field or its xi derivatives at many xi locations in one element.
+        :param element: Zinc element to evaluate in.
+        :param xi: Array-like (pointsCount, dimension) of element xi.
+        :param derivatives: Optional sequence of derivative order with respect to each xi,
+        e.g. (0, 1, 0) for first derivative with respect to xi2. Default is field values.
+        :return: numpy array (pointsCount, componentsCount).
+        '''
+        xi = np.asarray(xi, dtype=float).reshape(-1, self._dimension)
+        functionTypes, parameters = self.getElementParameters(element)
+        if functionTypes is None:
+            return self._evaluateWithZinc(element, xi, derivatives)
+        return getBasisMatrix(functionTypes, xi, derivatives) @ parameters
+
+    def evaluateMany(self, elements, xi, derivatives=None):
+        '''
+        Evaluate field or its xi derivatives at locations in any elements, grouping points
+        by element to evaluate each group in one pass.
+        :param elements: Sequence of Zinc element for each point.
+        :param xi: Array-like (pointsCount, dimension) of element xi for each point.
+        :param derivatives: Optional sequence of derivative order with respect to each xi.
+        :return: numpy array (pointsCount, componentsCount) in order of points.
+        '''
+        xi = np.asarray(xi, dtype=float).reshape(-1, self._dimension)
+        elementPoints = {}
+        for p, element in enumerate(elements):
+            points = elementPoints.get(element.getIdentifier())
+            if points is None:
+                elementPoints[element.getIdentifier()] = (element, [ p ])
+            else:
+                points[1].append(p)
+        values = np.zeros((xi.shape[0], self._componentsCount))
+        for element, points in elementPoints.values():
+            values[points] = self.evaluate(element, xi[points], derivatives)
+        return values
+
+    def evaluateLattice(self, element, numberInXi, derivatives=None):
+        '''
+        Evaluate field or its xi derivatives at the regular lattice of xi over element.
+        :param element: Zinc element to evaluate in.
+        :param numberInXi: Sequence of number of intervals in each xi direction.
+        :param derivatives: Optional sequence of derivative order with respect to each xi.
+        :return: numpy array (pointsCount, componentsCount) with xi1 varying fastest.
+        '''
+        return self.evaluate(element, getLatticeXi(numberInXi), derivatives)
+
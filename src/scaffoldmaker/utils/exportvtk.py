@@ -1,18 +1,27 @@
 '''
-Class for exporting a Scaffold from Zinc to legacy vtk text format.
+Class for exporting a Scaffold from Zinc to legacy vtk text or binary format, or vtu XML format.
 '''
 
+import base64
 import io
 import os
+import zlib
 from sys import version_info
+import numpy as np
 from opencmiss.utils.zinc.finiteelement import getElementNodeIdentifiersBasisOrder
 from opencmiss.utils.zinc.general import ChangeManager
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.result import RESULT_OK
 
+# number of points, cells or values written per chunk when streaming text
+_chunkSize = 65536
+# uncompressed size of blocks for vtkZLibDataCompressor
+_compressionBlockSize = 32768
+
+
 class ExportVtk:
     '''
-    Class for exporting a Scaffold from Zinc to legacy vtk text format.
+    Class for exporting a Scaffold from Zinc to legacy vtk text or binary format, or vtu XML format.
     Limited to writing only 3-D hexahedral elements. Assumes all nodes have field defined.
     '''
 
@@ -41,107 +50,228 @@ class ExportVtk:
                 self._markerNodes = markerNodeGroup.getNodesetGroup()
 
 
-    def _write(self, outstream):
-        if version_info.major > 2:
-          assert isinstance(outstream, io.TextIOBase), 'ExportVtk.write:  Invalid outstream argument'
-        outstream.write('# vtk DataFile Version 2.0\n')
-        outstream.write(self._description + '\n')
-        outstream.write('ASCII\n')
-        outstream.write('DATASET UNSTRUCTURED_GRID\n')
-        nodeIdentifierToIndex = {}  # map needed since vtk points are zero index based, i.e. have no identifier
+    def _getModelData(self):
+        '''
+        Extract points, cells and annotation group membership from the model into numpy arrays.
+        Group membership is found by iterating over each group's own elements or nodes once.
+        :return: points (pointCount, 3) float64, cells (cellCount, localNodeCount) int64 point
+        indexes in vtk order, vtk cell type, cell groups list of (safeName, membership bool array),
+        point groups list of (safeName, membership bool array).
+        '''
         coordinatesCount = self._coordinates.getNumberOfComponents()
         cache = self._fieldmodule.createFieldcache()
 
         # exclude marker nodes from output
-        pointCount = self._nodes.getSize()
+        markerNodeIdentifiers = set()
         if self._markerNodes:
-            pointCount -= self._markerNodes.getSize()
-        outstream.write('POINTS ' + str(pointCount) + ' double\n')
+            nodeIter = self._markerNodes.createNodeiterator()
+            node = nodeIter.next()
+            while node.isValid():
+                markerNodeIdentifiers.add(node.getIdentifier())
+                node = nodeIter.next()
+        nodeIdentifierToIndex = {}  # map needed since vtk points are zero index based, i.e. have no identifier
+        pointsList = []
         nodeIter = self._nodes.createNodeiterator()
         node = nodeIter.next()
-        index = 0
         while node.isValid():
-            if not (self._markerNodes and self._markerNodes.containsNode(node)):
-                nodeIdentifierToIndex[node.getIdentifier()] = index
+            nodeIdentifier = node.getIdentifier()
+            if nodeIdentifier not in markerNodeIdentifiers:
+                nodeIdentifierToIndex[nodeIdentifier] = len(pointsList)
                 cache.setNode(node)
                 result, x = self._coordinates.evaluateReal(cache, coordinatesCount)
                 if result != RESULT_OK:
-                    print("Coordinates not found for node", node.getIdentifier())
+                    print("Coordinates not found for node", nodeIdentifier)
                     x = [ 0.0 ]*coordinatesCount
-                if coordinatesCount < 3:
-                    for c in range(coordinatesCount - 1, 3):
-                        x.append(0.0)
-                outstream.write(" ".join(str(s) for s in x) + "\n")
-                index += 1
+                pointsList.append(x)
             node = nodeIter.next()
+        points = np.zeros((len(pointsList), 3), dtype=np.float64)
+        if pointsList:
+            points[:, :coordinatesCount] = pointsList
 
         # following assumes all hex (3-D) or all quad (2-D) elements
         if self._mesh.getDimension() == 2:
             localNodeCount = 4
             vtkIndexing = [ 0, 1, 3, 2 ]
-            cellTypeString = '9'
+            cellType = 9
         else:
             localNodeCount = 8
             vtkIndexing = [ 0, 1, 3, 2, 4, 5, 7, 6 ]
-            cellTypeString = '12'
-        localNodeCountStr = str(localNodeCount)
-        cellCount = self._mesh.getSize()
-        cellListSize = (1 + localNodeCount)*cellCount
-        outstream.write('CELLS ' + str(cellCount) + ' ' + str(cellListSize) + '\n')
+            cellType = 12
+        elementIdentifierToIndex = {}
+        cells = np.empty((self._mesh.getSize(), localNodeCount), dtype=np.int64)
+        cellIndex = 0
         elementIter = self._mesh.createElementiterator()
         element = elementIter.next()
         while element.isValid():
             eft = element.getElementfieldtemplate(self._coordinates, -1)  # assumes all components same
             nodeIdentifiers = getElementNodeIdentifiersBasisOrder(element, eft)
-            outstream.write(localNodeCountStr)
-            for localIndex in vtkIndexing:
-                index = nodeIdentifierToIndex[nodeIdentifiers[localIndex]]
-                outstream.write(' ' + str(index))
-            outstream.write('\n')
+            cells[cellIndex] = [ nodeIdentifierToIndex[nodeIdentifiers[localIndex]] for localIndex in vtkIndexing ]
+            elementIdentifierToIndex[element.getIdentifier()] = cellIndex
+            cellIndex += 1
             element = elementIter.next()
-        outstream.write('CELL_TYPES ' + str(cellCount) + '\n')
-        for i in range(cellCount - 1):
-            outstream.write(cellTypeString + ' ')
-        outstream.write(cellTypeString + '\n')
 
         # use cell data for annotation groups containing elements of mesh dimension
         # use point data for lower dimensional annotation groups
-        pointAnnotationGroups = []
-        cellAnnotationGroups = []
+        cellGroups = []
+        pointGroups = []
         for annotationGroup in self._annotationGroups:
+            safeName = annotationGroup.getName().replace(' ', '_')
             if annotationGroup.hasMeshGroup(self._mesh):
-                cellAnnotationGroups.append(annotationGroup)
-            elif annotationGroup.hasNodesetGroup(self._nodes):
-                pointAnnotationGroups.append(annotationGroup)
-
-        if cellAnnotationGroups:
-            outstream.write('CELL_DATA ' + str(cellCount) + '\n')
-            for annotationGroup in cellAnnotationGroups:
-                safeName = annotationGroup.getName().replace(' ', '_')
-                outstream.write('SCALARS ' + safeName + ' int 1\n')
-                outstream.write('LOOKUP_TABLE default\n') 
-                meshGroup = annotationGroup.getMeshGroup(self._mesh)
-                elementIter = self._mesh.createElementiterator()
+                membership = np.zeros(cells.shape[0], dtype=bool)
+                elementIter = annotationGroup.getMeshGroup(self._mesh).createElementiterator()
                 element = elementIter.next()
                 while element.isValid():
-                    outstream.write('1 ' if meshGroup.containsElement(element) else '0 ')
+                    membership[elementIdentifierToIndex[element.getIdentifier()]] = True
                     element = elementIter.next()
-                outstream.write('\n')
-
-        if pointAnnotationGroups:
-            outstream.write('POINT_DATA ' + str(pointCount) + '\n')
-            for annotationGroup in pointAnnotationGroups:
-                safeName = annotationGroup.getName().replace(' ', '_')
-                outstream.write('SCALARS ' + safeName + ' int 1\n')
-                outstream.write('LOOKUP_TABLE default\n') 
-                nodesetGroup = annotationGroup.getNodesetGroup(self._nodes)
-                nodeIter = self._nodes.createNodeiterator()
+                cellGroups.append((safeName, membership))
+            elif annotationGroup.hasNodesetGroup(self._nodes):
+                membership = np.zeros(points.shape[0], dtype=bool)
+                nodeIter = annotationGroup.getNodesetGroup(self._nodes).createNodeiterator()
                 node = nodeIter.next()
                 while node.isValid():
-                    if not (self._markerNodes and self._markerNodes.containsNode(node)):
-                        outstream.write('1 ' if nodesetGroup.containsNode(node) else '0 ')
+                    index = nodeIdentifierToIndex.get(node.getIdentifier())
+                    if index is not None:
+                        membership[index] = True
                     node = nodeIter.next()
-                outstream.write('\n')
+                pointGroups.append((safeName, membership))
+        return points, cells, cellType, cellGroups, pointGroups
+
+
+    def writeLegacy(self, outstream, binary=False):
+        '''
+        Stream model to outstream in legacy vtk format.
+        :param outstream: Text stream for ASCII format, or binary stream if binary is True.
+        :param binary: Set to True to write legacy vtk BINARY format with big-endian data.
+        '''
+        if version_info.major > 2:
+            if binary:
+                assert not isinstance(outstream, io.TextIOBase), 'ExportVtk.writeLegacy:  Binary format needs binary outstream'
+            else:
+                assert isinstance(outstream, io.TextIOBase), 'ExportVtk.writeLegacy:  Invalid outstream argument'
+        points, cells, cellType, cellGroups, pointGroups = self._getModelData()
+        pointCount = points.shape[0]
+        cellCount, localNodeCount = cells.shape
+
+        def writeText(text):
+            outstream.write(text.encode('ascii') if binary else text)
+
+        writeText('# vtk DataFile Version 2.0\n')
+        writeText(self._description + '\n')
+        writeText('BINARY\n' if binary else 'ASCII\n')
+        writeText('DATASET UNSTRUCTURED_GRID\n')
+        writeText('POINTS ' + str(pointCount) + ' double\n')
+        if binary:
+            outstream.write(points.astype('>f8').tobytes())
+            outstream.write(b'\n')
+        else:
+            for start in range(0, pointCount, _chunkSize):
+                outstream.write(''.join((' '.join(str(s) for s in x) + '\n') for x in points[start:start + _chunkSize].tolist()))
+
+        cellListSize = (1 + localNodeCount)*cellCount
+        writeText('CELLS ' + str(cellCount) + ' ' + str(cellListSize) + '\n')
+        if binary:
+            cellList = np.empty((cellCount, 1 + localNodeCount), dtype='>i4')
+            cellList[:, 0] = localNodeCount
+            cellList[:, 1:] = cells
+            outstream.write(cellList.tobytes())
+            outstream.write(b'\n')
+            writeText('CELL_TYPES ' + str(cellCount) + '\n')
+            outstream.write(np.full(cellCount, cellType, dtype='>i4').tobytes())
+            outstream.write(b'\n')
+        else:
+            localNodeCountStr = str(localNodeCount)
+            for start in range(0, cellCount, _chunkSize):
+                outstream.write(''.join((localNodeCountStr + ''.join((' ' + str(index)) for index in indexes) + '\n')
+                                        for indexes in cells[start:start + _chunkSize].tolist()))
+            outstream.write('CELL_TYPES ' + str(cellCount) + '\n')
+            cellTypeString = str(cellType)
+            if cellCount > 0:
+                outstream.write((cellTypeString + ' ')*(cellCount - 1) + cellTypeString + '\n')
+
+        for dataName, dataCount, groups in (('CELL_DATA', cellCount, cellGroups), ('POINT_DATA', pointCount, pointGroups)):
+            if groups:
+                writeText(dataName + ' ' + str(dataCount) + '\n')
+                for safeName, membership in groups:
+                    writeText('SCALARS ' + safeName + ' int 1\n')
+                    writeText('LOOKUP_TABLE default\n')
+                    if binary:
+                        outstream.write(membership.astype('>i4').tobytes())
+                        outstream.write(b'\n')
+                    else:
+                        for start in range(0, dataCount, _chunkSize):
+                            outstream.write(''.join(np.where(membership[start:start + _chunkSize], '1 ', '0 ').tolist()))
+                        outstream.write('\n')
+
+
+    def writeVtu(self, outstream, encoding='raw', compress=False):
+        '''
+        Stream model to binary outstream in vtu XML UnstructuredGrid format with appended data.
+        :param outstream: Binary stream.
+        :param encoding: 'raw' or 'base64' encoding of appended data.
+        :param compress: Set to True to compress data arrays with zlib.
+        '''
+        assert encoding in ('raw', 'base64'), 'ExportVtk.writeVtu:  Invalid encoding ' + str(encoding)
+        if version_info.major > 2:
+            assert not isinstance(outstream, io.TextIOBase), 'ExportVtk.writeVtu:  Needs binary outstream'
+        points, cells, cellType, cellGroups, pointGroups = self._getModelData()
+        pointCount = points.shape[0]
+        cellCount, localNodeCount = cells.shape
+
+        # list of (xml section, DataArray attributes, array) in order of appended data
+        dataArrays = []
+        for safeName, membership in pointGroups:
+            dataArrays.append(('PointData', 'type="Int32" Name="' + safeName + '"', membership.astype('<i4')))
+        for safeName, membership in cellGroups:
+            dataArrays.append(('CellData', 'type="Int32" Name="' + safeName + '"', membership.astype('<i4')))
+        dataArrays.append(('Points', 'type="Float64" NumberOfComponents="3"', points.astype('<f8', copy=False)))
+        dataArrays.append(('Cells', 'type="Int64" Name="connectivity"', cells.astype('<i8', copy=False)))
+        dataArrays.append(('Cells', 'type="Int64" Name="offsets"',
+                           np.arange(localNodeCount, localNodeCount*(cellCount + 1), localNodeCount, dtype='<i8')))
+        dataArrays.append(('Cells', 'type="UInt8" Name="types"', np.full(cellCount, cellType, dtype=np.uint8)))
+
+        # get list of blocks of bytes to write for each array, from which offsets are known
+        # uncompressed raw data is written directly from the array without copying
+        blocksList = []
+        offsets = []
+        offset = 0
+        for section, attributes, array in dataArrays:
+            data = np.ascontiguousarray(array)
+            if compress:
+                dataBytes = data.tobytes()
+                compressedBlocks = [ zlib.compress(dataBytes[start:start + _compressionBlockSize])
+                                     for start in range(0, len(dataBytes), _compressionBlockSize) ]
+                header = np.array([ len(compressedBlocks), _compressionBlockSize, len(dataBytes) % _compressionBlockSize ] +
+                                  [ len(block) for block in compressedBlocks ], dtype='<u8').tobytes()
+                blocks = [ header, b''.join(compressedBlocks) ]
+            else:
+                blocks = [ np.array([ data.nbytes ], dtype='<u8').tobytes(), data ]
+            if encoding == 'base64':
+                blocks = [ base64.b64encode(block) for block in blocks ]
+            blocksList.append(blocks)
+            offsets.append(offset)
+            offset += sum(memoryview(block).nbytes for block in blocks)
+
+        xml = [ '<?xml version="1.0"?>\n',
+                '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64"' +
+                (' compressor="vtkZLibDataCompressor"' if compress else '') + '>\n',
+                '  <!-- ' + self._description.replace('--', '- -') + ' -->\n',
+                '  <UnstructuredGrid>\n',
+                '    <Piece NumberOfPoints="' + str(pointCount) + '" NumberOfCells="' + str(cellCount) + '">\n' ]
+        for section in ('PointData', 'CellData', 'Points', 'Cells'):
+            xml.append('      <' + section + '>\n')
+            for (arraySection, attributes, array), arrayOffset in zip(dataArrays, offsets):
+                if arraySection == section:
+                    xml.append('        <DataArray ' + attributes + ' format="appended" offset="' + str(arrayOffset) + '"/>\n')
+            xml.append('      </' + section + '>\n')
+        xml += [ '    </Piece>\n',
+                 '  </UnstructuredGrid>\n',
+                 '  <AppendedData encoding="' + encoding + '">\n',
+                 '   _' ]
+        outstream.write(''.join(xml).encode('utf-8'))
+        for blocks in blocksList:
+            for block in blocks:
+                outstream.write(block)
+        outstream.write(b'\n  </AppendedData>\n</VTKFile>\n')
 
 
     def _writeMarkers(self, outstream):
@@ -164,13 +294,30 @@ class ExportVtk:
                 del markerCoordinates
 
 
-    def writeFile(self, filename):
+    def _writeMarkersFile(self, filename):
         '''
-        Export to legacy vtk file/
+        Write marker csv file alongside filename, if there are markers.
         '''
-        with open(filename, 'w') as outstream:
-            self._write(outstream)
         if self._markerNodes and (self._markerNodes.getSize() > 0):
             markerFilename = os.path.splitext(filename)[0] + "_marker.csv"
             with open(markerFilename, 'w') as outstream:
                 self._writeMarkers(outstream)
+
+
+    def writeFile(self, filename, binary=False):
+        '''
+        Export to legacy vtk file.
+        :param binary: Set to True to write legacy vtk BINARY format, otherwise ASCII.
+        '''
+        with open(filename, 'wb' if binary else 'w') as outstream:
+            self.writeLegacy(outstream, binary)
+        self._writeMarkersFile(filename)
+
+
+    def writeVtuFile(self, filename, encoding='raw', compress=False):
+        '''
+        Export to vtu XML file. See writeVtu().
+        '''
+        with open(filename, 'wb') as outstream:
+            self.writeVtu(outstream, encoding, compress)
+        self._writeMarkersFile(filename)
@@ -0,0 +1,328 @@
+'''
+Classes caching generated scaffolds and results from nested sub-scaffolds by a hash of
+their ScaffoldPackage settings.
+'''
+
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import os
+from scaffoldmaker.utils.profiling import addProfileCount
+
+
+def getScaffoldmakerVersion():
+    '''
+    :return: Installed scaffoldmaker version string, or empty string if not installed.
+    '''
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return ''
+    try:
+        return version('scaffoldmaker')
+    except PackageNotFoundError:
+        return ''
+
+
+# hash of scaffoldmaker source files, computed on first use
+_sourceHash = None
+
+
+def getScaffoldmakerSourceHash():
+    '''
+    Get hash of the contents of all scaffoldmaker python source files, so cached models are
+    not reused after code changes in development checkouts with an unchanged version.
+    :return: Hex string hash.
+    '''
+    global _sourceHash
+    if _sourceHash is None:
+        packageDirectory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        sourceHash = hashlib.sha256()
+        for directory, directoryNames, fileNames in os.walk(packageDirectory):
+            directoryNames.sort()
+            for fileName in sorted(fileNames):
+                if fileName.endswith('.py'):
+                    path = os.path.join(directory, fileName)
+                    sourceHash.update(os.path.relpath(path, packageDirectory).encode('utf-8'))
+                    with open(path, 'rb') as f:
+                        sourceHash.update(f.read())
+        _sourceHash = sourceHash.hexdigest()
+    return _sourceHash
+
+
+class _SettingsJSONEncoder(json.JSONEncoder):
+    '''
+    Encodes nested ScaffoldPackage options and mesh edits bytes for hashing.
+    Avoids importing scaffolds module which imports all scaffold types.
+    '''
+
+    def default(self, obj):
+        if isinstance(obj, bytes):
+            return obj.decode('utf-8')
+        toDict = getattr(obj, 'toDict', None)
+        if toDict:
+            return toDict()
+        return super().default(obj)
+
+
+class GenerationCache:
+    '''
+    Opt-in cache of generated scaffold models, keyed by a stable hash of
+    ScaffoldPackage.toDict() plus the scaffoldmaker version and a hash of its source files.
+    Entries are the region serialised to a Zinc model buffer together with the
+    terms of the automatic annotation groups, so a cache hit can restore the
+    model without calling the scaffold's generate functions.
+    Holds a size-bounded in-memory LRU cache and an optional on-disk cache.
+    '''
+
+    def __init__(self, maximumEntries=32, maximumBytes=512*1024*1024, directory=None, maximumDiskBytes=4*1024*1024*1024):
+        '''
+        :param maximumEntries: Maximum number of entries to keep in memory.
+        :param maximumBytes: Maximum total size of model buffers to keep in memory.
+        :param directory: Optional directory path for on-disk cache. Created if it does not exist.
+        :param maximumDiskBytes: Maximum total size of files in on-disk cache.
+        '''
+        self._maximumEntries = maximumEntries
+        self._maximumBytes = maximumBytes
+        self._directory = directory
+        self._maximumDiskBytes = maximumDiskBytes
+        if self._directory:
+            os.makedirs(self._directory, exist_ok=True)
+        self._version = getScaffoldmakerVersion()
+        self._sourceHash = getScaffoldmakerSourceHash()
+        # map key -> (buffer, autoAnnotationGroupTerms), in least to most recently used order
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hitCount = 0
+        self._missCount = 0
+
+    def getKey(self, scaffoldPackage, applyTransformation=True, faceMode=None, groupMode=None):
+        '''
+        :param scaffoldPackage: ScaffoldPackage to get key for.
+        :param applyTransformation: Value of same argument passed to ScaffoldPackage.generate().
+        If False, scale, rotation and translation are omitted from key.
+        :param faceMode: Optional FaceGenerationMode passed to ScaffoldPackage.generate().
+        Omitted from key if None or ALL.
+        :param groupMode: Optional GroupGenerationMode passed to ScaffoldPackage.generate().
+        Omitted from key if None or FULL.
+        :return: Hex string hash uniquely identifying generated model.
+        '''
+        dct = scaffoldPackage.toDict()
+        dct['applyTransformation'] = applyTransformation
+        if not applyTransformation:
+            # untransformed model does not depend on transformation
+            for name in ('rotation', 'scale', 'translation'):
+                dct.pop(name, None)
+        if faceMode and (faceMode.name != 'ALL'):
+            dct['faceMode'] = faceMode.name
+        if groupMode and (groupMode.name != 'FULL'):
+            dct['groupMode'] = groupMode.name
+        dct['scaffoldmakerVersion'] = self._version
+        dct['scaffoldmakerSource'] = self._sourceHash
+        text = json.dumps(dct, sort_keys=True, cls=_SettingsJSONEncoder)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _getFilePaths(self, key):
+        return os.path.join(self._directory, key + '.exf'), os.path.join(self._directory, key + '.json')
+
+    def get(self, key):
+        '''
+        Get cached entry, counting a hit or miss.
+        :param key: Key from getKey().
+        :return: buffer, autoAnnotationGroupTerms or None, None if not cached.
+        '''
+        entry = self._entries.get(key)
+        if entry:
+            self._entries.move_to_end(key)
+        elif self._directory:
+            bufferPath, termsPath = self._getFilePaths(key)
+            try:
+                with open(bufferPath, 'rb') as f:
+                    buffer = f.read()
+                with open(termsPath, 'r') as f:
+                    terms = [ tuple(term) for term in json.load(f) ]
+                entry = (buffer, terms)
+                self._addEntry(key, entry)
+                os.utime(bufferPath)
+            except (OSError, ValueError):
+                entry = None
+        if entry:
+            self._hitCount += 1
+            return entry
+        self._missCount += 1
+        return None, None
+
+    def put(self, key, buffer, autoAnnotationGroupTerms):
+        '''
+        Add entry to cache, evicting least recently used entries if over limits.
+        :param key: Key from getKey().
+        :param buffer: Zinc model file bytes for the generated region.
+        :param autoAnnotationGroupTerms: List of (name, id) for automatic annotation groups.
+        '''
+        entry = (buffer, [ tuple(term) for term in autoAnnotationGroupTerms ])
+        self._addEntry(key, entry)
+        if self._directory:
+            bufferPath, termsPath = self._getFilePaths(key)
+            try:
+                with open(bufferPath, 'wb') as f:
+                    f.write(buffer)
+                with open(termsPath, 'w') as f:
+                    json.dump(entry[1], f)
+                self._evictDisk()
+            except OSError as e:
+                print('GenerationCache.put:  Failed to write on-disk entry:', e)
+
+    def _addEntry(self, key, entry):
+        oldEntry = self._entries.pop(key, None)
+        if oldEntry:
+            self._bytes -= len(oldEntry[0])
+        if len(entry[0]) > self._maximumBytes:
+            return
+        self._entries[key] = entry
+        self._bytes += len(entry[0])
+        while (len(self._entries) > self._maximumEntries) or (self._bytes > self._maximumBytes):
+            key, oldEntry = self._entries.popitem(last=False)
+            self._bytes -= len(oldEntry[0])
+
+    def _evictDisk(self):
+        '''
+        Remove least recently used files until within disk size limit.
+        '''
+        files = []
+        totalBytes = 0
+        for name in os.listdir(self._directory):
+            if name.endswith('.exf'):
+                path = os.path.join(self._directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+                totalBytes += stat.st_size
+        files.sort()
+        for mtime, size, path in files:
+            if totalBytes <= self._maximumDiskBytes:
+                break
+            os.remove(path)
+            termsPath = path[:-4] + '.json'
+            if os.path.exists(termsPath):
+                os.remove(termsPath)
+            totalBytes -= size
+
+    def clear(self):
+        '''
+        Remove all in-memory entries and reset statistics. On-disk entries are kept.
+        '''
+        self._entries.clear()
+        self._bytes = 0
+        self._hitCount = 0
+        self._missCount = 0
+
+    def getEntryCount(self):
+        return len(self._entries)
+
+    def getHitCount(self):
+        return self._hitCount
+
+    def getMissCount(self):
+        return self._missCount
+
+    def getStatistics(self):
+        '''
+        :return: dict of hits, misses, in-memory entries and bytes.
+        '''
+        return {
+            'hits' : self._hitCount,
+            'misses' : self._missCount,
+            'entries' : len(self._entries),
+            'bytes' : self._bytes
+            }
+
+
+class SubScaffoldCache:
+    '''
+    In-memory LRU cache of results extracted from nested sub-scaffold packages such as
+    central paths, keyed by a hash of the nested ScaffoldPackage.toDict(), the extract
+    function and its arguments. On a hit the package is not generated at all, so
+    scaffolds avoid regenerating unchanged sub-scaffolds when other options change.
+    '''
+
+    def __init__(self, maximumEntries=64):
+        '''
+        :param maximumEntries: Maximum number of results to keep. Set to 0 to disable caching.
+        '''
+        self._maximumEntries = maximumEntries
+        # map key -> result, in least to most recently used order
+        self._entries = OrderedDict()
+        self._hitCount = 0
+        self._missCount = 0
+
+    def getKey(self, scaffoldPackage, extractFunction, extractArgs):
+        '''
+        :return: Hex string hash identifying result of extractFunction with extractArgs on the
+        region generated from scaffoldPackage.
+        '''
+        dct = scaffoldPackage.toDict()
+        dct['extractFunction'] = extractFunction.__module__ + '.' + extractFunction.__qualname__
+        dct['extractArgs'] = extractArgs
+        text = json.dumps(dct, sort_keys=True, cls=_SettingsJSONEncoder)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def getGeneratedResult(self, region, scaffoldPackage, extractFunction, *extractArgs):
+        '''
+        Get result of calling extractFunction(tmpRegion, *extractArgs) where tmpRegion is a
+        temporary child region of region in which scaffoldPackage is generated, from cache if present.
+        :param region: Parent region for temporary region, only created on cache miss.
+        :param scaffoldPackage: Nested ScaffoldPackage to generate.
+        :param extractFunction: Function taking region and extractArgs. Must return the same
+        result for the same package and arguments. Arguments must be JSON serialisable.
+        :return: Deep copy of result, which the caller may modify.
+        '''
+        key = self.getKey(scaffoldPackage, extractFunction, extractArgs) if (self._maximumEntries > 0) else None
+        result = self._entries.get(key) if key else None
+        if result is not None:
+            self._entries.move_to_end(key)
+            self._hitCount += 1
+            addProfileCount('sub-scaffold cache hits')
+        else:
+            self._missCount += 1
+            addProfileCount('sub-scaffold cache misses')
+            tmpRegion = region.createRegion()
+            scaffoldPackage.generate(tmpRegion)
+            result = extractFunction(tmpRegion, *extractArgs)
+            del tmpRegion
+            if key:
+                self._entries[key] = copy.deepcopy(result)
+                while len(self._entries) > self._maximumEntries:
+                    self._entries.popitem(last=False)
+                return result
+        return copy.deepcopy(result)
+
+    def clear(self):
+        '''
+        Remove all entries and reset statistics.
+        '''
+        self._entries.clear()
+        self._hitCount = 0
+        self._missCount = 0
+
+    def getEntryCount(self):
+        return len(self._entries)
+
+    def getHitCount(self):
+        return self._hitCount
+
+    def getMissCount(self):
+        return self._missCount
+
+    def getStatistics(self):
+        '''
+        :return: dict of hits, misses and entries.
+        '''
+        return {
+            'hits' : self._hitCount,
+            'misses' : self._missCount,
+            'entries' : len(self._entries)
+            }
+
+
+# shared cache used by scaffolds for results from their nested ScaffoldPackage options
+subScaffoldCache = SubScaffoldCache()
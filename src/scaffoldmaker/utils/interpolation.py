@@ -7,6 +7,7 @@ from collections.abc import Sequence
 import copy
 from enum import Enum
 import math
+import numpy as np
 from scaffoldmaker.utils import vector
 
 gaussXi3 = ( (-math.sqrt(0.6)+1.0)/2.0, 0.5, (+math.sqrt(0.6)+1.0)/2.0 )
@@ -175,6 +176,111 @@ def getCubicHermiteCurvesLength(cx, sd1):
 
     return totalLength
 
+def getCubicHermiteBasisArray(xi):
+    """
+    Array version of getCubicHermiteBasis.
+    :param xi: Array of xi values, any shape.
+    :return: Array of shape xi.shape + (4,) with basis functions for x1, d1, x2, d2.
+    """
+    xi = np.asarray(xi, dtype=float)
+    xi2 = xi*xi
+    xi3 = xi2*xi
+    return np.stack((1.0 - 3.0*xi2 + 2.0*xi3, xi - 2.0*xi2 + xi3, 3.0*xi2 - 2.0*xi3, -xi2 + xi3), axis=-1)
+
+def getCubicHermiteBasisDerivativesArray(xi):
+    """
+    Array version of getCubicHermiteBasisDerivatives.
+    :param xi: Array of xi values, any shape.
+    :return: Array of shape xi.shape + (4,) with basis derivatives for x1, d1, x2, d2.
+    """
+    xi = np.asarray(xi, dtype=float)
+    xi2 = xi*xi
+    return np.stack((-6.0*xi + 6.0*xi2, 1.0 - 4.0*xi + 3.0*xi2, 6.0*xi - 6.0*xi2, -2.0*xi + 3.0*xi2), axis=-1)
+
+def _interpolateCubicHermiteArrayWithBasis(v1, d1, v2, d2, basis):
+    """
+    :param v1, d1, v2, d2: Arrays of shape (nCurves, nComponents).
+    :param basis: Basis array of shape (nXi, 4) shared by all curves, or (nCurves, nXi, 4).
+    :return: Array of shape (nCurves, nXi, nComponents).
+    """
+    p = np.stack((v1, d1, v2, d2), axis=1)  # (nCurves, 4, nComponents)
+    if basis.ndim == 2:
+        return np.einsum('xb,nbc->nxc', basis, p)
+    return np.einsum('nxb,nbc->nxc', basis, p)
+
+def interpolateCubicHermiteArray(v1, d1, v2, d2, xi):
+    """
+    Array version of interpolateCubicHermite evaluating many curves at many xi in one call.
+    :param v1, v2: Values at xi = 0.0 and xi = 1.0, shape (nCurves, nComponents).
+    :param d1, d2: Derivatives w.r.t. xi at xi = 0.0 and xi = 1.0, shape (nCurves, nComponents).
+    :param xi: Positions in curves, shape (nXi,) shared by all curves or (nCurves, nXi).
+    :return: numpy array of interpolated values, shape (nCurves, nXi, nComponents).
+    """
+    return _interpolateCubicHermiteArrayWithBasis(
+        np.asarray(v1, dtype=float), np.asarray(d1, dtype=float), np.asarray(v2, dtype=float), np.asarray(d2, dtype=float),
+        getCubicHermiteBasisArray(xi))
+
+def interpolateCubicHermiteDerivativeArray(v1, d1, v2, d2, xi):
+    """
+    Array version of interpolateCubicHermiteDerivative evaluating many curves at many xi in one call.
+    :param v1, v2: Values at xi = 0.0 and xi = 1.0, shape (nCurves, nComponents).
+    :param d1, d2: Derivatives w.r.t. xi at xi = 0.0 and xi = 1.0, shape (nCurves, nComponents).
+    :param xi: Positions in curves, shape (nXi,) shared by all curves or (nCurves, nXi).
+    :return: numpy array of interpolated derivatives, shape (nCurves, nXi, nComponents).
+    """
+    return _interpolateCubicHermiteArrayWithBasis(
+        np.asarray(v1, dtype=float), np.asarray(d1, dtype=float), np.asarray(v2, dtype=float), np.asarray(d2, dtype=float),
+        getCubicHermiteBasisDerivativesArray(xi))
+
+_gaussBasisDerivatives4 = getCubicHermiteBasisDerivativesArray(gaussXi4)
+_gaussWeights4 = np.array(gaussWt4)
+
+def getCubicHermiteArcLengthArray(v1, d1, v2, d2):
+    '''
+    Array version of getCubicHermiteArcLength. Note this is approximate.
+    :param v1, d1, v2, d2: Arrays of shape (nCurves, nComponents).
+    :return: numpy array of arc lengths of curves using 4 point Gaussian quadrature, shape (nCurves,).
+    '''
+    dm = _interpolateCubicHermiteArrayWithBasis(
+        np.asarray(v1, dtype=float), np.asarray(d1, dtype=float), np.asarray(v2, dtype=float), np.asarray(d2, dtype=float),
+        _gaussBasisDerivatives4)
+    return np.sqrt(np.sum(dm*dm, axis=2)) @ _gaussWeights4
+
+def computeCubicHermiteArcLengthArray(v1, d1, v2, d2, rescaleDerivatives):
+    """
+    Array version of computeCubicHermiteArcLength, converging arc lengths of all curves together.
+    Uses the same iteration and tolerance as the scalar version; curves are removed from the
+    iteration as they converge.
+    :param v1, v2: Values at xi = 0.0 and xi = 1.0, shape (nCurves, nComponents).
+    :param d1, d2: Initial derivatives at v1, v2, shape (nCurves, nComponents).
+    :param rescaleDerivatives: If True, rescale initial d1 and d2 to |v2 - v|
+    :return: numpy array of arc lengths, shape (nCurves,).
+    """
+    v1 = np.asarray(v1, dtype=float)
+    d1 = np.asarray(d1, dtype=float)
+    v2 = np.asarray(v2, dtype=float)
+    d2 = np.asarray(d2, dtype=float)
+    if rescaleDerivatives:
+        lastArcLengths = np.linalg.norm(v2 - v1, axis=1)
+    else:
+        lastArcLengths = getCubicHermiteArcLengthArray(v1, d1, v2, d2)
+    d1 = d1/np.linalg.norm(d1, axis=1)[:, np.newaxis]
+    d2 = d2/np.linalg.norm(d2, axis=1)[:, np.newaxis]
+    tol = 1.0E-6
+    active = np.arange(len(lastArcLengths))
+    for iters in range(100):
+        last = lastArcLengths[active]
+        arcLengths = getCubicHermiteArcLengthArray(v1[active], last[:, np.newaxis]*d1[active], v2[active], last[:, np.newaxis]*d2[active])
+        if iters > 9:
+            arcLengths = 0.8*arcLengths + 0.2*last
+        converged = np.fabs(arcLengths - last) < tol*arcLengths
+        lastArcLengths[active] = arcLengths
+        active = active[~converged]
+        if active.size == 0:
+            return lastArcLengths
+    print('computeCubicHermiteArcLengthArray:  Max iters reached:', iters, 'for', active.size, 'curves')
+    return lastArcLengths
+
 def getCubicHermiteCurvature(v1, d1, v2, d2, radialVector, xi):
     """
     :param v1, v2: Values at xi = 0.0 and xi = 1.0, respectively.
@@ -293,6 +399,10 @@ def projectHermiteCurvesThroughWall(nx, nd1, nd2, n, wallThickness, loop = False
     d3 = vector.setMagnitude(unitNormal, math.fabs(wallThickness))
     return x, d1, d2, d3
 
+# minimum number of input elements for which sampleCubicHermiteCurves() computes their arc
+# lengths together with array functions instead of one element at a time
+arrayElementsCountThreshold = 8
+
 def sampleCubicHermiteCurves(nx, nd1, elementsCountOut,
     addLengthStart = 0.0, addLengthEnd = 0.0,
     lengthFractionStart = 1.0, lengthFractionEnd = 1.0,
@@ -323,13 +433,22 @@ def sampleCubicHermiteCurves(nx, nd1, elementsCountOut,
     nd1a = []
     nd1b = []
     length = 0.0
-    for e in range(elementsCountIn):
+    if elementsCountIn >= arrayElementsCountThreshold:
+        # converge arc lengths of all elements together
         if arcLengthDerivatives:
+            arcLengths = computeCubicHermiteArcLengthArray(nx[:-1], nd1[:-1], nx[1:], nd1[1:], rescaleDerivatives = True).tolist()
+        else:
+            arcLengths = getCubicHermiteArcLengthArray(nx[:-1], nd1[:-1], nx[1:], nd1[1:]).tolist()
+    for e in range(elementsCountIn):
+        if elementsCountIn >= arrayElementsCountThreshold:
+            arcLength = arcLengths[e]
+        elif arcLengthDerivatives:
             arcLength = computeCubicHermiteArcLength(nx[e], nd1[e], nx[e + 1], nd1[e + 1], rescaleDerivatives = True)
-            nd1a.append(vector.setMagnitude(nd1[e], arcLength))
-            nd1b.append(vector.setMagnitude(nd1[e + 1], arcLength))
         else:
             arcLength = getCubicHermiteArcLength(nx[e], nd1[e], nx[e + 1], nd1[e + 1])
+        if arcLengthDerivatives:
+            nd1a.append(vector.setMagnitude(nd1[e], arcLength))
+            nd1b.append(vector.setMagnitude(nd1[e + 1], arcLength))
         length += arcLength
         lengths.append(length)
     proportionEnd = 2.0/(elementLengthStartEndRatio + 1)
@@ -485,6 +604,202 @@ def sampleCubicHermiteCurvesSmooth(nx, nd1, elementsCountOut,
     psf.append(sf)
     return px, pd1, pe, pxi, psf
 
+def _getCubicHermiteArcLengthToXiArray(v1, d1, v2, d2, xi):
+    """
+    Array version of getCubicHermiteArcLengthToXi for one xi per curve.
+    :param v1, d1, v2, d2: Arrays of shape (nCurves, nComponents).
+    :param xi: Array of xi for each curve, shape (nCurves,).
+    :return: Array of arc lengths from xi = 0 to xi, shape (nCurves,).
+    """
+    basis = getCubicHermiteBasisDerivativesArray(xi[:, np.newaxis]*np.array(gaussXi4))
+    dm = _interpolateCubicHermiteArrayWithBasis(v1, d1, v2, d2, basis)
+    return xi*(np.sqrt(np.sum(dm*dm, axis=2)) @ _gaussWeights4)
+
+def _getCubicHermiteXiAtArcDistanceArray(v1, d1, v2, d2, arcLengths, partDistances):
+    """
+    Array version of Newton iteration in getCubicHermiteCurvesPointAtArcDistance, finding
+    xi at arc distance within each curve, using the same xi tolerance and step limits.
+    :param v1, d1, v2, d2: Arrays of shape (nCurves, nComponents).
+    :param arcLengths: Arc lengths of curves, shape (nCurves,).
+    :param partDistances: Arc distances into curves, shape (nCurves,).
+    :return: Array of xi, shape (nCurves,).
+    """
+    xiTol = 1.0E-6
+    xi = partDistances/arcLengths
+    active = np.arange(len(xi))
+    dxiLimit = 0.1
+    for iter in range(100):
+        axi = xi[active]
+        dist = _getCubicHermiteArcLengthToXiArray(v1[active], d1[active], v2[active], d2[active], axi)
+        dm = _interpolateCubicHermiteArrayWithBasis(v1[active], d1[active], v2[active], d2[active],
+            getCubicHermiteBasisDerivativesArray(axi[:, np.newaxis]))[:, 0]
+        dxi = np.clip((partDistances[active] - dist)/np.linalg.norm(dm, axis=1), -dxiLimit, dxiLimit)
+        xi[active] = axi + dxi
+        active = active[np.fabs(dxi) > xiTol]
+        if active.size == 0:
+            return xi
+        if iter in [ 4, 10, 25, 62 ]:
+            dxiLimit *= 0.5
+    print('_getCubicHermiteXiAtArcDistanceArray Max iters reached:', iter, 'for', active.size, 'curves')
+    return xi
+
+def _sampleCubicHermiteCurvesArrayAtDistances(nx, nd1, lengths, distances, nodeDerivativeMagnitudes, nd1a=None, nd1b=None):
+    """
+    Shared implementation of sampleCubicHermiteCurvesArray and sampleCubicHermiteCurvesSmoothArray.
+    Locates the element containing each distance from the table of cumulative arc lengths, then xi
+    in it either proportionally for arc length derivatives nd1a, nd1b, or by Newton iteration.
+    :param nx, nd1: Arrays of node coordinates and derivatives, shape (nCurves, elementsCountIn + 1, nComponents).
+    :param lengths: Cumulative arc lengths at nodes, shape (nCurves, elementsCountIn + 1).
+    :param distances: Distances of all but the last point out, shape (nCurves, elementsCountOut).
+    :param nodeDerivativeMagnitudes: Derivative magnitudes at points out, shape (nCurves, elementsCountOut + 1).
+    :param nd1a, nd1b: Optional start and end derivatives of elements rescaled to arc length,
+    shape (nCurves, elementsCountIn, nComponents).
+    :return: px, pd1, pe, pxi, psf arrays as for sampleCubicHermiteCurvesArray.
+    """
+    curvesCount, elementsCountOut = distances.shape
+    elementsCountIn = lengths.shape[1] - 1
+    # index of first element ending after distance, clamped to last element
+    pe = np.sum(lengths[:, np.newaxis, 1:-1] <= distances[:, :, np.newaxis], axis=2)
+    curves = np.repeat(np.arange(curvesCount), elementsCountOut)
+    e = pe.reshape(-1)
+    partDistances = distances.reshape(-1) - lengths[curves, e]
+    arcLengths = lengths[curves, e + 1] - lengths[curves, e]
+    v1 = nx[curves, e]
+    v2 = nx[curves, e + 1]
+    if nd1a is not None:
+        d1 = nd1a[curves, e]
+        d2 = nd1b[curves, e]
+        xi = partDistances/arcLengths
+    else:
+        d1 = nd1[curves, e]
+        d2 = nd1[curves, e + 1]
+        xi = np.zeros(len(e))
+        inside = partDistances >= 0.0
+        xi[inside] = _getCubicHermiteXiAtArcDistanceArray(v1[inside], d1[inside], v2[inside], d2[inside],
+            arcLengths[inside], partDistances[inside])
+    basis = np.stack((getCubicHermiteBasisArray(xi), getCubicHermiteBasisDerivativesArray(xi)), axis=1)
+    x, d = np.moveaxis(_interpolateCubicHermiteArrayWithBasis(v1, d1, v2, d2, basis), 1, 0)
+    if nd1a is None:
+        # as getCubicHermiteCurvesPointAtArcDistance, use first node for negative distances
+        x[~inside] = v1[~inside]
+        d[~inside] = d1[~inside]
+    componentsCount = nx.shape[2]
+    px = np.concatenate((x.reshape((curvesCount, elementsCountOut, componentsCount)), nx[:, -1:]), axis=1)
+    pd1 = np.concatenate((d.reshape((curvesCount, elementsCountOut, componentsCount)), nd1[:, -1:]), axis=1)
+    pe = np.concatenate((pe, np.full((curvesCount, 1), elementsCountIn - 1)), axis=1)
+    pxi = np.concatenate((xi.reshape((curvesCount, elementsCountOut)), np.ones((curvesCount, 1))), axis=1)
+    psf = nodeDerivativeMagnitudes/np.linalg.norm(pd1, axis=2)
+    pd1 *= psf[:, :, np.newaxis]
+    return px, pd1, pe, pxi, psf
+
+def sampleCubicHermiteCurvesArray(nx, nd1, elementsCountOut,
+    addLengthStart = 0.0, addLengthEnd = 0.0,
+    lengthFractionStart = 1.0, lengthFractionEnd = 1.0,
+    elementLengthStartEndRatio = 1.0, arcLengthDerivatives = False):
+    """
+    Array version of sampleCubicHermiteCurves sampling many independent curves with the same
+    numbers of elements in and out together, e.g. all rings around a tube. Arc lengths of all
+    elements are computed together, and points are located in a table of cumulative arc lengths
+    per curve then by proportion or Newton iteration within elements.
+    Results match sampleCubicHermiteCurves within its arc length and xi tolerances, except that
+    points beyond the end of curves are extrapolated from the last element instead of omitted.
+    :param nx: Coordinates of nodes along curves, shape (nCurves, elementsCountIn + 1, nComponents).
+    :param nd1: Derivatives of nodes along curves, same shape as nx.
+    :param elementsCountOut, addLengthStart, addLengthEnd, lengthFractionStart, lengthFractionEnd,
+    elementLengthStartEndRatio, arcLengthDerivatives: As for sampleCubicHermiteCurves, same for all curves.
+    :return: numpy arrays px, pd1 shape (nCurves, elementsCountOut + 1, nComponents), and pe, pxi, psf
+    shape (nCurves, elementsCountOut + 1) with meaning as for sampleCubicHermiteCurves.
+    """
+    nx = np.asarray(nx, dtype=float)
+    nd1 = np.asarray(nd1, dtype=float)
+    curvesCount, nodesCountIn, componentsCount = nx.shape
+    elementsCountIn = nodesCountIn - 1
+    assert (elementsCountIn > 0) and (nd1.shape == nx.shape) and (elementsCountOut > 0), \
+        'sampleCubicHermiteCurvesArray.  Invalid arguments'
+    v1 = nx[:, :-1].reshape((-1, componentsCount))
+    d1 = nd1[:, :-1].reshape((-1, componentsCount))
+    v2 = nx[:, 1:].reshape((-1, componentsCount))
+    d2 = nd1[:, 1:].reshape((-1, componentsCount))
+    nd1a = nd1b = None
+    if arcLengthDerivatives:
+        arcLengths = computeCubicHermiteArcLengthArray(v1, d1, v2, d2, rescaleDerivatives = True)
+        nd1a = (d1*(arcLengths/np.linalg.norm(d1, axis=1))[:, np.newaxis]).reshape((curvesCount, elementsCountIn, componentsCount))
+        nd1b = (d2*(arcLengths/np.linalg.norm(d2, axis=1))[:, np.newaxis]).reshape((curvesCount, elementsCountIn, componentsCount))
+    else:
+        arcLengths = getCubicHermiteArcLengthArray(v1, d1, v2, d2)
+    lengths = np.zeros((curvesCount, nodesCountIn))
+    lengths[:, 1:] = np.cumsum(arcLengths.reshape((curvesCount, elementsCountIn)), axis=1)
+    length = lengths[:, -1]
+    proportionEnd = 2.0/(elementLengthStartEndRatio + 1)
+    proportionStart = elementLengthStartEndRatio*proportionEnd
+    if elementsCountOut == 1:
+        elementLengthMid = length
+    else:
+        elementLengthMid = (length - addLengthStart - addLengthEnd) / \
+            (elementsCountOut - 2.0 + proportionStart*lengthFractionStart + proportionEnd*lengthFractionEnd)
+    # get smoothly varying element lengths, not accounting for start and end
+    if (elementsCountOut == 1) or (elementLengthStartEndRatio == 1.0):
+        proportions = np.ones(elementsCountOut)
+    else:
+        xi = np.arange(elementsCountOut)/(elementsCountOut - 1)
+        proportions = (1.0 - xi)*proportionStart + xi*proportionEnd
+    elementLengths = proportions[np.newaxis, :]*elementLengthMid[:, np.newaxis]
+    # get middle derivative magnitudes
+    nodeDerivativeMagnitudes = np.zeros((curvesCount, elementsCountOut + 1))
+    nodeDerivativeMagnitudes[:, 1:-1] = 0.5*(elementLengths[:, :-1] + elementLengths[:, 1:])
+    # fix end lengths:
+    elementLengths[:, 0] = addLengthStart + proportionStart*lengthFractionStart*elementLengthMid
+    elementLengths[:, -1] = addLengthEnd + proportionEnd*lengthFractionEnd*elementLengthMid
+    # set end derivatives:
+    if elementsCountOut == 1:
+        nodeDerivativeMagnitudes[:, 0] = nodeDerivativeMagnitudes[:, 1] = elementLengths[:, 0]
+    else:
+        nodeDerivativeMagnitudes[:, 0] = elementLengths[:, 0]*2.0 - nodeDerivativeMagnitudes[:, 1]
+        nodeDerivativeMagnitudes[:, -1] = elementLengths[:, -1]*2.0 - nodeDerivativeMagnitudes[:, -2]
+    distances = np.zeros((curvesCount, elementsCountOut))
+    distances[:, 1:] = np.cumsum(elementLengths[:, :-1], axis=1)
+    return _sampleCubicHermiteCurvesArrayAtDistances(nx, nd1, lengths, distances, nodeDerivativeMagnitudes, nd1a, nd1b)
+
+def sampleCubicHermiteCurvesSmoothArray(nx, nd1, elementsCountOut,
+       derivativeMagnitudeStart=None, derivativeMagnitudeEnd=None):
+    """
+    Array version of sampleCubicHermiteCurvesSmooth sampling many independent curves with the
+    same numbers of elements in and out together. See sampleCubicHermiteCurvesArray.
+    :param nx: Coordinates of nodes along curves, shape (nCurves, elementsCountIn + 1, nComponents).
+    :param nd1: Derivatives of nodes along curves, same shape as nx.
+    :param derivativeMagnitudeStart, derivativeMagnitudeEnd: Optional magnitudes of start and end
+    derivatives appropriate for elementsCountOut, either scalar or array of shape (nCurves,).
+    If None these are calculated from the other end or set to be equal for even spaced elements.
+    :return: numpy arrays px, pd1 shape (nCurves, elementsCountOut + 1, nComponents), and pe, pxi, psf
+    shape (nCurves, elementsCountOut + 1) with meaning as for sampleCubicHermiteCurvesSmooth.
+    """
+    nx = np.asarray(nx, dtype=float)
+    nd1 = np.asarray(nd1, dtype=float)
+    curvesCount, nodesCountIn, componentsCount = nx.shape
+    elementsCountIn = nodesCountIn - 1
+    assert (elementsCountIn > 0) and (nd1.shape == nx.shape) and (elementsCountOut > 0), \
+        'sampleCubicHermiteCurvesSmoothArray.  Invalid arguments'
+    arcLengths = getCubicHermiteArcLengthArray(nx[:, :-1].reshape((-1, componentsCount)), nd1[:, :-1].reshape((-1, componentsCount)),
+        nx[:, 1:].reshape((-1, componentsCount)), nd1[:, 1:].reshape((-1, componentsCount)))
+    lengths = np.zeros((curvesCount, nodesCountIn))
+    lengths[:, 1:] = np.cumsum(arcLengths.reshape((curvesCount, elementsCountIn)), axis=1)
+    length = lengths[:, -1]
+    if (derivativeMagnitudeStart is not None) and (derivativeMagnitudeEnd is not None):
+        pass
+    elif derivativeMagnitudeEnd is not None:
+        derivativeMagnitudeStart = (2.0*length - elementsCountOut*np.asarray(derivativeMagnitudeEnd))/elementsCountOut
+    elif derivativeMagnitudeStart is not None:
+        derivativeMagnitudeEnd = (2.0*length - elementsCountOut*np.asarray(derivativeMagnitudeStart))/elementsCountOut
+    else:
+        derivativeMagnitudeStart = derivativeMagnitudeEnd = length/elementsCountOut
+    # sample over length to get distances to elements boundaries
+    xi = np.arange(elementsCountOut + 1)/elementsCountOut
+    p = np.stack(np.broadcast_arrays(0.0, np.asarray(derivativeMagnitudeStart)*elementsCountOut,
+        length, np.asarray(derivativeMagnitudeEnd)*elementsCountOut), axis=1)  # (nCurves, 4)
+    nodeDistances = p @ getCubicHermiteBasisArray(xi).T
+    nodeDerivativeMagnitudes = (p @ getCubicHermiteBasisDerivativesArray(xi).T)/elementsCountOut
+    return _sampleCubicHermiteCurvesArrayAtDistances(nx, nd1, lengths, nodeDistances[:, :-1], nodeDerivativeMagnitudes)
+
 def interpolateSampleCubicHermite(v, d, pe, pxi, psf):
     '''
     Partner function to sampleCubicHermiteCurves for interpolating additional variables with
@@ -743,6 +1058,75 @@ def smoothCubicHermiteDerivativesLine(nx, nd1,
     print('smoothCubicHermiteDerivativesLine max iters reached:', iter + 1, ', cmax = ', round(closeness,2), 'x tolerance')
     return md1
 
+def smoothCubicHermiteDerivativesLineArray(nx, nd1,
+        fixStartDerivative = False, fixEndDerivative = False,
+        magnitudeScalingMode = DerivativeScalingMode.ARITHMETIC_MEAN):
+    """
+    Array version of smoothCubicHermiteDerivativesLine smoothing many lines with the same
+    number of nodes together. Each line follows the same iteration and convergence test as the
+    scalar version; lines are removed from the iteration as they converge.
+    Direction fixing options are not supported.
+    :param nx: Coordinates of nodes along lines, shape (nLines, nNodes, nComponents).
+    :param nd1: Derivatives of nodes along lines, shape (nLines, nNodes, nComponents).
+    :param fixStartDerivative, fixEndDerivative: Set to True to fix derivative direction and magnitude at respective end.
+    :param magnitudeScalingMode: A value from enum DerivativeScalingMode specifying
+    expression used to get derivative magnitude from adjacent arc lengths.
+    :return: numpy array of modified nd1, shape (nLines, nNodes, nComponents).
+    """
+    nx = np.asarray(nx, dtype=float)
+    nd1 = np.asarray(nd1, dtype=float)
+    linesCount, nodesCount = nx.shape[0:2]
+    elementsCount = nodesCount - 1
+    assert elementsCount > 0, 'smoothCubicHermiteDerivativesLineArray.  Too few nodes/elements'
+    assert nd1.shape == nx.shape, 'smoothCubicHermiteDerivativesLineArray.  Mismatched number of derivatives'
+    arithmeticMeanMagnitude = magnitudeScalingMode is DerivativeScalingMode.ARITHMETIC_MEAN
+    assert arithmeticMeanMagnitude or (magnitudeScalingMode is DerivativeScalingMode.HARMONIC_MEAN), \
+        'smoothCubicHermiteDerivativesLineArray. Invalid magnitude scaling mode'
+    md1 = nd1.copy()
+    if (elementsCount == 1) and not (fixStartDerivative or fixEndDerivative):
+        # straight line
+        delta = nx[:, 1] - nx[:, 0]
+        md1[:, 0] = delta
+        md1[:, 1] = delta
+        return md1
+    tol = 1.0E-6
+    active = np.arange(linesCount)
+    for iter in range(100):
+        ax = nx[active]
+        lastmd1 = md1[active]
+        amd1 = lastmd1.copy()
+        arcLengths = getCubicHermiteArcLengthArray(
+            ax[:, :-1].reshape(-1, ax.shape[2]), lastmd1[:, :-1].reshape(-1, ax.shape[2]),
+            ax[:, 1:].reshape(-1, ax.shape[2]), lastmd1[:, 1:].reshape(-1, ax.shape[2])).reshape(len(active), elementsCount)
+        # start
+        if not fixStartDerivative:
+            amd1[:, 0] = 2.0*(ax[:, 1] - ax[:, 0]) - lastmd1[:, 1]
+        # middle
+        if nodesCount > 2:
+            arcLengthsm = arcLengths[:, :-1]
+            arcLengthsp = arcLengths[:, 1:]
+            dirm = ax[:, 1:-1] - ax[:, :-2]
+            dirp = ax[:, 2:] - ax[:, 1:-1]
+            # mean weighted by fraction towards that end, equivalent to harmonic mean
+            arcLengthmp = arcLengthsm + arcLengthsp
+            middle = (arcLengthsp/arcLengthmp)[:, :, np.newaxis]*dirm + (arcLengthsm/arcLengthmp)[:, :, np.newaxis]*dirp
+            if arithmeticMeanMagnitude:
+                mag = 0.5*(arcLengthsm + arcLengthsp)
+            else: # harmonicMeanMagnitude
+                mag = 2.0/(1.0/arcLengthsm + 1.0/arcLengthsp)
+            amd1[:, 1:-1] = middle*(mag/np.linalg.norm(middle, axis=2))[:, :, np.newaxis]
+        # end
+        if not fixEndDerivative:
+            amd1[:, -1] = 2.0*(ax[:, -1] - ax[:, -2]) - lastmd1[:, -2]
+        md1[active] = amd1
+        dtol = tol*np.mean(arcLengths, axis=1)
+        converged = np.all(np.fabs(amd1 - lastmd1) <= dtol[:, np.newaxis, np.newaxis], axis=(1, 2))
+        active = active[~converged]
+        if active.size == 0:
+            return md1
+    print('smoothCubicHermiteDerivativesLineArray max iters reached:', iter + 1, 'for', active.size, 'lines')
+    return md1
+
 def smoothCubicHermiteCrossDerivativesLine(nx, nd1, nd2, nd12,
         fixStartDerivative = False, fixEndDerivative = False, instrument=False):
     """
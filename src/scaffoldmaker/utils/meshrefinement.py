@@ -2,15 +2,89 @@
 Class for refining a mesh from one region to another.
 '''
 from __future__ import division
+from concurrent.futures import ProcessPoolExecutor
 import math
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreateFieldGroup, findOrCreateFieldNodeGroup, \
     findOrCreateFieldStoredMeshLocation, findOrCreateFieldStoredString
+from opencmiss.zinc.context import Context
 from opencmiss.zinc.element import Element, Elementbasis
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.node import Node
 from opencmiss.zinc.result import RESULT_OK as ZINC_OK
 from scaffoldmaker.annotation.annotationgroup import AnnotationGroup
-from scaffoldmaker.utils.octree import Octree
+from scaffoldmaker.utils.elementevaluator import ElementEvaluator, getBasisMatrix, getLatticeXi
+from scaffoldmaker.utils.profiling import addProfileCount, isProfiling, profileSpan
+from scaffoldmaker.utils.spatialgrid import SpatialGrid
+
+
+_cubeLatticeBasisMatrices = {}
+
+
+def getCubeLatticeBasisMatrix(functionTypes, numberInXi1, numberInXi2, numberInXi3):
+    '''
+    Get matrix of tensor product basis function values at the regular xi lattice over a cube.
+    Matrices are cached by arguments.
+    :param functionTypes: Tuple of 3 Elementbasis function types in xi1, xi2, xi3; each either
+    linear, quadratic or cubic Lagrange, or cubic Hermite.
+    :return: numpy array (pointsCount, functionsCount) with points in order of lattice with xi1
+    varying fastest, and functions in Zinc order: for each basis node with xi1 varying fastest,
+    for each function of the node with xi1 varying fastest.
+    '''
+    key = (tuple(functionTypes), numberInXi1, numberInXi2, numberInXi3)
+    basisMatrix = _cubeLatticeBasisMatrices.get(key)
+    if basisMatrix is None:
+        basisMatrix = getBasisMatrix(functionTypes, getLatticeXi((numberInXi1, numberInXi2, numberInXi3)))
+        _cubeLatticeBasisMatrices[key] = basisMatrix
+    return basisMatrix
+
+
+def _refineCubeStandard3dChunk(sourceBuffer, annotationGroupTerms, elementIdentifiers, boundaryElements,
+        numberInXi1, numberInXi2, numberInXi3, nodeIdentifier, elementIdentifier):
+    '''
+    Refine a chunk of source elements in a new Zinc Context for partitioned
+    MeshRefinement.refineAllElementsCubeStandard3d(). Module-level so it can run in worker processes.
+    :param sourceBuffer: Source region serialised in Zinc EX format.
+    :param annotationGroupTerms: List of terms of source annotation groups.
+    :param elementIdentifiers: Identifiers of source elements to refine, in order.
+    :param boundaryElements: List of bool for each source element, True if it may share nodes with
+    elements in other chunks.
+    :param nodeIdentifier, elementIdentifier: First target node and element identifiers for chunk.
+    :return: Target region serialised in Zinc EX format, identifiers and coordinates of nodes on
+    the exteriors of boundary elements, list of (first identifier, count) of their target elements.
+    '''
+    context = Context('refineChunk')
+    sourceRegion = context.getDefaultRegion()
+    sir = sourceRegion.createStreaminformationRegion()
+    sir.createStreamresourceMemoryBuffer(sourceBuffer)
+    result = sourceRegion.read(sir)
+    assert result == ZINC_OK, '_refineCubeStandard3dChunk failed to read source region'
+    targetRegion = context.createRegion()
+    sourceAnnotationGroups = [ AnnotationGroup(sourceRegion, term) for term in annotationGroupTerms ]
+    meshrefinement = MeshRefinement(sourceRegion, targetRegion, sourceAnnotationGroups, workersCount=1)
+    meshrefinement._nodeIdentifier = nodeIdentifier
+    meshrefinement._elementIdentifier = elementIdentifier
+    sourceMesh = meshrefinement._sourceMesh
+    exteriors = [ (i in (0, numberInXi1)) or (j in (0, numberInXi2)) or (k in (0, numberInXi3))
+        for k in range(numberInXi3 + 1) for j in range(numberInXi2 + 1) for i in range(numberInXi1 + 1) ]
+    elementsCount = numberInXi1*numberInXi2*numberInXi3
+    # map node identifier -> coordinates, for exterior nodes of boundary elements in order first used
+    boundaryNodes = {}
+    boundaryElementRanges = []
+    for identifier, boundary in zip(elementIdentifiers, boundaryElements):
+        sourceElement = sourceMesh.findElementByIdentifier(identifier)
+        startElementIdentifier = meshrefinement._elementIdentifier
+        nids, nx = meshrefinement.refineElementCubeStandard3d(sourceElement, numberInXi1, numberInXi2, numberInXi3)
+        if boundary:
+            for p in range(len(nids)):
+                if exteriors[p] and (nids[p] not in boundaryNodes):
+                    boundaryNodes[nids[p]] = nx[p]
+            boundaryElementRanges.append((startElementIdentifier, elementsCount))
+    del meshrefinement  # ends changes
+    sir = targetRegion.createStreaminformationRegion()
+    srm = sir.createStreamresourceMemory()
+    targetRegion.write(sir)
+    result, targetBuffer = srm.getBuffer()
+    return targetBuffer, list(boundaryNodes.keys()), list(boundaryNodes.values()), boundaryElementRanges
 
 
 class MeshRefinement:
@@ -18,17 +92,24 @@ class MeshRefinement:
     Class for refining a mesh from one region to another.
     '''
 
-    def __init__(self, sourceRegion, targetRegion, sourceAnnotationGroups = []):
+    # default number of worker processes refineAllElementsCubeStandard3d() partitions the source mesh
+    # between; 1 for serial refinement. Set > 1 to refine all scaffolds using it in parallel.
+    defaultWorkersCount = 1
+
+    def __init__(self, sourceRegion, targetRegion, sourceAnnotationGroups = [], workersCount=None):
         '''
         Assumes targetRegion is empty.
         :param sourceAnnotationGroups: List of AnnotationGroup for source mesh in sourceRegion.
         A copy containing the refined elements is created by the MeshRefinement.
+        :param workersCount: Number of worker processes for refineAllElementsCubeStandard3d() to
+        refine partitions of the source mesh in, or None to use MeshRefinement.defaultWorkersCount.
         '''
+        self._workersCount = workersCount if workersCount else MeshRefinement.defaultWorkersCount
         self._sourceRegion = sourceRegion
         self._sourceFm = sourceRegion.getFieldmodule()
         self._sourceCache = self._sourceFm.createFieldcache()
         self._sourceCoordinates = findOrCreateFieldCoordinates(self._sourceFm)
-        # get range of source coordinates for octree range
+        # get range of source coordinates for spatial grid tolerance
         self._sourceFm.beginChange()
         sourceNodes = self._sourceFm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
         minimumsField = self._sourceFm.createFieldNodesetMinimum(self._sourceCoordinates, sourceNodes)
@@ -48,7 +129,11 @@ class MeshRefinement:
         self._sourceMesh = self._sourceFm.findMeshByDimension(3)
         self._sourceNodes = self._sourceFm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
         self._sourceElementiterator = self._sourceMesh.createElementiterator()
-        self._octree = Octree(minimums, maximums)
+        # tolerance is as for Octree over range: 1.0E-6*diagonal
+        self._spatialGrid = SpatialGrid(1.0E-6*math.sqrt(sum(((maximums[i] - minimums[i])*(maximums[i] - minimums[i])) for i in range(3))))
+
+        # for evaluating source coordinates with basis matrices instead of per-point field evaluation
+        self._sourceEvaluator = ElementEvaluator(self._sourceCoordinates, self._sourceMesh)
 
         self._targetRegion = targetRegion
         self._targetFm = targetRegion.getFieldmodule()
@@ -122,17 +207,55 @@ class MeshRefinement:
         return self._annotationGroups
 
 
+    def _createNode(self, x):
+        '''
+        Create target node with the next node identifier and coordinates x.
+        :return: Node identifier.
+        '''
+        node = self._targetNodes.createNode(self._nodeIdentifier, self._nodetemplate)
+        self._targetCache.setNode(node)
+        result = self._targetCoordinates.setNodeParameters(self._targetCache, -1, Node.VALUE_LABEL_VALUE, 1, x)
+        nodeId = self._nodeIdentifier
+        self._nodeIdentifier += 1
+        return nodeId
+
+
+    def _getSourceElementParameters(self, sourceElement):
+        '''
+        Get the element parameters of source coordinates multiplying each basis function on sourceElement.
+        :return: functionTypes, parameters (numpy array functionsCount x 3), or None, None if
+        the element field template is not supported.
+        '''
+        return self._sourceEvaluator.getElementParameters(sourceElement)
+
+
+    def _evaluateSourceCoordinatesLattice(self, sourceElement, numberInXi1, numberInXi2, numberInXi3):
+        '''
+        Evaluate source coordinates at the regular xi lattice over sourceElement in one pass by
+        applying a precomputed basis matrix to the element parameters.
+        :return: List of coordinates in lattice order with xi1 varying fastest, or None if
+        element field template is not supported so caller must evaluate with Zinc.
+        '''
+        functionTypes, parameters = self._getSourceElementParameters(sourceElement)
+        if functionTypes is None:
+            return None
+        basisMatrix = getCubeLatticeBasisMatrix(functionTypes, numberInXi1, numberInXi2, numberInXi3)
+        if basisMatrix.shape[1] != parameters.shape[0]:
+            return None
+        return (basisMatrix @ parameters).tolist()
+
+
     def refineElementCubeStandard3d(self, sourceElement, numberInXi1, numberInXi2, numberInXi3,
             addNewNodesToOctree=True, shareNodeIds=None, shareNodeCoordinates=None):
         '''
         Refine cube sourceElement to numberInXi1*numberInXi2*numberInXi3 linear cube
         sub-elements, evenly spaced in xi.
         :param addNewNodesToOctree: If True (default) add newly created nodes to
-        octree to be found when refining later elements. Set to False when nodes are at the
+        spatial grid to be found when refining later elements. Set to False when nodes are at the
         same location and not intended to be shared.
         :param shareNodeIds, shareNodeCoordinates: Arrays of identifiers and coordinates of
         nodes which may be shared in refining this element. If supplied, these are preferentially
-        used ahead of points in the octree. Used to control merging with known nodes, e.g.
+        used ahead of points in the spatial grid. Used to control merging with known nodes, e.g.
         those returned by this function for elements which used addNewNodesToOctree=False.
         :return: Node identifiers, node coordinates used in refinement of sourceElement.
         '''
@@ -143,11 +266,13 @@ class MeshRefinement:
         for sourceAndTargetMeshGroup in self._sourceAndTargetMeshGroups:
             if sourceAndTargetMeshGroup[0].containsElement(sourceElement):
                 meshGroups.append(sourceAndTargetMeshGroup[1])
-        # create nodes
-        nids = []
-        nx = []
+        # evaluate coordinates at all sub-nodes, with Zinc if element field template is not supported
+        nx = self._evaluateSourceCoordinatesLattice(sourceElement, numberInXi1, numberInXi2, numberInXi3)
+        evaluateWithZinc = nx is None
+        if evaluateWithZinc:
+            nx = []
+        exteriors = []
         xi = [ 0.0, 0.0, 0.0 ]
-        tol = self._octree._tolerance
         for k in range(numberInXi3 + 1):
             kExterior = (k == 0) or (k == numberInXi3)
             xi[2] = k/numberInXi3
@@ -156,31 +281,28 @@ class MeshRefinement:
                 xi[1] = j/numberInXi2
                 for i in range(numberInXi1 + 1):
                     iExterior = jExterior or (i == 0) or (i == numberInXi1)
-                    xi[0] = i/numberInXi1
-                    self._sourceCache.setMeshLocation(sourceElement, xi)
-                    result, x = self._sourceCoordinates.evaluateReal(self._sourceCache, 3)
-                    # only exterior points are ever common:
-                    nodeId = None
-                    if iExterior:
-                        if shareNodeIds:
-                            for n in range(shareNodesCount):
-                                if (math.fabs(shareNodeCoordinates[n][0] - x[0]) <= tol) and \
-                                   (math.fabs(shareNodeCoordinates[n][1] - x[1]) <= tol) and \
-                                   (math.fabs(shareNodeCoordinates[n][2] - x[2]) <= tol):
-                                    nodeId = shareNodeIds[n]
-                                    break
-                        if nodeId is None:
-                            nodeId = self._octree.findObjectByCoordinates(x)
-                    if nodeId is None:
-                        node = self._targetNodes.createNode(self._nodeIdentifier, self._nodetemplate)
-                        self._targetCache.setNode(node)
-                        result = self._targetCoordinates.setNodeParameters(self._targetCache, -1, Node.VALUE_LABEL_VALUE, 1, x)
-                        nodeId = self._nodeIdentifier
-                        if iExterior and addNewNodesToOctree:
-                            self._octree.addObjectAtCoordinates(x, nodeId)
-                        self._nodeIdentifier += 1
-                    nids.append(nodeId)
-                    nx.append(x)
+                    exteriors.append(iExterior)
+                    if evaluateWithZinc:
+                        xi[0] = i/numberInXi1
+                        self._sourceCache.setMeshLocation(sourceElement, xi)
+                        result, x = self._sourceCoordinates.evaluateReal(self._sourceCache, 3)
+                        nx.append(x)
+        # only exterior points are ever common; prefer supplied shared nodes
+        knownNodeIds = None
+        if shareNodeIds:
+            tol = self._spatialGrid.getTolerance()
+            knownNodeIds = [ None ]*len(nx)
+            for p in range(len(nx)):
+                if exteriors[p]:
+                    x = nx[p]
+                    for n in range(shareNodesCount):
+                        if (math.fabs(shareNodeCoordinates[n][0] - x[0]) <= tol) and \
+                           (math.fabs(shareNodeCoordinates[n][1] - x[1]) <= tol) and \
+                           (math.fabs(shareNodeCoordinates[n][2] - x[2]) <= tol):
+                            knownNodeIds[p] = shareNodeIds[n]
+                            break
+        # create nodes
+        nids = self._spatialGrid.findOrAddMany(nx, lambda p: self._createNode(nx[p]), knownNodeIds, exteriors, addNewNodesToOctree)
         # create elements
         startElementIdentifier = self._elementIdentifier
         for k in range(numberInXi3):
@@ -236,7 +358,185 @@ class MeshRefinement:
 
 
     def refineAllElementsCubeStandard3d(self, numberInXi1, numberInXi2, numberInXi3):
+        '''
+        Refine all source elements with refineElementCubeStandard3d.
+        With more than one worker and no elements refined yet, source elements are partitioned
+        into chunks which are refined in parallel worker processes and stitched together in
+        _mergeRefinedChunk(). Node and element identifiers are the same as for serial refinement,
+        but only nodes on chunk boundaries are added to the spatial grid.
+        '''
+        with profileSpan('MeshRefinement.refineAllElementsCubeStandard3d'):
+            if isProfiling():
+                startNodeIdentifier = self._nodeIdentifier
+                startElementIdentifier = self._elementIdentifier
+            if (self._workersCount > 1) and (self._sourceMesh.getSize() > 1) and (self._spatialGrid.getObjectsCount() == 0):
+                self._refineAllElementsCubeStandard3dPartitioned(numberInXi1, numberInXi2, numberInXi3)
+            else:
+                element = self._sourceElementiterator.next()
+                while element.isValid():
+                    self.refineElementCubeStandard3d(element, numberInXi1, numberInXi2, numberInXi3)
+                    element = self._sourceElementiterator.next()
+            if isProfiling():
+                addProfileCount('nodes', self._nodeIdentifier - startNodeIdentifier)
+                addProfileCount('elements', self._elementIdentifier - startElementIdentifier)
+
+
+    def _getChunkBoundaryElements(self, chunks):
+        '''
+        Find source elements which may share refined nodes with elements in other chunks, as
+        those with a node coincident with a node of an element in another chunk.
+        :param chunks: List of chunks, each a list of source element identifiers.
+        :return: List over chunks of list of bool, True for boundary elements.
+        '''
+        nodeGrid = SpatialGrid(self._spatialGrid.getTolerance())
+        # map source node identifier -> index of location, for coincident nodes to share
+        nodeLocations = {}
+        # for each location, set of chunk indexes with elements using it
+        locationChunks = []
+        # for each chunk, for each element, list of locations or None if unknown
+        chunksElementLocations = []
+        for c, chunk in enumerate(chunks):
+            elementsLocations = []
+            for identifier in chunk:
+                element = self._sourceMesh.findElementByIdentifier(identifier)
+                eft = element.getElementfieldtemplate(self._sourceCoordinates, -1)
+                locations = [] if eft.isValid() else None
+                if locations is not None:
+                    for n in range(1, eft.getNumberOfLocalNodes() + 1):
+                        node = element.getNode(eft, n)
+                        nodeIdentifier = node.getIdentifier()
+                        location = nodeLocations.get(nodeIdentifier)
+                        if location is None:
+                            self._sourceCache.setNode(node)
+                            result, x = self._sourceCoordinates.getNodeParameters(self._sourceCache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+                            if result != ZINC_OK:
+                                locations = None
+                                break
+                            location = nodeGrid.findObjectByCoordinates(x)
+                            if location is None:
+                                location = len(locationChunks)
+                                nodeGrid.addObjectAtCoordinates(x, location)
+                                locationChunks.append(set())
+                            nodeLocations[nodeIdentifier] = location
+                        locationChunks[location].add(c)
+                        locations.append(location)
+                elementsLocations.append(locations)
+            chunksElementLocations.append(elementsLocations)
+        # elements with unknown locations are assumed to be on the boundary
+        return [ [ (locations is None) or any((len(locationChunks[location]) > 1) for location in locations)
+            for locations in elementsLocations ] for elementsLocations in chunksElementLocations ]
+
+
+    def _refineAllElementsCubeStandard3dPartitioned(self, numberInXi1, numberInXi2, numberInXi3):
+        '''
+        Refine all source elements in chunks of consecutive elements in parallel worker processes,
+        each reading the serialised source region into its own Zinc Context. Chunks are given
+        blocks of node and element identifiers so results can be read directly into the target
+        region, after which nodes on chunk boundaries are merged and node identifiers compacted.
+        Consecutive source elements are assumed to be spatially coherent, as for scaffolds generated
+        in sweeps, so chunks share few boundary nodes.
+        '''
+        sourceElementIdentifiers = []
         element = self._sourceElementiterator.next()
         while element.isValid():
-            self.refineElementCubeStandard3d(element, numberInXi1, numberInXi2, numberInXi3)
+            sourceElementIdentifiers.append(element.getIdentifier())
             element = self._sourceElementiterator.next()
+        sourceElementsCount = len(sourceElementIdentifiers)
+        chunksCount = min(self._workersCount, sourceElementsCount)
+        chunks = [ sourceElementIdentifiers[(c*sourceElementsCount)//chunksCount:((c + 1)*sourceElementsCount)//chunksCount]
+            for c in range(chunksCount) ]
+        chunksBoundaryElements = self._getChunkBoundaryElements(chunks)
+        sir = self._sourceRegion.createStreaminformationRegion()
+        srm = sir.createStreamresourceMemory()
+        self._sourceRegion.write(sir)
+        result, sourceBuffer = srm.getBuffer()
+        annotationGroupTerms = [ sourceAnnotationGroup.getTerm() for sourceAnnotationGroup in self._sourceAnnotationGroups ]
+        pointsCount = (numberInXi1 + 1)*(numberInXi2 + 1)*(numberInXi3 + 1)
+        elementsCount = numberInXi1*numberInXi2*numberInXi3
+        startNodeIdentifier = self._nodeIdentifier
+        nodeIdentifier = self._nodeIdentifier
+        elementIdentifier = self._elementIdentifier
+        chunksArgs = []
+        for chunk, boundaryElements in zip(chunks, chunksBoundaryElements):
+            chunksArgs.append((sourceBuffer, annotationGroupTerms, chunk, boundaryElements,
+                numberInXi1, numberInXi2, numberInXi3, nodeIdentifier, elementIdentifier))
+            # node block is big enough for all lattice points and markers in chunk
+            markersCount = sum(len(self.elementMarkerMap.get(identifier, [])) for identifier in chunk)
+            nodeIdentifier += len(chunk)*pointsCount + markersCount
+            elementIdentifier += len(chunk)*elementsCount
+        # list of (coordinates, node identifier) of merged boundary nodes
+        boundaryNodes = []
+        with ProcessPoolExecutor(max_workers=chunksCount) as executor:
+            futures = [ executor.submit(_refineCubeStandard3dChunk, *chunkArgs) for chunkArgs in chunksArgs ]
+            # merge in chunk order for deterministic results
+            for future in futures:
+                self._mergeRefinedChunk(*future.result(), boundaryNodes)
+        self._elementIdentifier = elementIdentifier
+        newNodeIdentifiers = self._renumberNodes(startNodeIdentifier)
+        # rebuild spatial grid with new node identifiers
+        self._spatialGrid = SpatialGrid(self._spatialGrid.getTolerance())
+        for x, nodeIdentifier in boundaryNodes:
+            self._spatialGrid.addObjectAtCoordinates(x, newNodeIdentifiers.get(nodeIdentifier, nodeIdentifier))
+
+
+    def _mergeRefinedChunk(self, targetBuffer, boundaryNodeIdentifiers, boundaryNodeCoordinates, boundaryElementRanges,
+            boundaryNodes):
+        '''
+        Read a chunk refined by _refineCubeStandard3dChunk() into the target region, and merge its
+        boundary nodes with coincident nodes of previously merged chunks.
+        :param boundaryNodes: List to append (coordinates, node identifier) of boundary nodes kept to.
+        '''
+        sir = self._targetRegion.createStreaminformationRegion()
+        sir.createStreamresourceMemoryBuffer(targetBuffer)
+        result = self._targetRegion.read(sir)
+        assert result == ZINC_OK, 'MeshRefinement failed to read refined chunk'
+        # map duplicate node identifier -> identifier of node from previous chunk
+        duplicateNodeIdentifiers = {}
+        for nodeIdentifier, x in zip(boundaryNodeIdentifiers, boundaryNodeCoordinates):
+            existingNodeIdentifier = self._spatialGrid.findObjectByCoordinates(x)
+            if existingNodeIdentifier is None:
+                self._spatialGrid.addObjectAtCoordinates(x, nodeIdentifier)
+                boundaryNodes.append((x, nodeIdentifier))
+            else:
+                duplicateNodeIdentifiers[nodeIdentifier] = existingNodeIdentifier
+        if not duplicateNodeIdentifiers:
+            return
+        for startElementIdentifier, elementsCount in boundaryElementRanges:
+            for elementIdentifier in range(startElementIdentifier, startElementIdentifier + elementsCount):
+                element = self._targetMesh.findElementByIdentifier(elementIdentifier)
+                eft = element.getElementfieldtemplate(self._targetCoordinates, -1)
+                nids = [ element.getNode(eft, n).getIdentifier() for n in range(1, 9) ]
+                if any((nid in duplicateNodeIdentifiers) for nid in nids):
+                    element.setNodesByIdentifier(eft, [ duplicateNodeIdentifiers.get(nid, nid) for nid in nids ])
+        destroyGroup = self._targetFm.createFieldGroup()
+        destroyNodesetGroup = destroyGroup.createFieldNodeGroup(self._targetNodes).getNodesetGroup()
+        for nodeIdentifier in duplicateNodeIdentifiers:
+            destroyNodesetGroup.addNode(self._targetNodes.findNodeByIdentifier(nodeIdentifier))
+        self._targetNodes.destroyNodesConditional(destroyGroup)
+        del destroyNodesetGroup
+        del destroyGroup
+
+
+    def _renumberNodes(self, startNodeIdentifier):
+        '''
+        Give target nodes from startNodeIdentifier consecutive identifiers in identifier order,
+        closing gaps left by partitioned refinement, and set the next node identifier.
+        :return: dict mapping old -> new identifier for renumbered nodes.
+        '''
+        nodes = []
+        nodeiterator = self._targetNodes.createNodeiterator()
+        node = nodeiterator.next()
+        while node.isValid():
+            if node.getIdentifier() >= startNodeIdentifier:
+                nodes.append(node)
+            node = nodeiterator.next()
+        newNodeIdentifiers = {}
+        nodeIdentifier = startNodeIdentifier
+        for node in nodes:
+            oldNodeIdentifier = node.getIdentifier()
+            if oldNodeIdentifier != nodeIdentifier:
+                node.setIdentifier(nodeIdentifier)
+                newNodeIdentifiers[oldNodeIdentifier] = nodeIdentifier
+            nodeIdentifier += 1
+        self._nodeIdentifier = nodeIdentifier
+        return newNodeIdentifiers
@@ -0,0 +1,221 @@
+'''
+Optional instrumentation reporting time spent in phases of scaffold generation.
+Disabled unless a ProfileReport is active, in which case profileSpan() returns a
+shared do-nothing context manager and addProfileCount() returns immediately.
+'''
+
+import cProfile
+import io
+import pstats
+import time
+
+# the active ProfileReport, or None if not profiling
+_activeReport = None
+
+
+class _NullSpan:
+    '''
+    Context manager doing nothing, returned by profileSpan() when not profiling.
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_nullSpan = _NullSpan()
+
+
+class ProfileSpan:
+    '''
+    Timed phase of generation with nested child spans and named counters.
+    '''
+
+    def __init__(self, report, name):
+        self._report = report
+        self._name = name
+        self._time = 0.0
+        self._startTime = None
+        self._counters = {}
+        self._children = []
+
+    def __enter__(self):
+        self._report._spanStack[-1]._children.append(self)
+        self._report._spanStack.append(self)
+        self._startTime = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._time = time.perf_counter() - self._startTime
+        self._report._spanStack.pop()
+        return False
+
+    def getName(self):
+        return self._name
+
+    def getTime(self):
+        '''
+        :return: Wall time in seconds spent in span.
+        '''
+        return self._time
+
+    def getCounters(self):
+        '''
+        :return: dict counter name -> count added while span was innermost.
+        '''
+        return self._counters
+
+    def getChildren(self):
+        return self._children
+
+    def toDict(self):
+        '''
+        :return: Nested dict with keys 'name', 'time', 'counters' and 'children'.
+        '''
+        return {
+            'name' : self._name,
+            'time' : self._time,
+            'counters' : dict(self._counters),
+            'children' : [ child.toDict() for child in self._children ]
+            }
+
+
+class ProfileReport:
+    '''
+    Context manager collecting nested timed spans and counters from instrumented code
+    while active, with optional cProfile capture. Usage:
+        with ProfileReport() as report:
+            scaffoldPackage.generate(region)
+        print(report.format())
+    Only one report may be active at a time.
+    '''
+
+    def __init__(self, name='scaffoldmaker', useCProfile=False, callback=None):
+        '''
+        :param name: Name of root span.
+        :param useCProfile: Set to True to also capture function statistics with cProfile.
+        :param callback: Optional function called with this report when profiling stops.
+        '''
+        self._root = ProfileSpan(self, name)
+        self._spanStack = [ self._root ]
+        self._useCProfile = useCProfile
+        self._callback = callback
+        self._profile = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
+
+    def start(self):
+        global _activeReport
+        assert _activeReport is None, 'ProfileReport.start:  Another report is already active'
+        _activeReport = self
+        if self._useCProfile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._root._startTime = time.perf_counter()
+
+    def stop(self):
+        global _activeReport
+        self._root._time = time.perf_counter() - self._root._startTime
+        if self._profile:
+            self._profile.disable()
+        _activeReport = None
+        if self._callback:
+            self._callback(self)
+
+    def getRoot(self):
+        '''
+        :return: Root ProfileSpan.
+        '''
+        return self._root
+
+    def getTotals(self):
+        '''
+        :return: dict span name -> (total time, call count) summed over all spans of that name.
+        '''
+        totals = {}
+        spans = list(self._root._children)
+        while spans:
+            span = spans.pop()
+            totalTime, count = totals.get(span._name, (0.0, 0))
+            totals[span._name] = (totalTime + span._time, count + 1)
+            spans += span._children
+        return totals
+
+    def getCounters(self):
+        '''
+        :return: dict counter name -> count summed over all spans.
+        '''
+        counters = {}
+        spans = [ self._root ]
+        while spans:
+            span = spans.pop()
+            for name, count in span._counters.items():
+                counters[name] = counters.get(name, 0) + count
+            spans += span._children
+        return counters
+
+    def getProfileStats(self, sortBy='cumulative', limit=30):
+        '''
+        :return: Text of cProfile statistics, or None if not captured.
+        '''
+        if not self._profile:
+            return None
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats(sortBy).print_stats(limit)
+        return stream.getvalue()
+
+    def toDict(self):
+        return self._root.toDict()
+
+    def format(self):
+        '''
+        :return: Text listing spans indented by nesting, with times and counters.
+        '''
+        lines = []
+        spans = [ (self._root, 0) ]
+        while spans:
+            span, depth = spans.pop()
+            line = '  '*depth + span._name + ': ' + '{:.4f}'.format(span._time) + ' s'
+            if span._counters:
+                line += ' (' + ', '.join((name + ' ' + str(count)) for name, count in span._counters.items()) + ')'
+            lines.append(line)
+            spans += [ (child, depth + 1) for child in reversed(span._children) ]
+        return '\n'.join(lines)
+
+
+def isProfiling():
+    '''
+    :return: True if a ProfileReport is active. Use to skip computing costly counters.
+    '''
+    return _activeReport is not None
+
+
+def profileSpan(name):
+    '''
+    Get context manager timing a named span nested in the current span, if profiling.
+    :param name: Name of span, e.g. 'refineMesh'.
+    :return: ProfileSpan, or do-nothing context manager if not profiling.
+    '''
+    if _activeReport is None:
+        return _nullSpan
+    return ProfileSpan(_activeReport, name)
+
+
+def addProfileCount(name, count=1):
+    '''
+    Add count to named counter of the current span, if profiling.
+    :param name: Name of counter e.g. 'nodes'.
+    :param count: Number to add.
+    '''
+    if _activeReport is None:
+        return
+    counters = _activeReport._spanStack[-1]._counters
+    counters[name] = counters.get(name, 0) + count
@@ -337,23 +337,31 @@ class ShieldMesh:
                         self.pd2[n3][2*self.elementsCountUp-n2][n1] = mirror.mirrorVector(self.pd2[n3][n2][n1])
                         self.pd3[n3][2*self.elementsCountUp-n2][n1] = mirror.mirrorVector(self.pd3[n3][n2][n1])
 
-    def generateNodes(self, fieldmodule, coordinates, startNodeIdentifier,mirrorPlane=None):
+    def generateNodes(self, fieldmodule, coordinates, startNodeIdentifier,mirrorPlane=None, fieldTransforms=None):
         """
         Create shield nodes from coordinates.
         :param fieldmodule: Zinc fieldmodule to create nodes in. Uses DOMAIN_TYPE_NODES.
-        :param coordinates: Coordinate field to define.
+        :param coordinates: Coordinate field to define, or list of coordinate fields to define
+        on the same nodes in one pass.
         :param startNodeIdentifier: First node identifier to use.
         :param mirrorPlane: mirror plane ax+by+cz=d in form of [a,b,c,d]
+        :param fieldTransforms: Optional list of transforms for each field in coordinates, each
+        None to use shield parameters unchanged, or a function taking x, d1, d2, d3 and returning
+        transformed x, d1, d2, d3.
         :return: next nodeIdentifier.
          """
         nodeIdentifier = startNodeIdentifier
+        coordinatesFields = coordinates if isinstance(coordinates, list) else [coordinates]
+        if not fieldTransforms:
+            fieldTransforms = [None]*len(coordinatesFields)
         nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
         nodetemplate = nodes.createNodetemplate()
-        nodetemplate.defineField(coordinates)
-        nodetemplate.setValueNumberOfVersions(coordinates, -1, Node.VALUE_LABEL_VALUE, 1)
-        nodetemplate.setValueNumberOfVersions(coordinates, -1, Node.VALUE_LABEL_D_DS1, 1)
-        nodetemplate.setValueNumberOfVersions(coordinates, -1, Node.VALUE_LABEL_D_DS2, 1)
-        nodetemplate.setValueNumberOfVersions(coordinates, -1, Node.VALUE_LABEL_D_DS3, 1)
+        for field in coordinatesFields:
+            nodetemplate.defineField(field)
+            nodetemplate.setValueNumberOfVersions(field, -1, Node.VALUE_LABEL_VALUE, 1)
+            nodetemplate.setValueNumberOfVersions(field, -1, Node.VALUE_LABEL_D_DS1, 1)
+            nodetemplate.setValueNumberOfVersions(field, -1, Node.VALUE_LABEL_D_DS2, 1)
+            nodetemplate.setValueNumberOfVersions(field, -1, Node.VALUE_LABEL_D_DS3, 1)
         cache = fieldmodule.createFieldcache()
 
         #for n2 in range(self.elementsCountUp, -1, -1):
@@ -372,10 +380,13 @@ class ShieldMesh:
                         node = nodes.createNode(nodeIdentifier, nodetemplate)
                         self.nodeId[n3][n2][n1] = nodeIdentifier
                         cache.setNode(node)
-                        coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_VALUE, 1, self.px [n3][n2][n1])
-                        coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS1, 1, self.pd1[n3][n2][n1])
-                        coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS2, 1, self.pd2[n3][n2][n1])
-                        coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS3, 1, self.pd3[n3][n2][n1])
+                        parameters = (self.px[n3][n2][n1], self.pd1[n3][n2][n1], self.pd2[n3][n2][n1], self.pd3[n3][n2][n1])
+                        for field, fieldTransform in zip(coordinatesFields, fieldTransforms):
+                            x, d1, d2, d3 = fieldTransform(*parameters) if fieldTransform else parameters
+                            field.setNodeParameters(cache, -1, Node.VALUE_LABEL_VALUE, 1, x)
+                            field.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS1, 1, d1)
+                            field.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS2, 1, d2)
+                            field.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS3, 1, d3)
                         nodeIdentifier += 1
 
         return nodeIdentifier
@@ -385,12 +396,14 @@ class ShieldMesh:
         """
         Create shield elements from nodes.
         :param fieldmodule: Zinc fieldmodule to create elements in.
-        :param coordinates: Coordinate field to define.
+        :param coordinates: Coordinate field to define, or list of coordinate fields to define
+        with the same element field templates.
         :param startElementIdentifier: First element identifier to use.
         :param meshGroups: Zinc mesh groups to add elements to.
         :return: next elementIdentifier.
          """
         elementIdentifier = startElementIdentifier
+        coordinatesFields = coordinates if isinstance(coordinates, list) else [coordinates]
         useCrossDerivatives = False
         mesh = fieldmodule.findMeshByDimension(3)
 
@@ -398,7 +411,8 @@ class ShieldMesh:
         eft = tricubichermite.createEftNoCrossDerivatives()
         elementtemplate = mesh.createElementtemplate()
         elementtemplate.setElementShapeType(Element.SHAPE_TYPE_CUBE)
-        elementtemplate.defineField(coordinates, -1, eft)
+        for field in coordinatesFields:
+            elementtemplate.defineField(field, -1, eft)
 
         elementtemplate1 = mesh.createElementtemplate()
         elementtemplate1.setElementShapeType(Element.SHAPE_TYPE_CUBE)
@@ -586,7 +600,8 @@ class ShieldMesh:
                                 remapEftNodeValueLabel(eft1, [1, 2, 3, 4], Node.VALUE_LABEL_D_DS3, [(Node.VALUE_LABEL_D_DS3, [1])])
 
                     if eft1 is not eft:
-                        elementtemplate1.defineField(coordinates, -1, eft1)
+                        for field in coordinatesFields:
+                            elementtemplate1.defineField(field, -1, eft1)
                         element = mesh.createElement(elementIdentifier, elementtemplate1)
                     else:
                         element = mesh.createElement(elementIdentifier, elementtemplate)
@@ -0,0 +1,131 @@
+'''
+Hashed uniform grid for searching for objects by coordinates.
+'''
+from __future__ import division
+from array import array
+import math
+
+
+class SpatialGrid:
+    '''
+    Hashed uniform grid for searching for objects by coordinates.
+    Alternative to Octree with the same find/add semantics: coordinates are held in
+    flat arrays and objects are bucketed in cells of twice the tolerance, so each
+    search examines at most 8 cells and needs no recursion or range limits.
+    '''
+
+    def __init__(self, tolerance, dimension=3):
+        '''
+        :param tolerance: Distance under which coordinates are considered coincident. Must be positive.
+        :param dimension: Number of coordinate components.
+        '''
+        assert tolerance > 0.0, 'SpatialGrid tolerance must be positive'
+        self._dimension = dimension
+        self._tolerance = tolerance
+        self._cellSize = 2.0*tolerance
+        self._inverseCellSize = 1.0/self._cellSize
+        # flat coordinates for all stored objects, dimension values per object
+        self._coordinates = array('d')
+        self._objects = []
+        # map cell key -> index of first object in cell; further objects are chained through _next
+        self._cellHeads = {}
+        self._next = array('l')
+
+    def _getCellKey(self, cellIndexes):
+        key = 0
+        for cellIndex in cellIndexes:
+            key = key*1000003 + cellIndex
+        return key
+
+    def _getCellIndexRanges(self, x):
+        '''
+        :return: list over dimension of (lowest, highest) cell index within tolerance of x.
+        '''
+        return [ (int(math.floor((x[c] - self._tolerance)*self._inverseCellSize)),
+                  int(math.floor((x[c] + self._tolerance)*self._inverseCellSize))) for c in range(self._dimension) ]
+
+    def _getCellKeysInRanges(self, cellIndexRanges):
+        keys = [ 0 ]
+        for lowest, highest in cellIndexRanges:
+            if lowest == highest:
+                keys = [ (key*1000003 + lowest) for key in keys ]
+            else:
+                keys = [ (key*1000003 + cellIndex) for key in keys for cellIndex in range(lowest, highest + 1) ]
+        return keys
+
+    def getTolerance(self):
+        return self._tolerance
+
+    def getObjectsCount(self):
+        return len(self._objects)
+
+    def findObjectByCoordinates(self, x):
+        '''
+        Find closest existing object with |x - ox| < tolerance.
+        :param x: Coordinates in a list.
+        :return: nearest object or None if not found.
+        '''
+        tolerance = self._tolerance
+        dimension = self._dimension
+        coordinates = self._coordinates
+        nearestDistanceSquared = tolerance*tolerance
+        nearestIndex = -1
+        for key in self._getCellKeysInRanges(self._getCellIndexRanges(x)):
+            index = self._cellHeads.get(key, -1)
+            while index >= 0:
+                offset = index*dimension
+                distanceSquared = 0.0
+                for c in range(dimension):
+                    dx = x[c] - coordinates[offset + c]
+                    if math.fabs(dx) > tolerance:
+                        break
+                    distanceSquared += dx*dx
+                else:
+                    if distanceSquared < nearestDistanceSquared:
+                        nearestDistanceSquared = distanceSquared
+                        nearestIndex = index
+                index = self._next[index]
+        if nearestIndex < 0:
+            return None
+        return self._objects[nearestIndex]
+
+    def addObjectAtCoordinates(self, x, obj):
+        '''
+        Add object at coordinates to grid.
+        Caller should have received None result for findObjectByCoordinates() first.
+        :param x: Coordinates in a list.
+        :param obj: Object to store with coordinates.
+        '''
+        index = len(self._objects)
+        self._objects.append(obj)
+        self._coordinates.extend(x[c] for c in range(self._dimension))
+        key = self._getCellKey(int(math.floor(x[c]*self._inverseCellSize)) for c in range(self._dimension))
+        self._next.append(self._cellHeads.get(key, -1))
+        self._cellHeads[key] = index
+
+    def findOrAddMany(self, points, createObject, knownObjects=None, searchMask=None, addNew=True):
+        '''
+        Find or create objects for many points in one call, e.g. a whole element's sample grid.
+        Points are processed in order, so later points find objects created for earlier ones.
+        :param points: List of coordinates.
+        :param createObject: Callable taking point index and returning a new object, called in
+        point order for points where no object is known or found.
+        :param knownObjects: Optional list of objects already determined for points, with None
+        where unknown. Known points are not searched for or added.
+        :param searchMask: Optional list of bool; where False the point is not searched for and
+        its new object is not added to the grid.
+        :param addNew: Set to False to not add new objects to the grid.
+        :return: List of objects for points.
+        '''
+        objects = list(knownObjects) if knownObjects else [ None ]*len(points)
+        for n, x in enumerate(points):
+            if objects[n] is not None:
+                continue
+            search = (searchMask is None) or searchMask[n]
+            obj = self.findObjectByCoordinates(x) if search else None
+            if obj is None:
+                obj = createObject(n)
+                if search and addNew:
+                    self.addObjectAtCoordinates(x, obj)
+            objects[n] = obj
+        return objects
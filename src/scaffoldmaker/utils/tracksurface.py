@@ -6,10 +6,20 @@ from __future__ import division
 import copy
 from enum import Enum
 import math
+import numpy
 from scaffoldmaker.utils import interpolation as interp
 from scaffoldmaker.utils import vector
 
 
+# monomial coefficients of cubic Hermite basis functions x1, d1, x2, d2 in powers of xi 0-3
+_cubicHermiteMonomials = numpy.array([
+    [ 1.0, 0.0, -3.0,  2.0 ],
+    [ 0.0, 1.0, -2.0,  1.0 ],
+    [ 0.0, 0.0,  3.0, -2.0 ],
+    [ 0.0, 0.0, -1.0,  1.0 ]])
+_samplesCountPerElementDirection = 4
+
+
 class TrackSurface:
     '''
     A surface description on which positions can be stored and tracked for
@@ -54,6 +64,10 @@ class TrackSurface:
             self.nd1 += nd1
             self.nd2 += nd2
         self.loop1 = loop1
+        # built on first use: polynomial coefficients per element and points sampled over surface
+        self._coefficients = None
+        self._samplePositions = None
+        self._sampleCoordinates = None
 
     def createMirrorX(self):
         '''
@@ -163,6 +177,98 @@ class TrackSurface:
             derivative2.append(d2)
         return coordinates, derivative1, derivative2
 
+    def _getCoefficients(self):
+        '''
+        Get cached monomial coefficients of the bicubic polynomial over each element, so that
+        x(xi1, xi2) = sum(i, j) coefficients[e2, e1, i, j]*xi1^i*xi2^j.
+        :return: numpy array of shape (elementsCount2, elementsCount1, 4, 4, 3).
+        '''
+        if self._coefficients is None:
+            shape = (self.elementsCount2 + 1, self.elementsCount1 + 1, 3)
+            nx = numpy.array(self.nx, dtype=float).reshape(shape)
+            nd1 = numpy.array(self.nd1, dtype=float).reshape(shape)
+            nd2 = numpy.array(self.nd2, dtype=float).reshape(shape)
+            # element parameters for basis functions x1, d1, x2, d2 in xi1 by same in xi2; cross derivatives are zero
+            parameters = numpy.zeros((self.elementsCount2, self.elementsCount1, 4, 4, 3))
+            for b2, r2 in ((0, slice(0, -1)), (2, slice(1, None))):
+                for b1, r1 in ((0, slice(0, -1)), (2, slice(1, None))):
+                    parameters[:, :, b1, b2] = nx[r2, r1]
+                    parameters[:, :, b1 + 1, b2] = nd1[r2, r1]
+                    parameters[:, :, b1, b2 + 1] = nd2[r2, r1]
+            self._coefficients = numpy.einsum('ai,bj,...abc->...ijc', _cubicHermiteMonomials, _cubicHermiteMonomials, parameters)
+        return self._coefficients
+
+    def _evaluateCoordinatesDerivatives(self, position):
+        '''
+        Evaluate coordinates and derivatives w.r.t. xi1 and xi2 at a single position from cached
+        polynomial coefficients, for use in iterative loops. xi may be slightly outside 0.0 to 1.0.
+        :param position: A TrackSurfacePosition.
+        :return: coordinates, derivative1, derivative2 as lists.
+        '''
+        xi1 = position.xi1
+        xi2 = position.xi2
+        powers1 = numpy.array([ [ 1.0, xi1, xi1*xi1, xi1*xi1*xi1 ], [ 0.0, 1.0, 2.0*xi1, 3.0*xi1*xi1 ] ])
+        powers2 = numpy.array([ [ 1.0, xi2, xi2*xi2, xi2*xi2*xi2 ], [ 0.0, 1.0, 2.0*xi2, 3.0*xi2*xi2 ] ])
+        # values[i, j] is derivative order i in xi1 and j in xi2
+        values = numpy.dot(powers1, numpy.dot(powers2, self._getCoefficients()[position.e2, position.e1]))
+        return values[0, 0].tolist(), values[1, 0].tolist(), values[0, 1].tolist()
+
+    def evaluateCoordinatesMany(self, positions, derivatives = False):
+        '''
+        Evaluate coordinates on surface at many positions in one call, and optionally
+        derivatives w.r.t. xi1 and xi2. Uses cached polynomial coefficients per element.
+        :param positions: List of valid TrackSurfacePosition.
+        :return: If derivatives is False: numpy array of coordinates, shape (positionsCount, 3).
+        If derivatives is True: coordinates, derivatives1, derivatives2 arrays of the same shape.
+        '''
+        e1 = numpy.array([ position.e1 for position in positions ], dtype=int)
+        e2 = numpy.array([ position.e2 for position in positions ], dtype=int)
+        xi1 = numpy.array([ position.xi1 for position in positions ], dtype=float)
+        xi2 = numpy.array([ position.xi2 for position in positions ], dtype=float)
+        return self._evaluateCoordinatesArrays(e1, e2, xi1, xi2, derivatives)
+
+    def _evaluateCoordinatesArrays(self, e1, e2, xi1, xi2, derivatives = False):
+        '''
+        Array implementation of evaluateCoordinatesMany.
+        :param e1, e2: Integer arrays of element indexes.
+        :param xi1, xi2: Float arrays of element xi.
+        '''
+        coefficients = self._getCoefficients()[e2, e1]
+        powers1 = numpy.stack((numpy.ones_like(xi1), xi1, xi1*xi1, xi1*xi1*xi1), axis=-1)
+        powers2 = numpy.stack((numpy.ones_like(xi2), xi2, xi2*xi2, xi2*xi2*xi2), axis=-1)
+        coordinates = numpy.einsum('ni,nijc,nj->nc', powers1, coefficients, powers2)
+        if not derivatives:
+            return coordinates
+        dpowers1 = numpy.stack((numpy.zeros_like(xi1), numpy.ones_like(xi1), 2.0*xi1, 3.0*xi1*xi1), axis=-1)
+        dpowers2 = numpy.stack((numpy.zeros_like(xi2), numpy.ones_like(xi2), 2.0*xi2, 3.0*xi2*xi2), axis=-1)
+        derivatives1 = numpy.einsum('ni,nijc,nj->nc', dpowers1, coefficients, powers2)
+        derivatives2 = numpy.einsum('ni,nijc,nj->nc', powers1, coefficients, dpowers2)
+        return coordinates, derivatives1, derivatives2
+
+    def _getSamples(self):
+        '''
+        Get cached coarse index of points sampled at the centres of a 4x4 grid over each element.
+        :return: samplePositions (e1, e2, xi1, xi2 arrays), sampleCoordinates array (samplesCount, 3).
+        '''
+        if self._sampleCoordinates is None:
+            sampleXi = (numpy.arange(_samplesCountPerElementDirection) + 0.5)/_samplesCountPerElementDirection
+            e2, e1, xi2, xi1 = numpy.meshgrid(numpy.arange(self.elementsCount2), numpy.arange(self.elementsCount1),
+                sampleXi, sampleXi, indexing='ij')
+            self._samplePositions = (e1.ravel(), e2.ravel(), xi1.ravel(), xi2.ravel())
+            self._sampleCoordinates = self._evaluateCoordinatesArrays(*self._samplePositions)
+        return self._samplePositions, self._sampleCoordinates
+
+    def findNearestSamplePosition(self, targetx):
+        '''
+        Find position of the point sampled over the surface nearest to targetx. Suitable as a
+        start position for findNearestPosition on surfaces which are not simply shaped.
+        :return: TrackSurfacePosition
+        '''
+        (e1, e2, xi1, xi2), sampleCoordinates = self._getSamples()
+        delta = sampleCoordinates - numpy.asarray(targetx, dtype=float)
+        i = int(numpy.argmin(numpy.einsum('nc,nc->n', delta, delta)))
+        return TrackSurfacePosition(int(e1[i]), int(e2[i]), float(xi1[i]), float(xi2[i]))
+
     class HermiteCurveMode(Enum):
         SMOOTH = 1    # smooth variation of element size between end derivatives
         TRANSITION_END = 2  # transition from start derivative then even size
@@ -291,21 +397,27 @@ class TrackSurface:
             nd2[-1] = vector.setMagnitude(nd2[-1], vector.magnitude(nd1[-1]))
         return nx, nd1, nd2, nd3, nProportions
 
-    def findNearestPosition(self, targetx, startPosition = None):
+    def findNearestPosition(self, targetx, startPosition = None, startFromSamples = False):
         '''
         Find the nearest point to targetx on the track surface, with optional start position.
         Only works if track surface is simply shaped; use a close startPosition if not.
+        :param startFromSamples: If True and no startPosition, start from nearest point sampled
+        over the surface, which needs fewer iterations and finds the global nearest point on more
+        complex surfaces. Otherwise starts from the middle of the surface.
         :return: Nearest TrackSurfacePosition
         '''
         if not startPosition:
-            startPosition = self.createPositionProportion(0.5, 0.5)
+            if startFromSamples:
+                startPosition = self.findNearestSamplePosition(targetx)
+            else:
+                startPosition = self.createPositionProportion(0.5, 0.5)
         position = copy.deepcopy(startPosition)
         max_mag_dxi = 0.5  # target/maximum magnitude of xi increment
         xi_tol = 1.0E-6
         for iter in range(100):
             xi1 = position.xi1
             xi2 = position.xi2
-            ax, ad1, ad2 = self.evaluateCoordinates(position, derivatives = True)
+            ax, ad1, ad2 = self._evaluateCoordinatesDerivatives(position)
             deltax = [ (targetx[c] - ax[c]) for c in range(3) ]
             #print('iter', iter + 1, 'position', position, 'deltax', deltax, 'err', vector.magnitude(deltax))
             adelta_xi1, adelta_xi2 = calculate_surface_delta_xi(ad1, ad2, deltax)
@@ -348,13 +460,16 @@ class TrackSurface:
         #print('final position', position)
         return position
 
-    def trackVector(self, startPosition, direction, trackDistance):
+    def trackVector(self, startPosition, direction, trackDistance, adaptiveStep = False):
         '''
         Track from startPosition the given distance in the vector direction.
         Approximate, uses improved Euler method (mean of original & final gradient).
         :param startPosition: TrackSurfacePosition
         :param direction: 3-D vector (x, y, z) to track along. Projected onto surface.
         :param trackDistance: Distance to track along. Can be negative.
+        :param adaptiveStep: If True, grow the xi increment while the change in track direction
+        over a step is small, and shrink it where large, needing far fewer evaluations on smooth
+        surfaces. Otherwise uses a fixed xi increment of 0.02.
         :return: Final TrackSurfacePosition
         '''
         #print('TrackSurface.trackVector  start position', startPosition, 'direction', direction, 'distance', trackDistance)
@@ -366,13 +481,20 @@ class TrackSurface:
         position = copy.deepcopy(startPosition)
         distance = 0.0
         distanceLimit = 0.9999*useTrackDistance
-        max_mag_dxi = 0.02  # target/maximum magnitude of xi increment
+        max_mag_dxi = base_mag_dxi = 0.02  # target/maximum magnitude of xi increment
+        if adaptiveStep:
+            min_mag_dxi = 0.001
+            limit_mag_dxi = 0.25
+            # tolerance on estimated xi error per step
+            dxi_tol = 2.0E-4
+        ax = None
 
         while distance < useTrackDistance:
             xi1 = position.xi1
             xi2 = position.xi2
-            ax, ad1, ad2 = self.evaluateCoordinates(position, derivatives = True)
-            adelta_xi1, adelta_xi2 = calculate_surface_delta_xi(ad1, ad2, useDirection)
+            if ax is None:
+                ax, ad1, ad2 = self._evaluateCoordinatesDerivatives(position)
+                adelta_xi1, adelta_xi2 = calculate_surface_delta_xi(ad1, ad2, useDirection)
             #print('adelta_xi', adelta_xi1, adelta_xi2)
             scale = max_mag_dxi/math.sqrt(adelta_xi1*adelta_xi1 + adelta_xi2*adelta_xi2)
             adxi1 = dxi1 = scale*adelta_xi1
@@ -382,7 +504,7 @@ class TrackSurface:
                 # can go slightly outside element to get predictor/correct position
                 position.xi1 = xi1 + dxi1
                 position.xi2 = xi2 + dxi2
-                bx, bd1, bd2 = self.evaluateCoordinates(position, derivatives = True)
+                bx, bd1, bd2 = self._evaluateCoordinatesDerivatives(position)
                 bdelta_xi1, bdelta_xi2 = calculate_surface_delta_xi(bd1, bd2, useDirection)
                 # use mean of start and end derivatives
                 delta_xi1 = 0.5*(adelta_xi1 + bdelta_xi1)
@@ -390,11 +512,21 @@ class TrackSurface:
                 scale = max_mag_dxi/math.sqrt(delta_xi1*delta_xi1 + delta_xi2*delta_xi2)
                 dxi1 = scale*delta_xi1
                 dxi2 = scale*delta_xi2
+            if adaptiveStep:
+                # error estimate from change in unit xi direction from start to predicted end of step
+                amag = math.sqrt(adelta_xi1*adelta_xi1 + adelta_xi2*adelta_xi2)
+                bmag = math.sqrt(bdelta_xi1*bdelta_xi1 + bdelta_xi2*bdelta_xi2)
+                error_dxi = 0.5*max_mag_dxi*math.sqrt((adelta_xi1/amag - bdelta_xi1/bmag)**2 + (adelta_xi2/amag - bdelta_xi2/bmag)**2)
+                if (error_dxi > dxi_tol) and (max_mag_dxi > min_mag_dxi):
+                    max_mag_dxi = max(0.5*max_mag_dxi, min_mag_dxi)
+                    position.xi1 = xi1
+                    position.xi2 = xi2
+                    continue
             bxi1, bxi2, proportion, faceNumber = increment_xi_on_square(xi1, xi2, dxi1, dxi2)
             position.xi1 = bxi1
             position.xi2 = bxi2
             #print(distance, '-->', position)
-            bx, bd1, bd2 = self.evaluateCoordinates(position, derivatives = True)
+            bx, bd1, bd2 = self._evaluateCoordinatesDerivatives(position)
             bdelta_xi1, bdelta_xi2 = calculate_surface_delta_xi(bd1, bd2, useDirection)
             scale = max_mag_dxi/math.sqrt(bdelta_xi1*bdelta_xi1 + bdelta_xi2*bdelta_xi2)
             bdxi1 = scale*bdelta_xi1
@@ -409,6 +541,12 @@ class TrackSurface:
             if (distance + arcLength) >= distanceLimit:
                 # limit to useTrackDistance, approximately, and finish
                 r = proportion*(useTrackDistance - distance)/arcLength
+                if adaptiveStep and (max_mag_dxi > base_mag_dxi) and (r < 0.9):
+                    # retry with step estimated to end at distance, no smaller than fixed size
+                    max_mag_dxi = max(r*max_mag_dxi, base_mag_dxi)
+                    position.xi1 = xi1
+                    position.xi2 = xi2
+                    continue
                 position.xi1 = xi1 + r*dxi1
                 position.xi2 = xi2 + r*dxi2
                 #print(distance, '-->', position, '(final)')
@@ -423,6 +561,14 @@ class TrackSurface:
                     print('TrackSurface.trackVector:  End on boundary at', position)
                     break
                 #print('  cross face', faceNumber, 'new position', position)
+            # reuse end of step as start of next step; not valid after crossing face
+            if faceNumber:
+                ax = None
+            else:
+                ax, ad1, ad2 = bx, bd1, bd2
+                adelta_xi1, adelta_xi2 = bdelta_xi1, bdelta_xi2
+            if adaptiveStep and (error_dxi < 0.25*dxi_tol):
+                max_mag_dxi = min(2.0*max_mag_dxi, limit_mag_dxi)
         return position
 
     def updatePositionTofaceNumber(self, position, faceNumber):
@@ -4,6 +4,7 @@ using a segment profile.
 '''
 from __future__ import division
 import math
+import numpy
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreateFieldTextureCoordinates
 from opencmiss.zinc.element import Element
 from opencmiss.zinc.field import Field
@@ -99,143 +100,108 @@ def warpSegmentPoints(xList, d1List, d2List, segmentAxis,
     :return coordinates and derivatives of warped points.
     """
 
-    xWarpedList = []
-    d1WarpedList = []
-    d2WarpedList = []
-    d2WarpedListFinal = []
-    d3WarpedUnitList = []
-
-    for nAlongSegment in range(elementsCountAlongSegment + 1):
-        xElementAlongSegment = xList[elementsCountAround*nAlongSegment: elementsCountAround*(nAlongSegment+1)]
-        d1ElementAlongSegment = d1List[elementsCountAround*nAlongSegment: elementsCountAround*(nAlongSegment+1)]
-        d2ElementAlongSegment = d2List[elementsCountAround*nAlongSegment: elementsCountAround*(nAlongSegment+1)]
-
+    pointsCountAlong = elementsCountAlongSegment + 1
+    x = numpy.array(xList[:elementsCountAround*pointsCountAlong], dtype=float).reshape(pointsCountAlong, elementsCountAround, 3)
+    d1 = numpy.array(d1List[:elementsCountAround*pointsCountAlong], dtype=float).reshape(pointsCountAlong, elementsCountAround, 3)
+    d2 = numpy.array(d2List[:elementsCountAround*pointsCountAlong], dtype=float).reshape(pointsCountAlong, elementsCountAround, 3)
+    xWarped = numpy.empty_like(x)
+    d1Warped = numpy.empty_like(d1)
+    d2Warped = numpy.empty_like(d2)
+    identity = numpy.identity(3)
+
+    # Rotate each ring with a single frame: align segment axis with tangent of central line, then
+    # rotate about tangent so first point is in direction of sd2
+    for nAlongSegment in range(pointsCountAlong):
         centroid = [0.0, 0.0, refPointZ[nAlongSegment]]
-
-        # Rotate to align segment axis with tangent of central line
         unitTangent = vector.normalise(sd1[nAlongSegment])
         cp = vector.crossproduct3(segmentAxis, unitTangent)
         dp = vector.dotproduct(segmentAxis, unitTangent)
-        if vector.magnitude(cp)> 0.0: # path tangent not parallel to segment axis
+        if vector.magnitude(cp) > 0.0: # path tangent not parallel to segment axis
             axisRot = vector.normalise(cp)
-            thetaRot = math.acos(vector.dotproduct(segmentAxis, unitTangent))
-            rotFrame = matrix.getRotationMatrixFromAxisAngle(axisRot, thetaRot)
-            centroidRot = [rotFrame[j][0]*centroid[0] + rotFrame[j][1]*centroid[1] + rotFrame[j][2]*centroid[2] for j in range(3)]
-
-        else: # path tangent parallel to segment axis (z-axis)
-            if dp == -1.0: # path tangent opposite direction to segment axis
-                thetaRot = math.pi
-                axisRot = [1.0, 0, 0]
-                rotFrame = matrix.getRotationMatrixFromAxisAngle(axisRot, thetaRot)
-                centroidRot = [rotFrame[j][0] * centroid[0] + rotFrame[j][1] * centroid[1] + rotFrame[j][2] * centroid[2] for j in range(3)]
-
-            else: # segment axis in same direction as unit tangent
-                rotFrame = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
-                centroidRot = centroid
-
-        translateMatrix = [sx[nAlongSegment][j] - centroidRot[j] for j in range(3)]
-
-        for n1 in range(elementsCountAround):
-            x = xElementAlongSegment[n1]
-            d1 = d1ElementAlongSegment[n1]
-            d2 = d2ElementAlongSegment[n1]
-
-            if vector.magnitude(cp)> 0.0: # path tangent not parallel to segment axis
-                xRot1 = [rotFrame[j][0]*x[0] + rotFrame[j][1]*x[1] + rotFrame[j][2]*x[2] for j in range(3)]
-                d1Rot1 = [rotFrame[j][0]*d1[0] + rotFrame[j][1]*d1[1] + rotFrame[j][2]*d1[2] for j in range(3)]
-                d2Rot1 = [rotFrame[j][0]*d2[0] + rotFrame[j][1]*d2[1] + rotFrame[j][2]*d2[2] for j in range(3)]
-                # xTranslate = [xRot1[j] + translateMatrix[j] for j in range(3)]
-
-            else: # path tangent parallel to segment axis
-                xRot1 = [rotFrame[j][0]*x[0] + rotFrame[j][1]*x[1] + rotFrame[j][2]*x[2] for j in range(3)] if dp == -1.0 else x
-                d1Rot1 = [rotFrame[j][0]*d1[0] + rotFrame[j][1]*d1[1] + rotFrame[j][2]*d1[2] for j in range(3)] if dp == -1.0 else d1
-                d2Rot1 = [rotFrame[j][0]*d2[0] + rotFrame[j][1]*d2[1] + rotFrame[j][2]*d2[2] for j in range(3)] if dp == -1.0 else d2
-                # xTranslate = [xRot1[j] + translateMatrix[j] for j in range(3)]
-
-            if n1 == 0:  # Find angle between xCentroidRot and first node in the face
-                vectorToFirstNode = [xRot1[c] - centroidRot[c] for c in range(3)]
-                if vector.magnitude(vectorToFirstNode) > 0.0:
-                    cp = vector.crossproduct3(vector.normalise(vectorToFirstNode), sd2[nAlongSegment])
-                    if vector.magnitude(cp) > 0:
-                        cp = vector.normalise(cp)
-                        signThetaRot2 = vector.dotproduct(unitTangent, cp)
-                        thetaRot2 = math.acos(
-                            vector.dotproduct(vector.normalise(vectorToFirstNode), sd2[nAlongSegment]))
-                        axisRot2 = unitTangent
-                        rotFrame2 = matrix.getRotationMatrixFromAxisAngle(axisRot2, signThetaRot2*thetaRot2)
-                    else:
-                        rotFrame2 = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
-                else:
-                    rotFrame2 = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
-
-            xRot2 = [rotFrame2[j][0]*xRot1[0] + rotFrame2[j][1]*xRot1[1] + rotFrame2[j][2]*xRot1[2] for j in range(3)]
-            d1Rot2 = [rotFrame2[j][0]*d1Rot1[0] + rotFrame2[j][1]*d1Rot1[1] + rotFrame2[j][2]*d1Rot1[2] for j in range(3)]
-            d2Rot2 = [rotFrame2[j][0]*d2Rot1[0] + rotFrame2[j][1]*d2Rot1[1] + rotFrame2[j][2]*d2Rot1[2] for j in range(3)]
-            xTranslate = [xRot2[j] + translateMatrix[j] for j in range(3)]
-
-            xWarpedList.append(xTranslate)
-            d1WarpedList.append(d1Rot2)
-            d2WarpedList.append(d2Rot2)
+            thetaRot = math.acos(dp)
+            rotFrame = numpy.array(matrix.getRotationMatrixFromAxisAngle(axisRot, thetaRot))
+        elif dp == -1.0: # path tangent opposite direction to segment axis
+            rotFrame = numpy.array(matrix.getRotationMatrixFromAxisAngle([1.0, 0.0, 0.0], math.pi))
+        else: # segment axis in same direction as unit tangent
+            rotFrame = identity
+        centroidRot = rotFrame @ centroid
+
+        # Find angle between xCentroidRot and first node in the face
+        rotFrame2 = identity
+        vectorToFirstNode = (rotFrame @ x[nAlongSegment, 0] - centroidRot).tolist()
+        if vector.magnitude(vectorToFirstNode) > 0.0:
+            cp = vector.crossproduct3(vector.normalise(vectorToFirstNode), sd2[nAlongSegment])
+            if vector.magnitude(cp) > 0:
+                cp = vector.normalise(cp)
+                signThetaRot2 = vector.dotproduct(unitTangent, cp)
+                thetaRot2 = math.acos(vector.dotproduct(vector.normalise(vectorToFirstNode), sd2[nAlongSegment]))
+                rotFrame2 = numpy.array(matrix.getRotationMatrixFromAxisAngle(unitTangent, signThetaRot2*thetaRot2))
+
+        ringFrameTransposed = (rotFrame2 @ rotFrame).T
+        translate = numpy.array(sx[nAlongSegment]) - centroidRot
+        xWarped[nAlongSegment] = x[nAlongSegment] @ ringFrameTransposed + translate
+        d1Warped[nAlongSegment] = d1[nAlongSegment] @ ringFrameTransposed
+        d2Warped[nAlongSegment] = d2[nAlongSegment] @ ringFrameTransposed
 
     # Scale d2 with curvature of central path
-    d2WarpedListScaled = []
-    vProjectedList = []
-    for nAlongSegment in range(elementsCountAlongSegment + 1):
-        for n1 in range(elementsCountAround):
-            n = nAlongSegment * elementsCountAround + n1
-            # Calculate norm
-            sd1Normalised = vector.normalise(sd1[nAlongSegment])
-            v = [xWarpedList[n][c] - sx[nAlongSegment][c] for c in range(3)]
-            dp = vector.dotproduct(v, sd1Normalised)
-            dpScaled = [dp * c for c in sd1Normalised]
-            vProjected = [v[c] - dpScaled[c] for c in range(3)]
-            vProjectedList.append(vProjected)
-            if vector.magnitude(vProjected) > 0.0:
-                vProjectedNormlised = vector.normalise(vProjected)
-            else:
-                vProjectedNormlised = [0.0, 0.0, 0.0]
-
-            # Calculate curvature along at each node
-            if nAlongSegment == 0:
-                curvature = interp.getCubicHermiteCurvature(sx[0], sd1[0], sx[1], sd1[1], vProjectedNormlised, 0.0)
-            elif nAlongSegment == elementsCountAlongSegment:
-                curvature = interp.getCubicHermiteCurvature(sx[-2], sd1[-2], sx[-1], sd1[-1], vProjectedNormlised, 1.0)
-            else:
-                curvature = 0.5 * (interp.getCubicHermiteCurvature(sx[nAlongSegment - 1], sd1[nAlongSegment - 1],
-                                                                   sx[nAlongSegment], sd1[nAlongSegment],
-                                                                   vProjectedNormlised, 1.0) +
-                                   interp.getCubicHermiteCurvature(sx[nAlongSegment], sd1[nAlongSegment],
-                                                                   sx[nAlongSegment + 1], sd1[nAlongSegment + 1],
-                                                                   vProjectedNormlised, 0.0))
-            # Scale
-            factor = 1.0 - curvature * innerRadiusAlong[nAlongSegment]
-            d2 = [factor * c for c in d2WarpedList[n]]
-            d2WarpedListScaled.append(d2)
-
-    # Smooth d2 for segment
-    smoothd2Raw = []
-    for n1 in range(elementsCountAround):
-        nx = []
-        nd2 = []
-        for n2 in range(elementsCountAlongSegment + 1):
-            n = n2*elementsCountAround + n1
-            nx.append(xWarpedList[n])
-            nd2.append(d2WarpedListScaled[n])
-        smoothd2 = interp.smoothCubicHermiteDerivativesLine(nx, nd2, fixStartDerivative = True, fixEndDerivative = True)
-        smoothd2Raw.append(smoothd2)
-
-    # Re-arrange smoothd2
-    for n2 in range(elementsCountAlongSegment + 1):
-        for n1 in range(elementsCountAround):
-            d2WarpedListFinal.append(smoothd2Raw[n1][n2])
+    sxArray = numpy.array(sx[:pointsCountAlong], dtype=float)
+    sd1Array = numpy.array(sd1[:pointsCountAlong], dtype=float)
+    sd1Normalised = sd1Array/numpy.linalg.norm(sd1Array, axis=1)[:, numpy.newaxis]
+    v = xWarped - sxArray[:, numpy.newaxis, :]
+    dp = numpy.sum(v*sd1Normalised[:, numpy.newaxis, :], axis=2)
+    vProjected = v - dp[:, :, numpy.newaxis]*sd1Normalised[:, numpy.newaxis, :]
+    vProjectedMagnitude = numpy.linalg.norm(vProjected, axis=2)
+    vProjectedNormalised = numpy.zeros_like(vProjected)
+    nonZero = vProjectedMagnitude > 0.0
+    vProjectedNormalised[nonZero] = vProjected[nonZero]/vProjectedMagnitude[nonZero][:, numpy.newaxis]
+    for nAlongSegment in range(pointsCountAlong):
+        # curvature of central path in each radial direction = dot(dTangent, radial)/|tangent|^2,
+        # where tangent and dTangent are the same for all points in ring
+        if nAlongSegment == 0:
+            curvatureVectors = [ _getCubicHermiteCurvatureVector(sx[0], sd1[0], sx[1], sd1[1], 0.0) ]
+        elif nAlongSegment == elementsCountAlongSegment:
+            curvatureVectors = [ _getCubicHermiteCurvatureVector(sx[-2], sd1[-2], sx[-1], sd1[-1], 1.0) ]
+        else:
+            curvatureVectors = [
+                _getCubicHermiteCurvatureVector(sx[nAlongSegment - 1], sd1[nAlongSegment - 1],
+                                                sx[nAlongSegment], sd1[nAlongSegment], 1.0),
+                _getCubicHermiteCurvatureVector(sx[nAlongSegment], sd1[nAlongSegment],
+                                                sx[nAlongSegment + 1], sd1[nAlongSegment + 1], 0.0) ]
+        curvature = sum((vProjectedNormalised[nAlongSegment] @ curvatureVector) for curvatureVector in curvatureVectors)
+        if len(curvatureVectors) > 1:
+            curvature *= 0.5
+        # Scale
+        factor = 1.0 - curvature*innerRadiusAlong[nAlongSegment]
+        d2Warped[nAlongSegment] *= factor[:, numpy.newaxis]
+
+    # Smooth d2 for segment along all columns together
+    smoothd2 = interp.smoothCubicHermiteDerivativesLineArray(
+        xWarped.transpose((1, 0, 2)), d2Warped.transpose((1, 0, 2)), fixStartDerivative=True, fixEndDerivative=True)
+    d2WarpedFinal = smoothd2.transpose((1, 0, 2))
 
     # Calculate unit d3
-    for n in range(len(xWarpedList)):
-        d3Unit = vector.normalise(vector.crossproduct3(vector.normalise(d1WarpedList[n]),
-                                                       vector.normalise(d2WarpedListFinal[n])))
-        d3WarpedUnitList.append(d3Unit)
+    d1Normalised = d1Warped/numpy.linalg.norm(d1Warped, axis=2)[:, :, numpy.newaxis]
+    d2Normalised = d2WarpedFinal/numpy.linalg.norm(d2WarpedFinal, axis=2)[:, :, numpy.newaxis]
+    d3 = numpy.cross(d1Normalised, d2Normalised)
+    d3WarpedUnit = d3/numpy.linalg.norm(d3, axis=2)[:, :, numpy.newaxis]
 
-    return xWarpedList, d1WarpedList, d2WarpedListFinal, d3WarpedUnitList
+    pointsCount = pointsCountAlong*elementsCountAround
+    return xWarped.reshape(pointsCount, 3).tolist(), d1Warped.reshape(pointsCount, 3).tolist(), \
+        d2WarpedFinal.reshape(pointsCount, 3).tolist(), d3WarpedUnit.reshape(pointsCount, 3).tolist()
+
+def _getCubicHermiteCurvatureVector(v1, d1, v2, d2, xi):
+    """
+    Get vector which dotted with a unit radial vector gives the curvature of a cubic Hermite
+    curve in that direction, as computed by interp.getCubicHermiteCurvature.
+    :param v1, v2: Values at xi = 0.0 and xi = 1.0, respectively.
+    :param d1, d2: Derivatives w.r.t. xi at xi = 0.0 and xi = 1.0, respectively.
+    :param xi: Position in curve, nominally in [0.0, 1.0].
+    :return: numpy array dTangent/|tangent|^2.
+    """
+    tangent = interp.interpolateCubicHermiteDerivative(v1, d1, v2, d2, xi)
+    dTangent = interp.interpolateCubicHermiteSecondDerivative(v1, d1, v2, d2, xi)
+    magTangent = vector.magnitude(tangent)
+    return numpy.array(dTangent)/(magTangent*magTangent)
 
 def getCoordinatesFromInner(xInner, d1Inner, d2Inner, d3Inner,
     wallThicknessList, elementsCountAround,
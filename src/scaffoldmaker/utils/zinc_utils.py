@@ -2,6 +2,7 @@
 Utility functions for easing use of Zinc API.
 '''
 
+import numpy
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates
 from opencmiss.utils.zinc.general import ChangeManager
 from opencmiss.zinc.context import Context
@@ -260,6 +261,14 @@ def identifier_ranges_to_string(identifier_ranges):
     return identifier_ranges_string
 
 
+def identifier_ranges_count(identifier_ranges):
+    '''
+    :param identifier_ranges: Ordered list of identifier ranges e.g. [[1,30],[55,55],[66,70]]
+    :return: Number of identifiers in ranges, e.g. 36 for example.
+    '''
+    return sum((identifier_range[1] - identifier_range[0] + 1) for identifier_range in identifier_ranges)
+
+
 def domain_iterator_to_identifier_ranges(iterator):
     '''
     Extract sorted identifier ranges from iterator.
@@ -269,10 +278,11 @@ def domain_iterator_to_identifier_ranges(iterator):
     :return: List of sorted identifier ranges [start,stop] e.g. [[1,30],[55,55],[66,70]]
     '''
     identifier_ranges = []
-    obj = iterator.next()
+    iteratorNext = iterator.next
+    obj = iteratorNext()
     if obj.isValid():
         stop = start = obj.getIdentifier()
-        obj = iterator.next()
+        obj = iteratorNext()
         while obj.isValid():
             identifier = obj.getIdentifier()
             if identifier == (stop + 1):
@@ -280,23 +290,37 @@ def domain_iterator_to_identifier_ranges(iterator):
             else:
                 identifier_ranges.append([ start, stop ])
                 stop = start = identifier
-            obj = iterator.next()
+            obj = iteratorNext()
         identifier_ranges.append([ start, stop ])
     return identifier_ranges
 
 
-def mesh_group_add_identifier_ranges(mesh_group, identifier_ranges):
+def mesh_group_add_identifier_ranges(mesh_group, identifier_ranges, whole_domain=False):
     '''
-    Add elements with the supplied identifier ranges to mesh_group.
+    Add elements with the supplied identifier ranges to mesh_group in a single conditional add.
+    The conditional field is a temporary element group built from the ranges, which has no
+    parent groups or subelement handling so is cheap to add to one element at a time.
     :param mesh_group: Zinc MeshGroup to modify.
+    :param identifier_ranges: Ordered list of identifier ranges e.g. [[1,30],[55,55],[66,70]]
+    :param whole_domain: Set to True if identifier_ranges are known to contain every element in
+    the mesh, to add them all conditional on a constant true field without finding each element.
     '''
     mesh = mesh_group.getMasterMesh()
     fieldmodule = mesh.getFieldmodule()
     with ChangeManager(fieldmodule):
-        for identifier_range in identifier_ranges:
-            for identifier in range(identifier_range[0], identifier_range[1] + 1):
-                element = mesh.findElementByIdentifier(identifier)
-                mesh_group.addElement(element)
+        if whole_domain:
+            conditionalField = fieldmodule.createFieldConstant(1.0)
+        else:
+            rangesGroup = fieldmodule.createFieldGroup()
+            conditionalField = rangesGroup.createFieldElementGroup(mesh)
+            findElementByIdentifier = mesh.findElementByIdentifier
+            addElement = conditionalField.getMeshGroup().addElement
+            for identifier_range in identifier_ranges:
+                for identifier in range(identifier_range[0], identifier_range[1] + 1):
+                    addElement(findElementByIdentifier(identifier))
+            del rangesGroup
+        mesh_group.addElementsConditional(conditionalField)
+        del conditionalField
 
 
 def mesh_group_to_identifier_ranges(mesh_group):
@@ -307,18 +331,31 @@ def mesh_group_to_identifier_ranges(mesh_group):
     return domain_iterator_to_identifier_ranges(mesh_group.createElementiterator())
 
 
-def nodeset_group_add_identifier_ranges(nodeset_group, identifier_ranges):
+def nodeset_group_add_identifier_ranges(nodeset_group, identifier_ranges, whole_domain=False):
     '''
-    Add nodes with the supplied identifier ranges to nodeset_group.
+    Add nodes with the supplied identifier ranges to nodeset_group in a single conditional add,
+    with the conditional field a temporary node group built from the ranges.
     :param nodeset_group: Zinc NodesetGroup to modify.
+    :param identifier_ranges: Ordered list of identifier ranges e.g. [[1,30],[55,55],[66,70]]
+    :param whole_domain: Set to True if identifier_ranges are known to contain every node in
+    the nodeset, to add them all conditional on a constant true field without finding each node.
     '''
     nodeset = nodeset_group.getMasterNodeset()
     fieldmodule = nodeset.getFieldmodule()
     with ChangeManager(fieldmodule):
-        for identifier_range in identifier_ranges:
-            for identifier in range(identifier_range[0], identifier_range[1] + 1):
-                node = nodeset.findNodeByIdentifier(identifier)
-                nodeset_group.addNode(node)
+        if whole_domain:
+            conditionalField = fieldmodule.createFieldConstant(1.0)
+        else:
+            rangesGroup = fieldmodule.createFieldGroup()
+            conditionalField = rangesGroup.createFieldNodeGroup(nodeset)
+            findNodeByIdentifier = nodeset.findNodeByIdentifier
+            addNode = conditionalField.getNodesetGroup().addNode
+            for identifier_range in identifier_ranges:
+                for identifier in range(identifier_range[0], identifier_range[1] + 1):
+                    addNode(findNodeByIdentifier(identifier))
+            del rangesGroup
+        nodeset_group.addNodesConditional(conditionalField)
+        del conditionalField
 
 
 def nodeset_group_to_identifier_ranges(nodeset_group):
@@ -359,47 +396,142 @@ def mesh_destroy_elements_and_nodes_by_identifiers(mesh, element_identifiers):
     return
 
 
-def extract_node_field_parameters(nodeset, field, only_value_labels=None):
+def get_nodeset_field_parameters(nodeset, field, value_labels, identifiers=None):
     '''
-    Returns parameters of field from nodes in nodeset in identifier order.
-    Assumes all components have the same labels and versions.
-    :param onlyValueLabels: Optional list of node value labels to limit extraction from e.g. [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1].
-    :return: list of valueLabels returned, list of (node identifier, list over value labels of list of versions of parameters.
+    Get parameters of field at nodes as dense numpy arrays, for nodes in identifier order.
+    Parameters not defined at a node are zero and False in the present mask.
+    :param nodeset: Zinc Nodeset or NodesetGroup to get nodes from.
+    :param field: Zinc FieldFiniteElement to get parameters of.
+    :param value_labels: List of node value labels to get e.g. [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1].
+    :param identifiers: Optional sequence of node identifiers to get parameters for, in the order returned.
+    If not supplied, returns only nodes in nodeset at which field has any of value_labels.
+    :return: identifiers int array(nodesCount), parameters float array(nodesCount, valueLabelsCount,
+    versionsCount, componentsCount), present bool array(nodesCount, valueLabelsCount, versionsCount).
+    versionsCount is the maximum number of versions of any value label at any node, minimum 1.
     '''
     fieldmodule = nodeset.getFieldmodule()
     componentsCount = field.getNumberOfComponents()
     fieldcache = fieldmodule.createFieldcache()
-    valueLabels = only_value_labels if only_value_labels else \
-        [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2, Node.VALUE_LABEL_D_DS3, Node.VALUE_LABEL_D2_DS1DS3, Node.VALUE_LABEL_D2_DS2DS3, Node.VALUE_LABEL_D3_DS1DS2DS3 ]
-    valueLabelsCount = len(valueLabels)
-    fieldParameters = []
-    valueLabelParameterCounts = [ 0 for valueLabel in valueLabels ]
-    nodeIter = nodeset.createNodeiterator()
-    node = nodeIter.next()
-    while node.isValid():
-        fieldcache.setNode(node)
-        nodeParameters = []
-        fieldDefinedAtNode = False
-        for i in range(valueLabelsCount):
-            valueParameters = []
+    setNode = fieldcache.setNode
+    getNodeParameters = field.getNodeParameters
+    valueLabels = list(value_labels)
+    nodeIdentifiers = []
+    # for each node, list of (value label index, version index, parameters)
+    nodesEntries = []
+    versionsCount = 1
+
+    def getNodeEntries(node):
+        nonlocal versionsCount
+        setNode(node)
+        entries = []
+        for v in range(len(valueLabels)):
+            valueLabel = valueLabels[v]
             version = 1
             while True:
-                result, parameters = field.getNodeParameters(fieldcache, -1, valueLabels[i], version, componentsCount)
+                result, parameters = getNodeParameters(fieldcache, -1, valueLabel, version, componentsCount)
                 if result != RESULT_OK:
-                    break;
-                fieldDefinedAtNode = True
-                valueParameters.append(parameters)
-                valueLabelParameterCounts[i] += 1
+                    break
+                entries.append((v, version - 1, parameters))
                 version += 1
-            nodeParameters.append(valueParameters)
-        if fieldDefinedAtNode:
-            fieldParameters.append( ( node.getIdentifier(), nodeParameters ) )
-        node = nodeIter.next()
-    for i in range(valueLabelsCount - 1, -1, -1):
-        if valueLabelParameterCounts[i] == 0:
-            valueLabels.pop(i)
-            for nodeParameters in fieldParameters:
-                nodeParameters[1].pop(i)
+            if version > (versionsCount + 1):
+                versionsCount = version - 1
+        return entries
+
+    if identifiers is None:
+        nodeiterator = nodeset.createNodeiterator()
+        iteratorNext = nodeiterator.next
+        node = iteratorNext()
+        while node.isValid():
+            entries = getNodeEntries(node)
+            if entries:
+                nodeIdentifiers.append(node.getIdentifier())
+                nodesEntries.append(entries)
+            node = iteratorNext()
+    else:
+        findNodeByIdentifier = nodeset.findNodeByIdentifier
+        for identifier in identifiers:
+            node = findNodeByIdentifier(identifier)
+            nodeIdentifiers.append(identifier)
+            nodesEntries.append(getNodeEntries(node) if node.isValid() else [])
+    nodesCount = len(nodeIdentifiers)
+    parameters = numpy.zeros((nodesCount, len(valueLabels), versionsCount, componentsCount))
+    present = numpy.zeros((nodesCount, len(valueLabels), versionsCount), dtype=bool)
+    for n in range(nodesCount):
+        for v, i, nodeParameters in nodesEntries[n]:
+            parameters[n, v, i] = nodeParameters
+            present[n, v, i] = True
+    return numpy.array(nodeIdentifiers, dtype=numpy.int64), parameters, present
+
+
+def set_nodeset_field_parameters(nodeset, field, value_labels, identifiers, parameters, present=None):
+    '''
+    Set parameters of field at nodes from dense arrays, the inverse of get_nodeset_field_parameters.
+    Field must already be defined at nodes with the value labels and versions being set.
+    :param nodeset: Zinc Nodeset or NodesetGroup containing nodes.
+    :param field: Zinc FieldFiniteElement to set parameters of.
+    :param value_labels: List of node value labels to set e.g. [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1].
+    :param identifiers: Sequence of node identifiers to set parameters for, or None for all nodes in
+    nodeset in identifier order.
+    :param parameters: Array-like (nodesCount, valueLabelsCount, versionsCount, componentsCount).
+    :param present: Optional bool array-like (nodesCount, valueLabelsCount, versionsCount) limiting
+    which parameters are set. Default sets all.
+    :return: Number of parameter sets which failed to be set.
+    '''
+    fieldmodule = nodeset.getFieldmodule()
+    parameters = numpy.asarray(parameters, dtype=float)
+    nodesCount, valueLabelsCount, versionsCount = parameters.shape[0:3]
+    assert valueLabelsCount == len(value_labels), 'set_nodeset_field_parameters:  Mismatched value labels count'
+    if present is not None:
+        present = numpy.asarray(present, dtype=bool)
+    if identifiers is None:
+        nodes = []
+        nodeiterator = nodeset.createNodeiterator()
+        node = nodeiterator.next()
+        while node.isValid():
+            nodes.append(node)
+            node = nodeiterator.next()
+    else:
+        findNodeByIdentifier = nodeset.findNodeByIdentifier
+        nodes = [ findNodeByIdentifier(identifier) for identifier in identifiers ]
+    assert len(nodes) == nodesCount, 'set_nodeset_field_parameters:  Mismatched nodes count'
+    failedCount = 0
+    with ChangeManager(fieldmodule):
+        fieldcache = fieldmodule.createFieldcache()
+        setNode = fieldcache.setNode
+        setNodeParameters = field.setNodeParameters
+        for n in range(nodesCount):
+            setNode(nodes[n])
+            nodeParameters = parameters[n].tolist()
+            for v in range(valueLabelsCount):
+                valueLabel = value_labels[v]
+                for i in range(versionsCount):
+                    if (present is None) or present[n, v, i]:
+                        if setNodeParameters(fieldcache, -1, valueLabel, i + 1, nodeParameters[v][i]) != RESULT_OK:
+                            failedCount += 1
+    return failedCount
+
+
+def extract_node_field_parameters(nodeset, field, only_value_labels=None):
+    '''
+    Returns parameters of field from nodes in nodeset in identifier order.
+    Assumes all components have the same labels and versions.
+    See get_nodeset_field_parameters() for dense numpy array output.
+    :param onlyValueLabels: Optional list of node value labels to limit extraction from e.g. [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1].
+    :return: list of valueLabels returned, list of (node identifier, list over value labels of list of versions of parameters.
+    '''
+    valueLabels = list(only_value_labels) if only_value_labels else \
+        [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2, Node.VALUE_LABEL_D_DS3, Node.VALUE_LABEL_D2_DS1DS3, Node.VALUE_LABEL_D2_DS2DS3, Node.VALUE_LABEL_D3_DS1DS2DS3 ]
+    identifiers, parameters, present = get_nodeset_field_parameters(nodeset, field, valueLabels)
+    # remove value labels without parameters at any node
+    usedValueLabels = numpy.any(present, axis=(0, 2))
+    valueLabels = [ valueLabels[v] for v in range(len(valueLabels)) if usedValueLabels[v] ]
+    parameters = parameters[:, usedValueLabels]
+    present = present[:, usedValueLabels]
+    fieldParameters = []
+    for n in range(len(identifiers)):
+        nodeParameters = parameters[n].tolist()
+        fieldParameters.append( ( int(identifiers[n]), [ [ nodeParameters[v][i] for i in range(present.shape[2]) if present[n, v, i] ]
+            for v in range(len(valueLabels)) ] ) )
     return valueLabels, fieldParameters
 
 
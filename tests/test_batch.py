@@ -0,0 +1,84 @@
+import os
+import time
+import unittest
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.result import RESULT_OK
+from scaffoldmaker import batch
+from scaffoldmaker.batch import generateBatch
+from scaffoldmaker.meshtypes.meshtype_3d_box1 import MeshType_3d_box1
+from scaffoldmaker.scaffoldpackage import ScaffoldPackage
+
+
+def runTestJob(jobIndex, kind, timeout):
+    '''
+    Job for testing batch error handling: kind 'crash' exits the worker process, 'stuck' sleeps for
+    longer than timeout without returning to be interrupted, otherwise return a result immediately.
+    '''
+    if kind == 'crash':
+        os._exit(1)
+    if kind == 'stuck':
+        time.sleep(timeout + 5.0)
+    return { 'index': jobIndex, 'error': None }
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def test_batch(self):
+        """
+        Test generating a batch of scaffold packages in worker processes.
+        """
+        scaffoldPackageDicts = []
+        for elementsCount in range(1, 4):
+            scaffoldPackage = ScaffoldPackage(MeshType_3d_box1, {
+                'scaffoldSettings': { 'Number of elements 1': elementsCount }})
+            scaffoldPackageDicts.append(scaffoldPackage.toDict())
+        results = list(generateBatch(scaffoldPackageDicts, workersCount=2))
+        self.assertEqual(3, len(results))
+        context = Context("Test")
+        for jobIndex, result in enumerate(results):
+            self.assertEqual(jobIndex, result['index'])
+            self.assertIsNone(result['error'])
+            self.assertEqual('3D Box 1', result['scaffoldTypeName'])
+            self.assertTrue(result['time'] > 0.0)
+            region = context.createRegion()
+            sir = region.createStreaminformationRegion()
+            sir.createStreamresourceMemoryBuffer(result['buffer'])
+            self.assertEqual(RESULT_OK, region.read(sir))
+            mesh3d = region.getFieldmodule().findMeshByDimension(3)
+            self.assertEqual(jobIndex + 1, mesh3d.getSize())
+        results = list(generateBatch(scaffoldPackageDicts, workersCount=2, ordered=False))
+        self.assertEqual([ 0, 1, 2 ], sorted(result['index'] for result in results))
+
+    def test_batch_errors(self):
+        """
+        Test batch jobs which fail, crash their worker process or do not return give error results.
+        """
+        results = list(generateBatch([ { 'scaffoldTypeName': 'Not a scaffold type' } ], workersCount=1))
+        self.assertEqual(1, len(results))
+        self.assertEqual('Not a scaffold type', results[0]['scaffoldTypeName'])
+        self.assertIsNone(results[0]['buffer'])
+        self.assertIsNotNone(results[0]['error'])
+
+        createErrorResult = lambda jobIndex, jobArgs, error: { 'index': jobIndex, 'error': error }
+        for ordered in (True, False):
+            results = list(batch._runJobs(runTestJob, [ ('ok',), ('crash',) ], createErrorResult, 1, None, ordered))
+            self.assertEqual(2, len(results))
+            results.sort(key=lambda result: result['index'])
+            self.assertIn('BrokenProcessPool', results[1]['error'])
+
+        oldTimeoutMargin = batch.TIMEOUT_MARGIN
+        batch.TIMEOUT_MARGIN = 0.5
+        try:
+            for ordered in (True, False):
+                startTime = time.perf_counter()
+                results = list(batch._runJobs(runTestJob, [ ('ok',), ('stuck',) ], createErrorResult, 2, 0.5, ordered))
+                self.assertLess(time.perf_counter() - startTime, 5.0)
+                results.sort(key=lambda result: result['index'])
+                self.assertIsNone(results[0]['error'])
+                self.assertEqual('No result within 1.0 seconds', results[1]['error'])
+        finally:
+            batch.TIMEOUT_MARGIN = oldTimeoutMargin
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.node import Node
+from opencmiss.zinc.result import RESULT_OK
+from scaffoldmaker.meshtypes.meshtype_1d_bifurcationtree1 import MeshType_1d_bifurcationtree1
+from testutils import assertAlmostEqualList
+
+
+class BifurcationTreeTestCase(unittest.TestCase):
+
+    def test_bifurcation_tree(self):
+        """
+        Test breadth first bifurcation tree arrays and Zinc model numbered depth first.
+        """
+        options = MeshType_1d_bifurcationtree1.getDefaultOptions()
+        options['Number of generations'] = 12
+        bifurcationTree = MeshType_1d_bifurcationtree1.generateBifurcationTree(options)
+        self.assertEqual(4096, bifurcationTree.getNodesCount())
+        self.assertEqual(range(2048, 4096), bifurcationTree.getGenerationNodeIndexes(12))
+        parentIndexes = bifurcationTree.getParentIndexes()
+        self.assertEqual([ -1, 0, 1, 1, 2, 2 ], parentIndexes[:6].tolist())
+        x, d1, r = bifurcationTree.getNodeParameters()
+        x1, xd1, r1, x2, xd2, r2 = bifurcationTree.getCurve(2)
+        assertAlmostEqualList(self, x[1].tolist(), x1, delta=1.0E-12)
+        assertAlmostEqualList(self, x[2].tolist(), x2, delta=1.0E-12)
+        rootNode = bifurcationTree.getRootNode()
+        self.assertEqual((x1, xd1, r1, x2, xd2, r2), rootNode.getChild(0).getChildCurve(0))
+
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        self.assertEqual((4097, 4096), bifurcationTree.generateZincModel(region))
+        fieldmodule = region.getFieldmodule()
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        self.assertEqual(4096, nodes.getSize())
+        mesh1d = fieldmodule.findMeshByDimension(1)
+        self.assertEqual(4095, mesh1d.getSize())
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        radius = fieldmodule.findFieldByName("radius").castFiniteElement()
+        fieldcache = fieldmodule.createFieldcache()
+        # depth first: node 3 is first child of node 2, the last node is in the last generation
+        for nodeIdentifier, nodeIndex in ((2, 1), (3, 2), (4, 4), (4096, 4095)):
+            fieldcache.setNode(nodes.findNodeByIdentifier(nodeIdentifier))
+            result, nx = coordinates.evaluateReal(fieldcache, 3)
+            self.assertEqual(RESULT_OK, result)
+            assertAlmostEqualList(self, x[nodeIndex].tolist(), nx, delta=1.0E-12)
+        node = nodes.findNodeByIdentifier(2)
+        fieldcache.setNode(node)
+        result, nd1 = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS1, 2, 3)
+        self.assertEqual(RESULT_OK, result)
+        assertAlmostEqualList(self, xd1, nd1, delta=1.0E-12)
+        result, nr = radius.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 2, 1)
+        self.assertEqual(RESULT_OK, result)
+        self.assertAlmostEqual(r1, nr, delta=1.0E-12)
+        element = mesh1d.findElementByIdentifier(2)
+        eft = element.getElementfieldtemplate(coordinates, -1)
+        self.assertEqual(2, element.getNode(eft, 1).getIdentifier())
+        self.assertEqual(3, element.getNode(eft, 2).getIdentifier())
+
+        # deep tree arrays are generated without recursion
+        options['Number of generations'] = 18
+        bifurcationTree = MeshType_1d_bifurcationtree1.generateBifurcationTree(options)
+        self.assertEqual(262144, bifurcationTree.getNodesCount())
+
+
+if __name__ == "__main__":
+    unittest.main()
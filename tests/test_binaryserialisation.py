@@ -0,0 +1,80 @@
+import json
+import unittest
+from scaffoldmaker.utils.binaryserialisation import binaryToJSON, decodeBinary, encodeBinary, jsonToBinary
+
+
+def createScaffoldDict():
+    '''
+    :return: dict resembling a ScaffoldPackage encoding with nested package and meshEdits.
+    '''
+    meshEdits = ''.join(
+        (' Node: %d\n  %.15e %.15e %.15e\n' % (n + 1, 0.1*n, -0.25*n, 1.0/(n + 1))) for n in range(200))
+    return {
+        'rotation': [ 0.0, -0.0, 90.0 ],
+        'scaffoldTypeName': '3D Colon 1',
+        'scaffoldSettings': {
+            'Number of segments': 30,
+            'Refine': False,
+            'Central path': {
+                '_ScaffoldPackage': True,
+                'scaffoldTypeName': '1D Path 1',
+                'scaffoldSettings': { 'Coordinate dimensions': 3, 'Length': 1.0 },
+                'meshEdits': meshEdits.encode('utf-8')
+                },
+            'Big': 1 << 70,
+            'Name': 'café',
+            'Mixed': [ 1, 2.5, None, 'x', [] ],
+            'Empty': {}
+            },
+        'scale': [ 1.0, 1.0, 1.0 ],
+        'meshEdits': meshEdits.encode('utf-8')
+        }
+
+
+class BinarySerialisationTestCase(unittest.TestCase):
+
+    def test_encode_decode(self):
+        """
+        Test binary encoding round trips values, compressed and uncompressed.
+        """
+        dct = createScaffoldDict()
+        for compress in (False, True):
+            data = encodeBinary(dct, compress=compress)
+            self.assertEqual(b'SMB', data[:3])
+            self.assertEqual(dct, decodeBinary(data))
+        # packed float lists keep negative zero
+        self.assertEqual('-0.0', str(decodeBinary(data)['rotation'][1]))
+        uncompressedSize = len(encodeBinary(dct, compress=False))
+        compressedSize = len(encodeBinary(dct))
+        self.assertLess(compressedSize, uncompressedSize//3)
+
+        names = []
+        def objectHook(dct):
+            names.append(dct.get('scaffoldTypeName'))
+            return dct
+        decodeBinary(data, objectHook=objectHook)
+        self.assertEqual([ None, '1D Path 1', None, None, '3D Colon 1' ], names)
+
+        with self.assertRaises(TypeError):
+            encodeBinary({ 'set': { 1, 2 } })
+        self.assertEqual([ 1, 2 ], decodeBinary(encodeBinary({ 1, 2 }, default=sorted)))
+        with self.assertRaises(ValueError):
+            decodeBinary(b'{"json": true}')
+        with self.assertRaises(ValueError):
+            decodeBinary(encodeBinary(dct, compress=False)[:-1])
+
+    def test_json_conversion(self):
+        """
+        Test lossless conversion between JSON text and binary.
+        """
+        dct = createScaffoldDict()
+        jsonString = json.dumps(dct, default=lambda obj: obj.decode('utf-8'), indent=2)
+        data = jsonToBinary(jsonString)
+        self.assertLess(len(data), len(jsonString)//3)
+        self.assertEqual(jsonString, binaryToJSON(data, indent=2))
+        self.assertEqual(jsonString, binaryToJSON(encodeBinary(dct), indent=2))
+        self.assertEqual(json.loads(jsonString), decodeBinary(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,13 @@
 import unittest
 import copy
+from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates
 from opencmiss.utils.zinc.finiteelement import evaluateFieldNodesetRange
 from opencmiss.utils.zinc.general import ChangeManager
 from opencmiss.zinc.context import Context
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.result import RESULT_OK
 from scaffoldmaker.meshtypes.meshtype_3d_solidcylinder1 import MeshType_3d_solidcylinder1
+from scaffoldmaker.utils.cylindermesh import CylinderCentralPath, CylinderEnds, CylinderMesh
 from testutils import assertAlmostEqualList
 
 
@@ -58,6 +60,51 @@ class CylinderScaffoldTestCase(unittest.TestCase):
         self.assertEqual(result, RESULT_OK)
         self.assertAlmostEqual(volume, 9.414866630615249, delta=1.0E-3)
 
+    def test_cylinder_multiple_fields(self):
+        """
+        Test defining two coordinate fields, one transformed, on cylinder mesh in one pass.
+        """
+        options = MeshType_3d_solidcylinder1.getDefaultOptions("Default")
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        fieldmodule = region.getFieldmodule()
+        coordinates = findOrCreateFieldCoordinates(fieldmodule)
+        scaledCoordinates = findOrCreateFieldCoordinates(fieldmodule, name="scaled coordinates")
+        elementsCountAlong = options['Number of elements along']
+        cylinderCentralPath = CylinderCentralPath(region, options['Central path'], elementsCountAlong)
+        base = CylinderEnds(4, 4, 0, 1, 1.0, [0.0, 0.0, 0.0], cylinderCentralPath.alongAxis[0],
+                            cylinderCentralPath.majorAxis[0], cylinderCentralPath.minorRadii[0])
+
+        def scaleParameters(*parameters):
+            return [ [ 2.0*c for c in v ] for v in parameters ]
+
+        CylinderMesh(fieldmodule, [coordinates, scaledCoordinates], elementsCountAlong, base,
+                     cylinderCentralPath=cylinderCentralPath, fieldTransforms=[None, scaleParameters])
+        mesh3d = fieldmodule.findMeshByDimension(3)
+        self.assertEqual(12, mesh3d.getSize())
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        self.assertEqual(34, nodes.getSize())
+        minimums, maximums = evaluateFieldNodesetRange(coordinates, nodes)
+        assertAlmostEqualList(self, minimums, [-1.0, -1.0, 0.0], 1.0E-6)
+        assertAlmostEqualList(self, maximums, [ 1.0, 1.0, 3.0 ], 1.0E-6)
+        minimums, maximums = evaluateFieldNodesetRange(scaledCoordinates, nodes)
+        assertAlmostEqualList(self, minimums, [-2.0, -2.0, 0.0], 1.0E-6)
+        assertAlmostEqualList(self, maximums, [ 2.0, 2.0, 6.0 ], 1.0E-6)
+        with ChangeManager(fieldmodule):
+            one = fieldmodule.createFieldConstant(1.0)
+            volumeFields = []
+            for field in (coordinates, scaledCoordinates):
+                volumeField = fieldmodule.createFieldMeshIntegral(one, field, mesh3d)
+                volumeField.setNumbersOfPoints(3)
+                volumeFields.append(volumeField)
+        fieldcache = fieldmodule.createFieldcache()
+        result, volume = volumeFields[0].evaluateReal(fieldcache, 1)
+        self.assertEqual(result, RESULT_OK)
+        self.assertAlmostEqual(volume, 9.414866630615249, delta=1.0E-3)
+        result, scaledVolume = volumeFields[1].evaluateReal(fieldcache, 1)
+        self.assertEqual(result, RESULT_OK)
+        self.assertAlmostEqual(scaledVolume, 8.0*volume, delta=1.0E-6)
+
 
 if __name__ == "__main__":
     unittest.main()
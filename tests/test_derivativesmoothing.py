@@ -0,0 +1,124 @@
+import math
+import unittest
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.node import Node
+from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromRegion, \
+    setPathParameters
+from scaffoldmaker.meshtypes.meshtype_2d_plate1 import MeshType_2d_plate1
+from scaffoldmaker.utils.derivativemoothing import DerivativeSmoothing
+from testutils import assertAlmostEqualList
+
+
+class DerivativeSmoothingTestCase(unittest.TestCase):
+
+    def test_derivative_smoothing(self):
+        """
+        Test smoothing uneven derivatives on a straight path makes them uniform.
+        """
+        options = MeshType_1d_path1.getDefaultOptions()
+        options['Number of elements'] = 3
+        options['Length'] = 3.0
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        MeshType_1d_path1.generateMesh(region, options)
+        fieldmodule = region.getFieldmodule()
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        setPathParameters(region, [ Node.VALUE_LABEL_D_DS1 ], [ [ [ mag, 0.0, 0.0 ] for mag in (1.0, 0.5, 2.0, 1.5) ] ])
+        smoothing = DerivativeSmoothing(region, coordinates, editGroupName='smoothed')
+        convergenceHistory = smoothing.smooth()
+        self.assertEqual(1.0, convergenceHistory[0])
+        self.assertLess(convergenceHistory[-1], 1.0E-6)
+        x, d1 = extractPathParametersFromRegion(region, [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1 ])
+        for n in range(4):
+            assertAlmostEqualList(self, [ 1.0, 0.0, 0.0 ], d1[n], delta=1.0E-5)
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        editGroup = fieldmodule.findFieldByName('smoothed').castGroup()
+        self.assertEqual(4, editGroup.getFieldNodeGroup(nodes).getNodesetGroup().getSize())
+
+    def test_derivative_smoothing_zero_derivative(self):
+        """
+        Test zero derivatives have no direction to scale so stay zero rather than becoming NaN,
+        and are given a direction when updating directions.
+        """
+        options = MeshType_1d_path1.getDefaultOptions()
+        options['Number of elements'] = 3
+        options['Length'] = 3.0
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        MeshType_1d_path1.generateMesh(region, options)
+        fieldmodule = region.getFieldmodule()
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        setPathParameters(region, [ Node.VALUE_LABEL_D_DS1 ], [ [ [ mag, 0.0, 0.0 ] for mag in (1.0, 0.0, 1.0, 1.0) ] ])
+        DerivativeSmoothing(region, coordinates).smooth()
+        x, d1 = extractPathParametersFromRegion(region, [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1 ])
+        self.assertEqual([ 0.0, 0.0, 0.0 ], d1[1])
+        for n in range(4):
+            self.assertTrue(all(math.isfinite(c) for c in d1[n]))
+        DerivativeSmoothing(region, coordinates).smooth(updateDirections=True)
+        x, d1 = extractPathParametersFromRegion(region, [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1 ])
+        for n in range(4):
+            assertAlmostEqualList(self, [ 1.0, 0.0, 0.0 ], d1[n], delta=1.0E-5)
+
+
+    def test_derivative_smoothing_plate(self):
+        """
+        Test smoothing derivatives over a 2D plate gives the same results as the original
+        sequential algorithm, with and without updating directions. The plate is 1 element
+        across in direction 2 so both ends of those edges are on the boundary.
+        """
+        # expected d1, d2 at each node from original sequential algorithm
+        expectedDerivatives = {
+            False: [
+                [ [ 0.5170835714, 0.0000000000, 0.1723611905 ], [ 0.0000000000, 0.8269198481, -0.1653839696 ] ],
+                [ [ 0.7073368243, 0.0000000000, 0.1414673649 ], [ 0.0777284522, 0.7772845219, -0.1554569044 ] ],
+                [ [ 0.9082206805, 0.0000000000, 0.1297458115 ], [ 0.1578058184, 0.7890290922, -0.1578058184 ] ],
+                [ [ 1.1264118451, 0.0000000000, 0.1251568717 ], [ 0.2332994568, 0.7776648559, -0.1555329712 ] ],
+                [ [ 0.4706217798, 0.0784369633, 0.1568739266 ], [ 0.0000000000, 0.8078222306, -0.1009777788 ] ],
+                [ [ 0.7040242407, 0.0704024241, 0.1408048481 ], [ 0.0501491215, 0.8023859440, -0.1002982430 ] ],
+                [ [ 0.9189877396, 0.0656419814, 0.1312839628 ], [ 0.1002179315, 0.8017434521, -0.1002179315 ] ],
+                [ [ 1.1212993418, 0.0622944079, 0.1245888158 ], [ 0.1506840341, 0.8036481819, -0.1004560227 ] ] ],
+            True: [
+                [ [ 0.4860464531, 0.0957898714, 0.2298254765 ], [ 0.0000000000, 0.8138623583, 0.1712103900 ] ],
+                [ [ 0.7058002154, 0.1026032728, 0.1029076413 ], [ 0.0000000000, 0.7937957354, 0.0134600851 ] ],
+                [ [ 0.9049616577, 0.1018519177, -0.0615461621 ], [ 0.0000000000, 0.8032010448, -0.1542502263 ] ],
+                [ [ 1.0911503955, 0.0977996064, -0.2448523565 ], [ 0.0000000000, 0.8020190380, -0.1800377356 ] ],
+                [ [ 0.4878508190, 0.0957490180, 0.0854227547 ], [ 0.0000000000, 0.7861376417, 0.1653780039 ] ],
+                [ [ 0.7057000925, 0.1029852387, -0.0594214143 ], [ 0.0000000000, 0.8062042646, 0.0136704917 ] ],
+                [ [ 0.9001056494, 0.1012309614, -0.1672372037 ], [ 0.0000000000, 0.7967989552, -0.1530207412 ] ],
+                [ [ 1.0997952814, 0.0987601423, -0.1919145101 ], [ 0.0000000000, 0.7979809620, -0.1791312658 ] ] ]
+            }
+        options = MeshType_2d_plate1.getDefaultOptions()
+        options['Number of elements 1'] = 3
+        options['Number of elements 2'] = 1
+        for updateDirections in (False, True):
+            context = Context("Test")
+            region = context.getDefaultRegion()
+            MeshType_2d_plate1.generateMesh(region, options)
+            fieldmodule = region.getFieldmodule()
+            coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+            nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+            fieldcache = fieldmodule.createFieldcache()
+            # distort plate and give it uneven derivatives
+            nodeIdentifier = 1
+            for n2 in range(2):
+                for n1 in range(4):
+                    fieldcache.setNode(nodes.findNodeByIdentifier(nodeIdentifier))
+                    coordinates.setNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1,
+                        [ 0.5*n1 + 0.1*n1*n1, 0.8*n2 + 0.1*n1, 0.2*math.sin(n1 + n2) ])
+                    coordinates.setNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS1, 1, [ 0.3 + 0.2*n1, 0.05*n2, 0.1 ])
+                    coordinates.setNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS2, 1, [ 0.05*n1, 0.5 + 0.3*n2, -0.1 ])
+                    nodeIdentifier += 1
+            DerivativeSmoothing(region, coordinates).smooth(updateDirections=updateDirections)
+            for n in range(8):
+                fieldcache.setNode(nodes.findNodeByIdentifier(n + 1))
+                expectedd1, expectedd2 = expectedDerivatives[updateDirections][n]
+                result, d1 = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS1, 1, 3)
+                result, d2 = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS2, 1, 3)
+                assertAlmostEqualList(self, expectedd1, d1, delta=1.0E-8)
+                assertAlmostEqualList(self, expectedd2, d2, delta=1.0E-8)
+            del fieldcache
+
+
+if __name__ == "__main__":
+    unittest.main()
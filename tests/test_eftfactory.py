@@ -0,0 +1,48 @@
+import unittest
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.node import Node
+from scaffoldmaker.utils.eft_utils import getEftSignature, remapEftNodeValueLabel
+from scaffoldmaker.utils.eftfactory_tricubichermite import eftfactory_tricubichermite
+
+
+class EftFactoryTestCase(unittest.TestCase):
+
+    def test_eft_cache(self):
+        """
+        Test sharing of element field templates and element templates by eftfactory.
+        """
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        fieldmodule = region.getFieldmodule()
+        coordinates = fieldmodule.createFieldFiniteElement(3)
+        coordinates.setName("coordinates")
+        mesh = fieldmodule.findMeshByDimension(3)
+        eftfactory = eftfactory_tricubichermite(mesh, False)
+        eft1 = eftfactory.getSharedEft(eftfactory.createEftShellPoleBottom, 0, 100)
+        self.assertIs(eft1, eftfactory.getSharedEft(eftfactory.createEftShellPoleBottom, 0, 100))
+        eft2 = eftfactory.getSharedEft(eftfactory.createEftShellPoleBottom, 100, 200)
+        self.assertIsNot(eft1, eft2)
+        self.assertNotEqual(getEftSignature(eft1), getEftSignature(eft2))
+        self.assertIs(eft1, eftfactory.internEft(eftfactory.createEftShellPoleBottom(0, 100)))
+        eft3 = eftfactory.getSharedEft(eftfactory.createEftWedgeCollapseXi1Quadrant, [ 1, 5 ])
+        self.assertIs(eft3, eftfactory.getSharedEft(eftfactory.createEftWedgeCollapseXi1Quadrant, [ 1, 5 ]))
+
+        eft4 = eftfactory.createEftNoCrossDerivatives()
+        self.assertIs(eft4, eftfactory.internEft(eft4))
+        eft5 = eftfactory.createEftNoCrossDerivatives()
+        remapEftNodeValueLabel(eft5, [ 1, 3 ], Node.VALUE_LABEL_D_DS1, [ ( Node.VALUE_LABEL_D_DS1, [] ), ( Node.VALUE_LABEL_D_DS3, [] ) ])
+        self.assertIs(eft5, eftfactory.internEft(eft5))
+        eft6 = eftfactory.createEftNoCrossDerivatives()
+        remapEftNodeValueLabel(eft6, [ 1, 3 ], Node.VALUE_LABEL_D_DS1, [ ( Node.VALUE_LABEL_D_DS1, [] ), ( Node.VALUE_LABEL_D_DS3, [] ) ])
+        self.assertIs(eft5, eftfactory.internEft(eft6))
+
+        elementtemplate1, eft = eftfactory.getSharedElementtemplate(coordinates, eftfactory.createEftShellPoleBottom(0, 100))
+        self.assertIs(eft1, eft)
+        elementtemplate2, eft = eftfactory.getSharedElementtemplate(coordinates, eft1)
+        self.assertIs(elementtemplate1, elementtemplate2)
+        elementtemplate3, eft = eftfactory.getSharedElementtemplate(coordinates, eft2)
+        self.assertIsNot(elementtemplate1, elementtemplate3)
+
+
+if __name__ == "__main__":
+    unittest.main()
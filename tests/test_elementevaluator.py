@@ -0,0 +1,63 @@
+import unittest
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.result import RESULT_OK
+from scaffoldmaker.meshtypes.meshtype_3d_sphereshell1 import MeshType_3d_sphereshell1
+from scaffoldmaker.utils.elementevaluator import ElementEvaluator
+from testutils import assertAlmostEqualList
+
+
+class ElementEvaluatorTestCase(unittest.TestCase):
+
+    def test_element_evaluator(self):
+        """
+        Test element evaluator with scale factors and multi-term element field templates matches Zinc.
+        """
+        options = MeshType_3d_sphereshell1.getDefaultOptions()
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        MeshType_3d_sphereshell1.generateBaseMesh(region, options)
+        fieldmodule = region.getFieldmodule()
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        fieldcache = fieldmodule.createFieldcache()
+        xiList = [ [ 0.0, 0.0, 0.0 ], [ 0.2, 0.7, 0.4 ], [ 1.0, 0.5, 1.0 ], [ 0.9, 0.1, 0.6 ] ]
+        for dimension in (3, 2):
+            mesh = fieldmodule.findMeshByDimension(dimension)
+            evaluator = ElementEvaluator(coordinates, mesh)
+            elements = []
+            elementXi = []
+            elementiterator = mesh.createElementiterator()
+            element = elementiterator.next()
+            while element.isValid():
+                elements += [ element ]*len(xiList)
+                elementXi += [ xi[:dimension] for xi in xiList ]
+                element = elementiterator.next()
+            if dimension == 3:
+                self.assertEqual(16, mesh.getSize())
+            for d in range(-1, dimension):
+                derivatives = [ (1 if (i == d) else 0) for i in range(dimension) ]
+                field = coordinates
+                for i in range(dimension):
+                    if derivatives[i]:
+                        field = fieldmodule.createFieldDerivative(coordinates, i + 1)
+                values = evaluator.evaluateMany(elements, elementXi, derivatives)
+                self.assertEqual((len(elements), 3), values.shape)
+                for p in range(len(elements)):
+                    fieldcache.setMeshLocation(elements[p], elementXi[p])
+                    result, x = field.evaluateReal(fieldcache, 3)
+                    self.assertEqual(RESULT_OK, result)
+                    assertAlmostEqualList(self, x, values[p].tolist(), delta=1.0E-12)
+        mesh3d = fieldmodule.findMeshByDimension(3)
+        evaluator = ElementEvaluator(coordinates, mesh3d)
+        element = mesh3d.findElementByIdentifier(1)
+        functionTypes, parameters = evaluator.getElementParameters(element)
+        self.assertEqual(3, len(functionTypes))
+        self.assertEqual(3, parameters.shape[1])
+        lattice = evaluator.evaluateLattice(element, (2, 1, 1))
+        self.assertEqual((12, 3), lattice.shape)
+        fieldcache.setMeshLocation(element, [ 0.5, 1.0, 0.0 ])
+        result, x = coordinates.evaluateReal(fieldcache, 3)
+        assertAlmostEqualList(self, x, lattice[4].tolist(), delta=1.0E-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import io
+import unittest
+from opencmiss.zinc.context import Context
+from scaffoldmaker.annotation.annotationgroup import AnnotationGroup
+from scaffoldmaker.meshtypes.meshtype_3d_box1 import MeshType_3d_box1
+from scaffoldmaker.utils.exportvtk import ExportVtk
+
+
+class ExportVtkTestCase(unittest.TestCase):
+
+    def test_export_vtk(self):
+        """
+        Test exporting box scaffold with annotation group to legacy vtk and vtu formats.
+        """
+        options = MeshType_3d_box1.getDefaultOptions()
+        options['Number of elements 1'] = 2
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        MeshType_3d_box1.generateBaseMesh(region, options)
+        fieldmodule = region.getFieldmodule()
+        mesh3d = fieldmodule.findMeshByDimension(3)
+        annotationGroup = AnnotationGroup(region, ("left half", None))
+        annotationGroup.getMeshGroup(mesh3d).addElement(mesh3d.findElementByIdentifier(1))
+        exportVtk = ExportVtk(region, "Box", [ annotationGroup ])
+
+        outstream = io.StringIO()
+        exportVtk.writeLegacy(outstream)
+        lines = outstream.getvalue().split('\n')
+        self.assertEqual([ '# vtk DataFile Version 2.0', 'Box', 'ASCII', 'DATASET UNSTRUCTURED_GRID', 'POINTS 12 double' ], lines[:5])
+        self.assertEqual('0.0 0.0 0.0', lines[5])
+        self.assertEqual('CELLS 2 18', lines[17])
+        self.assertEqual('8 0 1 4 3 6 7 10 9', lines[18])
+        self.assertEqual('CELL_TYPES 2', lines[20])
+        self.assertEqual('12 12', lines[21])
+        self.assertEqual([ 'CELL_DATA 2', 'SCALARS left_half int 1', 'LOOKUP_TABLE default', '1 0 ' ], lines[22:26])
+
+        outstream = io.BytesIO()
+        exportVtk.writeLegacy(outstream, binary=True)
+        text = outstream.getvalue()
+        self.assertTrue(text.startswith(b'# vtk DataFile Version 2.0\nBox\nBINARY\nDATASET UNSTRUCTURED_GRID\nPOINTS 12 double\n'))
+        self.assertTrue(text.endswith(b'SCALARS left_half int 1\nLOOKUP_TABLE default\n\x00\x00\x00\x01\x00\x00\x00\x00\n'))
+
+        for encoding in ('raw', 'base64'):
+            for compress in (False, True):
+                outstream = io.BytesIO()
+                exportVtk.writeVtu(outstream, encoding, compress)
+                text = outstream.getvalue()
+                self.assertTrue(b'<Piece NumberOfPoints="12" NumberOfCells="2">' in text)
+                self.assertTrue(b'<DataArray type="Int32" Name="left_half" format="appended" offset="0"/>' in text)
+                self.assertTrue(('<AppendedData encoding="' + encoding + '">').encode() in text)
+                self.assertEqual(compress, b'compressor="vtkZLibDataCompressor"' in text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from opencmiss.utils.zinc.finiteelement import evaluateFieldNodesetRange
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.node import Node
+from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromScaffoldPackage
+from scaffoldmaker.meshtypes.meshtype_3d_heartatria1 import MeshType_3d_heartatria1
+from scaffoldmaker.scaffoldpackage import ScaffoldPackage
+from scaffoldmaker.utils.generationcache import GenerationCache, getScaffoldmakerSourceHash, subScaffoldCache
+from testutils import assertAlmostEqualList
+
+
+class GenerationCacheTestCase(unittest.TestCase):
+
+    def test_generation_cache(self):
+        """
+        Test generating scaffold packages with a generation cache.
+        """
+        generationCache = GenerationCache(maximumEntries=2)
+        scaffoldPackage = ScaffoldPackage(MeshType_3d_heartatria1)
+        context = Context("Test")
+        TOL = 1.0E-7
+
+        region1 = context.createRegion()
+        scaffoldPackage.generate(region1, generationCache=generationCache)
+        self.assertEqual(0, generationCache.getHitCount())
+        self.assertEqual(1, generationCache.getMissCount())
+        self.assertEqual(1, generationCache.getEntryCount())
+        annotationGroups1 = scaffoldPackage.getAnnotationGroups()
+        self.assertEqual(22, len(annotationGroups1))
+        fieldmodule1 = region1.getFieldmodule()
+        mesh1 = fieldmodule1.findMeshByDimension(3)
+        nodes1 = fieldmodule1.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        coordinates1 = fieldmodule1.findFieldByName("coordinates").castFiniteElement()
+        minimums1, maximums1 = evaluateFieldNodesetRange(coordinates1, nodes1)
+
+        scaffoldPackage2 = ScaffoldPackage(MeshType_3d_heartatria1)
+        region2 = context.createRegion()
+        scaffoldPackage2.generate(region2, generationCache=generationCache)
+        self.assertEqual(1, generationCache.getHitCount())
+        self.assertEqual(1, generationCache.getMissCount())
+        annotationGroups2 = scaffoldPackage2.getAnnotationGroups()
+        self.assertEqual([ annotationGroup.getTerm() for annotationGroup in annotationGroups1 ],
+                         [ annotationGroup.getTerm() for annotationGroup in annotationGroups2 ])
+        fieldmodule2 = region2.getFieldmodule()
+        mesh2 = fieldmodule2.findMeshByDimension(3)
+        nodes2 = fieldmodule2.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        self.assertEqual(mesh1.getSize(), mesh2.getSize())
+        self.assertEqual(nodes1.getSize(), nodes2.getSize())
+        for annotationGroup1, annotationGroup2 in zip(annotationGroups1, annotationGroups2):
+            self.assertEqual(annotationGroup1.getDimension(), annotationGroup2.getDimension())
+        coordinates2 = fieldmodule2.findFieldByName("coordinates").castFiniteElement()
+        minimums2, maximums2 = evaluateFieldNodesetRange(coordinates2, nodes2)
+        assertAlmostEqualList(self, minimums1, minimums2, delta=TOL)
+        assertAlmostEqualList(self, maximums1, maximums2, delta=TOL)
+
+        # changing transformation changes the key
+        scaffoldPackage2.setScale([ 2.0, 2.0, 2.0 ])
+        region3 = context.createRegion()
+        scaffoldPackage2.generate(region3, generationCache=generationCache)
+        self.assertEqual(1, generationCache.getHitCount())
+        self.assertEqual(2, generationCache.getMissCount())
+        self.assertEqual(2, generationCache.getEntryCount())
+
+        # untransformed key ignores transformation; all keys include hash of source files
+        self.assertEqual(generationCache.getKey(scaffoldPackage, applyTransformation=False),
+                         generationCache.getKey(scaffoldPackage2, applyTransformation=False))
+        self.assertNotEqual(generationCache.getKey(scaffoldPackage), generationCache.getKey(scaffoldPackage2))
+        self.assertEqual(64, len(getScaffoldmakerSourceHash()))
+
+    def test_sub_scaffold_cache(self):
+        """
+        Test memoized extraction of path parameters from nested scaffold package.
+        """
+        subScaffoldCache.clear()
+        centralPath = ScaffoldPackage(MeshType_1d_path1, {
+            'scaffoldSettings': { 'Length': 2.0, 'Number of elements': 2 }})
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        valueLabels = [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1 ]
+        cx, cd1 = extractPathParametersFromScaffoldPackage(region, centralPath, valueLabels)
+        self.assertEqual(3, len(cx))
+        self.assertEqual({ 'hits': 0, 'misses': 1, 'entries': 1 }, subScaffoldCache.getStatistics())
+        assertAlmostEqualList(self, cx[2], [ 2.0, 0.0, 0.0 ], delta=1.0E-12)
+        # results are copies which the caller may modify
+        cx[2][0] = 5.0
+        cx, cd1 = extractPathParametersFromScaffoldPackage(region, centralPath, valueLabels)
+        self.assertEqual(1, subScaffoldCache.getHitCount())
+        assertAlmostEqualList(self, cx[2], [ 2.0, 0.0, 0.0 ], delta=1.0E-12)
+        # different value labels or settings are separate entries
+        cx, = extractPathParametersFromScaffoldPackage(region, centralPath, [ Node.VALUE_LABEL_VALUE ])
+        self.assertEqual(2, subScaffoldCache.getMissCount())
+        centralPath.getScaffoldSettings()['Length'] = 3.0
+        cx, cd1 = extractPathParametersFromScaffoldPackage(region, centralPath, valueLabels)
+        self.assertEqual(3, subScaffoldCache.getMissCount())
+        self.assertEqual(3, subScaffoldCache.getEntryCount())
+        assertAlmostEqualList(self, cx[2], [ 3.0, 0.0, 0.0 ], delta=1.0E-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import math
+import unittest
+from scaffoldmaker.utils import interpolation as interp
+from testutils import assertAlmostEqualList
+
+
+def getHelixPoints(elementsCount):
+    '''
+    :return: nx, nd1 for cubic Hermite curves along a helix.
+    '''
+    nx = [ [ 10.0*math.cos(0.01*n), 10.0*math.sin(0.01*n), 0.05*n ] for n in range(elementsCount + 1) ]
+    nd1 = [ [ -0.1*math.sin(0.01*n), 0.1*math.cos(0.01*n), 0.05 ] for n in range(elementsCount + 1) ]
+    return nx, nd1
+
+
+class InterpolationTestCase(unittest.TestCase):
+
+    def test_cubic_hermite_arrays(self):
+        """
+        Test array cubic Hermite functions match the per-curve functions.
+        """
+        nx, nd1 = getHelixPoints(20)
+        v1, d1, v2, d2 = nx[:-1], nd1[:-1], nx[1:], nd1[1:]
+        xiList = [ 0.0, 0.25, 0.6, 1.0 ]
+        TOL = 1.0E-12
+        values = interp.interpolateCubicHermiteArray(v1, d1, v2, d2, xiList)
+        derivatives = interp.interpolateCubicHermiteDerivativeArray(v1, d1, v2, d2, xiList)
+        self.assertEqual((20, 4, 3), values.shape)
+        self.assertEqual((20, 4, 3), derivatives.shape)
+        for e in range(20):
+            for i in range(len(xiList)):
+                assertAlmostEqualList(self, values[e][i].tolist(),
+                    interp.interpolateCubicHermite(v1[e], d1[e], v2[e], d2[e], xiList[i]), delta=TOL)
+                assertAlmostEqualList(self, derivatives[e][i].tolist(),
+                    interp.interpolateCubicHermiteDerivative(v1[e], d1[e], v2[e], d2[e], xiList[i]), delta=TOL)
+        arcLengths = interp.getCubicHermiteArcLengthArray(v1, d1, v2, d2)
+        computedArcLengths = interp.computeCubicHermiteArcLengthArray(v1, d1, v2, d2, rescaleDerivatives=True)
+        for e in range(20):
+            self.assertAlmostEqual(arcLengths[e], interp.getCubicHermiteArcLength(v1[e], d1[e], v2[e], d2[e]), delta=TOL)
+            self.assertAlmostEqual(computedArcLengths[e],
+                interp.computeCubicHermiteArcLength(v1[e], d1[e], v2[e], d2[e], rescaleDerivatives=True), delta=TOL)
+
+    def test_sample_cubic_hermite_curves(self):
+        """
+        Test sampling long curves gives the same results with array arc lengths.
+        """
+        nx, nd1 = getHelixPoints(200)
+        TOL = 1.0E-10
+        for arcLengthDerivatives in (False, True):
+            px, pd1, pe, pxi, psf = interp.sampleCubicHermiteCurves(nx, nd1, 50, arcLengthDerivatives=arcLengthDerivatives)
+            self.assertEqual(51, len(px))
+            arrayElementsCountThreshold = interp.arrayElementsCountThreshold
+            interp.arrayElementsCountThreshold = len(nx)
+            try:
+                qx, qd1, qe, qxi, qsf = interp.sampleCubicHermiteCurves(nx, nd1, 50, arcLengthDerivatives=arcLengthDerivatives)
+            finally:
+                interp.arrayElementsCountThreshold = arrayElementsCountThreshold
+            self.assertEqual(pe, qe)
+            for n in range(51):
+                assertAlmostEqualList(self, px[n], qx[n], delta=TOL)
+                assertAlmostEqualList(self, pd1[n], qd1[n], delta=TOL)
+
+    def test_sample_cubic_hermite_curves_array(self):
+        """
+        Test sampling many curves together matches sampling each curve.
+        """
+        nx, nd1 = getHelixPoints(40)
+        curvesx = []
+        curvesd1 = []
+        for i in range(4):
+            scale = 1.0 + 0.5*i
+            curvesx.append([ [ scale*x[0], x[1], x[2] ] for x in nx[i*5:i*5 + 6] ])
+            curvesd1.append([ [ scale*d[0], d[1], (1.0 + 0.2*n)*d[2] ] for n, d in enumerate(nd1[i*5:i*5 + 6]) ])
+        TOL = 1.0E-10
+        for arcLengthDerivatives in (False, True):
+            for elementsCountOut in (1, 4, 9):
+                px, pd1, pe, pxi, psf = interp.sampleCubicHermiteCurvesArray(curvesx, curvesd1, elementsCountOut,
+                    addLengthStart=0.01, lengthFractionEnd=0.5, elementLengthStartEndRatio=1.5, arcLengthDerivatives=arcLengthDerivatives)
+                self.assertEqual((4, elementsCountOut + 1, 3), px.shape)
+                for i in range(4):
+                    qx, qd1, qe, qxi, qsf = interp.sampleCubicHermiteCurves(curvesx[i], curvesd1[i], elementsCountOut,
+                        addLengthStart=0.01, lengthFractionEnd=0.5, elementLengthStartEndRatio=1.5, arcLengthDerivatives=arcLengthDerivatives)
+                    self.assertEqual(qe, pe[i].tolist())
+                    assertAlmostEqualList(self, qxi, pxi[i].tolist(), delta=TOL)
+                    assertAlmostEqualList(self, qsf, psf[i].tolist(), delta=TOL)
+                    for n in range(elementsCountOut + 1):
+                        assertAlmostEqualList(self, qx[n], px[i][n].tolist(), delta=TOL)
+                        assertAlmostEqualList(self, qd1[n], pd1[i][n].tolist(), delta=TOL)
+        for derivativeMagnitudeStart, derivativeMagnitudeEnd in ((None, None), (0.05, None), (0.04, 0.06)):
+            px, pd1, pe, pxi, psf = interp.sampleCubicHermiteCurvesSmoothArray(curvesx, curvesd1, 6,
+                derivativeMagnitudeStart, derivativeMagnitudeEnd)
+            for i in range(4):
+                qx, qd1, qe, qxi, qsf = interp.sampleCubicHermiteCurvesSmooth(curvesx[i], curvesd1[i], 6,
+                    derivativeMagnitudeStart, derivativeMagnitudeEnd)
+                self.assertEqual(qe, pe[i].tolist())
+                for n in range(7):
+                    assertAlmostEqualList(self, qx[n], px[i][n].tolist(), delta=TOL)
+                    assertAlmostEqualList(self, qd1[n], pd1[i][n].tolist(), delta=TOL)
+
+    def test_smooth_derivatives_line_array(self):
+        """
+        Test smoothing many lines together gives the same derivatives as smoothing each line.
+        """
+        nx, nd1 = getHelixPoints(40)
+        linesx = []
+        linesd1 = []
+        for i in range(5):
+            scale = 1.0 + 0.5*i
+            linesx.append([ [ scale*x[0], x[1], x[2] ] for x in nx[i*5:i*5 + 11] ])
+            linesd1.append([ [ 0.0, 0.1, 0.05 + 0.01*i ] for n in range(11) ])
+        TOL = 1.0E-12
+        for fixStartDerivative, fixEndDerivative in ((False, False), (True, True), (True, False)):
+            for magnitudeScalingMode in (interp.DerivativeScalingMode.ARITHMETIC_MEAN, interp.DerivativeScalingMode.HARMONIC_MEAN):
+                md1 = interp.smoothCubicHermiteDerivativesLineArray(linesx, linesd1, fixStartDerivative=fixStartDerivative,
+                    fixEndDerivative=fixEndDerivative, magnitudeScalingMode=magnitudeScalingMode)
+                self.assertEqual((5, 11, 3), md1.shape)
+                for i in range(5):
+                    ld1 = interp.smoothCubicHermiteDerivativesLine(linesx[i], linesd1[i], fixStartDerivative=fixStartDerivative,
+                        fixEndDerivative=fixEndDerivative, magnitudeScalingMode=magnitudeScalingMode)
+                    for n in range(11):
+                        assertAlmostEqualList(self, ld1[n], md1[i][n].tolist(), delta=TOL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+from opencmiss.utils.zinc.field import findOrCreateFieldGroup, findOrCreateFieldNodeGroup, \
+    findOrCreateFieldStoredMeshLocation, findOrCreateFieldStoredString
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.node import Node
+from opencmiss.zinc.result import RESULT_OK
+from scaffoldmaker.annotation.annotationgroup import AnnotationGroup
+from scaffoldmaker.meshtypes.meshtype_3d_box1 import MeshType_3d_box1
+from scaffoldmaker.utils.meshrefinement import MeshRefinement
+from testutils import assertAlmostEqualList
+
+
+class MeshRefinementTestCase(unittest.TestCase):
+
+    def test_refine_all_elements(self):
+        """
+        Test refining all elements evaluates sub-node coordinates from element parameters and merges shared nodes.
+        """
+        options = MeshType_3d_box1.getDefaultOptions()
+        options['Number of elements 1'] = 3
+        options['Number of elements 2'] = 2
+        options['Refine number of elements 1'] = 3
+        options['Refine number of elements 2'] = 2
+        options['Refine number of elements 3'] = 4
+        context = Context("Test")
+        sourceRegion = context.getDefaultRegion()
+        MeshType_3d_box1.generateBaseMesh(sourceRegion, options)
+        targetRegion = sourceRegion.createRegion()
+        meshrefinement = MeshRefinement(sourceRegion, targetRegion, [])
+        MeshType_3d_box1.refineMesh(meshrefinement, options)
+        del meshrefinement
+        fieldmodule = targetRegion.getFieldmodule()
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        mesh3d = fieldmodule.findMeshByDimension(3)
+        self.assertEqual(144, mesh3d.getSize())
+        self.assertEqual(250, nodes.getSize())
+        # refined nodes lie on the regular lattice over the unit cube
+        fieldcache = fieldmodule.createFieldcache()
+        nodeiterator = nodes.createNodeiterator()
+        node = nodeiterator.next()
+        while node.isValid():
+            fieldcache.setNode(node)
+            result, x = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+            self.assertEqual(RESULT_OK, result)
+            for c, elementsCount in enumerate((9, 4, 4)):
+                self.assertAlmostEqual(round(x[c]*elementsCount), x[c]*elementsCount, delta=1.0E-10)
+            node = nodeiterator.next()
+        fieldcache.setNode(nodes.findNodeByIdentifier(250))
+        result, x = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+        assertAlmostEqualList(self, x, [ 1.0, 1.0, 1.0 ], delta=1.0E-12)
+
+    def test_refine_all_elements_partitioned(self):
+        """
+        Test refining all elements in partitions in worker processes gives the same nodes, elements,
+        annotation groups and markers as serial refinement.
+        """
+        options = MeshType_3d_box1.getDefaultOptions()
+        options['Number of elements 1'] = 4
+        options['Number of elements 2'] = 3
+        options['Number of elements 3'] = 2
+        options['Refine number of elements 1'] = 2
+        options['Refine number of elements 2'] = 3
+        options['Refine number of elements 3'] = 2
+        context = Context("Test")
+        sourceRegion = context.getDefaultRegion()
+        MeshType_3d_box1.generateBaseMesh(sourceRegion, options)
+        sourceFieldmodule = sourceRegion.getFieldmodule()
+        sourceMesh = sourceFieldmodule.findMeshByDimension(3)
+        sourceNodes = sourceFieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        annotationGroup = AnnotationGroup.fromDict({ '_AnnotationGroup': True, 'name': 'part', 'ontId': 'PART:1',
+            'dimension': 3, 'identifierRanges': '2-7,13,20' }, sourceRegion)
+        markerGroup = findOrCreateFieldGroup(sourceFieldmodule, "marker")
+        markerName = findOrCreateFieldStoredString(sourceFieldmodule, name="marker_name")
+        markerLocation = findOrCreateFieldStoredMeshLocation(sourceFieldmodule, sourceMesh, name="marker_location")
+        markerNodes = findOrCreateFieldNodeGroup(markerGroup, sourceNodes).getNodesetGroup()
+        markerTemplate = markerNodes.createNodetemplate()
+        markerTemplate.defineField(markerName)
+        markerTemplate.defineField(markerLocation)
+        sourceFieldcache = sourceFieldmodule.createFieldcache()
+        for elementIdentifier, xi in ((8, [ 0.3, 0.6, 0.9 ]), (17, [ 1.0, 0.2, 0.5 ])):
+            node = markerNodes.createNode(-1, markerTemplate)
+            sourceFieldcache.setNode(node)
+            markerName.assignString(sourceFieldcache, "marker " + str(elementIdentifier))
+            markerLocation.assignMeshLocation(sourceFieldcache, sourceMesh.findElementByIdentifier(elementIdentifier), xi)
+
+        results = []
+        for workersCount in (1, 2, 3):
+            targetRegion = context.createRegion()
+            meshrefinement = MeshRefinement(sourceRegion, targetRegion, [ annotationGroup ], workersCount=workersCount)
+            MeshType_3d_box1.refineMesh(meshrefinement, options)
+            targetAnnotationGroup = meshrefinement.getAnnotationGroups()[0]
+            del meshrefinement
+            fieldmodule = targetRegion.getFieldmodule()
+            coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+            targetMarkerName = fieldmodule.findFieldByName("marker_name")
+            targetMarkerLocation = fieldmodule.findFieldByName("marker_location")
+            nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+            mesh3d = fieldmodule.findMeshByDimension(3)
+            self.assertEqual(288, mesh3d.getSize())
+            self.assertEqual(452, nodes.getSize())
+            fieldcache = fieldmodule.createFieldcache()
+            nodesData = []
+            nodeiterator = nodes.createNodeiterator()
+            node = nodeiterator.next()
+            while node.isValid():
+                fieldcache.setNode(node)
+                result, x = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+                if result == RESULT_OK:
+                    nodesData.append((node.getIdentifier(), x))
+                else:
+                    element, xi = targetMarkerLocation.evaluateMeshLocation(fieldcache, 3)
+                    nodesData.append((node.getIdentifier(), targetMarkerName.evaluateString(fieldcache),
+                        element.getIdentifier(), xi))
+                node = nodeiterator.next()
+            elementsData = []
+            elementiterator = mesh3d.createElementiterator()
+            element = elementiterator.next()
+            while element.isValid():
+                eft = element.getElementfieldtemplate(coordinates, -1)
+                elementsData.append((element.getIdentifier(), [ element.getNode(eft, n).getIdentifier() for n in range(1, 9) ]))
+                element = elementiterator.next()
+            groupElementIdentifiers = []
+            elementiterator = targetAnnotationGroup.getMeshGroup(mesh3d).createElementiterator()
+            element = elementiterator.next()
+            while element.isValid():
+                groupElementIdentifiers.append(element.getIdentifier())
+                element = elementiterator.next()
+            self.assertEqual(96, len(groupElementIdentifiers))
+            results.append((nodesData, elementsData, groupElementIdentifiers))
+
+        serialNodesData, serialElementsData, serialGroupElementIdentifiers = results[0]
+        self.assertEqual([ ('marker 8', 93), ('marker 17', 200) ],
+            [ nodeData[1:3] for nodeData in serialNodesData if len(nodeData) == 4 ])
+        for nodesData, elementsData, groupElementIdentifiers in results[1:]:
+            self.assertEqual(len(serialNodesData), len(nodesData))
+            for serialNodeData, nodeData in zip(serialNodesData, nodesData):
+                self.assertEqual(serialNodeData[0], nodeData[0])
+                if len(serialNodeData) == 2:
+                    assertAlmostEqualList(self, serialNodeData[1], nodeData[1], delta=1.0E-12)
+                else:
+                    self.assertEqual(serialNodeData[1:3], nodeData[1:3])
+                    assertAlmostEqualList(self, serialNodeData[3], nodeData[3], delta=1.0E-12)
+            self.assertEqual(serialElementsData, elementsData)
+            self.assertEqual(serialGroupElementIdentifiers, groupElementIdentifiers)
+
+if __name__ == "__main__":
+    unittest.main()
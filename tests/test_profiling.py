@@ -0,0 +1,59 @@
+import unittest
+from scaffoldmaker.utils.profiling import ProfileReport, addProfileCount, isProfiling, profileSpan
+
+
+def instrumentedFunction(count):
+    with profileSpan('outer'):
+        addProfileCount('calls')
+        for i in range(count):
+            with profileSpan('inner'):
+                addProfileCount('items', 2)
+
+
+class ProfilingTestCase(unittest.TestCase):
+
+    def test_profiling_disabled(self):
+        """
+        Test instrumentation does nothing when no report is active.
+        """
+        self.assertFalse(isProfiling())
+        span1 = profileSpan('outer')
+        span2 = profileSpan('inner')
+        self.assertIs(span1, span2)
+        instrumentedFunction(3)
+
+    def test_profile_report(self):
+        """
+        Test nested spans, counters, callback and cProfile capture.
+        """
+        reports = []
+        with ProfileReport('test', useCProfile=True, callback=reports.append) as report:
+            self.assertTrue(isProfiling())
+            instrumentedFunction(3)
+            instrumentedFunction(1)
+        self.assertFalse(isProfiling())
+        self.assertEqual([ report ], reports)
+        root = report.getRoot()
+        self.assertEqual('test', root.getName())
+        self.assertEqual([ 'outer', 'outer' ], [ span.getName() for span in root.getChildren() ])
+        outer1 = root.getChildren()[0]
+        self.assertEqual({ 'calls': 1 }, outer1.getCounters())
+        self.assertEqual(3, len(outer1.getChildren()))
+        self.assertEqual({ 'items': 2 }, outer1.getChildren()[0].getCounters())
+        self.assertTrue(root.getTime() >= outer1.getTime() >= outer1.getChildren()[0].getTime() >= 0.0)
+        totals = report.getTotals()
+        self.assertEqual(2, totals['outer'][1])
+        self.assertEqual(4, totals['inner'][1])
+        self.assertEqual({ 'calls': 2, 'items': 8 }, report.getCounters())
+        dct = report.toDict()
+        self.assertEqual('inner', dct['children'][1]['children'][0]['name'])
+        lines = report.format().split('\n')
+        self.assertEqual(7, len(lines))
+        self.assertTrue(lines[1].startswith('  outer: '))
+        self.assertTrue(lines[2].startswith('    inner: '))
+        self.assertTrue(lines[2].endswith(' s (items 2)'))
+        self.assertIn('instrumentedFunction', report.getProfileStats())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import copy
+import unittest
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.node import Node
+from opencmiss.zinc.result import RESULT_OK
+from scaffoldmaker.meshtypes.meshtype_3d_box1 import MeshType_3d_box1
+from scaffoldmaker.meshtypes.meshtype_3d_heartatria1 import MeshType_3d_heartatria1
+from scaffoldmaker.meshtypes.scaffold_base import FaceGenerationMode, GroupGenerationMode
+from scaffoldmaker.scaffoldpackage import ScaffoldPackage
+from scaffoldmaker.scaffolds import Scaffolds
+from scaffoldmaker.utils.generationcache import GenerationCache
+from testutils import assertAlmostEqualList
+
+
+class ScaffoldPackageTestCase(unittest.TestCase):
+
+    def test_update_transformation(self):
+        """
+        Test updating only the transformation from stored untransformed node parameters.
+        """
+        scaffoldPackage = ScaffoldPackage(MeshType_3d_box1)
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        # can't update until generated with storeUntransformed
+        self.assertFalse(scaffoldPackage.updateTransformation())
+        scaffoldPackage.generate(region, storeUntransformed=True)
+        fieldmodule = region.getFieldmodule()
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        fieldcache = fieldmodule.createFieldcache()
+        fieldcache.setNode(nodes.findNodeByIdentifier(8))
+        TOL = 1.0E-7
+
+        # same transformation as test_transformation
+        scaffoldPackage.setScale([ 2.0, 1.5, 0.5 ])
+        scaffoldPackage.setRotation([ 30.0, -10.0, 90.0 ])
+        scaffoldPackage.setTranslation([ 0.5, 1.2, -0.1 ])
+        self.assertTrue(scaffoldPackage.updateTransformation())
+        result, x = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+        self.assertEqual(RESULT_OK, result)
+        assertAlmostEqualList(self, x , [  2.230161464134234e+00,  1.621558917869791e+00,  1.724507984852172e+00 ], delta=TOL)
+        result, d1 = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS1, 1, 3)
+        self.assertEqual(RESULT_OK, result)
+        assertAlmostEqualList(self, d1, [  1.705737064039425e+00,  9.848077530127952e-01,  3.472963553408093e-01 ], delta=TOL)
+        result, d3 = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS3, 1, 3)
+        self.assertEqual(RESULT_OK, result)
+        assertAlmostEqualList(self, d3, [  2.499999998128999e-01, -4.330127019169794e-01,  0.000000000000000e+00 ], delta=TOL)
+
+        # transformation is applied to untransformed parameters, not accumulated
+        scaffoldPackage.setScale([ 1.0, 1.0, 1.0 ])
+        scaffoldPackage.setRotation([ 0.0, 0.0, 0.0 ])
+        scaffoldPackage.setTranslation([ 0.0, 0.0, 0.0 ])
+        self.assertTrue(scaffoldPackage.updateTransformation())
+        result, x = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+        assertAlmostEqualList(self, x , [ 1.0, 1.0, 1.0 ], delta=TOL)
+
+        # can't update if nodes have been renumbered
+        node = nodes.findNodeByIdentifier(8)
+        self.assertEqual(RESULT_OK, node.setIdentifier(100))
+        self.assertFalse(scaffoldPackage.updateTransformation())
+        self.assertEqual(RESULT_OK, node.setIdentifier(8))
+        self.assertTrue(scaffoldPackage.updateTransformation())
+
+        # can't update if settings have changed
+        scaffoldPackage.getScaffoldSettings()['Number of elements 1'] = 2
+        self.assertFalse(scaffoldPackage.updateTransformation())
+
+        # update after reading the model from a generation cache
+        generationCache = GenerationCache()
+        for expectedHits in (0, 1):
+            scaffoldPackage = ScaffoldPackage(MeshType_3d_box1)
+            scaffoldPackage.setScale([ 2.0, 1.5, 0.5 ])
+            region = context.createRegion()
+            scaffoldPackage.generate(region, generationCache=generationCache, storeUntransformed=True)
+            self.assertEqual(expectedHits, generationCache.getHitCount())
+            fieldmodule = region.getFieldmodule()
+            nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+            coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+            fieldcache = fieldmodule.createFieldcache()
+            fieldcache.setNode(nodes.findNodeByIdentifier(8))
+            result, x = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+            assertAlmostEqualList(self, x , [ 2.0, 1.5, 0.5 ], delta=TOL)
+            scaffoldPackage.setScale([ 1.0, 1.0, 1.0 ])
+            scaffoldPackage.setTranslation([ 0.5, 1.2, -0.1 ])
+            self.assertTrue(scaffoldPackage.updateTransformation())
+            result, x = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_VALUE, 1, 3)
+            assertAlmostEqualList(self, x , [ 1.5, 2.2, 0.9 ], delta=TOL)
+            result, d1 = coordinates.getNodeParameters(fieldcache, -1, Node.VALUE_LABEL_D_DS1, 1, 3)
+            assertAlmostEqualList(self, d1, [ 1.0, 0.0, 0.0 ], delta=TOL)
+
+    def test_generation_modes(self):
+        """
+        Test generating scaffolds with no faces, exterior faces and highest dimension groups,
+        including user annotation groups.
+        """
+        context = Context("Test")
+        options = MeshType_3d_box1.getDefaultOptions()
+        for i in range(1, 4):
+            options['Number of elements ' + str(i)] = 2
+        expectedCounts = {
+            FaceGenerationMode.NONE: (8, 0, 0),
+            FaceGenerationMode.EXTERIOR: (8, 24, 48),
+            FaceGenerationMode.ALL: (8, 36, 54)
+        }
+        for faceMode, counts in expectedCounts.items():
+            region = context.createRegion()
+            MeshType_3d_box1.generateMesh(region, options, faceMode=faceMode)
+            fieldmodule = region.getFieldmodule()
+            self.assertEqual(counts, tuple(fieldmodule.findMeshByDimension(dimension).getSize() for dimension in range(3, 0, -1)))
+
+        generationCache = GenerationCache()
+        userAnnotationGroupDict = {
+            '_AnnotationGroup' : True,
+            'name' : 'user group',
+            'ontId' : None,
+            'dimension' : 3,
+            'identifierRanges' : '1-4'
+            }
+        scaffoldPackage = ScaffoldPackage(MeshType_3d_heartatria1, { 'userAnnotationGroups': [ userAnnotationGroupDict ] })
+        region1 = context.createRegion()
+        scaffoldPackage.generate(region1, generationCache=generationCache)
+        dimensions1 = [ annotationGroup.getDimension() for annotationGroup in scaffoldPackage.getAnnotationGroups() ]
+        fieldmodule1 = region1.getFieldmodule()
+        userAnnotationGroup1 = scaffoldPackage.findAnnotationGroupByName('user group')
+        self.assertTrue(userAnnotationGroup1.hasMeshGroup(fieldmodule1.findMeshByDimension(2)))
+        self.assertTrue(userAnnotationGroup1.hasNodesetGroup(fieldmodule1.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)))
+        exteriorPackage = ScaffoldPackage(MeshType_3d_heartatria1, { 'userAnnotationGroups': [ userAnnotationGroupDict ] })
+        region2 = context.createRegion()
+        exteriorPackage.generate(region2, generationCache=generationCache,
+            faceMode=FaceGenerationMode.EXTERIOR, groupMode=GroupGenerationMode.HIGHEST_DIMENSION)
+        self.assertEqual(0, generationCache.getHitCount())
+        self.assertEqual(2, generationCache.getEntryCount())
+        fieldmodule2 = region2.getFieldmodule()
+        self.assertEqual(fieldmodule1.findMeshByDimension(3).getSize(), fieldmodule2.findMeshByDimension(3).getSize())
+        self.assertLess(fieldmodule2.findMeshByDimension(2).getSize(), fieldmodule1.findMeshByDimension(2).getSize())
+        nodes2 = fieldmodule2.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        annotationGroups2 = exteriorPackage.getAnnotationGroups()
+        self.assertIsNotNone(exteriorPackage.findAnnotationGroupByName('user group'))
+        self.assertEqual(dimensions1, [ annotationGroup.getDimension() for annotationGroup in annotationGroups2 ])
+        for annotationGroup in annotationGroups2:
+            dimension = annotationGroup.getDimension()
+            if dimension > 0:
+                self.assertFalse(annotationGroup.hasNodesetGroup(nodes2))
+            for lowerDimension in range(1, dimension):
+                self.assertFalse(annotationGroup.hasMeshGroup(fieldmodule2.findMeshByDimension(lowerDimension)))
+
+    def test_scaffold_package_copy(self):
+        """
+        Test deep copy of scaffold package and cached default options are independent.
+        """
+        colonType = Scaffolds().findScaffoldTypeByName('3D Colon 1')
+        scaffoldPackage = ScaffoldPackage(colonType, defaultParameterSetName='Pig 1')
+        scaffoldPackage2 = ScaffoldPackage(colonType, defaultParameterSetName='Pig 1')
+        self.assertEqual(scaffoldPackage, scaffoldPackage2)
+        settings = scaffoldPackage.getScaffoldSettings()
+        settings2 = scaffoldPackage2.getScaffoldSettings()
+        self.assertIsNot(settings, settings2)
+        self.assertIsNot(settings['Central path'], settings2['Central path'])
+        settings2['Number of segments'] += 1
+        self.assertNotEqual(settings['Number of segments'], settings2['Number of segments'])
+        self.assertEqual(settings, ScaffoldPackage(colonType, defaultParameterSetName='Pig 1').getScaffoldSettings())
+
+        scaffoldPackage.setRotation([ 0.0, 0.0, 90.0 ])
+        scaffoldPackage3 = copy.deepcopy(scaffoldPackage)
+        self.assertEqual(scaffoldPackage, scaffoldPackage3)
+        settings3 = scaffoldPackage3.getScaffoldSettings()
+        self.assertIsNot(settings, settings3)
+        centralPath = settings['Central path']
+        centralPath3 = settings3['Central path']
+        self.assertIsNot(centralPath, centralPath3)
+        self.assertEqual(centralPath, centralPath3)
+        centralPath3.getScaffoldSettings()['Number of elements'] += 1
+        self.assertNotEqual(centralPath, centralPath3)
+        self.assertNotEqual(scaffoldPackage, scaffoldPackage3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+import unittest
+from scaffoldmaker.scaffoldpackage import ScaffoldPackage
+from scaffoldmaker.scaffolds import Scaffolds, Scaffolds_decodeBinary, Scaffolds_decodeJSON, Scaffolds_encodeBinary, \
+    Scaffolds_JSONEncoder
+from scaffoldmaker.utils.binaryserialisation import binaryToJSON, jsonToBinary
+
+
+class ScaffoldsTestCase(unittest.TestCase):
+
+    def test_scaffolds_registry(self):
+        """
+        Test scaffold types are found by name and their modules only imported on first access.
+        """
+        scaffolds = Scaffolds()
+        names = scaffolds.getScaffoldTypeNames()
+        self.assertEqual(len(names), len(set(names)))
+        scaffoldTypes = scaffolds.getScaffoldTypes()
+        self.assertEqual(names, [ scaffoldType.getName() for scaffoldType in scaffoldTypes ])
+        for scaffoldType in scaffoldTypes:
+            self.assertIs(scaffoldType, scaffolds.findScaffoldTypeByName(scaffoldType.getName()))
+        self.assertEqual('3D Box 1', scaffolds.getDefaultScaffoldType().getName())
+        self.assertIsNone(scaffolds.findScaffoldTypeByName('3D Not A Scaffold 1'))
+
+        # in a new interpreter, finding one scaffold type only imports its module and dependencies
+        code = (
+            "import sys\n"
+            "from scaffoldmaker.scaffolds import Scaffolds\n"
+            "Scaffolds().findScaffoldTypeByName('3D Box 1')\n"
+            "print(' '.join(name for name in sys.modules if name.startswith('scaffoldmaker.meshtypes.meshtype_')))\n")
+        loaded = subprocess.run([ sys.executable, '-c', code ], stdout=subprocess.PIPE, check=True).stdout.decode().split()
+        self.assertIn('scaffoldmaker.meshtypes.meshtype_3d_box1', loaded)
+        self.assertNotIn('scaffoldmaker.meshtypes.meshtype_3d_stomachhuman1', loaded)
+        self.assertLess(len(loaded), len(names)//4)
+
+    def test_binary_serialisation(self):
+        """
+        Test compact binary serialisation of scaffold package with nested package and mesh edits.
+        """
+        scaffoldPackage = ScaffoldPackage(Scaffolds().findScaffoldTypeByName('3D Colon 1'))
+        centralPath = scaffoldPackage.getScaffoldSettings()['Central path']
+        self.assertTrue(isinstance(centralPath.getMeshEdits(), bytes))
+        data = Scaffolds_encodeBinary(scaffoldPackage)
+        scaffoldPackage2 = Scaffolds_decodeBinary(data)
+        self.assertEqual(scaffoldPackage, scaffoldPackage2)
+        self.assertEqual(centralPath.getMeshEdits(), scaffoldPackage2.getScaffoldSettings()['Central path'].getMeshEdits())
+
+        jsonString = json.dumps(scaffoldPackage, cls=Scaffolds_JSONEncoder)
+        self.assertLess(len(data), len(jsonString)//2)
+        self.assertEqual(jsonString, binaryToJSON(data))
+        self.assertEqual(scaffoldPackage, json.loads(binaryToJSON(jsonToBinary(jsonString)), object_hook=Scaffolds_decodeJSON))
+
+
+if __name__ == "__main__":
+    unittest.main()
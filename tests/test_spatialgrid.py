@@ -0,0 +1,62 @@
+import math
+import unittest
+from scaffoldmaker.utils.octree import Octree
+from scaffoldmaker.utils.spatialgrid import SpatialGrid
+
+
+class SpatialGridTestCase(unittest.TestCase):
+
+    def test_spatialgrid_matches_octree(self):
+        """
+        Test spatial grid finds the same objects as octree, including near cell boundaries.
+        """
+        minimums = [ -1.0, -1.0, -1.0 ]
+        maximums = [ 2.0, 2.0, 2.0 ]
+        octree = Octree(minimums, maximums)
+        tolerance = octree._tolerance
+        spatialGrid = SpatialGrid(tolerance)
+        self.assertEqual(tolerance, spatialGrid.getTolerance())
+        points = []
+        for k in range(5):
+            for j in range(5):
+                for i in range(5):
+                    points.append([ 0.25*i, 0.25*j + 0.1*math.sin(i), 0.25*k ])
+        # add points within and just beyond tolerance of earlier points
+        points += [ [ x[0] + 0.4*tolerance, x[1] - 0.4*tolerance, x[2] ] for x in points[::3] ]
+        points += [ [ x[0] + 1.5*tolerance, x[1], x[2] ] for x in points[::7] ]
+        octreeIds = []
+        gridIds = []
+        for x in points:
+            for index, ids in ((octree, octreeIds), (spatialGrid, gridIds)):
+                obj = index.findObjectByCoordinates(x)
+                if obj is None:
+                    obj = len(ids)
+                    index.addObjectAtCoordinates(x, obj)
+                ids.append(obj)
+        self.assertEqual(octreeIds, gridIds)
+        self.assertEqual(len(set(gridIds)), spatialGrid.getObjectsCount())
+
+    def test_spatialgrid_find_or_add_many(self):
+        """
+        Test bulk find or add of points including coincident points in the same call.
+        """
+        spatialGrid = SpatialGrid(1.0E-6)
+        created = []
+        def createObject(index):
+            created.append(index)
+            return 100 + len(created)
+        points = [ [ 0.0, 0.0, 0.0 ], [ 1.0, 0.0, 0.0 ], [ 0.0, 0.0, 0.0 ], [ 0.5, 0.5, 0.5 ], [ 1.0, 0.0, 1.0E-7 ] ]
+        searchMask = [ True, True, True, False, True ]
+        objects = spatialGrid.findOrAddMany(points, createObject, searchMask=searchMask)
+        self.assertEqual([ 101, 102, 101, 103, 102 ], objects)
+        self.assertEqual([ 0, 1, 3 ], created)
+        self.assertEqual(2, spatialGrid.getObjectsCount())
+        objects = spatialGrid.findOrAddMany(points[:2], createObject, knownObjects=[ 7, None ], addNew=False)
+        self.assertEqual([ 7, 102 ], objects)
+        objects = spatialGrid.findOrAddMany([ [ 2.0, 0.0, 0.0 ] ], createObject, addNew=False)
+        self.assertEqual([ 104 ], objects)
+        self.assertIsNone(spatialGrid.findObjectByCoordinates([ 2.0, 0.0, 0.0 ]))
+
+
+if __name__ == "__main__":
+    unittest.main()
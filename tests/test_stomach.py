@@ -1,4 +1,5 @@
 import copy
+import numpy as np
 import unittest
 from opencmiss.utils.zinc.finiteelement import evaluateFieldNodesetRange, findNodeWithName
 from opencmiss.utils.zinc.general import ChangeManager
@@ -9,6 +10,7 @@ from opencmiss.zinc.result import RESULT_OK
 from scaffoldmaker.annotation.annotationgroup import getAnnotationGroupForTerm
 from scaffoldmaker.annotation.stomach_terms import get_stomach_term
 from scaffoldmaker.meshtypes.meshtype_3d_stomach1 import MeshType_3d_stomach1
+from scaffoldmaker.meshtypes.meshtype_3d_stomachhuman1 import MeshType_3d_stomachhuman1, Stomach
 from scaffoldmaker.utils.meshrefinement import MeshRefinement
 from scaffoldmaker.utils.zinc_utils import createFaceMeshGroupExteriorOnFace
 from testutils import assertAlmostEqualList
@@ -163,5 +165,59 @@ class StomachScaffoldTestCase(unittest.TestCase):
         self.assertEqual(1213, element.getIdentifier())
         assertAlmostEqualList(self, xi, [ 0.0, 1.0, 1.0 ], 1.0E-10)
 
+    def test_stomachhuman1(self):
+        """
+        Test creation of human stomach scaffold from host mesh, and that host mesh values evaluated
+        from arrays match those evaluated by Zinc from the host mesh EX string.
+        """
+        scaffold = MeshType_3d_stomachhuman1
+        options = scaffold.getDefaultOptions()
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        self.assertEqual([], scaffold.generateBaseMesh(region, options))
+        fieldmodule = region.getFieldmodule()
+        mesh3d = fieldmodule.findMeshByDimension(3)
+        self.assertEqual(264, mesh3d.getSize())
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        self.assertEqual(384, nodes.getSize())
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        minimums, maximums = evaluateFieldNodesetRange(coordinates, nodes)
+        assertAlmostEqualList(self, minimums, [-0.4161696376130286, -0.4718423850914564, -0.5617831769261749], 1.0E-6)
+        assertAlmostEqualList(self, maximums, [0.5815545631087864, 0.5253560248652475, 0.40641402868512333], 1.0E-6)
+        fibres = fieldmodule.findFieldByName("fibres").castFiniteElement()
+        minimums, maximums = evaluateFieldNodesetRange(fibres, nodes)
+        assertAlmostEqualList(self, minimums, [0.0, 0.0, 0.0], 1.0E-6)
+        assertAlmostEqualList(self, maximums, [1.570796326794897, 0.0, 0.0], 1.0E-6)
+
+        stomach = Stomach()
+        values = stomach.getInitialValues({ 'coordinates': 3, 'fibres': 3 }, 8, 11, 3, {}, {})
+        hostRegion = context.createRegion()
+        sir = hostRegion.createStreaminformationRegion()
+        sir.createStreamresourceMemoryBuffer(Stomach.hostMesh)
+        self.assertEqual(RESULT_OK, hostRegion.read(sir))
+        hostFieldmodule = hostRegion.getFieldmodule()
+        hostMesh = hostFieldmodule.findMeshByDimension(3)
+        hostFields = [ (hostFieldmodule.findFieldByName(fieldName), values[fieldName]) for fieldName in ('coordinates', 'fibres') ]
+        fieldcache = hostFieldmodule.createFieldcache()
+        # node material coordinates around, along and through the wall, as for default options
+        n = 0
+        for wallLocation in np.linspace(0.0, 0.99999, 4):
+            for lengthLocation in np.linspace(0.0, 0.99999, 12):
+                for circumferentialLocation in np.linspace(0.0, 0.99999, 9)[:8]:
+                    xi = []
+                    elementIdentifier = 1
+                    for location, elementsCount, offset in ((circumferentialLocation, 8, 1), (lengthLocation, 11, 8), (wallLocation, 3, 88)):
+                        position = int(location*elementsCount)
+                        xi.append(location*elementsCount - position)
+                        elementIdentifier += position*offset
+                    # xi1 and xi2 are swapped in host mesh
+                    fieldcache.setMeshLocation(hostMesh.findElementByIdentifier(elementIdentifier), [ xi[1], xi[0], xi[2] ])
+                    for hostField, fieldValues in hostFields:
+                        result, x = hostField.evaluateReal(fieldcache, 3)
+                        self.assertEqual(RESULT_OK, result)
+                        assertAlmostEqualList(self, x, fieldValues[n].tolist(), 1.0E-10)
+                    n += 1
+        self.assertEqual(384, n)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,78 @@
+import math
+import unittest
+from scaffoldmaker.utils import vector
+from scaffoldmaker.utils.tracksurface import TrackSurface
+from testutils import assertAlmostEqualList
+
+
+def createEllipticTubeTrackSurface():
+    '''
+    :return: TrackSurface looping around a tube with elliptical, varying cross section.
+    '''
+    elementsCount1 = 12
+    elementsCount2 = 8
+    nx = []
+    nd1 = []
+    nd2 = []
+    for n2 in range(elementsCount2 + 1):
+        z = -1.0 + 2.0*n2/elementsCount2
+        for n1 in range(elementsCount1):
+            theta = 2.0*math.pi*n1/elementsCount1
+            r = 1.0 + 0.3*math.cos(2.0*theta) + 0.2*z*z
+            nx.append([ r*math.cos(theta), 0.7*r*math.sin(theta), 1.5*z ])
+            nd1.append([ -r*math.sin(theta)*2.0*math.pi/elementsCount1, 0.7*r*math.cos(theta)*2.0*math.pi/elementsCount1, 0.0 ])
+            nd2.append([ 0.8*z*math.cos(theta)/elementsCount2, 0.56*z*math.sin(theta)/elementsCount2, 3.0/elementsCount2 ])
+    return TrackSurface(elementsCount1, elementsCount2, nx, nd1, nd2, loop1=True)
+
+
+class TrackSurfaceTestCase(unittest.TestCase):
+
+    def test_evaluate_coordinates_many(self):
+        """
+        Test batched evaluation with cached element coefficients matches evaluateCoordinates.
+        """
+        trackSurface = createEllipticTubeTrackSurface()
+        positions = [ trackSurface.createPositionProportion((0.13*i) % 2.0, (0.07*i) % 1.0) for i in range(50) ]
+        x = trackSurface.evaluateCoordinatesMany(positions)
+        self.assertEqual((50, 3), x.shape)
+        x, d1, d2 = trackSurface.evaluateCoordinatesMany(positions, derivatives=True)
+        TOL = 1.0E-12
+        for i in range(50):
+            ex, ed1, ed2 = trackSurface.evaluateCoordinates(positions[i], derivatives=True)
+            assertAlmostEqualList(self, ex, x[i].tolist(), delta=TOL)
+            assertAlmostEqualList(self, ed1, d1[i].tolist(), delta=TOL)
+            assertAlmostEqualList(self, ed2, d2[i].tolist(), delta=TOL)
+
+    def test_find_nearest_position(self):
+        """
+        Test finding nearest position starting from sampled points.
+        """
+        trackSurface = createEllipticTubeTrackSurface()
+        for proportion1, proportion2 in ((0.1, 0.2), (0.7, 0.5), (1.3, 0.9), (1.9, 0.05)):
+            position = trackSurface.createPositionProportion(proportion1, proportion2)
+            x, d1, d2 = trackSurface.evaluateCoordinates(position, derivatives=True)
+            normal = vector.normalise(vector.crossproduct3(d1, d2))
+            targetx = [ (x[c] + 0.05*normal[c]) for c in range(3) ]
+            samplePosition = trackSurface.findNearestSamplePosition(targetx)
+            sx = trackSurface.evaluateCoordinates(samplePosition)
+            self.assertLess(vector.magnitude([ (sx[c] - x[c]) for c in range(3) ]), 0.2)
+            nearestPosition = trackSurface.findNearestPosition(targetx, startFromSamples=True)
+            nx = trackSurface.evaluateCoordinates(nearestPosition)
+            assertAlmostEqualList(self, x, nx, delta=1.0E-5)
+
+    def test_track_vector_adaptive_step(self):
+        """
+        Test tracking with adaptive step ends close to tracking with fixed step.
+        """
+        trackSurface = createEllipticTubeTrackSurface()
+        startPosition = trackSurface.createPositionProportion(0.3, 0.4)
+        for direction, distance in (([ 0.0, 1.0, 0.2 ], 1.5), ([ 1.0, 0.0, 0.5 ], -1.0), ([ 0.1, 1.0, 0.0 ], 4.0)):
+            fixedPosition = trackSurface.trackVector(startPosition, direction, distance)
+            adaptivePosition = trackSurface.trackVector(startPosition, direction, distance, adaptiveStep=True)
+            fx = trackSurface.evaluateCoordinates(fixedPosition)
+            ax = trackSurface.evaluateCoordinates(adaptivePosition)
+            assertAlmostEqualList(self, fx, ax, delta=5.0E-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
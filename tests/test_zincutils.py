@@ -0,0 +1,164 @@
+import time
+import unittest
+from opencmiss.utils.zinc.general import ChangeManager
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field, FieldGroup
+from opencmiss.zinc.node import Node
+from scaffoldmaker.annotation.annotationgroup import AnnotationGroup
+from scaffoldmaker.meshtypes.meshtype_1d_path1 import MeshType_1d_path1, extractPathParametersFromRegion, \
+    setPathParameters
+from scaffoldmaker.meshtypes.meshtype_3d_box1 import MeshType_3d_box1
+from scaffoldmaker.utils.zinc_utils import extract_node_field_parameters, get_nodeset_field_parameters, \
+    identifier_ranges_to_string, mesh_group_to_identifier_ranges, nodeset_group_to_identifier_ranges, \
+    set_nodeset_field_parameters
+from testutils import assertAlmostEqualList
+
+
+class ZincUtilsTestCase(unittest.TestCase):
+
+    def test_annotation_group_identifier_ranges(self):
+        """
+        Test addition of whole and partial identifier ranges to annotation groups via serialisation.
+        """
+        options = MeshType_3d_box1.getDefaultOptions()
+        options['Number of elements 1'] = 3
+        options['Number of elements 2'] = 3
+        options['Number of elements 3'] = 3
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        MeshType_3d_box1.generateMesh(region, options)
+        fieldmodule = region.getFieldmodule()
+        mesh3d = fieldmodule.findMeshByDimension(3)
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        self.assertEqual(27, mesh3d.getSize())
+        self.assertEqual(64, nodes.getSize())
+
+        allGroup = AnnotationGroup.fromDict({ '_AnnotationGroup': True, 'name': 'all', 'ontId': 'ALL:1',
+            'dimension': 3, 'identifierRanges': '1-27' }, region)
+        self.assertEqual(27, allGroup.getMeshGroup(mesh3d).getSize())
+        self.assertEqual(108, allGroup.getMeshGroup(fieldmodule.findMeshByDimension(2)).getSize())
+        self.assertEqual(144, allGroup.getMeshGroup(fieldmodule.findMeshByDimension(1)).getSize())
+        self.assertEqual(64, allGroup.getNodesetGroup(nodes).getSize())
+        dct = allGroup.toDict()
+        self.assertTrue(dct['wholeDomain'])
+        wholeGroup = AnnotationGroup.fromDict(dict(dct, name='whole'), region)
+        self.assertEqual(27, wholeGroup.getMeshGroup(mesh3d).getSize())
+        self.assertEqual(64, wholeGroup.getNodesetGroup(nodes).getSize())
+        # wholeDomain is ignored if the ranges don't have the domain size
+        staleGroup = AnnotationGroup.fromDict({ '_AnnotationGroup': True, 'name': 'stale', 'ontId': 'STALE:1',
+            'dimension': 3, 'identifierRanges': '1-4', 'wholeDomain': True }, region)
+        self.assertEqual(4, staleGroup.getMeshGroup(mesh3d).getSize())
+
+        partGroup = AnnotationGroup.fromDict({ '_AnnotationGroup': True, 'name': 'part', 'ontId': 'PART:1',
+            'dimension': 3, 'identifierRanges': '1,3-4,30' }, region)
+        meshGroup = partGroup.getMeshGroup(mesh3d)
+        self.assertEqual(3, meshGroup.getSize())
+        self.assertEqual('1,3-4', identifier_ranges_to_string(mesh_group_to_identifier_ranges(meshGroup)))
+        self.assertEqual(17, partGroup.getMeshGroup(fieldmodule.findMeshByDimension(2)).getSize())
+        self.assertEqual(20, partGroup.getNodesetGroup(nodes).getSize())
+        self.assertNotIn('wholeDomain', partGroup.toDict())
+
+        # ranges covering more identifiers than the domain but not all of it
+        nodeGroup = AnnotationGroup.fromDict({ '_AnnotationGroup': True, 'name': 'nodes', 'ontId': 'NODES:1',
+            'dimension': 0, 'identifierRanges': '2-64,70-80' }, region)
+        nodesetGroup = nodeGroup.getNodesetGroup(nodes)
+        self.assertEqual(63, nodesetGroup.getSize())
+        self.assertEqual('2-64', identifier_ranges_to_string(nodeset_group_to_identifier_ranges(nodesetGroup)))
+
+    def test_annotation_group_from_dict_timing(self):
+        """
+        Test conditional addition of a large annotation group from dict is faster than the
+        baseline adding elements one at a time with full subelement handling.
+        """
+        options = MeshType_3d_box1.getDefaultOptions()
+        options['Number of elements 1'] = 16
+        options['Number of elements 2'] = 16
+        options['Number of elements 3'] = 16
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        MeshType_3d_box1.generateMesh(region, options)
+        fieldmodule = region.getFieldmodule()
+        meshes = [ fieldmodule.findMeshByDimension(dimension) for dimension in range(3, 0, -1) ]
+        mesh3d = meshes[0]
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        elementsCount = mesh3d.getSize()
+        self.assertEqual(4096, elementsCount)
+
+        startTime = time.perf_counter()
+        baselineGroup = AnnotationGroup(region, ('baseline', 'BASELINE:1'))
+        with ChangeManager(fieldmodule):
+            baselineGroup.getGroup().setSubelementHandlingMode(FieldGroup.SUBELEMENT_HANDLING_MODE_FULL)
+            meshGroup = baselineGroup.getMeshGroup(mesh3d)
+            for identifier in range(1, elementsCount + 1):
+                meshGroup.addElement(mesh3d.findElementByIdentifier(identifier))
+        baselineTime = time.perf_counter() - startTime
+        expectedSizes = [ baselineGroup.getMeshGroup(mesh).getSize() for mesh in meshes ] + \
+            [ baselineGroup.getNodesetGroup(nodes).getSize() ]
+        self.assertEqual([ 4096, 13056, 13872, 4913 ], expectedSizes)
+
+        wholeDct = dict(baselineGroup.toDict(), name='whole')
+        self.assertTrue(wholeDct['wholeDomain'])
+        rangesDct = dict(wholeDct, name='ranges')
+        del rangesDct['wholeDomain']
+        for dct in (wholeDct, rangesDct):
+            startTime = time.perf_counter()
+            annotationGroup = AnnotationGroup.fromDict(dct, region)
+            elapsedTime = time.perf_counter() - startTime
+            self.assertEqual(expectedSizes, [ annotationGroup.getMeshGroup(mesh).getSize() for mesh in meshes ] +
+                [ annotationGroup.getNodesetGroup(nodes).getSize() ])
+            self.assertLess(elapsedTime, baselineTime)
+
+    def test_nodeset_field_parameters(self):
+        """
+        Test dense numpy get and set of node field parameters and path parameter functions.
+        """
+        options = MeshType_1d_path1.getDefaultOptions()
+        options['Number of elements'] = 3
+        options['Length'] = 3.0
+        options['D2 derivatives'] = True
+        context = Context("Test")
+        region = context.getDefaultRegion()
+        MeshType_1d_path1.generateMesh(region, options)
+        fieldmodule = region.getFieldmodule()
+        coordinates = fieldmodule.findFieldByName("coordinates").castFiniteElement()
+        nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        valueLabels = [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS3 ]
+        identifiers, parameters, present = get_nodeset_field_parameters(nodes, coordinates, valueLabels)
+        self.assertEqual([ 1, 2, 3, 4 ], identifiers.tolist())
+        self.assertEqual((4, 3, 1, 3), parameters.shape)
+        self.assertEqual((4, 3, 1), present.shape)
+        self.assertTrue(present[:, 0:2].all())
+        self.assertFalse(present[:, 2].any())
+        assertAlmostEqualList(self, [ 2.0, 0.0, 0.0 ], parameters[2, 0, 0].tolist(), delta=1.0E-12)
+        assertAlmostEqualList(self, [ 1.0, 0.0, 0.0 ], parameters[2, 1, 0].tolist(), delta=1.0E-12)
+
+        identifiers, parameters, present = get_nodeset_field_parameters(nodes, coordinates, valueLabels, [ 3, 5 ])
+        self.assertEqual([ 3, 5 ], identifiers.tolist())
+        self.assertTrue(present[0, 0:2].all())
+        self.assertFalse(present[1].any())
+
+        identifiers, parameters, present = get_nodeset_field_parameters(nodes, coordinates, valueLabels)
+        parameters[:, 0, 0, 1] = [ 0.0, 0.5, 1.0, 1.5 ]
+        self.assertEqual(0, set_nodeset_field_parameters(nodes, coordinates, valueLabels, identifiers, parameters, present))
+        self.assertEqual(4, set_nodeset_field_parameters(nodes, coordinates, valueLabels, None, parameters))
+        x, d1 = extractPathParametersFromRegion(region, valueLabels[0:2])
+        assertAlmostEqualList(self, [ 3.0, 1.5, 0.0 ], x[3], delta=1.0E-12)
+        assertAlmostEqualList(self, [ 1.0, 0.0, 0.0 ], d1[3], delta=1.0E-12)
+        valueLabels, fieldParameters = extract_node_field_parameters(nodes, coordinates)
+        self.assertEqual([ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2 ],
+            valueLabels)
+        self.assertEqual(4, len(fieldParameters))
+        self.assertEqual(2, fieldParameters[1][0])
+        assertAlmostEqualList(self, [ 1.0, 0.5, 0.0 ], fieldParameters[1][1][0][0], delta=1.0E-12)
+        assertAlmostEqualList(self, [ 0.0, 1.0, 0.0 ], fieldParameters[1][1][2][0], delta=1.0E-12)
+
+        setPathParameters(region, [ Node.VALUE_LABEL_D_DS1 ], [ [ [ 1.0, 0.1*n, 0.0 ] for n in range(4) ] ], editGroupName='edited')
+        x, d1 = extractPathParametersFromRegion(region, [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1 ])
+        assertAlmostEqualList(self, [ 2.0, 1.0, 0.0 ], x[2], delta=1.0E-12)
+        assertAlmostEqualList(self, [ 1.0, 0.2, 0.0 ], d1[2], delta=1.0E-12)
+        editGroup = fieldmodule.findFieldByName('edited').castGroup()
+        self.assertEqual(4, editGroup.getFieldNodeGroup(nodes).getNodesetGroup().getSize())
+
+
+if __name__ == "__main__":
+    unittest.main()